@@ -158,6 +158,8 @@ CONFIGURATION = {
                   LOGGER._setverbosity),
     'pdb_mirror_path': ('', None, proteins.pathPDBMirror),
     'local_pdb_folder': ('', None, proteins.pathPDBFolder),
+    'structure_cache': ('', None, proteins.pathStructureCache),
+    'structure_cache_size': (1024, None, None),
 }
 
 
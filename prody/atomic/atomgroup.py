@@ -1784,10 +1784,10 @@ for fname, field in ATOMIC_FIELDS.items():
                         raise ValueError('array cannot be assigned type '
                                          '{0}'.format(dtype))
                 self._data[var] = array
-                if none:
-                    self._none(none)
-                if flags and self._flags:
-                    self._resetFlags(var)
+        if none:
+            self._none(none)
+        if flags and self._flags:
+            self._resetFlags(var)
 
     setData = wrapSetMethod(setData)
     setData.__name__ = setMeth
@@ -37,7 +37,7 @@ from re import compile as recompile
 from time import time
 from collections import defaultdict
 
-from numpy import array, ones, zeros
+from numpy import append, array, diff, ones, repeat, unique, zeros
 
 from prody import SETTINGS, LOGGER
 from prody.utilities import joinLinks, joinTerms, wrapText
@@ -55,6 +55,7 @@ PLANTERS = {}
 EDITORS = {}
 FIELDS = defaultdict(set)  # flags that fill be nulled when a field changes
 FIELDSDEFAULT = ['name', 'resname', 'resnum']
+RESFIELDS = ['chain', 'segment', 'icode', 'resnum']  # fields for resindex
 TIMESTAMP = 0
 
 PDBLIGSUM = ('.. _{0}: '
@@ -753,12 +754,29 @@ def updateDefinitions():
 # protein
 #==============================================================================
 
+def _lookup(values, test):
+    """Returns a boolean array for *values* evaluating *test* only once for
+    each distinct value.  Values are first collapsed into runs of identical
+    consecutive values, e.g. residue names of atoms in a residue, and *test*
+    results are tabulated for unique values of runs."""
+
+    n_atoms = len(values)
+    if not n_atoms:
+        return zeros(0, bool)
+    starts = ones(n_atoms, bool)
+    starts[1:] = values[1:] != values[:-1]
+    starts = starts.nonzero()[0]
+    uniq, inverse = unique(values[starts], return_inverse=True)
+    table = array([test(val) for val in uniq], bool)
+    return repeat(table[inverse], diff(append(starts, n_atoms)))
+
+
 def setCalpha(ag, label):
 
     flags = ag._getNames() == 'CA'
     indices = flags.nonzero()[0]
     if len(indices):
-        torf = array([rn in AMINOACIDS for rn in ag._getResnames()[indices]])
+        torf = _lookup(ag._getResnames()[indices], AMINOACIDS.__contains__)
         flags[indices] = torf
         ag._setFlags(label, flags)
         ag._setSubset(label, indices[torf])
@@ -767,7 +785,7 @@ def setCalpha(ag, label):
         ag._setSubset(label, array([]))
     return flags
 
-addPlanter(setCalpha, 'ca', 'calpha')
+addPlanter(setCalpha, 'ca', 'calpha', fields=['name', 'resname'])
 
 
 def setProtein(ag, label):
@@ -783,7 +801,8 @@ def setProtein(ag, label):
     ag._setFlags('protein', flags)
     return flags
 
-addPlanter(setProtein, 'protein', 'aminoacid')
+addPlanter(setProtein, 'protein', 'aminoacid',
+           fields=['name', 'resname'] + RESFIELDS)
 
 # subsets
 #==============================================================================
@@ -793,17 +812,18 @@ def setBackbone(ag, label):
 
     protein = ag._getSubset('protein')
     if len(protein):
-        bb = DEFINITIONS[label]
-        names = ag._getNames()[protein]
         flags = zeros(ag.numAtoms(), bool)
-        flags[protein] = [nm in bb for nm in names]
+        flags[protein] = _lookup(ag._getNames()[protein],
+                                 DEFINITIONS[label].__contains__)
     else:
         flags = zeros(ag.numAtoms(), bool)
     ag._setFlags(label, flags)
     return flags
 
-addPlanter(setBackbone, 'bb', 'backbone', editor=changeBackbone)
-addPlanter(setBackbone, 'bbfull', 'backbonefull', editor=changeBackbone)
+addPlanter(setBackbone, 'bb', 'backbone', editor=changeBackbone,
+           fields=['name', 'resname'] + RESFIELDS)
+addPlanter(setBackbone, 'bbfull', 'backbonefull', editor=changeBackbone,
+           fields=['name', 'resname'] + RESFIELDS)
 
 
 def setSidechain(ag, label):
@@ -818,18 +838,18 @@ def setSidechain(ag, label):
     ag._setFlags(label, flags)
     return flags
 
-addPlanter(setSidechain, 'sc', 'sidechain')
+addPlanter(setSidechain, 'sc', 'sidechain',
+           fields=['name', 'resname'] + RESFIELDS)
 
 
 def setCategories(ag, label):
 
     calpha = ag._getSubset('ca')
     if len(calpha):
-        resnames = DEFINITIONS[label]
         residx = ag._getResindices()
         torf = zeros(ag.numResidues(), bool)
-        torf[residx[calpha]] = [rn in resnames
-                                for rn in ag._getResnames()[calpha]]
+        torf[residx[calpha]] = _lookup(ag._getResnames()[calpha],
+                                       DEFINITIONS[label].__contains__)
         flags = torf[residx]
     else:
         flags = zeros(ag.numAtoms(), bool)
@@ -837,7 +857,7 @@ def setCategories(ag, label):
     return flags
 
 addPlanter(setCategories, 'stdaa', 'nonstdaa', *list(CATEGORIZED.keys()),
-           aliases=False)
+           aliases=False, fields=['name', 'resname'] + RESFIELDS)
 
 
 def setAll(ag, label):
@@ -846,7 +866,7 @@ def setAll(ag, label):
     ag._setFlags('all', flags)
     return flags
 
-addPlanter(setAll, 'all')
+addPlanter(setAll, 'all', fields=[])
 
 
 def setNone(ag, label):
@@ -855,7 +875,7 @@ def setNone(ag, label):
     ag._setFlags('none', flags)
     return flags
 
-addPlanter(setNone, 'none')
+addPlanter(setNone, 'none', fields=[])
 
 # hetero, nucleic, water, etc.
 #==============================================================================
@@ -863,15 +883,15 @@ addPlanter(setNone, 'none')
 
 def setResiflag(ag, label):
 
-    resnames = DEFINITIONS[label]
-    flags = array([rn in resnames for rn in ag._getResnames()], bool)
+    flags = _lookup(ag._getResnames(), DEFINITIONS[label].__contains__)
     ag._setFlags(label, flags)
     return flags
 
 addPlanter(setResiflag, 'nucleobase', 'nucleoside', 'nucleotide',
            'water', 'ion', 'lipid', 'sugar', 'heme', 'at', 'cg', 'purine',
-           'pyrimidine', aliases=False, editor=changeResnames)
-addPlanter(setResiflag, 'nucleic')
+           'pyrimidine', aliases=False, editor=changeResnames,
+           fields=['resname'])
+addPlanter(setResiflag, 'nucleic', fields=['resname'])
 
 
 def setHetero(ag, label):
@@ -882,7 +902,7 @@ def setHetero(ag, label):
     ag._setFlags('hetero', flags)
     return flags
 
-addPlanter(setHetero, 'hetero',)
+addPlanter(setHetero, 'hetero', fields=['name', 'resname'] + RESFIELDS)
 
 
 # element
@@ -891,13 +911,13 @@ addPlanter(setHetero, 'hetero',)
 def setElement(ag, label):
 
     match = DEFINITIONS[label].match
-    flags = array([match(nm) is not None for nm in ag._getNames()])
+    flags = _lookup(ag._getNames(), lambda nm: match(nm) is not None)
     flags[ag._getSubset('ion')] = False
     ag._setFlags(label, flags)
     return flags
 
 addPlanter(setElement, 'hydrogen', 'carbon', 'nitrogen', 'oxygen', 'sulfur',
-           aliases=False, editor=changeNameRegex)
+           aliases=False, editor=changeNameRegex, fields=['name', 'resname'])
 
 
 def setNoh(ag, label):
@@ -907,7 +927,7 @@ def setNoh(ag, label):
     ag._setFlags(label, flags)
     return flags
 
-addPlanter(setNoh, 'noh', 'heavy')
+addPlanter(setNoh, 'noh', 'heavy', fields=['name', 'resname'])
 
 
 # secondary
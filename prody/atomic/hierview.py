@@ -2,7 +2,8 @@
 """This module defines :class:`HierView` class that builds a hierarchical
 views of atom groups."""
 
-from numpy import unique, zeros, arange, concatenate
+from numpy import unique, zeros, arange, concatenate, repeat, flatnonzero
+from numpy import argsort, cumsum, split
 from prody.utilities.misctools import count
 
 from .atomgroup import AtomGroup
@@ -208,7 +209,10 @@ class HierView(object):
                 _list[pidx] = concatenate((subset, indices[pi:]))
 
     def _update(self, **kwargs):
-        """Build hierarchical view for :class:`.AtomGroup` instances."""
+        """Build hierarchical view for :class:`.AtomGroup` instances.
+        Boundaries of segments, chains, and residues are detected as change
+        points in per-atom data arrays, so that Python level loops run over
+        contiguous runs of atoms rather than individual atoms."""
 
         ag = self._ag = self._atoms
         n_atoms = len(ag)
@@ -219,177 +223,114 @@ class HierView(object):
         self._segments = _segments = []
         self._chains = _chains = []
 
-        nones = None
-        getnones = lambda: [None] * n_atoms if nones is None else nones
         termini = ag.getFlags('pdbter')
-        if termini is None:
-            termini = getnones()
 
         # identify segments
-        segindex = -1
-        segindices = zeros(n_atoms, int)
-
         sgnms = ag._getSegnames()
-        if sgnms is None:
+        if sgnms is None or not n_atoms:
             _segments = None
+            segindices = zeros(n_atoms, int)
         else:
-            s = sgnms[0]
-            if len(unique(sgnms)) == 1:
+            starts = _changepoints(n_atoms, sgnms)
+            if len(starts) == 1 or len(unique(sgnms)) == 1:
                 # 1 segment
-                if s:
+                if sgnms[0]:
                     _segments.append(_indices)
-                    _dict[s] = 0
+                    _dict[sgnms[0]] = 0
                 else:
                     _segments = None
+                segindices = zeros(n_atoms, int)
             else:
-                ps = None       # previous segment name
-                for i, s in enumerate(sgnms):
-                    if s == ps or s in _dict:
-                        continue
-                    ps = s
-                    idx = _indices[i:][sgnms[i:] == s]
-                    segindex += 1
-                    segindices[idx] = segindex
-                    _dict[s or None] = segindex
+                keys = [s or None for s in sgnms[starts].tolist()]
+                segindices, groups = _groupruns(n_atoms, starts, keys)
+                for segindex, (key, idx) in enumerate(groups):
+                    _dict[key] = segindex
                     _segments.append(idx)
 
         ag._data['segindex'] = segindices
+        if _segments is None:
+            sgnms = None
 
         # identify chains
-        chindex = -1
-        chindices = zeros(n_atoms, int)
-
         chids = ag._getChids()
-        if chids is None:
+        if chids is None or not n_atoms:
             _chains = None
+            chindices = zeros(n_atoms, int)
         else:
-            if _segments is None:
-                if len(unique(chids)) == 1:
-                    _dict[(None, chids[0] or None)] = 0
-                    _chains.append(_indices)
-                else:
-                    pc = None
-                    for i, c in enumerate(chids):
-                        if c == pc or (None, c) in _dict:
-                            continue
-                        pc = c
-                        idx = _indices[i:][chids[i:] == c]
-                        chindex += 1
-                        chindices[idx] = chindex
-                        _dict[(None, c)] = chindex
-                        _chains.append(idx)
+            starts = _changepoints(n_atoms, sgnms, chids)
+            if sgnms is None:
+                keys = [(None, c or None) for c in chids[starts].tolist()]
             else:
-                pc = chids[0]
-                ps = sgnms[0]
-                _i = 0
-                for i, c in enumerate(chids):
-                    s = sgnms[i]
-                    if c == pc and s == ps:
-                        continue
-                    s_c = (ps, pc or None)
-                    cid = _dict.get(s_c)
-                    idx = _indices[_i:i]
-                    if cid is None:
-                        #segment = _dict[ps]
-                        chindex += 1
-                        chindices[idx] = chindex
-                        _dict[s_c] = chindex
-                        _chains.append(idx)
-                    else:
-                        chain = _chains[cid]
-                        chindices[idx] = cid
-                        _chains[cid] = concatenate((chain, idx))
-                    pc = c
-                    ps = s
-                    _i = i
-                s_c = (ps or None, pc or None)
-                cid = _dict.get(s_c)
-                idx = _indices[_i:]
-                if cid is None:
-                    #segment = _dict[ps]
-                    chindex += 1
-                    chindices[idx] = chindex
-                    _dict[s_c] = chindex
-                    _chains.append(idx)
-                else:
-                    chain = _chains[cid]
-                    chindices[idx] = cid
-                    _chains[cid] = concatenate((chain, idx))
+                keys = [(s or None, c or None) for s, c in
+                        zip(sgnms[starts].tolist(), chids[starts].tolist())]
+            chindices, groups = _groupruns(n_atoms, starts, keys)
+            for chindex, (key, idx) in enumerate(groups):
+                _dict[key] = chindex
+                _chains.append(idx)
 
         ag._data['chindex'] = chindices
+        if _chains is None:
+            chids = None
 
         if kwargs.get('chain') == True:
             return
 
         # identify residues
-        resindex = -1
-        resindices = zeros(n_atoms, int)
-
         rnums = ag._getResnums()
         if rnums is None:
             raise ValueError('resnums are not set')
-        if _segments is None:
-            sgnms = nones = getnones()
-        if _chains is None:
-            chids = nones = getnones()
         icods = ag._getIcodes()
-        if icods is None:
-            icods = nones = getnones()
-        pr = rnums[0]
-        pi = icods[0] or None
-        pc = chids[0]
-        ps = sgnms[0]
-        _j = 0
-        _append = _residues.append
+
+        starts = _changepoints(n_atoms, sgnms, chids, rnums, icods,
+                               termini=termini)
+        ends = concatenate((starts[1:], [n_atoms]))
+        n_runs = len(starts)
+
+        nones = [None] * n_runs
+        run_s = nones if sgnms is None else sgnms[starts].tolist()
+        run_c = nones if chids is None else chids[starts].tolist()
+        run_r = rnums[starts].tolist()
+        run_i = (nones if icods is None else
+                 [i or None for i in icods[starts].tolist()])
+        if termini is None:
+            run_t = [False] * n_runs
+        else:
+            run_t = termini[ends - 1].tolist()
+
+        # a run continues an earlier residue with the same key, unless that
+        # residue was terminated by a TER record
+        run_res = zeros(n_runs, int)
+        res_runs = []
+        res_ter = []
         _get = _dict.get
         _set = _dict.__setitem__
-        for j, r in enumerate(rnums):
-            i = icods[j] or None
-            c = chids[j]
-            s = sgnms[j]
-            if r != pr or i != pi or c != pc or s != ps or (j and termini[j-1]):
-                s_c_r_i = (ps, pc, pr, pi)
-                rid = _get(s_c_r_i)
-                idx = _indices[_j:j]
-                if (rid is None or isinstance(rid, list) or
-                    termini[_residues[rid][-1]]):
-                    resindex += 1
-                    resindices[idx] = resindex
-                    _append(idx)
-                    if rid is None:
-                        _set(s_c_r_i, resindex)
-                    elif isinstance(rid, list):
-                        rid.append(resindex)
-                    else:
-                        _set(s_c_r_i, [rid, resindex])
+        for k, key in enumerate(zip(run_s, run_c, run_r, run_i)):
+            rid = _get(key)
+            if rid is None or isinstance(rid, list) or res_ter[rid]:
+                resindex = len(res_runs)
+                res_runs.append([k])
+                res_ter.append(run_t[k])
+                if rid is None:
+                    _set(key, resindex)
+                elif isinstance(rid, list):
+                    rid.append(resindex)
                 else:
-                    residue = _residues[rid]
-                    resindices[idx] = rid
-                    _residues[rid] = concatenate((residue, idx))
-                ps = s
-                pc = c
-                pr = r
-                pi = i
-                _j = j
-        s_c_r_i = (ps, pc, pr, pi)
-        rid = _get(s_c_r_i)
-        idx = _indices[_j:]
-        if rid is None or isinstance(rid, list) or termini[_residues[rid][-1]]:
-            resindex += 1
-            resindices[idx] = resindex
-            _append(idx)
-            if rid is None:
-                _set(s_c_r_i, resindex)
-            elif isinstance(rid, list):
-                rid.append(resindex)
+                    _set(key, [rid, resindex])
             else:
-                _set(s_c_r_i, [rid, resindex])
-        else:
-            residue = _residues[rid]
-            resindices[idx] = rid
-            _residues[rid] = concatenate((residue, idx))
+                resindex = rid
+                res_runs[rid].append(k)
+                res_ter[rid] = run_t[k]
+            run_res[k] = resindex
+
+        for runs in res_runs:
+            if len(runs) == 1:
+                k = runs[0]
+                _residues.append(_indices[starts[k]:ends[k]])
+            else:
+                _residues.append(concatenate([_indices[starts[k]:ends[k]]
+                                              for k in runs]))
 
-        ag._data['resindex'] = resindices
+        ag._data['resindex'] = repeat(run_res, ends - starts)
 
     def getResidue(self, chid, resnum, icode=None, segname=None):
         """Returns residue with number *resnum* and insertion code *icode* from
@@ -516,3 +457,49 @@ class HierView(object):
                 item = alist[i] = Segment(ag, item, self, acsi, selstr=selstr,
                                           unique=True)
             yield item
+
+
+def _changepoints(n_atoms, *arrays, **kwargs):
+    """Returns indices of atoms that start a new run of identical values in
+    all of the given *arrays*.  Arrays that are **None** are ignored.  When
+    *termini* flags are given, an atom that follows a terminal atom also
+    starts a new run."""
+
+    change = zeros(n_atoms, bool)
+    if n_atoms:
+        change[0] = True
+    for array in arrays:
+        if array is not None:
+            change[1:] |= array[1:] != array[:-1]
+    termini = kwargs.get('termini')
+    if termini is not None:
+        change[1:] |= termini[:-1]
+    return flatnonzero(change)
+
+
+def _groupruns(n_atoms, starts, keys):
+    """Group runs of atoms starting at *starts* by their *keys*, in the order
+    of first appearance.  Returns group index of each atom and a list of
+    ``(key, indices)`` tuples."""
+
+    ends = concatenate((starts[1:], [n_atoms]))
+    order = {}
+    unique_keys = []
+    run_group = []
+    for key in keys:
+        group = order.get(key)
+        if group is None:
+            group = order[key] = len(unique_keys)
+            unique_keys.append(key)
+        run_group.append(group)
+    indices = zeros(n_atoms, int)
+    indices[:] = repeat(run_group, ends - starts)
+
+    if len(unique_keys) == len(starts):
+        groups = [arange(start, end) for start, end in zip(starts, ends)]
+    else:
+        counts = zeros(len(unique_keys), int)
+        for group, start, end in zip(run_group, starts, ends):
+            counts[group] += end - start
+        groups = split(argsort(indices, kind='mergesort'), cumsum(counts)[:-1])
+    return indices, list(zip(unique_keys, groups))
@@ -17,11 +17,13 @@ struct KDTree
     struct DataPoint* _data_point_list;
     int _data_point_list_size;
     struct Radius* _radius_list;
+    long int _radius_list_size;
     struct Neighbor* _neighbor_list;
     struct Node *_root;
     struct Region *_query_region;
     long int _count;
     long int _neighbor_count;
+    long int _neighbor_list_size;
     float _radius;
     float _radius_sq;
     float _neighbor_radius;
@@ -290,9 +292,11 @@ struct KDTree* KDTree_init(int dim, int bucket_size)
     tree->_root=NULL;
     tree->_coords=NULL;
     tree->_radius_list = NULL;
+    tree->_radius_list_size = 0;
     tree->_count=0;
     tree->_neighbor_count=0;
     tree->_neighbor_list = NULL;
+    tree->_neighbor_list_size = 0;
     tree->_bucket_size=bucket_size;
     tree->_data_point_list = NULL;
     tree->_data_point_list_size = 0;
@@ -385,15 +389,15 @@ static int KDTree_add_point(struct KDTree* tree, long int index, float *coord)
     int n;
     struct DataPoint* p;
 
+    /* list is allocated in KDTree_set_data */
     n = tree->_data_point_list_size;
-    p = realloc(tree->_data_point_list, (n+1)*sizeof(struct DataPoint));
+    p = tree->_data_point_list;
     if (p==NULL) return 0;
 
     p[n]._index = index;
     p[n]._coord = coord;
 
     tree->_data_point_list_size = n+1;
-    tree->_data_point_list = p;
 
     return 1;
 }
@@ -420,18 +424,25 @@ static int KDTree_report_point(struct KDTree* tree, long int index, float *coord
 
     if (r<=tree->_radius_sq)
     {
-        int n = tree->_count;
+        long int n = tree->_count;
         struct Radius* p;
 
-    p  = realloc(tree->_radius_list, (n+1)*sizeof(struct Radius));
-        if (p==NULL)
+        if (n == tree->_radius_list_size)
         {
-            return 0;
+            /* grow geometrically, list is kept between searches */
+            long int size = n ? 2 * n : 64;
+            p = realloc(tree->_radius_list, size*sizeof(struct Radius));
+            if (p==NULL)
+            {
+                return 0;
+            }
+            tree->_radius_list = p;
+            tree->_radius_list_size = size;
         }
+        p = tree->_radius_list;
         /* note use of sqrt - only calculated if necessary */
         p[n].index = index;
         p[n].value = sqrt(r);
-        tree->_radius_list = p;
         tree->_count++;
     }
     return 1;
@@ -474,6 +485,11 @@ long int KDTree_neighbor_get_count(struct KDTree* tree)
     return tree->_neighbor_count;
 }
 
+int KDTree_get_dim(struct KDTree* tree)
+{
+    return tree->dim;
+}
+
 static int KDTree_search(struct KDTree* tree, struct Region *region, struct Node *node, int depth);
 
 static int KDTree_test_region(struct KDTree* tree, struct Node *node, struct Region *region, int depth)
@@ -622,20 +638,33 @@ int KDTree_set_data(struct KDTree* tree, float *coords, long int nr_points)
         free(tree->_radius_list);
         tree->_radius_list = NULL;
     }
+    tree->_radius_list_size = 0;
     tree->_count=0;
     /* keep pointer to coords to delete it */
     tree->_coords=coords;
 
-    for (i=0; i<nr_points; i++)
+    /* data point list is allocated at once, and is reused when the tree is
+       built again for a new set of coordinates */
+    if (nr_points > tree->_data_point_list_size)
     {
-        ok = KDTree_add_point(tree, i, coords+i*tree->dim);
-        if (!ok) 
+        struct DataPoint* p;
+        p = realloc(tree->_data_point_list, nr_points*sizeof(struct DataPoint));
+        if (p==NULL)
         {
             free(tree->_data_point_list);
             tree->_data_point_list = NULL;
             tree->_data_point_list_size = 0;
+            tree->_root = NULL;
             return 0;
         }
+        tree->_data_point_list = p;
+    }
+    tree->_data_point_list_size = 0;
+
+    for (i=0; i<nr_points; i++)
+    {
+        ok = KDTree_add_point(tree, i, coords+i*tree->dim);
+        if (!ok) return 0;
     }
 
     /* build KD tree */
@@ -644,7 +673,7 @@ int KDTree_set_data(struct KDTree* tree, float *coords, long int nr_points)
     return 1;
 }
 
-int KDTree_search_center_radius(struct KDTree* tree, float *coord, float radius)
+static int KDTree__search_center_radius(struct KDTree* tree, float *coord, float radius)
 {
     int i;
     int dim = tree->dim;
@@ -659,11 +688,6 @@ int KDTree_search_center_radius(struct KDTree* tree, float *coord, float radius)
 
     Region_dim=tree->dim;
 
-    if (tree->_radius_list)
-    {
-        free(tree->_radius_list);
-        tree->_radius_list = NULL;
-    }
     tree->_count=0;
 
     tree->_radius=radius;
@@ -678,9 +702,6 @@ int KDTree_search_center_radius(struct KDTree* tree, float *coord, float radius)
         tree->_center_coord[i]=coord[i];
     }
 
-    /* clean up! */
-    if (coord) free(coord);
-
     Region_destroy(tree->_query_region);
     tree->_query_region= Region_create(left, right);
 
@@ -692,6 +713,16 @@ int KDTree_search_center_radius(struct KDTree* tree, float *coord, float radius)
     return KDTree_search(tree, NULL, NULL, 0);
 }
 
+int KDTree_search_center_radius(struct KDTree* tree, float *coord, float radius)
+{
+    int ok;
+
+    ok = KDTree__search_center_radius(tree, coord, radius);
+    /* clean up! */
+    if (coord) free(coord);
+    return ok;
+}
+
 void KDTree_copy_indices(struct KDTree* tree, long *indices)
 {
     long int i;
@@ -726,16 +757,23 @@ static int KDTree_test_neighbors(struct KDTree* tree, struct DataPoint* p1, stru
     {
         /* we found a neighbor pair! */
         struct Neighbor* p;
-        int n;
+        long int n;
         n = tree->_neighbor_count;
-        p = realloc(tree->_neighbor_list, (n+1)*sizeof(struct Neighbor));
-        if (p==NULL) return 0;
+        if (n == tree->_neighbor_list_size)
+        {
+            /* grow geometrically to avoid a reallocation per pair */
+            long int size = n ? 2 * n : 1024;
+            p = realloc(tree->_neighbor_list, size*sizeof(struct Neighbor));
+            if (p==NULL) return 0;
+            tree->_neighbor_list = p;
+            tree->_neighbor_list_size = size;
+        }
+        p = tree->_neighbor_list;
 
         p[n].index1 = p1->_index;
         p[n].index2 = p2->_index;
         /* note sqrt */
         p[n].radius = sqrt(r);
-        tree->_neighbor_list = p;
         tree->_neighbor_count++;
     }
 
@@ -1048,20 +1086,83 @@ static int KDTree__neighbor_search(struct KDTree* tree, struct Node *node, struc
     return ok;
 }
 
-int
-KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius,
-                       struct Neighbor** neighbors)
+static void KDTree_neighbor_reset(struct KDTree* tree)
 {
-    long int i;
-    int ok;
-    Region_dim=tree->dim;
-
     if(tree->_neighbor_list)
     {
         free(tree->_neighbor_list);
         tree->_neighbor_list = NULL;
     }
+    tree->_neighbor_list_size = 0;
     tree->_neighbor_count=0;
+}
+
+void KDTree_copy_neighbor_indices(struct KDTree* tree, long *indices)
+{
+    long int i;
+
+    for (i=0; i<tree->_neighbor_count; i++)
+    {
+        indices[2*i]=tree->_neighbor_list[i].index1;
+        indices[2*i+1]=tree->_neighbor_list[i].index2;
+    }
+}
+
+void KDTree_copy_neighbor_radii(struct KDTree* tree, double *radii)
+{
+    long int i;
+
+    for (i=0; i<tree->_neighbor_count; i++)
+    {
+        radii[i]=tree->_neighbor_list[i].radius;
+    }
+}
+
+int
+KDTree_search_centers_radius(struct KDTree* tree, float *coords,
+                             long int nr_centers, float radius)
+{
+    /* points within radius of each center are stored as neighbors, with
+       index of the center as index1 and index of the point as index2 */
+    long int i, j, n;
+    struct Neighbor* p;
+
+    KDTree_neighbor_reset(tree);
+    for (i=0; i<nr_centers; i++)
+    {
+        if (!KDTree__search_center_radius(tree, coords+i*tree->dim, radius))
+            return 0;
+        n = tree->_neighbor_count + tree->_count;
+        if (n > tree->_neighbor_list_size)
+        {
+            long int size = tree->_neighbor_list_size;
+            if (size < 1024) size = 1024;
+            while (size < n) size *= 2;
+            p = realloc(tree->_neighbor_list, size*sizeof(struct Neighbor));
+            if (p==NULL) return 0;
+            tree->_neighbor_list = p;
+            tree->_neighbor_list_size = size;
+        }
+        p = tree->_neighbor_list + tree->_neighbor_count;
+        for (j=0; j<tree->_count; j++)
+        {
+            p[j].index1 = i;
+            p[j].index2 = tree->_radius_list[j].index;
+            p[j].radius = tree->_radius_list[j].value;
+        }
+        tree->_neighbor_count = n;
+    }
+    tree->_count=0;
+    return 1;
+}
+
+int
+KDTree_neighbor_search_pairs_only(struct KDTree* tree, float neighbor_radius)
+{
+    int ok;
+    Region_dim=tree->dim;
+
+    KDTree_neighbor_reset(tree);
     /* note the use of r^2 to avoid use of sqrt */
     tree->_neighbor_radius=neighbor_radius;
     tree->_neighbor_radius_sq=neighbor_radius*neighbor_radius;
@@ -1082,7 +1183,16 @@ KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius,
         ok = KDTree__neighbor_search(tree, tree->_root, region, 0);
         Region_destroy(region);
     }
-    if (!ok) return 0;
+    return ok;
+}
+
+int
+KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius,
+                       struct Neighbor** neighbors)
+{
+    long int i;
+
+    if (!KDTree_neighbor_search_pairs_only(tree, neighbor_radius)) return 0;
 
     *neighbors = NULL;
     for (i = 0; i < tree->_neighbor_count; i++)
@@ -1118,12 +1228,7 @@ KDTree_neighbor_simple_search(struct KDTree* tree, float radius,
     tree->_neighbor_radius=radius;
     tree->_neighbor_radius_sq=radius*radius;
 
-    tree->_neighbor_count=0;
-    if (tree->_neighbor_list)
-    {
-        free(tree->_neighbor_list);
-        tree->_neighbor_list = NULL;
-    }
+    KDTree_neighbor_reset(tree);
 
     DataPoint_sort(tree->_data_point_list, tree->_data_point_list_size, 0);
 
@@ -7,8 +7,13 @@ void KDTree_destroy(struct KDTree* tree);
 int KDTree_set_data(struct KDTree* tree, float *coords, long int nr_points);
 long int KDTree_get_count(struct KDTree* tree);
 long int KDTree_neighbor_get_count(struct KDTree* tree);
+int KDTree_get_dim(struct KDTree* tree);
 int KDTree_search_center_radius(struct KDTree* tree, float *coord, float radius);
 void KDTree_copy_indices(struct KDTree* tree, long *indices);
 void KDTree_copy_radii(struct KDTree* tree, float *radii);
 int KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius, struct Neighbor** neighbors);
+int KDTree_search_centers_radius(struct KDTree* tree, float *coords, long int nr_centers, float radius);
+int KDTree_neighbor_search_pairs_only(struct KDTree* tree, float neighbor_radius);
+void KDTree_copy_neighbor_indices(struct KDTree* tree, long *indices);
+void KDTree_copy_neighbor_radii(struct KDTree* tree, double *radii);
 int KDTree_neighbor_simple_search(struct KDTree* tree, float radius, struct Neighbor** neighbors);
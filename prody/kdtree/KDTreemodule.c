@@ -376,6 +376,8 @@ PyTree_search_center_radius(PyTree* self, PyObject* args)
             goto exit;
     }
     ok = KDTree_search_center_radius(tree, coords, radius);
+    /* coords is freed by KDTree_search_center_radius */
+    coords = NULL;
     if (!ok) {
         PyErr_NoMemory();
         goto exit;
@@ -514,6 +516,204 @@ PyTree_neighbor_simple_search(PyTree* self, PyObject* args)
     return list;
 }
 
+static char PyTree_neighbor_search_count__doc__[] =
+"searches for all neighbor pairs within radius and returns their number,\n"
+"pairs are retrieved using neighbor_get_indices and neighbor_get_radii\n";
+
+static PyObject*
+PyTree_neighbor_search_count(PyTree* self, PyObject* args)
+{
+    double radius;
+    struct KDTree* tree = self->tree;
+
+    if(!PyArg_ParseTuple(args, "d:KDTree_neighbor_search_count", &radius))
+        return NULL;
+
+    if(radius <= 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "Radius must be positive.");
+        return NULL;
+    }
+
+    if (!KDTree_neighbor_search_pairs_only(tree, radius))
+    {
+        PyErr_SetString(PyExc_MemoryError,
+            "calculation failed due to lack of memory");
+        return NULL;
+    }
+
+    return PyLong_FromLong(KDTree_neighbor_get_count(tree));
+}
+
+static char PyTree_search_centers_radius__doc__[] =
+"searches for points within radius of each of centers given as an array\n"
+"with shape (n, dim) and returns the number of (center, point) pairs,\n"
+"pairs are retrieved using neighbor_get_indices and neighbor_get_radii\n";
+
+static PyObject*
+PyTree_search_centers_radius(PyTree* self, PyObject* args)
+{
+    float* coords = NULL;
+    Py_ssize_t n, m, i, j;
+    PyObject *obj;
+    double radius;
+    struct KDTree* tree = self->tree;
+    int ok;
+    Py_ssize_t rowstride, colstride;
+    const char* p;
+    const int flags = PyBUF_FORMAT | PyBUF_STRIDES;
+    char datatype;
+    Py_buffer view;
+
+    if(!PyArg_ParseTuple(args, "Od:KDTree_search_centers_radius",
+                         &obj, &radius))
+        return NULL;
+
+    if(radius <= 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "Radius must be positive.");
+        return NULL;
+    }
+
+    if (PyObject_GetBuffer(obj, &view, flags) == -1) return NULL;
+    if (view.ndim != 2 || view.shape[1] != KDTree_get_dim(tree)) {
+        PyErr_SetString(PyExc_ValueError,
+            "array must have shape (n, dim)");
+        goto exit;
+    }
+    n = view.shape[0];
+    m = view.shape[1];
+    rowstride = view.strides[0];
+    colstride = view.strides[1];
+    coords = malloc((n ? n : 1)*m*sizeof(float));
+    if (!coords) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    p = view.buf;
+    datatype = view.format[0];
+    switch (datatype) {
+        case '@':
+        case '=':
+        case '<':
+        case '>':
+        case '!': datatype = view.format[1]; break;
+        default: break;
+    }
+    switch (datatype) {
+        case 'd': COPY2DARRAY(double); break;
+        case 'f': COPY2DARRAY(float); break;
+        case 'i': COPY2DARRAY(int); break;
+        case 'I': COPY2DARRAY(unsigned int); break;
+        case 'l': COPY2DARRAY(long); break;
+        case 'L': COPY2DARRAY(unsigned long); break;
+        default:
+            PyErr_Format(PyExc_RuntimeError,
+                "array should contain numerical data (format character was %c).",
+                datatype);
+            goto exit;
+    }
+    ok = KDTree_search_centers_radius(tree, coords, n, radius);
+    if (!ok) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    free(coords);
+    PyBuffer_Release(&view);
+    return PyLong_FromLong(KDTree_neighbor_get_count(tree));
+
+exit:
+    PyBuffer_Release(&view);
+    if (coords) free(coords);
+    return NULL;
+}
+
+static char PyTree_neighbor_get_indices__doc__[] =
+"copies index pairs of neighbors into a Numpy array with shape (n, 2)\n";
+
+static PyObject *PyTree_neighbor_get_indices(PyTree *self, PyObject* args)
+{
+    struct KDTree* tree = self->tree;
+    const int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT;
+    char datatype;
+    Py_buffer view;
+    PyObject* object;
+
+    if (!PyArg_ParseTuple(args, "O:KDTree_neighbor_get_indices", &object))
+        return NULL;
+    if (PyObject_GetBuffer(object, &view, flags) == -1)
+        return NULL;
+    datatype = view.format[0];
+    switch (datatype) {
+        case '@':
+        case '=':
+        case '<':
+        case '>':
+        case '!': datatype = view.format[1]; break;
+        default: break;
+    }
+    if (datatype != 'l') {
+        PyErr_Format(PyExc_RuntimeError,
+            "array has incorrect data format ('%c', expected 'l')", datatype);
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    else if (view.ndim != 2 || view.shape[1] != 2 ||
+             view.shape[0] < KDTree_neighbor_get_count(tree)) {
+        PyErr_SetString(PyExc_ValueError,
+            "array must have shape (n, 2) with n at least neighbor count");
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    KDTree_copy_neighbor_indices(tree, (long int *) view.buf);
+    PyBuffer_Release(&view);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static char PyTree_neighbor_get_radii__doc__[] =
+"copies distances between neighbors into a Numpy array\n";
+
+static PyObject *PyTree_neighbor_get_radii(PyTree *self, PyObject* args)
+{
+    struct KDTree* tree = self->tree;
+    const int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT;
+    char datatype;
+    Py_buffer view;
+    PyObject* object;
+
+    if (!PyArg_ParseTuple(args, "O:KDTree_neighbor_get_radii", &object))
+        return NULL;
+    if (PyObject_GetBuffer(object, &view, flags) == -1)
+        return NULL;
+    datatype = view.format[0];
+    switch (datatype) {
+        case '@':
+        case '=':
+        case '<':
+        case '>':
+        case '!': datatype = view.format[1]; break;
+        default: break;
+    }
+    if (datatype != 'd') {
+        PyErr_Format(PyExc_RuntimeError,
+            "array has incorrect data format ('%c', expected 'd')", datatype);
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    else if (view.ndim != 1 ||
+             view.shape[0] < KDTree_neighbor_get_count(tree)) {
+        PyErr_SetString(PyExc_ValueError,
+            "array must have rank 1 and length at least neighbor count");
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    KDTree_copy_neighbor_radii(tree, (double *) view.buf);
+    PyBuffer_Release(&view);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
 static char PyTree_get_indices__doc__[] =
 "returns indices of coordinates within radius as a Numpy array\n";
 
@@ -607,6 +807,10 @@ static PyMethodDef PyTree_methods[] = {
     {"neighbor_get_count", (PyCFunction)PyTree_neighbor_get_count, METH_NOARGS, NULL},
     {"neighbor_search", (PyCFunction)PyTree_neighbor_search, METH_VARARGS, NULL},
     {"neighbor_simple_search", (PyCFunction)PyTree_neighbor_simple_search, METH_VARARGS, NULL},
+    {"neighbor_search_count", (PyCFunction)PyTree_neighbor_search_count, METH_VARARGS, PyTree_neighbor_search_count__doc__},
+    {"search_centers_radius", (PyCFunction)PyTree_search_centers_radius, METH_VARARGS, PyTree_search_centers_radius__doc__},
+    {"neighbor_get_indices", (PyCFunction)PyTree_neighbor_get_indices, METH_VARARGS, PyTree_neighbor_get_indices__doc__},
+    {"neighbor_get_radii", (PyCFunction)PyTree_neighbor_get_radii, METH_VARARGS, PyTree_neighbor_get_radii__doc__},
     {"get_indices", (PyCFunction)PyTree_get_indices, METH_VARARGS, PyTree_get_indices__doc__},
     {"get_radii", (PyCFunction)PyTree_get_radii, METH_VARARGS, PyTree_get_radii__doc__},
     {NULL}  /* Sentinel */
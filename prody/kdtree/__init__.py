@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 """This module provides :class:`.KDTree` class as an interface to Thomas
-Hamelryck's KDTree C module distributed with Biopython."""
+Hamelryck's KDTree C module distributed with Biopython, and
+:func:`.iterFrameNeighbors` for neighbor search over trajectory frames."""
 
-from .kdtree import KDTree
+from .kdtree import KDTree, iterFrameNeighbors
 
-__all__ = ['KDTree']
+__all__ = ['KDTree', 'iterFrameNeighbors']
@@ -2,9 +2,12 @@
 """This module defines :class:`KDTree` class for dealing with atomic coordinate
 sets and handling periodic boundary conditions."""
 
-from numpy import array, ndarray, concatenate, empty
+from numpy import array, ndarray, concatenate, empty, arange, floor, dot
+from numpy import lexsort, ones, eye, cross, repeat, array_equal
+from numpy.linalg import inv, det
 
 from prody import LOGGER
+from prody.utilities import getBoxVectors
 
 def createKDTreeByDim(KDTclass, coords, bucketsize):
     kdt = KDTclass(3, bucketsize)
@@ -18,7 +21,9 @@ def createKDTreeByCoords(KDTclass, coords, bucketsize):
 try:
     from ._CKDTree import KDTree as _KDTree
     CKDTree = lambda coords, bz : createKDTreeByDim(_KDTree, coords, bz) 
+    REUSABLE = True
 except ImportError:
+    REUSABLE = False
     try:
         from Bio.PDB.kdtrees import KDTree as _KDTree
         CKDTree = lambda coords, bz : createKDTreeByCoords(_KDTree, coords, bz) 
@@ -31,7 +36,7 @@ except ImportError:
                             'Reinstall ProDy or install Biopython '
                             'to solve the problem.')
 
-__all__ = ['KDTree']
+__all__ = ['KDTree', 'iterFrameNeighbors']
 
 _ = array([-1., 0., 1.])
 REPLICATE = array([[x, y, z] for x in _ for y in _ for z in _])
@@ -45,6 +50,13 @@ class KDTree(object):
 
     **Periodic Boundary Conditions**
 
+    Unitcell may be orthorhombic, given as box dimensions with shape ``(3,)``,
+    or triclinic, given as box dimensions and angles in degrees with shape
+    ``(6,)`` or as box vectors with shape ``(3, 3)``.  A zero dimension in an
+    orthorhombic unitcell turns off periodicity along that axis.  Coordinates
+    are wrapped into the unitcell before the tree is built, so there is no
+    requirement on where the system is located.
+
     *Point search*
 
     A point search around a *center*, indicated with a question mark (``?``)
@@ -65,31 +77,30 @@ class KDTree(object):
          |       ? |       ? |      ?  |
          |_________|_________|_________|
 
-    There are two requirements for this approach to work: (i) the *center* must
-    be in the original unitcell, and (ii) the system must be in the original
-    unitcell with parts in its immediate periodic images.
-
     *Pair search*
 
-    A pair search involves making 26 (or 8 in 2-d) replicas of the system
-    coordinates.  A KDTree is built for the system (``O`` and ``H``) and all
-    its replicas (``o`` and ``h``).  After pair search is performed, unique
-    pairs of indices and minimum distance between them are returned.
+    A pair search involves making images of atoms that are within search
+    radius of the walls of the unitcell, i.e. only a thin skin of the 26
+    (or 8 in 2-d) replicas of the system.  A KDTree is built for the system
+    (``O`` and ``H``) and these images (``h``), pairs involving at least one
+    atom from the original cell are kept, and unique pairs of indices with
+    minimum distance between them are selected using array operations.
     ::
 
           _____________________________
-         |o  h h  1|o  h h  2|o  h h  3|
-        h| h  o   h| h  o   h| h  o    |
+         |        1|        2|        3|
+        h|         |         |         |
          |_________|_________|_________|
-         |o  h h  4|O  H H  5|o  h h  6|
-        h| h  o   H| H  O   h| h  o    |
+         |        4|O  H H  5|o       6|
+        h|        H| H  O   h|         |
          |_________|_________|_________|
-         |o  h h  7|o  h h  8|o  h h  9|
-        h| h  o   h| h  o   h| h  o    |
+         |        7|        8|        9|
+        h|         |         |         |
          |_________|_________|_________|
 
-    Only requirement for this approach to work is that the system must be
-    in the original unitcell with parts in its immediate periodic images.
+    Search radius must not exceed half of the smallest width of the
+    unitcell, so that an atom interacts with a single image of another, and
+    :exc:`ValueError` is raised otherwise.
 
 
     .. seealso::
@@ -103,13 +114,40 @@ class KDTree(object):
         :type coords: :class:`numpy.ndarray`, :class:`.Atomic`, :class:`.Frame`
 
         :arg unitcell: orthorhombic unitcell dimension array with shape
-            ``(3,)``
+            ``(3,)``, or triclinic unitcell with shape ``(6,)`` or ``(3, 3)``
         :type unitcell: :class:`numpy.ndarray`
 
         :arg bucketsize: number of points per tree node, default is 10
         :type bucketsize: int"""
 
-        unitcell = kwargs.get('unitcell')
+        self._bucketsize = kwargs.get('bucketsize', 10)
+
+        if not isinstance(self._bucketsize, int):
+            raise TypeError('bucketsize must be an integer')
+        if self._bucketsize < 1:
+            raise ValueError('bucketsize must be a positive integer')
+
+        self._unitcell = None
+        self._cell = None
+        self._kdtree2 = None
+        self._buffers = None
+        self.setCoords(coords, kwargs.get('unitcell'))
+        self._none = kwargs.pop('none', lambda: None)
+        try:
+            self._none()
+        except TypeError:
+            raise TypeError('none argument must be callable')
+        self._oncall = kwargs.pop('oncall', 'both')
+        assert self._oncall in ('both', 'dist'), 'oncall must be both or dist'
+
+    def setCoords(self, coords, unitcell=None):
+        """Rebuild the tree for *coords*, e.g. coordinates from the next frame
+        of a trajectory, reusing this instance and its settings.  When
+        *unitcell* is not given, unitcell provided earlier will be used, if
+        any."""
+
+        if unitcell is None:
+            unitcell = self._unitcell
         if not isinstance(coords, ndarray):
             if unitcell is None:
                 try:
@@ -138,38 +176,64 @@ class KDTree(object):
         if coords.min() <= -1e6 or coords.max() >= 1e6:
                 raise Exception('coords must be between -1e6 and 1e6')
 
-        self._bucketsize = kwargs.get('bucketsize', 10)
-
-        if not isinstance(self._bucketsize, int):
-            raise TypeError('bucketsize must be an integer')
-        if self._bucketsize < 1:
-            raise ValueError('bucketsize must be a positive integer')
-
         self._coords = None
         self._unitcell = None
         self._neighbors = None
-        if unitcell is None:
-            self._kdtree = CKDTree(coords, self._bucketsize)
-        else:
+        self._pbc = None
+        self._n_atoms = coords.shape[0]
+        if unitcell is not None:
             if not isinstance(unitcell, ndarray):
                 raise TypeError('unitcell must be a Numpy array')
-            if unitcell.shape != (3,):
-                raise ValueError('unitcell.shape must be (3,)')
-            self._kdtree = CKDTree(coords, self._bucketsize)
+            if unitcell.shape not in ((3,), (6,), (3, 3)):
+                raise ValueError('unitcell.shape must be (3,), (6,), or '
+                                 '(3, 3)')
+            if unitcell.shape == (6,) and (unitcell[3:] == 90).all():
+                unitcell = unitcell[:3]
+            if not unitcell.any():
+                # e.g. frames of trajectories without periodic boxes
+                unitcell = None
+        if unitcell is not None:
+            if self._cell is None or not array_equal(unitcell, self._cell):
+                self._setUnitcell(unitcell)
+            frac = dot(coords, self._invbox)
+            periodic = self._periodic
+            frac[:, periodic] -= floor(frac[:, periodic])
+            coords = dot(frac, self._box)
             self._coords = coords
+            self._frac = frac
             self._unitcell = unitcell
-            self._replicate = REPLICATE * unitcell
-            self._kdtree2 = None
-            self._pbcdict = {}
-            self._pbckeys = []
-            self._n_atoms = coords.shape[0]
-        self._none = kwargs.pop('none', lambda: None)
-        try:
-            self._none()
-        except TypeError:
-            raise TypeError('none argument must be callable')
-        self._oncall = kwargs.pop('oncall', 'both')
-        assert self._oncall in ('both', 'dist'), 'oncall must be both or dist'
+            # images are made again for the new coordinates at the next pair
+            # search, but the image tree instance is kept and refilled
+            self._skin = 0
+
+        kdtree = getattr(self, '_kdtree', None)
+        if REUSABLE and kdtree is not None:
+            kdtree.set_data(coords)
+        else:
+            self._kdtree = CKDTree(coords, self._bucketsize)
+
+    def _setUnitcell(self, unitcell):
+        """Set box vectors, their inverse, image shifts, and widths of
+        *unitcell*.  Axes with zero length are not periodic."""
+
+        self._cell = unitcell.copy()
+        box = getBoxVectors(unitcell)
+        periodic = (box != 0).any(1)
+        if not periodic.all():
+            if unitcell.shape != (3,):
+                raise ValueError('triclinic unitcell dimensions must be '
+                                 'nonzero')
+            box = box + eye(3) * ~periodic
+        self._box = box
+        self._invbox = inv(box)
+        self._periodic = periodic
+        shifts = REPLICATE[(REPLICATE[:, ~periodic] == 0).all(1)]
+        self._shifts = shifts
+        self._replicate = dot(shifts, box)
+        # widths of the cell, i.e. distances between opposite walls
+        volume = abs(det(box))
+        self._widths = array([volume / (cross(box[i-2], box[i-1]) ** 2
+                                        ).sum() ** 0.5 for i in range(3)])
 
     def __call__(self, radius, center=None):
         """Shorthand method for searching and retrieving results."""
@@ -194,6 +258,7 @@ class KDTree(object):
             raise TypeError('radius must be a number')
         if radius <= 0:
             raise TypeError('radius must be a positive number')
+        self._checkRadius(radius)
 
         if center is not None:
             if not isinstance(center, ndarray):
@@ -208,49 +273,107 @@ class KDTree(object):
             else:
                 kdtree = self._kdtree
                 search = kdtree.search_center_radius
-                get_radii = lambda : get_KDTree_radii(kdtree)
-                get_indices = lambda : get_KDTree_indices(kdtree)
                 get_count = kdtree.get_count
 
-                _dict = {}
-                _dict_get = _dict.get
-                _dict_set = _dict.__setitem__
-                for center in center + self._replicate:
-                    search(center, radius)
+                frac = dot(center, self._invbox)
+                frac[self._periodic] -= floor(frac[self._periodic])
+                center = dot(frac, self._box)
+
+                indices = []
+                radii = []
+                for xyz in center + self._replicate:
+                    search(xyz, radius)
                     if get_count():
-                        [_dict_set(i, min(r, _dict_get(i, 1e6)))
-                         for i, r in zip(get_indices(), get_radii())]
-                self._pbcdict = _dict
-                self._pdbkeys = list(_dict)
+                        indices.append(get_KDTree_indices(kdtree))
+                        radii.append(get_KDTree_radii(kdtree))
+                if indices:
+                    self._pbc = _uniqueMinimum(concatenate(indices),
+                                               concatenate(radii))
+                else:
+                    self._pbc = (empty(0, int), empty(0, 'f'))
 
         else:
             if self._unitcell is None:
-                self._neighbors = self._kdtree.neighbor_search(radius)
+                self._neighbors = get_KDTree_neighbors(self._kdtree, radius,
+                                                       self._buffers)
             else:
-                kdtree = self._kdtree2
-                if kdtree is None:
-                    coords = self._coords
-                    coords = concatenate([coords + rep
-                                          for rep in self._replicate])
-                    kdtree = CKDTree(coords, self._bucketsize)
-                    self._kdtree2 = kdtree
-                n_atoms = len(self._coords)
-                _dict = {}
-                neighbors = kdtree.neighbor_search(radius)
-                if kdtree.neighbor_get_count():
-                    _get = _dict.get
-                    _set = _dict.__setitem__
-
-                    for nb in neighbors:
-                        i = nb.index1 % n_atoms
-                        j = nb.index2 % n_atoms
-                        if i < j:
-                            _set((i, j), min(nb.radius, _get((i, j), 1e6)))
-                        elif j < i:
-                            _set((j, i), min(nb.radius, _get((j, i), 1e6)))
-                self._pbcdict = _dict
-                self._pdbkeys = list(_dict)
-
+                if self._kdtree2 is None or self._skin < radius:
+                    self._buildImages(radius)
+                n_atoms = self._n_atoms
+                pairs, radii = get_KDTree_neighbors(self._kdtree2, radius,
+                                                    self._buffers)
+                # keep pairs that involve at least one atom in the cell
+                which = (pairs < n_atoms).any(1)
+                pairs = self._images[pairs[which]]
+                radii = radii[which]
+                which = pairs[:, 0] != pairs[:, 1]
+                pairs = pairs[which]
+                pairs.sort(1)
+                self._pbc = _uniqueMinimum(pairs, radii[which], n_atoms)
+
+    def _checkRadius(self, radius):
+        """Raise :exc:`ValueError` if *radius* exceeds half of the smallest
+        width of the unitcell, when minimum image convention does not hold."""
+
+        if self._unitcell is not None:
+            width = self._widths[self._periodic].min()
+            # tolerance for round off in widths calculated from box vectors
+            if radius > width / 2 * (1 + 1e-6):
+                raise ValueError('radius ({0:.2f}) must not exceed half of '
+                                 'the smallest width of the unitcell '
+                                 '({1:.2f})'.format(radius, width / 2))
+
+    def _searchCenters(self, radius, centers):
+        """Returns index arrays of *centers* and of points within *radius* of
+        them, and distances between them.  All centers are searched in a
+        single call to the C module, and images of *centers* are used when
+        there is a unitcell."""
+
+        self._checkRadius(radius)
+        kdtree = self._kdtree
+        if self._unitcell is None:
+            pairs, radii = get_KDTree_center_neighbors(kdtree, radius, centers)
+        else:
+            frac = dot(centers, self._invbox)
+            periodic = self._periodic
+            frac[:, periodic] -= floor(frac[:, periodic])
+            centers = dot(frac, self._box)
+            pairs = []
+            radii = []
+            for rep in self._replicate:
+                found = get_KDTree_center_neighbors(kdtree, radius,
+                                                    centers + rep)
+                pairs.append(found[0])
+                radii.append(found[1])
+            pairs, radii = _uniqueMinimum(concatenate(pairs),
+                                          concatenate(radii), self._n_atoms)
+        return pairs[:, 0], pairs[:, 1], radii
+
+    def _buildImages(self, radius):
+        """Build a tree for atoms in the unitcell and their images that are
+        within *radius* of the walls of the unitcell."""
+
+        frac = self._frac
+        skin = radius / self._widths
+        near = [frac >= 1 - skin, ones(frac.shape, bool), frac <= skin]
+        coords = [self._coords]
+        images = [arange(self._n_atoms)]
+        for shift, rep in zip(self._shifts, self._replicate):
+            if not shift.any():
+                continue
+            which = near[int(shift[0]) + 1][:, 0]
+            for k in (1, 2):
+                which = which & near[int(shift[k]) + 1][:, k]
+            if which.any():
+                images.append(which.nonzero()[0])
+                coords.append(self._coords[which] + rep)
+        self._images = concatenate(images)
+        coords = concatenate(coords)
+        if REUSABLE and self._kdtree2 is not None:
+            self._kdtree2.set_data(coords)
+        else:
+            self._kdtree2 = CKDTree(coords, self._bucketsize)
+        self._skin = radius
 
     def getIndices(self):
         """Returns array of indices for points or pairs, depending on the type
@@ -261,10 +384,9 @@ class KDTree(object):
                 if self._neighbors is None:
                     return get_KDTree_indices(self._kdtree)
                 else:
-                    return array([(n.index1, n.index2)
-                                  for n in self._neighbors], int)
+                    return self._neighbors[0]
             else:
-                return array(self._pdbkeys)
+                return self._pbc[0]
         return self._none()
 
     def getDistances(self):
@@ -275,10 +397,9 @@ class KDTree(object):
                 if self._neighbors is None:
                     return get_KDTree_radii(self._kdtree)
                 else:
-                    return array([n.radius for n in self._neighbors])
+                    return self._neighbors[1]
             else:
-                _dict = self._pbcdict
-                return array([_dict[i] for i in self._pdbkeys])
+                return self._pbc[1]
         return self._none()
 
     def getCount(self):
@@ -288,9 +409,9 @@ class KDTree(object):
             if self._neighbors is None:
                 return self._kdtree.get_count()
             else:
-                return self._kdtree.neighbor_get_count()
+                return len(self._neighbors[1])
         else:
-            return len(self._pbcdict)
+            return 0 if self._pbc is None else len(self._pbc[1])
 
 def get_KDTree_indices(kdtree):
     indices = None
@@ -313,3 +434,128 @@ def get_KDTree_radii(kdtree):
             radii = empty(n, 'f')
             kdtree.get_radii(radii)
     return radii
+
+def get_KDTree_neighbors(kdtree, radius, buffers=None):
+    """Search for all pairs within *radius* and return an index array with
+    shape ``(n_pairs, 2)`` and an array of distances.  Arrays are filled
+    directly by the C module when it supports it, without creating a Python
+    object for each pair.  When a list of two *buffers* is given, they are
+    grown as needed and reused, and views of them are returned."""
+
+    try:
+        n = kdtree.neighbor_search_count(radius)
+    except AttributeError:
+        neighbors = kdtree.neighbor_search(radius)
+        indices = array([(nb.index1, nb.index2) for nb in neighbors],
+                        int).reshape((len(neighbors), 2))
+        radii = array([nb.radius for nb in neighbors], float)
+    else:
+        if buffers is None:
+            indices = empty((n, 2), int)
+            radii = empty(n, float)
+        else:
+            if len(buffers[1]) < n:
+                buffers[0] = empty((n + n // 4, 2), int)
+                buffers[1] = empty(n + n // 4, float)
+            indices = buffers[0][:n]
+            radii = buffers[1][:n]
+        if n:
+            kdtree.neighbor_get_indices(indices)
+            kdtree.neighbor_get_radii(radii)
+    return indices, radii
+
+
+def get_KDTree_center_neighbors(kdtree, radius, centers):
+    """Search for points within *radius* of each of *centers* and return an
+    array of (center, point) index pairs with shape ``(n_pairs, 2)`` and an
+    array of distances."""
+
+    try:
+        n = kdtree.search_centers_radius(centers, radius)
+    except AttributeError:
+        indices = []
+        radii = []
+        for i, xyz in enumerate(centers):
+            kdtree.search_center_radius(xyz, radius)
+            n = kdtree.get_count()
+            if n:
+                indices.append(array([repeat(i, n),
+                                      get_KDTree_indices(kdtree)]).T)
+                radii.append(get_KDTree_radii(kdtree))
+        if radii:
+            indices = concatenate(indices)
+            radii = concatenate(radii).astype(float)
+        else:
+            indices = empty((0, 2), int)
+            radii = empty(0, float)
+    else:
+        indices = empty((n, 2), int)
+        radii = empty(n, float)
+        if n:
+            kdtree.neighbor_get_indices(indices)
+            kdtree.neighbor_get_radii(radii)
+    return indices, radii
+
+
+def _uniqueMinimum(indices, radii, n_atoms=None):
+    """Returns unique *indices* (or index pairs for pair search, where
+    *n_atoms* is used to form keys) and minimum of *radii* for each."""
+
+    if n_atoms is None:
+        keys = indices
+    else:
+        keys = indices[:, 0] * n_atoms + indices[:, 1]
+    order = lexsort((radii, keys))
+    keys = keys[order]
+    first = ones(len(keys), bool)
+    first[1:] = keys[1:] != keys[:-1]
+    order = order[first]
+    return indices[order], radii[order]
+
+
+def iterFrameNeighbors(frames, radius, unitcell=None, **kwargs):
+    """Yield pairs of atoms within *radius* of each other for each frame as an
+    index array with shape ``(n_pairs, 2)`` and an array of distances.  A
+    single :class:`KDTree` is built once and refilled for each frame, and
+    search results are written into buffers that are reused.  Hence, arrays
+    yielded for a frame may be overwritten in the next iteration and should
+    be copied if they need to be kept.
+
+    :arg frames: coordinate sets with shape ``(n_frames, n_atoms, 3)``, or a
+        trajectory, e.g. :class:`.DCDFile`, that yields :class:`.Frame`
+        instances
+    :type frames: :class:`numpy.ndarray`, :class:`.TrajBase`
+
+    :arg radius: distance (Å)
+    :type radius: float
+
+    :arg unitcell: unitcell for periodic boundary conditions, see
+        :class:`KDTree`, when **None** unitcell of each frame is used if
+        available
+    :type unitcell: :class:`numpy.ndarray`
+
+    :arg bucketsize: number of points per tree node, default is 10
+    :type bucketsize: int"""
+
+    radius = float(radius)
+    kdtree = None
+    buffers = [empty((0, 2), int), empty(0, float)]
+    for frame in frames:
+        uc = unitcell
+        try:
+            coords = frame._getCoords()
+        except AttributeError:
+            coords = frame
+        else:
+            if uc is None:
+                uc = frame.getUnitcell()
+        if kdtree is None:
+            kdtree = KDTree(coords, unitcell=uc, **kwargs)
+            kdtree._buffers = buffers
+        else:
+            kdtree.setCoords(coords, uc)
+        kdtree.search(radius)
+        if kdtree.getCount():
+            yield kdtree.getIndices(), kdtree.getDistances()
+        else:
+            yield buffers[0][:0], buffers[1][:0]
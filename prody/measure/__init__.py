@@ -11,6 +11,8 @@ The following class and functions are for contact identifications:
   * :class:`.Contacts` - identify intermolecular contacts
   * :func:`.findNeighbors` - identify interacting atom pairs
   * :func:`.iterNeighbors` - identify interacting atom pairs
+  * :func:`.findNeighborArrays` - identify interacting atom pairs as arrays
+  * :func:`.buildContactMatrix` - build a sparse contact matrix
 
 Measure quantities
 ==================
@@ -1,13 +1,14 @@
 # -*- coding: utf-8 -*-
 """ This module defines a class and function for identifying contacts."""
 
-from numpy import array, ndarray
+from numpy import array, ndarray, concatenate, empty, lexsort, unique
 
 from prody.atomic import Atomic, Atom, AtomGroup, AtomSubset, Selection
 from prody.kdtree import KDTree
 from prody.utilities import rangeString
 
-__all__ = ['Contacts', 'iterNeighbors', 'findNeighbors']
+__all__ = ['Contacts', 'iterNeighbors', 'findNeighbors', 'findNeighborArrays',
+           'buildContactMatrix']
 
 class Contacts(object):
 
@@ -19,7 +20,8 @@ class Contacts(object):
         """*atoms* must be an :class:`.Atomic` instance.  
         
         :arg unitcell: orthorhombic unitcell dimension array with shape 
-                        ``(3,)`` for KDTree. Default is **None**.
+                        ``(3,)``, or triclinic unitcell with shape ``(6,)`` or
+                        ``(3, 3)``, for KDTree. Default is **None**.
         :type unitcell: :class:`~numpy.ndarray`"""
 
         try:
@@ -27,7 +29,8 @@ class Contacts(object):
         except AttributeError:
             try:
                 self._ag = atoms.getAtoms()
-                unitcell = unitcell or atoms.getUnitcell()[:3]
+                if unitcell is None:
+                    unitcell = atoms.getUnitcell()
                 self._indices = atoms.getSelection()
             except AttributeError:
                 try:
@@ -95,31 +98,41 @@ class Contacts(object):
         else:
             if center is None:
                 raise ValueError('center does not have coordinate data')
+            if center.ndim == 1:
+                center = [center]
 
-        search = self._kdtree.search
-        get_indices = self._kdtree.getIndices
-        get_count = self._kdtree.getCount
-        indices = set()
-        update = indices.update
-        radius = float(radius)
-        for xyz in center:
-            search(radius, xyz)
-            if get_count():
-                update(get_indices())
-        indices = list(indices)
-        if indices:
-            indices.sort()
+        indices = unique(self._kdtree._searchCenters(float(radius),
+                                                     array(center))[1])
+        if len(indices):
             if self._ag is None:
-                return array(indices)
+                return indices
             else:
                 if self._indices is not None:
                     indices = self._indices[indices]
-                return Selection(self._ag, array(indices), 'index ' +
+                return Selection(self._ag, indices, 'index ' +
                                  rangeString(indices), acsi=self._acsi,
                                  unique=True)
 
     select = __call__
 
+    def update(self):
+        """Update contacts for the current coordinates of atoms, e.g. after
+        active coordinate set of an :class:`.AtomGroup` is changed or the next
+        frame of a trajectory is read.  The same :class:`.KDTree` instance is
+        reused to hold the new coordinates."""
+
+        atoms = self._atoms
+        try:
+            coords = atoms._getCoords()
+        except AttributeError:
+            coords = atoms
+        else:
+            try:
+                self._acsi = atoms.getACSIndex()
+            except AttributeError:
+                pass
+        self._kdtree.setCoords(coords)
+
     def getAtoms(self):
         """Returns atoms, or coordinate array, provided at instantiation.."""
 
@@ -136,7 +149,7 @@ def iterNeighbors(atoms, radius, atoms2=None, unitcell=None):
     distance between them.  If *atoms2* is also provided, one atom from *atoms*
     and another from *atoms2* will be yielded.  If one of *atoms* or *atoms2*
     is a coordinate array, pairs of indices and distances will be yielded.
-    When orthorhombic *unitcell* dimensions are provided, periodic boundary
+    When *unitcell* is provided, periodic boundary
     conditions will be taken into account (see :class:`.KDTree` and also
     :func:`wrapAtoms` for details).  If *atoms* is a :class:`.Frame` instance
     and *unitcell* is not provided, unitcell information from frame will be
@@ -153,7 +166,7 @@ def iterNeighbors(atoms, radius, atoms2=None, unitcell=None):
             ndim, shape = atoms.ndim, atoms.shape
         except AttributeError:
             try:
-                uc = atoms.getUnitcell()[:3]
+                uc = atoms.getUnitcell()
             except AttributeError:
                 raise TypeError('atoms must be an Atomic or Frame instance or '
                                 'a coordinate array')
@@ -282,3 +295,126 @@ def findNeighbors(atoms, radius, atoms2=None, unitcell=None):
     distance between them.  See :func:`iterNeighbors` for more details."""
 
     return list(iterNeighbors(atoms, radius, atoms2, unitcell))
+
+
+def _getNeighborCoords(atoms, unitcell, name='atoms'):
+    """Returns coordinate array of *atoms* and *unitcell*, which is taken
+    from *atoms* when it is a :class:`.Frame` and *unitcell* is **None**."""
+
+    try:
+        coords = atoms._getCoords()
+    except AttributeError:
+        try:
+            ndim = atoms.ndim
+        except AttributeError:
+            raise TypeError('{0} must be an Atomic or Frame instance or a '
+                            'coordinate array'.format(name))
+        else:
+            if ndim > 2:
+                raise ValueError('number of dimensions of {0} must be 1 or 2'
+                                 .format(name))
+            coords = atoms
+    else:
+        if coords is None:
+            raise ValueError('{0} does not have coordinate data'.format(name))
+        if unitcell is None:
+            try:
+                unitcell = atoms.getUnitcell()
+            except AttributeError:
+                pass
+
+    if coords.ndim == 1:
+        coords = array([coords])
+    return coords, unitcell
+
+
+def findNeighborArrays(atoms, radius, atoms2=None, unitcell=None,
+                       kdtree=None):
+    """Returns pairs of *atoms* that are within *radius* of each other and the
+    distances between them as three arrays, ``(indices1, indices2,
+    distances)``, sorted by *indices1* and then *indices2*.  Unlike
+    :func:`findNeighbors`, no :class:`.Atom` instance is built for pairs,
+    which makes this function suitable for repeated contact analysis, e.g.
+    over the frames of a trajectory.
+
+    Indices refer to positions of atoms in *atoms* (and *atoms2*), i.e. rows
+    of their coordinate arrays, not to atom indices in an :class:`.AtomGroup`.
+    For an :class:`.AtomSubset`, atom indices can be obtained as
+    ``atoms.getIndices()[indices1]``.
+
+    If *atoms2* is **None**, pairs within *atoms* are returned with
+    ``indices1 < indices2``.  Otherwise, *indices1* refer to *atoms* and
+    *indices2* refer to *atoms2*.  When *unitcell* is provided, or *atoms* is
+    a :class:`.Frame` with unitcell information, periodic boundary conditions
+    will be taken into account.  Both orthorhombic and triclinic unitcells
+    are supported (see :class:`.KDTree`).
+
+    A :class:`.KDTree` built for coordinates of *atoms* may be passed as
+    *kdtree* to avoid building a new one in each call, e.g. when *atoms*
+    are fixed and *atoms2* change.  In this case, unitcell of *kdtree* is
+    used and *unitcell* is ignored."""
+
+    radius = float(radius)
+    if radius <= 0:
+        raise ValueError('radius must be a positive number')
+
+    coords, unitcell = _getNeighborCoords(atoms, unitcell)
+    if kdtree is not None:
+        if not isinstance(kdtree, KDTree):
+            raise TypeError('kdtree must be a KDTree instance')
+        if kdtree._n_atoms != len(coords):
+            raise ValueError('kdtree must be built for coordinates of atoms')
+
+    if atoms2 is None:
+        if len(coords) <= 1:
+            raise ValueError('atoms must be more than 1')
+        if kdtree is None:
+            kdtree = KDTree(coords, unitcell=unitcell)
+        kdtree.search(radius)
+        if kdtree.getCount():
+            pairs = kdtree.getIndices()
+            indices1 = pairs.min(1)
+            indices2 = pairs.max(1)
+            distances = kdtree.getDistances()
+        else:
+            indices1 = empty(0, int)
+            indices2 = empty(0, int)
+            distances = empty(0, float)
+    else:
+        coords2, unitcell = _getNeighborCoords(atoms2, unitcell, 'atoms2')
+        if kdtree is None and len(coords) < len(coords2):
+            kdtree = KDTree(coords2, unitcell=unitcell)
+            indices1, indices2, distances = kdtree._searchCenters(radius,
+                                                                  coords)
+        else:
+            if kdtree is None:
+                kdtree = KDTree(coords, unitcell=unitcell)
+            indices2, indices1, distances = kdtree._searchCenters(radius,
+                                                                  coords2)
+
+    order = lexsort((indices2, indices1))
+    return indices1[order], indices2[order], distances[order]
+
+
+def buildContactMatrix(atoms, radius, atoms2=None, unitcell=None,
+                       kdtree=None):
+    """Returns a :class:`~scipy.sparse.csr_matrix` with distances between
+    pairs of atoms that are within *radius* of each other.  If *atoms2* is
+    **None**, a symmetric matrix with shape ``(n_atoms, n_atoms)`` is
+    returned, otherwise the shape is ``(n_atoms, n_atoms2)``.  See
+    :func:`findNeighborArrays` for description of arguments."""
+
+    from scipy.sparse import coo_matrix
+
+    indices1, indices2, distances = findNeighborArrays(atoms, radius, atoms2,
+                                                       unitcell, kdtree)
+    n_atoms = len(_getNeighborCoords(atoms, unitcell)[0])
+    if atoms2 is None:
+        shape = (n_atoms, n_atoms)
+        indices1, indices2 = (concatenate([indices1, indices2]),
+                              concatenate([indices2, indices1]))
+        distances = concatenate([distances, distances])
+    else:
+        shape = (n_atoms, len(_getNeighborCoords(atoms2, unitcell)[0]))
+
+    return coo_matrix((distances, (indices1, indices2)), shape=shape).tocsr()
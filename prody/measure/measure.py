@@ -3,7 +3,8 @@
 and measuring quantities."""
 
 from numpy import ndarray, power, sqrt, array, zeros, arccos, dot
-from numpy import sign, tile, concatenate, pi, cross, subtract, var
+from numpy import sign, tile, pi, cross, subtract, var
+from numpy import arange, triu_indices, memmap
 
 from prody.atomic import Atomic, Residue, Atom
 from prody.utilities import importLA, solveEig, checkCoords, getDistance, getCoords
@@ -24,28 +25,49 @@ __all__ = ['buildDistMatrix', 'calcDistance',
 RAD2DEG = 180 / pi
 
 DISTMAT_FORMATS = set(['mat', 'rcd', 'arr'])
+DISTMAT_BLOCK = 2 ** 16
+UNITCELL_SHAPES = set([(3,), (6,), (3, 3)])
 
 
-def buildDistMatrix(atoms1, atoms2=None, unitcell=None, format='mat'):
+def buildDistMatrix(atoms1, atoms2=None, unitcell=None, format='mat', **kwargs):
     """Returns distance matrix.  When *atoms2* is given, a distance matrix
     with shape ``(len(atoms1), len(atoms2))`` is built.  When *atoms2* is
     **None**, a symmetric matrix with shape ``(len(atoms1), len(atoms1))``
     is built.  If *unitcell* array is provided, periodic boundary conditions
     will be taken into account.
 
+    Distances are calculated in blocks of rows, so that temporary arrays stay
+    small even for large systems.
+
     :arg atoms1: atom or coordinate data
     :type atoms1: :class:`.Atomic`, :class:`numpy.ndarray`
 
     :arg atoms2: atom or coordinate data
     :type atoms2: :class:`.Atomic`, :class:`numpy.ndarray`
 
-    :arg unitcell: orthorhombic unitcell dimension array with shape ``(3,)``
+    :arg unitcell: orthorhombic unitcell dimension array with shape ``(3,)``,
+        or triclinic unitcell given as dimensions and angles with shape
+        ``(6,)`` or as box vectors with shape ``(3, 3)``
     :type unitcell: :class:`numpy.ndarray`
 
     :arg format: format of the resulting array, one of ``'mat'`` (matrix,
         default), ``'rcd'`` (arrays of row indices, column indices, and
         distances), or ``'arr'`` (only array of distances)
-    :type format: bool"""
+    :type format: bool
+
+    :arg dtype: data type of distances, e.g. :class:`numpy.float32` can be
+        used to halve memory usage, default is :class:`float`
+
+    :arg cutoff: when given, only distances up to *cutoff* are calculated
+        using a :class:`.KDTree`, and a :class:`~scipy.sparse.csr_matrix` is
+        returned for ``'mat'`` format, or arrays of row indices, column
+        indices, and distances of pairs within *cutoff* for ``'rcd'`` format
+    :type cutoff: float
+
+    :arg filename: name of a file to hold a dense result as a
+        :class:`numpy.memmap`, which allows for building distance matrices
+        that do not fit in memory
+    :type filename: str"""
 
     if not isinstance(atoms1, ndarray):
         try:
@@ -72,33 +94,74 @@ def buildDistMatrix(atoms1, atoms2=None, unitcell=None, format='mat'):
     if unitcell is not None:
         if not isinstance(unitcell, ndarray):
             raise TypeError('unitcell must be an array')
-        elif unitcell.shape != (3,):
-            raise ValueError('unitcell.shape must be (3,)')
-
-    dist = zeros((len(atoms1), len(atoms2)))
-    if symmetric:
-        if format not in DISTMAT_FORMATS:
-            raise ValueError('format must be one of mat, rcd, or arr')
-        if format == 'mat':
-            for i, xyz in enumerate(atoms1[:-1]):
-                dist[i, i+1:] = dist[i+1:, i] = getDistance(xyz, atoms2[i+1:],
-                                                            unitcell)
-        else:
-            dist = concatenate([getDistance(xyz, atoms2[i+1:], unitcell)
-                                for i, xyz in enumerate(atoms1)])
-            if format == 'rcd':
-                n_atoms = len(atoms1)
-                rc = array([(i, j) for i in range(n_atoms)
-                            for j in range(i + 1, n_atoms)])
-                row, col = rc.T
-                dist = (row, col, dist)
+        elif unitcell.shape not in UNITCELL_SHAPES:
+            raise ValueError('unitcell.shape must be (3,), (6,), or (3, 3)')
+
+    if format not in DISTMAT_FORMATS:
+        raise ValueError('format must be one of mat, rcd, or arr')
+
+    dtype = kwargs.pop('dtype', float)
+    cutoff = kwargs.pop('cutoff', None)
+    filename = kwargs.pop('filename', None)
+
+    if cutoff is not None:
+        return _buildSparseDistMatrix(atoms1, None if symmetric else atoms2,
+                                      unitcell, format, cutoff, dtype)
 
+    n_atoms1, n_atoms2 = len(atoms1), len(atoms2)
+    if symmetric and format != 'mat':
+        shape = (n_atoms1 * (n_atoms1 - 1) // 2,)
     else:
-        for i, xyz in enumerate(atoms1):
-            dist[i] = getDistance(xyz, atoms2, unitcell)
+        shape = (n_atoms1, n_atoms2)
+    if filename is None:
+        dist = zeros(shape, dtype)
+    else:
+        dist = memmap(filename, dtype, mode='w+', shape=shape)
+
+    step = max(1, DISTMAT_BLOCK // max(1, n_atoms2))
+    if not symmetric:
+        for i in range(0, n_atoms1, step):
+            dist[i:i+step] = getDistance(atoms1[i:i+step, None],
+                                         atoms2[None], unitcell)
+    elif format == 'mat':
+        for i in range(0, n_atoms1, step):
+            block = getDistance(atoms1[i:i+step, None], atoms2[None, i:],
+                                unitcell)
+            dist[i:i+step, i:] = block
+            dist[i:, i:i+step] = block.T
+    else:
+        start = 0
+        for i in range(0, n_atoms1, step):
+            block = getDistance(atoms1[i:i+step, None], atoms2[None, i:],
+                                unitcell)
+            upper = (arange(block.shape[1])[None, :] >
+                     arange(block.shape[0])[:, None])
+            block = block[upper]
+            dist[start:start+len(block)] = block
+            start += len(block)
+        if format == 'rcd':
+            row, col = triu_indices(n_atoms1, 1)
+            dist = (row, col, dist)
     return dist
 
 
+def _buildSparseDistMatrix(atoms1, atoms2, unitcell, format, cutoff, dtype):
+    """Returns distances up to *cutoff* calculated using a :class:`.KDTree`.
+    See :func:`buildDistMatrix`."""
+
+    from .contacts import findNeighborArrays, buildContactMatrix
+
+    if format == 'arr':
+        raise ValueError('format must be mat or rcd when cutoff is given')
+
+    if format == 'mat':
+        matrix = buildContactMatrix(atoms1, cutoff, atoms2, unitcell)
+        return matrix.astype(dtype)
+
+    row, col, dist = findNeighborArrays(atoms1, cutoff, atoms2, unitcell)
+    return row, col, dist.astype(dtype)
+
+
 def calcDistance(atoms1, atoms2, unitcell=None):
     """Returns the Euclidean distance between *atoms1* and *atoms2*.  Arguments
     may be :class:`~.Atomic` instances or NumPy arrays.  Shape of numpy arrays
@@ -112,7 +175,9 @@ def calcDistance(atoms1, atoms2, unitcell=None):
     :arg atoms2: atom or coordinate data
     :type atoms2: :class:`.Atomic`, :class:`numpy.ndarray`
 
-    :arg unitcell: orthorhombic unitcell dimension array with shape ``(3,)``
+    :arg unitcell: orthorhombic unitcell dimension array with shape ``(3,)``,
+        or triclinic unitcell with shape ``(6,)`` or ``(3, 3)``, see
+        :func:`buildDistMatrix`
     :type unitcell: :class:`numpy.ndarray`"""
 
     if not isinstance(atoms1, ndarray):
@@ -131,8 +196,8 @@ def calcDistance(atoms1, atoms2, unitcell=None):
     if unitcell is not None:
         if not isinstance(unitcell, ndarray):
             raise TypeError('unitcell must be an array')
-        elif unitcell.shape != (3,):
-            raise ValueError('unitcell.shape must be (3,)')
+        elif unitcell.shape not in UNITCELL_SHAPES:
+            raise ValueError('unitcell.shape must be (3,), (6,), or (3, 3)')
 
     return getDistance(atoms1, atoms2, unitcell)
 
@@ -15,6 +15,8 @@ You can use following functions to manage PDB file resources:
   * :func:`.pathPDBFolder` - local folder for storing PDB files
   * :func:`.pathPDBMirror` - local PDB mirror path
   * :func:`.wwPDBServer` - set wwPDB FTP/HTTP server for downloads
+  * :func:`.pathStructureCache` - folder for caching parsed structures
+  * :func:`.clearStructureCache` - remove cached structures
 
 The following functions can be used to handle local PDB files:
 
@@ -160,6 +162,10 @@ from . import localpdb
 from .localpdb import *
 __all__.extend(localpdb.__all__)
 
+from . import cache
+from .cache import *
+__all__.extend(cache.__all__)
+
 from . import wwpdb
 from .wwpdb import *
 __all__.extend(wwpdb.__all__)
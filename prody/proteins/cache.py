@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""This module defines functions for caching structures parsed from files,
+so that parsing the same file again with the same options only loads arrays
+from disk."""
+
+import os
+import shutil
+import pickle
+from hashlib import sha1
+from os.path import abspath, getmtime, isdir, isfile, join
+
+import numpy as np
+
+from prody import LOGGER, SETTINGS
+from prody.atomic import AtomGroup
+from prody.atomic import flags
+
+__all__ = ['pathStructureCache', 'clearStructureCache']
+
+CACHE_META = 'atoms.pkl'
+
+CACHE_SKIP = set(['numbonds', 'fragindex'])
+
+
+def pathStructureCache(folder=None):
+    """Returns or specify the folder where structures parsed by
+    :func:`.parsePDB` and :func:`.parseMMCIF` are cached.  When a folder is
+    set, parsing a file again with the same options loads the atom group
+    from the cache, with coordinates and other arrays memory mapped.
+    Entries are keyed by file path, modification time and parsing options,
+    so an edited file is parsed again.  To release the current folder, pass
+    an invalid path, e.g. ``folder=''``.
+
+    The total size of the cache is limited by ``structure_cache_size``
+    option of :func:`.confProDy` in megabytes, and least recently used
+    entries are removed when it is exceeded."""
+
+    if folder is None:
+        folder = SETTINGS.get('structure_cache_folder')
+        if folder:
+            if isdir(folder):
+                return folder
+            else:
+                LOGGER.warn('Structure cache folder {0} is not accessible.'
+                            .format(repr(folder)))
+    else:
+        if isdir(folder):
+            folder = abspath(folder)
+            LOGGER.info('Structure cache folder is set: {0}'
+                        .format(repr(folder)))
+            SETTINGS['structure_cache_folder'] = folder
+            SETTINGS.save()
+        else:
+            current = SETTINGS.pop('structure_cache_folder')
+            if current:
+                LOGGER.info('Structure cache folder {0} is released.'
+                            .format(repr(current)))
+                SETTINGS.save()
+            else:
+                raise IOError('{0} is not a valid path.'.format(repr(folder)))
+
+
+def clearStructureCache():
+    """Remove all entries from the structure cache folder."""
+
+    folder = pathStructureCache()
+    if folder is None:
+        return
+    for entry in _iterEntries(folder):
+        shutil.rmtree(entry, ignore_errors=True)
+
+
+def _iterEntries(folder):
+
+    for name in os.listdir(folder):
+        entry = join(folder, name)
+        if isfile(join(entry, CACHE_META)):
+            yield entry
+
+
+def _getEntry(folder, filename, kwargs):
+    """Returns path of the cache entry for parsing *filename* with
+    *kwargs*."""
+
+    from prody import __version__
+
+    options = [(key, repr(kwargs[key])) for key in sorted(kwargs)]
+    key = repr((__version__, abspath(filename), getmtime(filename),
+                os.path.getsize(filename), options))
+    return join(folder, sha1(key.encode('utf-8')).hexdigest())
+
+
+def _loadCached(filename, kwargs):
+    """Returns the result of parsing *filename* with *kwargs* from the
+    structure cache, or **None** if it is not cached."""
+
+    folder = pathStructureCache()
+    if folder is None or 'ag' in kwargs:
+        return None
+
+    entry = _getEntry(folder, filename, kwargs)
+    try:
+        with open(join(entry, CACHE_META), 'rb') as inp:
+            meta = pickle.load(inp)
+        os.utime(entry, None)
+
+        load = lambda label: np.load(join(entry, label + '.npy'),
+                                     mmap_mode='c')
+        ag = AtomGroup(meta['title'])
+        ag._n_atoms = meta['n_atoms']
+        if meta['n_csets']:
+            ag._coords = load('coordinates')
+            ag._n_csets = meta['n_csets']
+            ag._cslabels = meta['cslabels']
+            ag._acsi = meta['acsi']
+        ag._setTimeStamp()
+        for label in meta['data']:
+            ag._data[label] = load('data_' + label)
+        skip = set()
+        for label in meta['flags']:
+            if label not in skip:
+                ag._setFlags(label, load('flags_' + label))
+                skip.update(flags.ALIASES.get(label, [label]))
+        if meta['bonds']:
+            ag._bonds = load('bonds')
+            ag._bmap = load('bmap')
+            ag._data['numbonds'] = load('numbonds')
+    except (IOError, OSError, EOFError, KeyError, ValueError,
+            pickle.UnpicklingError):
+        return None
+
+    LOGGER.debug('{0} was loaded from structure cache.'.format(filename))
+    if meta['header'] is None:
+        return ag
+    return ag, meta['header']
+
+
+def _saveCached(filename, kwargs, result):
+    """Save *result* of parsing *filename* with *kwargs* in the structure
+    cache, if a cache folder is set and *result* is an atom group, with or
+    without a header dictionary."""
+
+    folder = pathStructureCache()
+    if folder is None or 'ag' in kwargs:
+        return
+
+    header = None
+    if isinstance(result, tuple) and len(result) == 2:
+        result, header = result
+        if not isinstance(header, dict):
+            return
+    if not isinstance(result, AtomGroup):
+        return
+
+    ag = result
+    entry = _getEntry(folder, filename, kwargs)
+    temp = entry + '.{0}.tmp'.format(os.getpid())
+    meta = {'title': ag.getTitle(), 'n_atoms': ag.numAtoms(),
+            'n_csets': ag.numCoordsets(), 'cslabels': ag.getCSLabels(),
+            'acsi': ag.getACSIndex(), 'header': header,
+            'data': [], 'flags': [], 'bonds': False}
+    try:
+        os.mkdir(temp)
+        save = lambda label, array: np.save(join(temp, label + '.npy'),
+                                            array)
+        if ag.numCoordsets():
+            save('coordinates', ag._getCoordsets())
+        for label, array in ag._data.items():
+            if (array is None or label in CACHE_SKIP or
+                array.dtype == object):
+                continue
+            save('data_' + label, array)
+            meta['data'].append(label)
+        for label in ag.getFlagLabels('user'):
+            save('flags_' + label, ag._getFlags(label))
+            meta['flags'].append(label)
+        if ag._bonds is not None and ag._bmap is not None:
+            save('bonds', ag._bonds)
+            save('bmap', ag._bmap)
+            save('numbonds', ag._data['numbonds'])
+            meta['bonds'] = True
+        with open(join(temp, CACHE_META), 'wb') as out:
+            pickle.dump(meta, out, 2)
+        os.rename(temp, entry)
+    except Exception as err:
+        LOGGER.debug('{0} could not be cached ({1}).'.format(filename, err))
+        shutil.rmtree(temp, ignore_errors=True)
+        return
+
+    _evictEntries(folder)
+
+
+def _evictEntries(folder):
+    """Remove least recently used entries until the cache is within the
+    size set by ``structure_cache_size`` option."""
+
+    limit = SETTINGS.get('structure_cache_size', 1024) * 1024 ** 2
+    entries = []
+    total = 0
+    for entry in _iterEntries(folder):
+        try:
+            size = sum(os.path.getsize(join(entry, name))
+                       for name in os.listdir(entry))
+            entries.append((getmtime(entry), size, entry))
+        except OSError:
+            continue
+        total += size
+
+    entries.sort()
+    for mtime, size, entry in entries:
+        if total <= limit:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
@@ -10,12 +10,12 @@ import numpy as np
 
 from prody.atomic import AtomGroup
 from prody.atomic import flags
-from prody.atomic import ATOMIC_FIELDS
 from prody.utilities import openFile
 from prody import LOGGER, SETTINGS
 
 from .localpdb import fetchPDB
-from .starfile import parseSTARLines, StarDict
+from .starfile import parseSTARLines, StarDict, _splitValues
+from .cache import _loadCached, _saveCached
 
 __all__ = ['parseMMCIFStream', 'parseMMCIF', ]
 
@@ -106,9 +106,14 @@ def parseMMCIF(pdb, **kwargs):
         if len(title) == 7 and title.startswith('pdb'):
             title = title[3:]
         kwargs['title'] = title
+    kwargs['chain'] = chain
+    result = _loadCached(pdb, kwargs)
+    if result is not None:
+        return result
     cif = openFile(pdb, 'rt')
-    result = parseMMCIFStream(cif, chain=chain, **kwargs)
+    result = parseMMCIFStream(cif, **kwargs)
     cif.close()
+    _saveCached(pdb, kwargs, result)
     return result
 
 
@@ -203,59 +208,52 @@ def _parseMMCIFLines(atomgroup, lines, model, chain, subset,
     :arg lines: mmCIF lines
     """
 
-    if subset is not None:
-        if subset == 'ca':
-            subset = set(('CA',))
-        elif subset in 'bb':
-            subset = flags.BACKBONE
-        protein_resnames = flags.AMINOACIDS
-
-    asize = 0
-    i = 0
-    models = []
-    nModels = 0
     fields = OrderedDict()
     fieldCounter = -1
-    foundAtomBlock = False
-    doneAtomBlock = False
-    start = 0
-    stop = 0
-    while not doneAtomBlock:
-        line = lines[i]
+    start = stop = None
+    for i, line in enumerate(lines):
         if line[:11] == '_atom_site.':
             fieldCounter += 1
             fields[line.split('.')[1].strip()] = fieldCounter
+        elif line.startswith('ATOM') or line.startswith('HETATM'):
+            start = i
+            break
+    if start is None:
+        raise mmCIFParseError('_atom_site loop is not found')
+    stop = start
+    for stop in range(start, len(lines)):
+        line = lines[stop]
+        if not (line.startswith('ATOM') or line.startswith('HETATM')):
+            break
+    else:
+        stop = len(lines)
+
+    # all values of the loop are split at once and columns are taken as
+    # strided slices of the list of values
+    values = _splitValues('\n'.join(lines[start:stop]))
+    n_fields = len(fields)
+    n_rows = stop - start
+    if len(values) != n_rows * n_fields:
+        raise mmCIFParseError('number of values in _atom_site loop does not '
+                              'match the number of fields')
+
+    def column(name, dtype=None):
+        try:
+            index = fields[name]
+        except KeyError:
+            raise mmCIFParseError('_atom_site.{0} is not found'.format(name))
+        return np.array(values[index::n_fields], dtype)
 
-        if line.startswith('ATOM') or line.startswith('HETATM'):
-            if not foundAtomBlock:
-                foundAtomBlock = True
-                start = i
-            models.append(line.split()[fields['pdbx_PDB_model_num']])
-            if models[asize] != models[asize-1]:
-                nModels += 1
-            asize += 1
-        else:
-            if foundAtomBlock:
-                doneAtomBlock = True
-                stop = i
-        i += 1
-    if nModels == 0:
-        nModels = 1
+    models = column('pdbx_PDB_model_num', int)
+    atomnames = column('auth_atom_id')
+    resnames = column('auth_comp_id')
+    chainids = column('auth_asym_id')
+    altlocs = column('label_alt_id')
 
     if model is not None and model != 1:
-        for i in range(start, stop):
-            if str(models[i]) != model and str(models[i+1]) == model:
-                start = i+1
-            if str(models[i]) == model and str(models[i+1]) != model:
-                stop = i+1
-                break
-        if not str(model) in models:
+        if not (models == model).any():
             raise mmCIFParseError('model {0} is not found'.format(model))
 
-    addcoords = False
-    if atomgroup.numCoordsets() > 0:
-        addcoords = True
-
     if isinstance(altloc_torf, str):
         if altloc_torf.strip() != 'A':
             LOGGER.info('Parsing alternate locations {0}.'
@@ -263,115 +261,78 @@ def _parseMMCIFLines(atomgroup, lines, model, chain, subset,
             which_altlocs = '.' + ''.join(altloc_torf.split())
         else:
             which_altlocs = '.A'
-        altloc_torf = False
     else:
         which_altlocs = '.A'
-        altloc_torf = True
-
-    coordinates = np.zeros((asize, 3), dtype=float)
-    atomnames = np.zeros(asize, dtype=ATOMIC_FIELDS['name'].dtype)
-    resnames = np.zeros(asize, dtype=ATOMIC_FIELDS['resname'].dtype)
-    resnums = np.zeros(asize, dtype=ATOMIC_FIELDS['resnum'].dtype)
-    chainids = np.zeros(asize, dtype=ATOMIC_FIELDS['chain'].dtype)
-    segnames = np.zeros(asize, dtype=ATOMIC_FIELDS['segment'].dtype)
-    hetero = np.zeros(asize, dtype=bool)
-    termini = np.zeros(asize, dtype=bool)
-    altlocs = np.zeros(asize, dtype=ATOMIC_FIELDS['altloc'].dtype)
-    icodes = np.zeros(asize, dtype=ATOMIC_FIELDS['icode'].dtype)
-    serials = np.zeros(asize, dtype=ATOMIC_FIELDS['serial'].dtype)
-    elements = np.zeros(asize, dtype=ATOMIC_FIELDS['element'].dtype)
-    bfactors = np.zeros(asize, dtype=ATOMIC_FIELDS['beta'].dtype)
-    occupancies = np.zeros(asize, dtype=ATOMIC_FIELDS['occupancy'].dtype)
-
-    n_atoms = atomgroup.numAtoms()
-    if n_atoms > 0:
-        asize = n_atoms
-
-    acount = 0
-    for line in lines[start:stop]:
-        startswith = line.split()[fields['group_PDB']]
-
-        atomname = line.split()[fields['auth_atom_id']]
-        resname = line.split()[fields['auth_comp_id']]
-
-        if subset is not None:
-            if not (atomname in subset and resname in protein_resnames):
-                continue
-
-        chID = line.split()[fields['auth_asym_id']]
-        if chain is not None:
-            if isinstance(chain, str):
-                chain = chain.split(',')
-            if not chID in chain:
-                continue
-
-        segID = line.split()[fields['label_asym_id']]
-
-        alt = line.split()[fields['label_alt_id']]
-        if alt not in which_altlocs:
-            continue
-
-        if model is not None:
-            if int(models[acount]) < model:
-                continue
-            elif int(models[acount]) > model:
-                break
-
-        coordinates[acount] = [line.split()[fields['Cartn_x']],
-                               line.split()[fields['Cartn_y']],
-                               line.split()[fields['Cartn_z']]]
-        atomnames[acount] = atomname
-        resnames[acount] = resname
-        resnums[acount] = line.split()[fields['auth_seq_id']]
-        chainids[acount] = chID
-        segnames[acount] = segID
-        hetero[acount] = startswith == 'HETATM' # True or False
-
-        if chainids[acount] != chainids[acount-1]: 
-            termini[acount-1] = True
-
-        altlocs[acount] = alt
-        icodes[acount] = line.split()[fields['pdbx_PDB_ins_code']]
-
-        if icodes[acount] == '?': 
-            icodes[acount] = ''
-
-        serials[acount] = line.split()[fields['id']]
-        elements[acount] = line.split()[fields['type_symbol']]
-        bfactors[acount] = line.split()[fields['B_iso_or_equiv']]
-        occupancies[acount] = line.split()[fields['occupancy']]
-
-        acount += 1
 
+    torf = np.in1d(altlocs, list(which_altlocs))
+    if subset is not None:
+        if subset == 'ca':
+            subset = set(('CA',))
+        elif subset in 'bb':
+            subset = flags.BACKBONE
+        torf &= np.in1d(atomnames, list(subset))
+        torf &= np.in1d(resnames, list(flags.AMINOACIDS))
+    if chain is not None:
+        if isinstance(chain, str):
+            chain = chain.split(',')
+        torf &= np.in1d(chainids, list(chain))
     if model is not None:
-        nModels = 1
+        torf &= models == model
+    which = torf.nonzero()[0]
+
+    # atoms of the first model set atomic data, others provide coordinates
+    models = models[which]
+    starts = np.concatenate([[0], (np.diff(models) != 0).nonzero()[0] + 1,
+                             [len(models)]])
+    modelSize = starts[1]
+    first = which[:modelSize]
+
+    coordinates = np.array([column('Cartn_x', float)[which],
+                            column('Cartn_y', float)[which],
+                            column('Cartn_z', float)[which]]).T
+    coordsets = [coordinates[:modelSize]]
+    for n in range(1, len(starts) - 1):
+        size = starts[n+1] - starts[n]
+        if size == modelSize:
+            coordsets.append(coordinates[starts[n]:starts[n+1]])
+        else:
+            LOGGER.warn('Discarding model {0}, which contains {1} atoms '
+                        'while the first model contains {2}.'
+                        .format(models[starts[n]], size, modelSize))
 
-    modelSize = acount//nModels
+    chainids = chainids[first]
+    termini = np.zeros(modelSize, dtype=bool)
+    termini[:-1] = chainids[1:] != chainids[:-1]
+    termini[-1:] = True
+    icodes = column('pdbx_PDB_ins_code')[first]
+    icodes[icodes == '?'] = ''
 
-    if addcoords:
-        atomgroup.addCoordset(coordinates[:modelSize])
+    if atomgroup.numCoordsets() > 0:
+        atomgroup.addCoordset(coordsets[0])
     else:
-        atomgroup._setCoords(coordinates[:modelSize])
-
-    atomgroup.setNames(atomnames[:modelSize])
-    atomgroup.setResnames(resnames[:modelSize])
-    atomgroup.setResnums(resnums[:modelSize])
-    atomgroup.setSegnames(segnames[:modelSize])
-    atomgroup.setChids(chainids[:modelSize])
-    atomgroup.setFlags('hetatm', hetero[:modelSize])
-    atomgroup.setFlags('pdbter', termini[:modelSize])
-    atomgroup.setAltlocs(altlocs[:modelSize])
-    atomgroup.setIcodes(icodes[:modelSize])
-    atomgroup.setSerials(serials[:modelSize])
-
-    atomgroup.setElements(elements[:modelSize])
+        atomgroup._setCoords(coordsets[0])
+
+    atomgroup.setNames(atomnames[first])
+    atomgroup.setResnames(resnames[first])
+    atomgroup.setResnums(column('auth_seq_id', int)[first])
+    atomgroup.setSegnames(column('label_asym_id')[first])
+    atomgroup.setChids(chainids)
+    atomgroup.setFlags('hetatm', column('group_PDB')[first] == 'HETATM')
+    atomgroup.setFlags('pdbter', termini)
+    atomgroup.setAltlocs(altlocs[first])
+    atomgroup.setIcodes(icodes)
+    atomgroup.setSerials(column('id', int)[first])
+
+    elements = column('type_symbol')[first]
+    atomgroup.setElements(elements)
     from prody.utilities.misctools import getMasses
-    atomgroup.setMasses(getMasses(elements[:modelSize]))
-    atomgroup.setBetas(bfactors[:modelSize])
-    atomgroup.setOccupancies(occupancies[:modelSize])
+    elements, inverse = np.unique(elements, return_inverse=True)
+    atomgroup.setMasses(getMasses(elements)[inverse])
+    atomgroup.setBetas(column('B_iso_or_equiv', float)[first])
+    atomgroup.setOccupancies(column('occupancy', float)[first])
 
-    for n in range(1, nModels):
-        atomgroup.addCoordset(coordinates[n*modelSize:(n+1)*modelSize])
+    for coords in coordsets[1:]:
+        atomgroup.addCoordset(coords)
 
     if header:
         header = parseSTARLines(lines[:start-fieldCounter-2] + lines[stop:],
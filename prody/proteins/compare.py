@@ -13,12 +13,10 @@ from prody.atomic import AAMAP
 from prody.atomic import flags
 from prody.measure import calcTransformation, printRMSD, calcDistance, calcRMSD, superpose
 from prody import LOGGER, SELECT, PY2K, PY3K
-from prody.sequence import MSA
+from prody.sequence import MSA, alignPairwise
 from prody.utilities import cmp, pystr, isListLike, multilap, SolutionDepletionException, index
 from prody.utilities import MATCH_SCORE, MISMATCH_SCORE, GAP_PENALTY, GAP_EXT_PENALTY, ALIGNMENT_METHOD
 
-from Bio import pairwise2
-
 if PY2K:
     range = xrange
 
@@ -560,7 +558,7 @@ def matchChains(atoms1, atoms2, **kwargs):
     This function tries to match chains based on residue numbers and names.
     All chains in *atoms1* is compared to all chains in *atoms2*.  This works
     well for different structures of the same protein.  When it fails,
-    :mod:`Bio.pairwise2` is used for pairwise sequence alignment, and matching
+    :func:`.alignPairwise` is used for pairwise sequence alignment, and matching
     is performed based on the sequence alignment.  User can control, whether
     sequence alignment is performed or not with *pwalign* keyword.  If
     ``pwalign=True`` is passed, pairwise alignment is enforced."""
@@ -642,29 +640,28 @@ def matchChains(atoms1, atoms2, **kwargs):
                 unmatched.append((simpch1, simpch2))
 
     if pwalign or (not matches and (pwalign is None or pwalign)):
-        if pairwise2:
-            LOGGER.debug('Trying to match chains based on {0} sequence '
-                         'alignment:'.format(ALIGNMENT_METHOD))
-            for simpch1, simpch2 in unmatched:
-                LOGGER.debug(' Comparing {0} (len={1}) and {2} '
-                             '(len={3}):'
-                             .format(simpch1.getTitle(), len(simpch1),
-                                     simpch2.getTitle(), len(simpch2)))
-                match1, match2, nmatches = getAlignedMatch(simpch1, simpch2)
-                _seqid = nmatches * 100 / min(len(simpch1), len(simpch2))
-                _cover = len(match2) * 100 / max(len(simpch1), len(simpch2))
-                if _seqid >= seqid and _cover >= coverage:
-                    LOGGER.debug('\tMatch: {0} residues match with {1:.0f}% '
-                                 'sequence identity and {2:.0f}% overlap.'
-                                 .format(len(match1), _seqid, _cover))
-                    matches.append((match1, match2, _seqid, _cover,
-                                    simpch1, simpch2))
-                else:
-                    LOGGER.debug('\tFailed to match chains (seqid={0:.0f}%, '
-                                 'overlap={1:.0f}%).'
-                                 .format(_seqid, _cover))
-        else:
-            LOGGER.warning('Pairwise alignment could not be performed.')
+        LOGGER.debug('Trying to match chains based on {0} sequence '
+                     'alignment:'.format(ALIGNMENT_METHOD))
+        alignments = _alignUnmatched(unmatched)
+        for (simpch1, simpch2), alignment in zip(unmatched, alignments):
+            LOGGER.debug(' Comparing {0} (len={1}) and {2} '
+                         '(len={3}):'
+                         .format(simpch1.getTitle(), len(simpch1),
+                                 simpch2.getTitle(), len(simpch2)))
+            match1, match2, nmatches = getAlignedMatch(simpch1, simpch2,
+                                                       alignment)
+            _seqid = nmatches * 100 / min(len(simpch1), len(simpch2))
+            _cover = len(match2) * 100 / max(len(simpch1), len(simpch2))
+            if _seqid >= seqid and _cover >= coverage:
+                LOGGER.debug('\tMatch: {0} residues match with {1:.0f}% '
+                             'sequence identity and {2:.0f}% overlap.'
+                             .format(len(match1), _seqid, _cover))
+                matches.append((match1, match2, _seqid, _cover,
+                                simpch1, simpch2))
+            else:
+                LOGGER.debug('\tFailed to match chains (seqid={0:.0f}%, '
+                             'overlap={1:.0f}%).'
+                             .format(_seqid, _cover))
     if not matches:
         return None
     subset = _SUBSETS[subset]
@@ -768,25 +765,46 @@ def getTrivialMatch(ach, bch):
     return amatch, bmatch, match
 
 
-def getAlignedMatch(ach, bch):
+def _alignUnmatched(unmatched):
+    """Returns pairwise alignments of chain pairs in *unmatched*.  Chains
+    from the first structure are aligned to all their partners at once."""
+
+    partners = {}
+    for simpch1, simpch2 in unmatched:
+        partners.setdefault(id(simpch1), (simpch1, []))[1].append(simpch2)
+
+    alignments = {}
+    for simpch1, chains in partners.values():
+        results = alignPairwise(simpch1.getSequence(),
+                                [simpch2.getSequence() for simpch2 in chains],
+                                method=ALIGNMENT_METHOD, match=MATCH_SCORE,
+                                mismatch=MISMATCH_SCORE,
+                                gap_opening=GAP_PENALTY,
+                                gap_extension=GAP_EXT_PENALTY)
+        for simpch2, result in zip(chains, results):
+            alignments[id(simpch1), id(simpch2)] = result
+
+    return [alignments[id(simpch1), id(simpch2)]
+            for simpch1, simpch2 in unmatched]
+
+
+def getAlignedMatch(ach, bch, alignment=None):
     """Returns list of matching residues (match is based on sequence alignment).
+    A precomputed *alignment* of the two sequences, as returned by
+    :func:`.alignPairwise`, can be passed to skip aligning them again.
     """
 
-    if ALIGNMENT_METHOD == 'local':
-        alignment = pairwise2.align.localms(ach.getSequence(),
-                                            bch.getSequence(),
-                                            MATCH_SCORE, MISMATCH_SCORE,
-                                            GAP_PENALTY, GAP_EXT_PENALTY,
-                                            one_alignment_only=1)
-    else:
-        alignment = pairwise2.align.globalms(ach.getSequence(),
-                                             bch.getSequence(),
-                                             MATCH_SCORE, MISMATCH_SCORE,
-                                             GAP_PENALTY, GAP_EXT_PENALTY,
-                                             one_alignment_only=1)
-
-    this = alignment[0][0]
-    that = alignment[0][1]
+    if alignment is None:
+        alignment = alignPairwise(ach.getSequence(), bch.getSequence(),
+                                  method=ALIGNMENT_METHOD, match=MATCH_SCORE,
+                                  mismatch=MISMATCH_SCORE,
+                                  gap_opening=GAP_PENALTY,
+                                  gap_extension=GAP_EXT_PENALTY)
+    if alignment is None:
+        return [], [], 0.
+
+    this = alignment[0]
+    that = alignment[1]
     amatch = []
     bmatch = []
     aiter = ach.__iter__()
@@ -916,7 +934,7 @@ def mapChainOntoChain(mobile, target, **kwargs):
         fails. If ``"ce"`` or ``"cealign"``, then the CE algorithm [IS98]_ will be 
         performed. It can also be a list of prealigned sequences, a :class:`.MSA` instance,
         or a dict of indices such as that derived from a :class:`.DaliRecord`.
-        If set to **True** then the sequence alignment from :mod:`~Bio.pairwise2` 
+        If set to **True** then the sequence alignment from :func:`.alignPairwise` 
         will be used. If set to **False**, only the trivial mapping will be performed. 
         Default is **"auto"**
     :type mapping: list, str, bool
@@ -1315,19 +1333,13 @@ def getAlignedMapping(target, chain, alignment=None):
     alignment or predefined alignment)."""
 
     if alignment is None:
-        if ALIGNMENT_METHOD == 'local':
-            alignments = pairwise2.align.localms(target.getSequence(),
-                                                chain.getSequence(),
-                                                MATCH_SCORE, MISMATCH_SCORE,
-                                                GAP_PENALTY,  GAP_EXT_PENALTY,
-                                                one_alignment_only=1)
-        else:
-            alignments = pairwise2.align.globalms(target.getSequence(),
-                                                chain.getSequence(),
-                                                MATCH_SCORE, MISMATCH_SCORE,
-                                                GAP_PENALTY, GAP_EXT_PENALTY,
-                                                one_alignment_only=1)
-        alignment = alignments[0]
+        alignment = alignPairwise(target.getSequence(), chain.getSequence(),
+                                  method=ALIGNMENT_METHOD, match=MATCH_SCORE,
+                                  mismatch=MISMATCH_SCORE,
+                                  gap_opening=GAP_PENALTY,
+                                  gap_extension=GAP_EXT_PENALTY)
+        if alignment is None:
+            return None
         this, that = alignment[:2]
     else:
         def _findAlignment(sequence, alignment):
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """This module defines functions for parsing header data from PDB files."""
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import os.path
 
 import numpy as np
@@ -9,14 +9,16 @@ import numpy as np
 from prody import LOGGER
 from prody.atomic import ATOMIC_FIELDS
 from prody.atomic import Atomic, AtomGroup
-from prody.atomic import getSequence
+from prody.atomic import getSequence, flags
+from prody.atomic.bond import trimBonds
+from prody.atomic.fields import READONLY
 from prody.measure import Transformation
 from prody.utilities import openFile
 
 from .localpdb import fetchPDB
 
 __all__ = ['Chemical', 'Polymer', 'DBRef', 'parsePDBHeader',
-           'assignSecstr', 'buildBiomolecules']
+           'assignSecstr', 'buildBiomolecules', 'BiomolecularAssembly']
 
 
 class Chemical(object):
@@ -234,7 +236,7 @@ def cleanString(string, nows=False):
         return ' '.join(string.strip().split())
 
 
-def parsePDBHeader(pdb, *keys):
+def parsePDBHeader(pdb, *keys, **kwargs):
     """Returns header data dictionary for *pdb*.  This function is equivalent to
     ``parsePDB(pdb, header=True, model=0, meta=False)``, likewise *pdb* may be
     an identifier or a filename.
@@ -283,7 +285,13 @@ def parsePDBHeader(pdb, *keys):
 
     Header records that are not parsed are: OBSLTE, CAVEAT, SOURCE, KEYWDS,
     REVDAT, SPRSDE, SSBOND, LINK, CISPEP, CRYST1, ORIGX1, ORIGX2, ORIGX3,
-    MTRIX1, MTRIX2, MTRIX3, and REMARK X not mentioned above."""
+    MTRIX1, MTRIX2, MTRIX3, and REMARK X not mentioned above.
+
+    If ``lazy=True`` is passed, records are parsed only when the corresponding
+    key is looked up.  Such a dictionary should be used through its Python
+    methods, since functions that read dictionary storage directly, e.g.
+    :func:`json.dumps`, see only the entries evaluated so far.  By default,
+    a plain :class:`dict` with all entries is returned."""
 
     if not os.path.isfile(pdb):
         if len(pdb) == 4 and pdb.isalnum():
@@ -298,6 +306,8 @@ def parsePDBHeader(pdb, *keys):
     pdb = openFile(pdb, 'rt')
     header, _ = getHeaderDict(pdb, *keys)
     pdb.close()
+    if isinstance(header, _PDBHeader) and not kwargs.get('lazy', False):
+        header = header._getDict()
     return header
 
 
@@ -337,18 +347,136 @@ def getHeaderDict(stream, *keys):
         else:
             return tuple(keys), loc
     else:
-        header = {}
-        for key, func in _PDB_HEADER_MAP.items():  # PY3K: OK
-            value = func(lines)
-            if value is not None:
-                header[key] = value
-        for chem in header.get('chemicals', []):
-            chem.pdbentry = pdbid
-            header[chem.resname] = chem
-        for poly in header.get('polymers', []):
-            poly.pdbentry = pdbid
-            header[poly.chid] = poly
-        return header, loc
+        return _PDBHeader(lines), loc
+
+
+class _PDBHeader(dict):
+
+    """A dictionary of header data that is parsed from the header records
+    when it is first accessed.  Extracting polymer, chemical, and other
+    data is delayed until the corresponding key is looked up, so only
+    records that are used are processed.  Iterating over the dictionary,
+    comparing, copying, or pickling it evaluates all entries, and pickled
+    header is a plain :class:`dict`.  Functions implemented in C that read
+    dictionary storage directly, e.g. :func:`json.dumps`, bypass these
+    methods and see only evaluated entries, so this class is used only when
+    ``lazy=True`` is passed to :func:`.parsePDB` or :func:`parsePDBHeader`.
+    """
+
+    def __init__(self, lines):
+
+        dict.__init__(self)
+        self._lines = lines
+        self._pending = set(_PDB_HEADER_MAP)
+
+    def _evaluate(self, key):
+
+        if key in _HEADER_COMPONENTS:
+            keys = [k for k in _HEADER_COMPONENTS if k in self._pending]
+        else:
+            keys = [key]
+        pdbid = self._lines['pdbid']
+        for key in keys:
+            self._pending.discard(key)
+            value = _PDB_HEADER_MAP[key](self._lines)
+            if value is None:
+                continue
+            dict.__setitem__(self, key, value)
+            if key in _HEADER_COMPONENTS:
+                for item in value:
+                    item.pdbentry = pdbid
+                    if key == 'polymers':
+                        dict.__setitem__(self, item.chid, item)
+                    else:
+                        dict.__setitem__(self, item.resname, item)
+        if not self._pending:
+            self._lines = None
+
+    def _evaluateAll(self):
+
+        for key in list(self._pending):
+            if key in self._pending:
+                self._evaluate(key)
+
+    def __missing__(self, key):
+
+        if key in self._pending:
+            self._evaluate(key)
+        elif (key not in _PDB_HEADER_MAP and
+              any(k in self._pending for k in _HEADER_COMPONENTS)):
+            # key may be a chain identifier or a chemical component name
+            self._evaluate('polymers')
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+
+        try:
+            self[key]
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def get(self, key, default=None):
+
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+
+        self._pending.discard(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+
+        self[key]
+        dict.__delitem__(self, key)
+
+    def __eq__(self, other):
+
+        self._evaluateAll()
+        if isinstance(other, _PDBHeader):
+            other._evaluateAll()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+
+        return not self == other
+
+    def __repr__(self):
+
+        self._evaluateAll()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+
+        return (dict, (self._getDict(),))
+
+    def _getDict(self):
+        """Returns a plain :class:`dict` with all entries evaluated."""
+
+        self._evaluateAll()
+        return dict(dict.items(self))
+
+
+def _materialize(method):
+
+    def wrapper(self, *args, **kwargs):
+        self._evaluateAll()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+for _method in ['__iter__', '__len__', 'keys', 'values', 'items', 'copy',
+                'pop', 'popitem', 'setdefault', 'update',
+                'iterkeys', 'itervalues', 'iteritems']:
+    if hasattr(dict, _method):
+        setattr(_PDBHeader, _method, _materialize(getattr(dict, _method)))
+if hasattr(dict, 'has_key'):
+    _PDBHeader.has_key = _PDBHeader.__contains__
 
 
 def _getBiomoltrans(lines):
@@ -912,6 +1040,10 @@ _PDB_HEADER_MAP = {
     'related_entries': _getRelatedEntries,
 }
 
+_HEADER_COMPONENTS = ('chemicals', 'polymers')
+
+SEGNAMES = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
 mapHelix = {
     1: 'H',  # 4-turn helix (alpha helix)
     2: '',  # other helix, Right-handed omega
@@ -1033,7 +1165,7 @@ def assignSecstr(header, atoms, coil=False):
     return atoms
 
 
-def buildBiomolecules(header, atoms, biomol=None):
+def buildBiomolecules(header, atoms, biomol=None, **kwargs):
     """Returns *atoms* after applying biomolecular transformations from *header*
     dictionary.  Biomolecular transformations are applied to all coordinate
     sets in the molecule.
@@ -1054,6 +1186,11 @@ def buildBiomolecules(header, atoms, biomol=None):
     Note that atoms in biomolecules are ordered according to chain identifiers.
     When multiple chains in a biomolecule have the same chain identifier, they 
     are given different segment names to distinguish them.
+
+    If *virtual* is **True**, :class:`BiomolecularAssembly` instances that
+    refer to *atoms* are returned instead of :class:`.AtomGroup` instances.
+    They can be passed to ENM methods, e.g. :meth:`.ANM.buildHessian`,
+    without copying atomic data for each transformation.
     """
 
     if not isinstance(header, dict):
@@ -1070,6 +1207,7 @@ def buildBiomolecules(header, atoms, biomol=None):
     if not isinstance(atoms, AtomGroup):
         atoms = atoms.copy()
 
+    virtual = kwargs.get('virtual', False)
     biomols = []
     if biomol is None:
         keys = list(biomt)
@@ -1083,9 +1221,8 @@ def buildBiomolecules(header, atoms, biomol=None):
             return None
 
     keys.sort()
+    selections = {}
     for i in keys:
-        segnm = list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'*20)
-        ags = []
         mt = biomt[i]
         # mt is a list, first item is list of chain identifiers
         # following items are lines corresponding to transformation
@@ -1095,38 +1232,30 @@ def buildBiomolecules(header, atoms, biomol=None):
                         'applied'.format(i))
             continue
 
+        indices = []
+        rotations = []
+        translations = []
         for times in range(int((len(mt)) / 4)):
-            rotation = np.zeros((3, 3))
-            translation = np.zeros(3)
-            line0 = np.fromstring(mt[times*4+1], sep=' ')
-            rotation[0, :] = line0[:3]
-            translation[0] = line0[3]
-            line1 = np.fromstring(mt[times*4+2], sep=' ')
-            rotation[1, :] = line1[:3]
-            translation[1] = line1[3]
-            line2 = np.fromstring(mt[times*4+3], sep=' ')
-            rotation[2, :] = line2[:3]
-            translation[2] = line2[3]
-            t = Transformation(rotation, translation)
-
-            newag = atoms.select('chain ' + ' '.join(mt[times*4+0])).copy()
-            if newag is None:
+            chains = tuple(mt[times*4+0])
+            if chains not in selections:
+                selection = atoms.select('chain ' + ' '.join(chains))
+                selections[chains] = (None if selection is None
+                                      else selection.getIndices())
+            if selections[chains] is None:
                 continue
-            newag.all.setSegnames(segnm.pop(0))
-            for acsi in range(newag.numCoordsets()):
-                newag.setACSIndex(acsi)
-                newag = t.apply(newag)
-            newag.setACSIndex(0)
-            ags.append(newag)
-
-        if ags:
-            newag = ags.pop(0)
-            while ags:
-                newag += ags.pop(0)
-            newag.setTitle('{0} biomolecule {1}'
-                           .format(atoms.getTitle(), i))
-            biomols.append(newag)
-            
+            matrix = np.array([np.fromstring(line, sep=' ')[:4]
+                               for line in mt[times*4+1:times*4+4]])
+            indices.append(selections[chains])
+            rotations.append(matrix[:, :3])
+            translations.append(matrix[:, 3])
+
+        if indices:
+            assembly = BiomolecularAssembly(atoms, indices, rotations,
+                                            translations,
+                                            '{0} biomolecule {1}'
+                                            .format(atoms.getTitle(), i))
+            biomols.append(assembly if virtual else assembly.toAtomGroup())
+
     if biomols:
         if len(biomols) == 1:
             return biomols[0]
@@ -1134,3 +1263,141 @@ def buildBiomolecules(header, atoms, biomol=None):
             return biomols
     else:
         return None
+
+
+class BiomolecularAssembly(object):
+
+    """A biomolecular assembly that refers to atoms of an asymmetric unit and
+    transformations that are applied to them, instead of holding a copy of
+    atomic data for each transformation.  Coordinates of the assembly are
+    computed when requested, so an instance can be passed to ENM methods,
+    e.g. :meth:`.ANM.buildHessian`.  Use :meth:`toAtomGroup` to build an
+    :class:`.AtomGroup` with all atomic data.  Instances are returned by
+    :func:`buildBiomolecules` when ``virtual=True`` is passed."""
+
+    def __init__(self, atoms, indices, rotations, translations, title=None):
+
+        self._atoms = atoms
+        self._indices = indices
+        self._rotations = np.array(rotations, float).reshape((-1, 3, 3))
+        self._translations = np.array(translations, float).reshape((-1, 3))
+        self._offsets = np.cumsum([0] + [len(i) for i in indices])
+        self._title = atoms.getTitle() if title is None else title
+
+    def __repr__(self):
+
+        return ('<BiomolecularAssembly: {0} ({1} atoms; {2} '
+                'transformations)>').format(self._title, self.numAtoms(),
+                                            self.numTransformations())
+
+    def __len__(self):
+
+        return int(self._offsets[-1])
+
+    def numAtoms(self):
+        """Returns number of atoms in the assembly."""
+
+        return int(self._offsets[-1])
+
+    def numTransformations(self):
+        """Returns number of transformations."""
+
+        return len(self._indices)
+
+    def getTitle(self):
+        """Returns title of the assembly."""
+
+        return self._title
+
+    def getAtoms(self):
+        """Returns atoms that transformations are applied to."""
+
+        return self._atoms
+
+    def getIndices(self):
+        """Returns indices of atoms that each atom of the assembly is a copy
+        of."""
+
+        return np.concatenate(self._indices)
+
+    def getTransformations(self):
+        """Returns a list of :class:`.Transformation` instances."""
+
+        return [Transformation(rotation, translation) for rotation,
+                translation in zip(self._rotations, self._translations)]
+
+    def _transform(self, coordsets):
+        """Returns coordinates of the assembly for *coordsets* of atoms with
+        shape ``(n_csets, n_atoms, 3)``.  Transformations applied to the
+        same atoms are applied together in a single batched product."""
+
+        offsets = self._offsets
+        coords = np.empty((len(coordsets), offsets[-1], 3), float)
+        groups = OrderedDict()
+        for k, indices in enumerate(self._indices):
+            groups.setdefault(id(indices), []).append(k)
+        for ks in groups.values():
+            block = coordsets[:, self._indices[ks[0]]]
+            moved = np.matmul(block[np.newaxis],
+                              self._rotations[ks].transpose(0, 2, 1)
+                              [:, np.newaxis])
+            moved += self._translations[ks][:, np.newaxis, np.newaxis]
+            for j, k in enumerate(ks):
+                coords[:, offsets[k]:offsets[k+1]] = moved[j]
+        return coords
+
+    def getCoords(self):
+        """Returns a copy of coordinates from the active coordinate set."""
+
+        coords = self._atoms._getCoords()
+        if coords is not None:
+            return self._transform(coords[np.newaxis])[0]
+
+    _getCoords = getCoords
+
+    def getCoordsets(self):
+        """Returns a copy of all coordinate sets."""
+
+        coordsets = self._atoms._getCoordsets()
+        if coordsets is not None:
+            return self._transform(coordsets)
+
+    def toAtomGroup(self):
+        """Returns an :class:`.AtomGroup` containing atomic data and bonds
+        of atoms for each transformation, with transformed coordinates.
+        Copies are given segment names ``'A'``, ``'B'``, ..., in the
+        order of transformations."""
+
+        atoms = self._atoms
+        index = self.getIndices()
+        offsets = self._offsets
+        new = AtomGroup(self._title)
+        if atoms.numCoordsets():
+            new.setCoords(self.getCoordsets(), label=atoms.getCSLabels())
+
+        for label in atoms.getDataLabels():
+            if label not in READONLY:
+                new.setData(label, atoms.getData(label)[index])
+        segnames = np.repeat([SEGNAMES[k % len(SEGNAMES)]
+                              for k in range(len(self._indices))],
+                             np.diff(offsets))
+        new.setSegnames(segnames)
+
+        skip_flags = set()
+        for label in atoms.getFlagLabels():
+            if label not in skip_flags:
+                new._setFlags(label, atoms.getFlags(label)[index])
+                skip_flags.update(flags.ALIASES.get(label, [label]))
+
+        if atoms._bonds is not None and atoms._bmap is not None:
+            bonds = []
+            trimmed = {}
+            for k, indices in enumerate(self._indices):
+                if id(indices) not in trimmed:
+                    trimmed[id(indices)] = trimBonds(atoms._bonds, indices)
+                if trimmed[id(indices)] is not None:
+                    bonds.append(trimmed[id(indices)] + offsets[k])
+            if bonds:
+                new.setBonds(np.concatenate(bonds))
+        return new
+
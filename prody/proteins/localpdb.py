@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
 """This module defines functions for handling local PDB folders."""
 
-from glob import glob, iglob
+import os
+from hashlib import sha1
 from os.path import sep as pathsep
 from os.path import abspath, isdir, isfile, join, split, splitext, normpath
+from os.path import dirname, getmtime
+from time import time
 
 from prody import LOGGER, SETTINGS
 from prody.utilities import makePath, gunzip, relpath, copyFile, isWritable
-from prody.utilities import sympath
+from prody.utilities import sympath, pickle, unpickle
 
 from . import wwpdb
 from .wwpdb import checkIdentifiers, fetchPDBviaFTP, fetchPDBviaHTTP
@@ -15,7 +18,14 @@ from .wwpdb import checkIdentifiers, fetchPDBviaFTP, fetchPDBviaHTTP
 
 __all__ = ['pathPDBFolder', 'pathPDBMirror',
            'fetchPDB', 'fetchPDBfromMirror',
-           'iterPDBFilenames', 'findPDBFiles']
+           'iterPDBFilenames', 'findPDBFiles', 'lookupPDBFiles']
+
+PDB_INDEX_VERSION = 1
+
+PDB_EXTENSIONS = {'.pdb': 'pdb', '.ent': 'pdb', '.cif': 'cif', '.xml': 'xml'}
+
+PDB_INDEXES = {}
+
 
 def pathPDBFolder(folder=None, divided=False):
     """Returns or specify local PDB folder for storing PDB files downloaded from
@@ -168,13 +178,18 @@ def fetchPDBfromMirror(*pdb, **kwargs):
     append = filenames.append
     success = 0
     failure = 0
+    index = _getPDBFolderIndex(mirror, persist=True)
+    exists = index.findFiles([join(ftp_divided, pdb[1:3],
+                                   ftp_prefix + pdb + ftp_pdbext)
+                              for pdb in identifiers if pdb is not None])
+    exists.reverse()
     for pdb in identifiers:
         if pdb is None:
             append(None)
             continue
         fn = join(mirror, ftp_divided, pdb[1:3],
                   ftp_prefix + pdb + ftp_pdbext)
-        if isfile(fn):
+        if exists.pop():
             if folder or not compressed:
                 if compressed:
                     fn = copyFile(fn, join(folder or '.',
@@ -220,19 +235,14 @@ def fetchPDB(*pdb, **kwargs):
     compressed = kwargs.get('compressed')
 
     # check *folder* specified by the user, usually pwd ('.')
-    filedict = findPDBFiles(folder, compressed=compressed)
+    filenames = _findInFolder(folder, identifiers, compressed=compressed)
 
-    filenames = []
     not_found = []
     exists = 0
     for i, pdb in enumerate(identifiers):
-        if pdb is None:
-            filenames.append(None)
-        elif pdb in filedict:
-            filenames.append(filedict[pdb])
+        if filenames[i] is not None:
             exists += 1
-        else:
-            filenames.append(None)
+        elif pdb is not None:
             not_found.append((i, pdb))
 
     if not not_found:
@@ -248,11 +258,11 @@ def fetchPDB(*pdb, **kwargs):
                       'specify another folder'.format(folder))
 
     if compressed is not None and not compressed:
-        filedict = findPDBFiles(folder, compressed=True)
+        fns = _findInFolder(folder, [pdb for i, pdb in not_found],
+                            compressed=True)
         not_found, decompress = [], not_found
-        for i, pdb in decompress:
-            if pdb in filedict:
-                fn = filedict[pdb]
+        for (i, pdb), fn in zip(decompress, fns):
+            if fn is not None:
                 filenames[i] = gunzip(fn, splitext(fn)[0])
             else:
                 not_found.append((i, pdb))
@@ -263,14 +273,10 @@ def fetchPDB(*pdb, **kwargs):
     local_folder = pathPDBFolder()
     copy = kwargs.setdefault('copy', False)
     if local_folder:
-        local_folder, is_divided = local_folder
         temp, not_found = not_found, []
-        for i, pdb in temp:
-            if is_divided:
-                fn = join(local_folder, pdb[1:3], 'pdb' + pdb + '.pdb.gz')
-            else:
-                fn = join(local_folder, pdb + '.pdb.gz')
-            if isfile(fn):
+        fns = _findInPDBFolder(local_folder, [pdb for i, pdb in temp])
+        for (i, pdb), fn in zip(temp, fns):
+            if fn is not None:
                 if copy or not compressed and compressed is not None:
                     if compressed:
                         fn = copyFile(fn, join(folder, pdb + 'pdb.gz'))
@@ -375,21 +381,26 @@ def iterPDBFilenames(path=None, sort=False, unique=True, **kwargs):
     and :file:`pdb1mkp.ent.gz1`).  :file:`.pdb` and :file:`.ent` extensions,
     and compressed files are considered."""
 
-    from re import compile, IGNORECASE
-
     if path is None or kwargs.get('mirror') is True:
         if path is None:
             path = pathPDBMirror()
         if path is None:
             raise ValueError('path must be specified or PDB mirror path '
                              'must be set')
+        divided = join('data', 'structures', 'divided', 'pdb')
+        index = _getPDBFolderIndex(path, persist=True)
+        try:
+            folders = [join(divided, name)
+                       for name in os.listdir(join(path, divided))
+                       if not name.startswith('.')]
+        except OSError:
+            folders = []
+        index.update(*folders)
+        pdbs = [join(path, folder, name) for folder in folders
+                for name in index.getFiles(folder)
+                if name.endswith('.ent.gz')]
         if sort:
-            pdbs = glob(join(path, 'data/structures/divided/pdb/',
-                        '*/*.ent.gz'))
-            pdbs.sort(reverse=kwargs.get('reverse'))
-        else:
-            pdbs = iglob(join(path, 'data/structures/divided/pdb/',
-                        '*/*.ent.gz'))
+            pdbs.sort(reverse=bool(kwargs.get('reverse')))
         for fn in pdbs:
             yield fn
     else:
@@ -397,20 +408,17 @@ def iterPDBFilenames(path=None, sort=False, unique=True, **kwargs):
         if unique:
             yielded = set()
         compressed = kwargs.get('compressed')
-        if compressed is None:
-            pdbext = compile('\.(pdb|ent)(\.gz)?$', IGNORECASE)
-        elif compressed:
-            pdbext = compile('\.(pdb|ent)\.gz$', IGNORECASE)
-        else:
-            pdbext = compile('\.(pdb|ent)$', IGNORECASE)
-        pdbs = [pdb for pdb in iglob(join(path, '*')) if pdbext.search(pdb)]
+        index = _getPDBFolderIndex(path)
+        index.update()
+        files = index.getFiles()
+        pdbs = [(join(path, name), info[0])
+                for name, info in files.items()
+                if info[1] == 'pdb' and
+                (compressed is None or info[2] == bool(compressed))]
         if sort:
-            pdbs.sort(reverse=kwargs.get('reverse'))
-        for fn in pdbs:
+            pdbs.sort(reverse=bool(kwargs.get('reverse')))
+        for fn, pdb in pdbs:
             if unique:
-                pdb = splitext(splitext(split(fn)[1])[0])[0]
-                if len(pdb) == 7 and pdb.startswith('pdb'):
-                    pdb = pdb[3:]
                 if pdb in yielded:
                     continue
                 else:
@@ -448,3 +456,303 @@ def findPDBFiles(path, case=None, **kwargs):
 
     return pdbs
 
+
+def lookupPDBFiles(*pdb, **kwargs):
+    """Returns path(s) to file(s) for specified *pdb* identifier(s) that are
+    present in user specified *folder*, local PDB folder (see
+    :func:`.pathPDBFolder`), or local PDB mirror (see :func:`.pathPDBMirror`),
+    and **None** for those that are not found.  Unlike :func:`.fetchPDB`,
+    files are not downloaded, copied, or decompressed.  *format* may be
+    ``'pdb'`` (default), ``'cif'``, or ``'xml'``.
+
+    Contents of folders are indexed, and the index of local PDB folder and
+    mirror is kept on disk when package path is set.  Only subfolders that
+    were modified since the last call are scanned again, so thousands of
+    identifiers can be looked up in a single call."""
+
+    if len(pdb) == 1 and isinstance(pdb[0], list):
+        pdb = pdb[0]
+
+    format = str(kwargs.get('format', 'pdb')).lower()
+    if format not in ('pdb', 'cif', 'xml'):
+        raise ValueError('{0} is not a recognized format'
+                         .format(repr(format)))
+
+    identifiers = checkIdentifiers(*pdb)
+    folder = kwargs.get('folder')
+    if folder is not None:
+        filenames = _findInFolder(folder, identifiers, format=format)
+    else:
+        filenames = [None] * len(identifiers)
+
+    missing = [(i, pdb) for i, pdb in enumerate(identifiers)
+               if pdb is not None and filenames[i] is None]
+    local_folder = pathPDBFolder()
+    if missing and local_folder and format == 'pdb':
+        fns = _findInPDBFolder(local_folder, [pdb for i, pdb in missing])
+        for (i, pdb), fn in zip(missing, fns):
+            filenames[i] = fn
+        missing = [(i, pdb) for (i, pdb), fn in zip(missing, fns)
+                   if fn is None]
+
+    if missing and pathPDBMirror() is not None:
+        try:
+            fns = fetchPDBfromMirror(*[pdb for i, pdb in missing],
+                                     format=format, check=False)
+        except IOError:
+            pass
+        else:
+            if len(missing) == 1:
+                fns = [fns]
+            for (i, pdb), fn in zip(missing, fns):
+                filenames[i] = fn
+
+    return filenames[0] if len(identifiers) == 1 else filenames
+
+
+def _findInFolder(folder, identifiers, compressed=None, format='pdb'):
+    """Returns paths to files in *folder* for *identifiers*, or **None** for
+    those that are not found.  When there are multiple files for an
+    identifier, the one :func:`.findPDBFiles` would return is chosen."""
+
+    if not isdir(folder):
+        return [None] * len(identifiers)
+
+    index = _getPDBFolderIndex(folder)
+    index.update()
+    files = index.getFiles()
+    ids = index.getIdentifiers()
+    filenames = []
+    for pdb in identifiers:
+        if pdb is None:
+            filenames.append(None)
+            continue
+        names = [name for name in ids.get(pdb.lower(), [])
+                 if files[name][0] == pdb and files[name][1] == format and
+                 (compressed is None or files[name][2] == bool(compressed))]
+        if names:
+            filenames.append(normpath(join(folder, names[-1])))
+        else:
+            filenames.append(None)
+    return filenames
+
+
+def _findInPDBFolder(local_folder, identifiers):
+    """Returns paths to files in local PDB folder for *identifiers*, or
+    **None** for those that are not found.  *local_folder* is the value
+    returned by :func:`.pathPDBFolder`."""
+
+    local_folder, is_divided = local_folder
+    if is_divided:
+        fns = [join(pdb[1:3], 'pdb' + pdb + '.pdb.gz')
+               for pdb in identifiers]
+    else:
+        fns = [pdb + '.pdb.gz' for pdb in identifiers]
+    index = _getPDBFolderIndex(local_folder, persist=True)
+    return [join(local_folder, fn) if exists else None
+            for fn, exists in zip(fns, index.findFiles(fns))]
+
+
+def _parsePDBFilename(name):
+    """Returns identifier, format, and compression of file *name*, or
+    **None** if it is not a PDB, mmCIF, or PDBML file."""
+
+    base, ext = splitext(name)
+    compressed = ext.lower() == '.gz'
+    if compressed:
+        ext = splitext(base)[1]
+    format = PDB_EXTENSIONS.get(ext.lower())
+    if format is None:
+        return None
+    pdb = splitext(base)[0]
+    if len(pdb) == 7 and pdb.startswith('pdb'):
+        pdb = pdb[3:]
+    return pdb, format, compressed
+
+
+def _scanPDBFolder(path):
+    """Returns a dictionary mapping names of PDB files in *path* to their
+    identifier, format, compression and modification time."""
+
+    try:
+        entries = [(entry.name, entry) for entry in os.scandir(path)]
+    except AttributeError:
+        entries = [(name, None) for name in os.listdir(path)]
+
+    files = {}
+    for name, entry in entries:
+        if name.startswith('.'):
+            continue
+        info = _parsePDBFilename(name)
+        if info is None:
+            continue
+        try:
+            if entry is None:
+                fn = join(path, name)
+                if not isfile(fn):
+                    continue
+                mtime = getmtime(fn)
+            else:
+                if not entry.is_file():
+                    continue
+                mtime = entry.stat().st_mtime
+        except OSError:
+            continue
+        files[name] = info + (mtime,)
+    return files
+
+
+class _PDBFolderIndex(object):
+
+    """Index of PDB files in a local folder or mirror.  Contents of each
+    subfolder are recorded together with its modification time, and a
+    subfolder is scanned again only when its modification time changes.
+    When *persist* is **True** and package path is set, the index is saved
+    in :file:`pdbindex` folder in package path and reused between
+    sessions."""
+
+    def __init__(self, path, persist=False):
+
+        self._path = abspath(path)
+        self._persist = persist
+        self._folders = None
+        self._ids = {}
+
+    def __repr__(self):
+
+        return '<_PDBFolderIndex: {0}>'.format(self._path)
+
+    def _getFilename(self):
+
+        package = SETTINGS.get('package_path')
+        if not self._persist or not package or not isWritable(package):
+            return None
+        key = sha1(self._path.encode('utf-8')).hexdigest()
+        return join(package, 'pdbindex', key + '.pkl')
+
+    def _load(self):
+
+        self._folders = {}
+        filename = self._getFilename()
+        if filename is None or not isfile(filename):
+            return
+        try:
+            index = unpickle(filename)
+        except Exception as err:
+            LOGGER.debug('PDB folder index {0} could not be loaded ({1}).'
+                         .format(filename, err))
+            return
+        if (isinstance(index, dict) and
+            index.get('version') == PDB_INDEX_VERSION and
+            index.get('path') == self._path):
+            self._folders = index['folders']
+
+    def _save(self):
+
+        filename = self._getFilename()
+        if filename is None:
+            return
+        try:
+            makePath(dirname(filename))
+            temp = filename + '.{0}.tmp'.format(os.getpid())
+            pickle({'version': PDB_INDEX_VERSION, 'path': self._path,
+                    'folders': self._folders}, temp)
+            if isfile(filename):
+                os.remove(filename)
+            os.rename(temp, filename)
+        except Exception as err:
+            LOGGER.debug('PDB folder index {0} could not be saved ({1}).'
+                         .format(filename, err))
+
+    def getPath(self):
+        """Returns path of the indexed folder."""
+
+        return self._path
+
+    def update(self, *folders):
+        """Scan *folders*, given relative to the indexed path, whose
+        modification time changed since the last scan.  If no folder is
+        given, the indexed folder itself is updated.  Returns **True** if
+        any of the folders were scanned."""
+
+        if self._folders is None:
+            self._load()
+        if not folders:
+            folders = ('',)
+
+        changed = False
+        now = time()
+        for folder in folders:
+            try:
+                mtime = os.stat(join(self._path, folder)).st_mtime
+            except OSError:
+                mtime = None
+            record = self._folders.get(folder)
+            if mtime is None:
+                if record is not None:
+                    self._folders.pop(folder)
+                    self._ids.pop(folder, None)
+                    changed = True
+                continue
+            if record is not None and record[0] == mtime:
+                continue
+            files = _scanPDBFolder(join(self._path, folder))
+            # a folder modified within the timestamp resolution may change
+            # again unnoticed, so it is scanned again on the next update
+            if now - mtime < 2:
+                mtime = None
+            self._folders[folder] = (mtime, files)
+            self._ids.pop(folder, None)
+            changed = True
+
+        if changed and self._persist:
+            self._save()
+        return changed
+
+    def getFiles(self, folder=''):
+        """Returns a dictionary mapping names of files in *folder* to their
+        identifier, format, compression, and modification time.  The index
+        is not updated by this method."""
+
+        if self._folders is None:
+            self._load()
+        return self._folders.get(folder, (None, {}))[1]
+
+    def getIdentifiers(self, folder=''):
+        """Returns a dictionary mapping identifiers, in lower case, to names
+        of files in *folder*.  The index is not updated by this method."""
+
+        try:
+            return self._ids[folder]
+        except KeyError:
+            pass
+        ids = {}
+        for name, info in self.getFiles(folder).items():
+            ids.setdefault(info[0].lower(), []).append(name)
+        for names in ids.values():
+            names.sort()
+        self._ids[folder] = ids
+        return ids
+
+    def findFiles(self, filenames):
+        """Returns a list of booleans indicating whether each of the
+        *filenames*, given relative to the indexed path, exists.  Folders
+        containing the files are updated once, so thousands of files can be
+        looked up in a single call."""
+
+        paths = [split(fn) for fn in filenames]
+        self.update(*set(folder for folder, name in paths))
+        return [name in self.getFiles(folder) for folder, name in paths]
+
+
+def _getPDBFolderIndex(path, persist=False):
+    """Returns index of PDB files in *path*.  Indexes are kept in
+    memory and shared between calls for the same path."""
+
+    key = abspath(path)
+    index = PDB_INDEXES.get(key)
+    if index is None:
+        index = PDB_INDEXES[key] = _PDBFolderIndex(key, persist)
+    elif persist and not index._persist:
+        index._persist = True
+    return index
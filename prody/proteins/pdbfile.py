@@ -18,16 +18,21 @@ from prody.utilities.misctools import decToHybrid36, packmolRenumChains
 from prody import LOGGER, SETTINGS
 
 from .header import getHeaderDict, buildBiomolecules, assignSecstr, isHelix, isSheet
+from .header import _PDBHeader
 from .localpdb import fetchPDB
 from .ciffile import parseMMCIF
 from .emdfile import parseEMD
+from .cache import _loadCached, _saveCached
 
-__all__ = ['parsePDBStream', 'parsePDB', 'parseChainsList', 'parsePQR',
+__all__ = ['parsePDBStream', 'parsePDB', 'parseStructures',
+           'parseChainsList', 'parsePQR',
            'writePDBStream', 'writePDB', 'writeChainsList', 'writePQR',
            'writePQRStream']
 
 MAX_N_ATOM = 99999 
 
+ANISOU_COLUMNS = ((28, 35), (35, 42), (43, 49), (49, 56), (56, 63), (63, 70))
+
 class PDBParseError(Exception):
     pass
 
@@ -61,6 +66,11 @@ _parsePDBdoc = _parsePQRdoc + """
     :arg header: if **True** PDB header content will be parsed and returned
     :type header: bool
 
+    :arg lazy: if **True**, header records are parsed when the corresponding
+        key of the header dictionary is looked up, see :func:`.parsePDBHeader`
+        for details, default is **False**
+    :type lazy: bool
+
     :arg altloc: if a location indicator is passed, such as ``'A'`` or ``'B'``,
          only indicated alternate locations will be parsed as the single
          coordinate set of the AtomGroup,  if *altloc* is set **True** all
@@ -179,6 +189,295 @@ def parsePDB(*pdb, **kwargs):
 
         return results
 
+def parseStructures(*pdb, **kwargs):
+    """Returns a list of structures parsed from PDB or mmCIF files, or from
+    PDB identifiers, using a pool of processes.  Structures are returned in
+    the order they are given, and each item is what :func:`.parsePDB` or
+    :func:`.parseMMCIF` returns for that structure.  Files with :file:`.cif`
+    or :file:`.cif.gz` extension, or all identifiers when ``format='cif'``,
+    are parsed as mmCIF files.
+
+    If parsing a structure fails, a warning is logged and **None** is placed
+    in its position, so that a bad or missing file does not stop the batch.
+
+    Other arguments, such as *subset*, *chain*, *model*, *altloc* and
+    *header*, are passed to the parser for every structure.
+
+    :arg pdb: PDB identifiers or filenames, or a list of them
+
+    :arg n_cpu: number of processes, default is the number of CPUs.  When
+        **1**, structures are parsed in this process.
+    :type n_cpu: int
+
+    :arg return_errors: if **True**, a list with an error message or
+        **None** for each structure is returned as well, default is **False**
+    :type return_errors: bool
+
+    :arg per_structure: parser arguments that differ between structures,
+        mapping each argument name to a list with an entry for each
+        structure, e.g. ``per_structure={'chain': ['A', 'B']}``
+    :type per_structure: dict
+
+    Arrays of atom groups parsed in other processes are sent back through
+    shared memory where it is available (Python 3.8 or later) rather than
+    being pickled.  As for any use of :mod:`multiprocessing`, scripts
+    should protect their entry point with ``if __name__ == '__main__'``."""
+
+    n_cpu = kwargs.pop('n_cpu', None)
+    return_errors = kwargs.pop('return_errors', False)
+    per_structure = kwargs.pop('per_structure', None) or {}
+    if not isinstance(per_structure, dict):
+        raise TypeError('per_structure must be a dictionary')
+
+    if len(pdb) == 1 and isListLike(pdb[0]):
+        pdb = pdb[0]
+    n_pdb = len(pdb)
+    if n_pdb == 0:
+        raise ValueError('Please provide PDB IDs or filenames')
+
+    if n_cpu is None:
+        from multiprocessing import cpu_count
+        n_cpu = cpu_count()
+    if not isinstance(n_cpu, Integral):
+        raise TypeError('n_cpu must be an integer')
+    elif n_cpu < 1:
+        raise ValueError('n_cpu must be equal to or greater than 1')
+    n_cpu = min(n_cpu, n_pdb)
+
+    for key, values in per_structure.items():
+        if not isListLike(values) or len(values) != n_pdb:
+            raise ValueError('per_structure {0} must have an entry for each '
+                             'structure'.format(repr(key)))
+
+    # shared memory blocks of i-th structure are named prefix + i + '_' + k
+    prefix = None
+    if n_cpu > 1:
+        from uuid import uuid4
+        prefix = 'psm_{0}_'.format(uuid4().hex[:8])
+    tasks = []
+    for i, item in enumerate(pdb):
+        itemkwargs = dict(kwargs)
+        for key, values in per_structure.items():
+            itemkwargs[key] = values[i]
+        tasks.append((item, itemkwargs,
+                      None if prefix is None else prefix + str(i) + '_'))
+
+    start = time.time()
+    LOGGER.progress('Parsing {0} structures...'.format(n_pdb), n_pdb,
+                    '_prody_parseStructures')
+    if n_cpu == 1:
+        pool = None
+        outputs = map(_parseStructure, tasks)
+    else:
+        from multiprocessing import Pool
+        pool = Pool(n_cpu)
+        outputs = pool.imap(_parseStructure, tasks)
+
+    results = []
+    errors = []
+    try:
+        for i, (result, error) in enumerate(outputs):
+            LOGGER.update(i, 'Parsing {0}...'.format(pdb[i]),
+                          label='_prody_parseStructures')
+            if error is not None:
+                LOGGER.warn('{0} could not be parsed ({1}).'
+                            .format(pdb[i], error))
+            try:
+                results.append(_unpackStructure(result))
+            except BaseException:
+                _releaseStructure(result)
+                raise
+            errors.append(error)
+    finally:
+        if pool is not None:
+            if len(results) < n_pdb:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+            # release blocks of structures that were not unpacked
+            for i in range(len(results), n_pdb):
+                _unlinkShared(prefix + str(i) + '_')
+    LOGGER.finish()
+
+    LOGGER.info('{0} structures were parsed in {1:.2f}s.'
+                .format(errors.count(None), time.time()-start))
+
+    if return_errors:
+        return results, errors
+    return results
+
+
+def _parseStructure(args):
+    """Parse a structure for :func:`.parseStructures` and return it with
+    an error message, which is **None** upon success."""
+
+    pdb, kwargs, prefix = args
+    kwargs = dict(kwargs)
+    cif = kwargs.pop('format', 'pdb').lower() == 'cif'
+    if not cif:
+        cif = (str(pdb).lower().endswith('.cif') or
+               str(pdb).lower().endswith('.cif.gz'))
+    try:
+        if cif:
+            result = parseMMCIF(pdb, **kwargs)
+        else:
+            result = _parsePDB(pdb, **kwargs)
+    except Exception as err:
+        return None, str(err) or err.__class__.__name__
+    if prefix is not None:
+        result = _packStructure(result, prefix)
+    return result, None
+
+
+def _packStructure(result, prefix, count=None):
+    """Returns *result* with atom groups replaced by
+    :class:`._SharedAtomGroup` instances, whose shared memory blocks are
+    named *prefix* followed by consecutive integers."""
+
+    try:
+        from importlib.util import find_spec
+    except ImportError:
+        return result
+    if find_spec('multiprocessing.shared_memory') is None:
+        return result
+    if os.name == 'nt':
+        # blocks are freed on Windows when the last handle is closed
+        return result
+
+    if count is None:
+        count = [0]
+    if isinstance(result, AtomGroup):
+        count[0] += 1
+        return _SharedAtomGroup(result, prefix + str(count[0] - 1))
+    if isinstance(result, (list, tuple)):
+        return type(result)([_packStructure(item, prefix, count)
+                             for item in result])
+    return result
+
+
+def _unlinkShared(prefix, numbered=True):
+    """Unlink shared memory blocks named *prefix* followed by consecutive
+    integers, which were created by :func:`._packStructure`, or the block
+    named *prefix* when *numbered* is **False**."""
+
+    from multiprocessing import shared_memory
+
+    k = 0
+    while True:
+        try:
+            shm = shared_memory.SharedMemory(
+                name=prefix + str(k) if numbered else prefix)
+        except (OSError, ValueError):
+            break
+        shm.close()
+        shm.unlink()
+        if not numbered:
+            break
+        k += 1
+
+
+def _unpackStructure(result):
+    """Returns *result* with :class:`._SharedAtomGroup` instances replaced
+    by atom groups."""
+
+    if isinstance(result, _SharedAtomGroup):
+        return result.unpack()
+    if isinstance(result, (list, tuple)):
+        return type(result)([_unpackStructure(item) for item in result])
+    return result
+
+
+def _releaseStructure(result):
+    """Release shared memory blocks of :class:`._SharedAtomGroup` instances
+    in *result* that were not unpacked."""
+
+    if isinstance(result, _SharedAtomGroup):
+        result.release()
+    elif isinstance(result, (list, tuple)):
+        for item in result:
+            _releaseStructure(item)
+
+
+class _SharedAtomGroup(object):
+
+    """An :class:`.AtomGroup` whose coordinates, data arrays and bonds are
+    placed in a shared memory block, so that only the remaining attributes
+    are pickled when it is sent to another process.  The receiving process
+    calls :meth:`unpack` once, which copies arrays and releases the
+    block.  The block is named *name*, so that the receiving process can
+    release it also when the atom group does not reach it."""
+
+    def __init__(self, atoms, name):
+
+        from multiprocessing import shared_memory, resource_tracker
+
+        state = atoms.__getstate__()
+        state['_data'] = data = dict(state['_data'])
+        arrays = []
+        for slot in ('_coords', '_bonds'):
+            if state[slot] is not None:
+                arrays.append((slot, None, state[slot]))
+                state[slot] = None
+        for key, array in list(data.items()):
+            if array is not None and array.dtype != object:
+                arrays.append(('_data', key, array))
+                data[key] = None
+
+        self._state = state
+        self._name = None
+        self._arrays = []
+
+        size = 0
+        for slot, key, array in arrays:
+            offset = (size + 15) // 16 * 16
+            self._arrays.append((slot, key, array.dtype.str, array.shape,
+                                 offset))
+            size = offset + array.nbytes
+
+        shm = shared_memory.SharedMemory(name, create=True,
+                                         size=max(size, 1))
+        for (slot, key, dtype, shape, offset), (_, _, array) in zip(
+                self._arrays, arrays):
+            np.ndarray(shape, dtype, shm.buf, offset)[...] = array
+        self._name = shm.name
+        shm.close()
+        # the block is unlinked by the receiving process, or by
+        # parseStructures when it is not received
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+    def unpack(self):
+        """Returns the atom group."""
+
+        atoms = AtomGroup.__new__(AtomGroup)
+        atoms.__setstate__(self._state)
+        if self._name is None:
+            return atoms
+
+        from multiprocessing import shared_memory
+
+        shm = shared_memory.SharedMemory(name=self._name)
+        try:
+            for slot, key, dtype, shape, offset in self._arrays:
+                array = np.ndarray(shape, dtype, shm.buf, offset).copy()
+                if key is None:
+                    setattr(atoms, slot, array)
+                else:
+                    atoms._data[key] = array
+        finally:
+            shm.close()
+            shm.unlink()
+        self._name = None
+        return atoms
+
+    def release(self):
+        """Release the shared memory block without unpacking."""
+
+        if self._name is not None:
+            _unlinkShared(self._name, False)
+            self._name = None
+
+
 def _getPDBid(pdb):
     l = len(pdb)
     if l == 4:
@@ -226,11 +525,15 @@ def _parsePDB(pdb, **kwargs):
         if len(title) == 7 and title.startswith('pdb'):
             title = title[3:]
         kwargs['title'] = title
-    pdb = openFile(pdb, 'rt')
     if chain != '':
         kwargs['chain'] = chain
-    result = parsePDBStream(pdb, **kwargs)
-    pdb.close()
+    result = _loadCached(pdb, kwargs)
+    if result is not None:
+        return result
+    stream = openFile(pdb, 'rt')
+    result = parsePDBStream(stream, **kwargs)
+    stream.close()
+    _saveCached(pdb, kwargs, result)
     return result
 
 parsePDB.__doc__ += _parsePDBdoc
@@ -343,6 +646,10 @@ def parsePDBStream(stream, **kwargs):
     if packmol:
         ag = packmolRenumChains(ag)
 
+    if (header or model == 0) and isinstance(hd, _PDBHeader) and \
+            not kwargs.get('lazy', False):
+        hd = hd._getDict()
+
     if model != 0:
         if header:
             return ag, hd
@@ -421,6 +728,10 @@ def _parsePDBLines(atomgroup, lines, split, model, chain, subset,
     format = format.upper()
     if format == 'PDB':
         isPDB = True
+        ag = _parsePDBColumns(atomgroup, lines, split, model, chain, subset,
+                              altloc_torf, bonds)
+        if ag is not None:
+            return ag
     else:
         isPDB = False
 
@@ -677,21 +988,7 @@ def _parsePDBLines(atomgroup, lines, split, model, chain, subset,
                         np.zeros(asize, ATOMIC_FIELDS['radius'].dtype)))
         elif startswith == 'CONECT':
             if bonds is not None:
-                atom_serial = line[6:11]
-                bonded1_serial = line[11:16]
-                bonds.append([int(atom_serial), int(bonded1_serial)])
-                
-                bonded2_serial = line[16:21]
-                if len(bonded2_serial.strip()):
-                    bonds.append([int(atom_serial), int(bonded2_serial)])
-
-                bonded3_serial = line[21:26]
-                if len(bonded3_serial.strip()):
-                    bonds.append([int(atom_serial), int(bonded3_serial)])
-                    
-                bonded4_serial = line[27:31]
-                if len(bonded4_serial.strip()):
-                    bonds.append([int(atom_serial), int(bonded4_serial)])
+                _parseCONECT(line, bonds)
 
         elif not onlycoords and (startswith == 'TER   ' or
             startswith.strip() == 'TER'):
@@ -896,6 +1193,316 @@ def _parsePDBLines(atomgroup, lines, split, model, chain, subset,
 
     return atomgroup
 
+def _parseCONECT(line, bonds):
+    """Append pairs of serial numbers of bonded atoms in a CONECT *line* to
+    *bonds*."""
+
+    atom_serial = line[6:11]
+    bonded1_serial = line[11:16]
+    bonds.append([int(atom_serial), int(bonded1_serial)])
+
+    bonded2_serial = line[16:21]
+    if len(bonded2_serial.strip()):
+        bonds.append([int(atom_serial), int(bonded2_serial)])
+
+    bonded3_serial = line[21:26]
+    if len(bonded3_serial.strip()):
+        bonds.append([int(atom_serial), int(bonded3_serial)])
+
+    bonded4_serial = line[27:31]
+    if len(bonded4_serial.strip()):
+        bonds.append([int(atom_serial), int(bonded4_serial)])
+
+
+def _parseFloats(values, numbers, label):
+    """Returns float array parsed from fixed column *values*, zero is used for
+    values that cannot be parsed and a warning is logged with line number."""
+
+    try:
+        return values.astype(float)
+    except ValueError:
+        floats = np.zeros(len(values))
+        for i, (value, number) in enumerate(zip(values, numbers)):
+            try:
+                floats[i] = value
+            except ValueError:
+                LOGGER.warn('failed to parse {0} at line {1}'
+                            .format(label, number))
+        return floats
+
+
+def _parseSerials(values, numbers):
+    """Returns serial numbers parsed from fixed column *values*, allowing for
+    hexadecimal numbers."""
+
+    try:
+        return values.astype(ATOMIC_FIELDS['serial'].dtype)
+    except ValueError:
+        serials = np.zeros(len(values), ATOMIC_FIELDS['serial'].dtype)
+        for i, (value, number) in enumerate(zip(values, numbers)):
+            try:
+                serials[i] = int(value)
+            except ValueError:
+                try:
+                    serials[i] = int(value, 16)
+                except ValueError:
+                    LOGGER.warn('failed to parse serial number in line {0}'
+                                .format(number))
+                    serials[i] = serials[i-1] + 1
+        return serials
+
+
+def _getHeads(lines):
+    """Returns first six characters of *lines* as rows of a byte matrix, or
+    **None** if *lines* are empty.  Line ends and positions after the end of
+    short lines are filled with spaces."""
+
+    lengths = np.fromiter(map(len, lines), int, len(lines))
+    try:
+        text = ''.join(lines).encode('ascii', 'replace')
+    except UnicodeError:
+        return None
+    if not len(text):
+        return None
+    text = np.frombuffer(text, np.uint8)
+    index = (np.cumsum(lengths) - lengths)[:, None] + np.arange(6)
+    heads = text[np.minimum(index, len(text) - 1)]
+    heads[np.arange(6) >= lengths[:, None]] = 32
+    heads[(heads == 10) | (heads == 13)] = 32
+    return heads
+
+
+def _getColumn(mat, first, last):
+    """Returns fixed column *first* to *last* of byte matrix *mat*."""
+
+    return np.ascontiguousarray(mat[:, first:last]).view(
+        '|S{0}'.format(last - first))[:, 0]
+
+
+def _parsePDBColumns(atomgroup, lines, split, model, chain, subset,
+                     altloc_torf, bonds=None):
+    """Returns an AtomGroup, or **None** when *lines* need to be parsed one
+    at a time by :func:`_parsePDBLines`.  Records of the coordinate section
+    are located in bulk and fields of ATOM/HETATM records are decoded from
+    fixed columns of a byte array.  Lines that are not ASCII or that contain
+    coordinates, residue numbers, or anisotropic temperature factors that
+    cannot be converted are left to the line parser, which reports them."""
+
+    lines = lines[split:]
+    heads = _getHeads(lines)
+    if heads is None:
+        return None
+    records = _getColumn(heads, 0, 6)
+    start = 0
+    if model is not None and model != 1:
+        models = (_getColumn(heads, 0, 5) == b'MODEL').nonzero()[0]
+        if len(models) < model:
+            raise PDBParseError('model {0} is not found'.format(model))
+        start = models[model - 1] + 1
+
+    is_atom = (records == b'ATOM  ') | (records == b'HETATM')
+    is_atom[:start] = False
+    atom_lines = is_atom.nonzero()[0]
+    if not len(atom_lines):
+        return None
+    try:
+        mat = np.array([lines[i] for i in atom_lines], '|S80')
+    except UnicodeError:
+        return None
+    mat = mat.view(np.uint8).reshape((len(atom_lines), 80))
+    mat[(mat == 10) | (mat == 13)] = 32
+
+    keep = np.ones(len(atom_lines), bool)
+    if subset:
+        if subset == 'ca':
+            subset = ['CA']
+        else:
+            subset = flags.BACKBONE
+        names = np.char.strip(_getColumn(mat, 12, 16))
+        resnames = np.char.strip(_getColumn(mat, 17, 21))
+        keep &= np.in1d(names, np.array(list(subset), '|S'))
+        keep &= np.in1d(resnames, np.array(list(flags.AMINOACIDS), '|S'))
+    if chain is not None:
+        keep &= np.in1d(_getColumn(mat, 21, 22), np.array(list(chain), '|S'))
+
+    if isinstance(altloc_torf, str):
+        if altloc_torf.strip() != 'A':
+            which_altlocs = ' ' + ''.join(altloc_torf.split())
+        else:
+            which_altlocs = ' A'
+        evaluate = False
+    else:
+        which_altlocs = ' A'
+        evaluate = True
+    altlocs = _getColumn(mat, 16, 17)
+    isalt = ~np.in1d(altlocs, np.array(list(which_altlocs), '|S'))
+    alt_lines = atom_lines[keep & isalt]
+    keep &= ~isalt
+
+    kept = keep.nonzero()[0]
+    if not len(kept):
+        return None
+    kept_lines = atom_lines[kept]
+
+    # split atoms into models at END/ENDMDL records following atoms
+    ends = _getColumn(heads, 0, 3) == b'END'
+    ends[:start] = False
+    ends = ends.nonzero()[0]
+    bounds = [0]
+    stops = []
+    for end, count in zip(ends, np.searchsorted(kept_lines, ends)):
+        if count > bounds[-1]:
+            bounds.append(count)
+            stops.append(end)
+            if model is not None:
+                break
+    if bounds[-1] < len(kept) and (model is None or len(bounds) == 1):
+        bounds.append(len(kept))
+        stops.append(len(records))
+
+    n_atoms = bounds[1]
+    if atomgroup.numAtoms() > 0 and atomgroup.numAtoms() != n_atoms:
+        return None
+
+    try:
+        coords = np.ascontiguousarray(mat[kept[:bounds[-1]], 30:54])
+        coords = coords.view('|S8').astype(float)
+        resnums = _getColumn(mat[kept[:n_atoms]], 22, 26)
+        resnums = resnums.astype(ATOMIC_FIELDS['resnum'].dtype)
+    except ValueError:
+        return None
+
+    anisou = siguij = None
+    position = -np.ones(len(atom_lines), int)
+    position[kept[:n_atoms]] = np.arange(n_atoms)
+    for label in (b'ANISOU', b'SIGUIJ'):
+        which = (records == label)
+        which[:start] = False
+        which[stops[0]:] = False
+        which = which.nonzero()[0]
+        if not len(which):
+            continue
+        try:
+            values = np.array([lines[i] for i in which], '|S80')
+            values = values.view(np.uint8).reshape((len(which), 80))
+            values = np.array([_getColumn(values, first, last).astype(float)
+                               for first, last in ANISOU_COLUMNS]).T
+        except (UnicodeError, ValueError):
+            return None
+        # assign values to the atom record immediately preceding them
+        index = position[np.searchsorted(atom_lines, which) - 1]
+        torf = index >= 0
+        array = np.zeros((n_atoms, 6), ATOMIC_FIELDS['anisou'].dtype)
+        array[index[torf]] = values[torf]
+        if label == b'ANISOU':
+            anisou = array
+        else:
+            siguij = array
+
+    rows = kept[:n_atoms]
+    first = mat[rows]
+    numbers = kept_lines[:n_atoms] + split
+    serials = _parseSerials(_getColumn(first, 6, 11), numbers)
+    occupancies = _parseFloats(_getColumn(first, 54, 60), numbers, 'occupancy')
+    bfactors = _parseFloats(_getColumn(first, 60, 66), numbers, 'beta-factor')
+
+    charges = np.zeros(n_atoms, ATOMIC_FIELDS['charge'].dtype)
+    signed = first[:, 79] != 0
+    if signed.any():
+        values = np.char.add(_getColumn(first, 79, 80),
+                             _getColumn(first, 78, 79))[signed]
+        values, inverse = np.unique(values, return_inverse=True)
+        table = np.zeros(len(values), ATOMIC_FIELDS['charge'].dtype)
+        for i, value in enumerate(values):
+            try:
+                table[i] = int(value)
+            except ValueError:
+                pass
+        charges[signed] = table[inverse]
+
+    termini = np.zeros(n_atoms, bool)
+    ters = (records == b'TER   ')
+    ters[:start] = False
+    ters[stops[0]:] = False
+    ters = np.searchsorted(kept_lines, ters.nonzero()[0]) - 1
+    termini[ters[ters >= 0]] = True
+
+    if which_altlocs != ' A':
+        LOGGER.info('Parsing alternate locations {0}.'.format(altloc_torf))
+
+    coordsets = [coords[:n_atoms]]
+    for i in range(1, len(bounds) - 1):
+        size = bounds[i+1] - bounds[i]
+        if size == n_atoms:
+            coordsets.append(coords[bounds[i]:bounds[i+1]])
+        elif size < n_atoms:
+            LOGGER.warn('Discarding model {0}, which contains {1} fewer '
+                        'atoms than the first model does.'
+                        .format(i + 1, n_atoms - size))
+        else:
+            LOGGER.warn('Discarding model {0}, which contains {1} more '
+                        'atoms than first model does.'
+                        .format(i + 1, size - n_atoms))
+    if len(coordsets) == 1:
+        coordsets = coordsets[0]
+    else:
+        coordsets = np.array(coordsets)
+    if atomgroup.numCoordsets() > 0:
+        atomgroup.addCoordset(coordsets)
+    else:
+        atomgroup._setCoords(coordsets)
+
+    atomnames = np.char.strip(_getColumn(first, 12, 16))
+    atomnames = atomnames.astype(ATOMIC_FIELDS['name'].dtype)
+    resnames = np.char.strip(_getColumn(first, 17, 21))
+    resnames = resnames.astype(ATOMIC_FIELDS['resname'].dtype)
+    chainids = _getColumn(first, 21, 22).astype(ATOMIC_FIELDS['chain'].dtype)
+    atomgroup.setNames(atomnames)
+    atomgroup.setResnames(resnames)
+    atomgroup.setResnums(resnums)
+    atomgroup.setChids(chainids)
+    atomgroup.setFlags('hetatm', records[kept_lines[:n_atoms]] == b'HETATM')
+    atomgroup.setFlags('pdbter', termini)
+    atomgroup.setAltlocs(altlocs[rows].astype(ATOMIC_FIELDS['altloc'].dtype))
+    atomgroup.setIcodes(np.char.strip(_getColumn(first, 26, 27))
+                        .astype(ATOMIC_FIELDS['icode'].dtype))
+    atomgroup.setSerials(serials)
+    atomgroup.setBetas(bfactors)
+    atomgroup.setOccupancies(occupancies)
+    atomgroup.setSegnames(np.char.strip(_getColumn(first, 72, 76))
+                          .astype(ATOMIC_FIELDS['segment'].dtype))
+    elements = np.char.strip(_getColumn(first, 76, 78))
+    elements = elements.astype(ATOMIC_FIELDS['element'].dtype)
+    atomgroup.setElements(elements)
+    from prody.utilities.misctools import getMasses
+    elements, inverse = np.unique(elements, return_inverse=True)
+    atomgroup.setMasses(getMasses(elements)[inverse])
+    if anisou is not None:
+        atomgroup.setAnisous(anisou / 10000)
+    if siguij is not None:
+        atomgroup.setAnistds(siguij / 10000)
+    atomgroup.setCharges(charges)
+
+    if bonds is not None:
+        for i in (records[start:] == b'CONECT').nonzero()[0]:
+            _parseCONECT(lines[start + i], bonds)
+
+    if evaluate and len(alt_lines):
+        # altloc lines of later models are evaluated together, as they are
+        # by the line parser
+        first = alt_lines < stops[0]
+        for torf in (first, ~first):
+            altloc = defaultdict(list)
+            for i in alt_lines[torf]:
+                line = lines[i]
+                altloc[line[16]].append((line, split + i))
+            if altloc:
+                _evalAltlocs(atomgroup, altloc, chainids, resnums,
+                             resnames, atomnames)
+
+    return atomgroup
+
+
 def _evalAltlocs(atomgroup, altloc, chainids, resnums, resnames, atomnames):
     altloc_keys = list(altloc)
     altloc_keys.sort()
@@ -1069,6 +1676,117 @@ def parseChainsList(filename):
 
     return ags, headers, chains
 
+def _formatFixed(values, width, precision):
+    """Returns an array of bytes with *width* columns that holds *values*
+    formatted as ``'%{width}.{precision}f'``, without a decimal point for
+    zero *precision*.  **None** is returned if some values do not fit."""
+
+    values = np.asarray(values, dtype=float).ravel()
+    n_values = len(values)
+    if not np.isfinite(values).all():
+        return None
+
+    scale = 10 ** precision
+    scaled = np.abs(values) * scale
+    rounded = np.rint(scaled)
+    if n_values and rounded.max() >= 1e15:
+        return None
+    numbers = rounded.astype(np.int64)
+    negative = np.signbit(values)
+
+    n_int = width - precision - (1 if precision else 0)
+    integers = numbers // scale
+    n_digits = np.ones(n_values, int)
+    for k in range(1, n_int + 1):
+        n_digits += integers >= 10 ** k
+    if (n_digits + negative > n_int).any():
+        return None
+
+    out = np.empty((n_values, width), np.uint8)
+    fractions = numbers % scale
+    for k in range(precision):
+        out[:, width - 1 - k] = 48 + fractions // 10 ** k % 10
+    if precision:
+        out[:, n_int] = 46
+    for k in range(n_int):
+        out[:, n_int - 1 - k] = np.where(n_digits > k,
+                                         48 + integers // 10 ** k % 10,
+                                         np.where(negative & (n_digits == k),
+                                                  45, 32))
+
+    # values that are about half way between two roundings are left to
+    # Python, so that output is identical to that of string formatting
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        fmt = '%{0}.{1}f'.format(width, precision)
+        for i in ties.nonzero()[0]:
+            text = fmt % values[i]
+            if len(text) != width:
+                return None
+            out[i] = np.frombuffer(text.encode('ascii'), np.uint8)
+    return out
+
+
+def _formatStrings(values, width, right=False):
+    """Returns an array of bytes with *width* columns that holds ASCII
+    *values* justified to the left or to the *right*.  **None** is returned
+    if some values do not fit."""
+
+    values = np.ascontiguousarray(values)
+    n_values = len(values)
+    if values.dtype.char == 'U':
+        size = values.dtype.itemsize // 4
+        codes = values.view(np.uint32)
+    elif values.dtype.char == 'S':
+        size = values.dtype.itemsize
+        codes = values.view(np.uint8)
+    else:
+        return None
+
+    out = np.zeros((n_values, width), np.uint8)
+    if size:
+        codes = codes.reshape(n_values, size)
+        if size > width:
+            if codes[:, width:].any():
+                return None
+            codes = codes[:, :width]
+            size = width
+        if (codes > 127).any():
+            return None
+        out[:, :size] = codes
+
+    if right:
+        lengths = (out != 0).sum(1)
+        text = out
+        out = np.empty((n_values, width), np.uint8)
+        out.fill(32)
+        rows = np.arange(n_values)
+        for k in range(width):
+            torf = lengths > k
+            out[rows[torf], (width - lengths + k)[torf]] = text[torf, k]
+    else:
+        out[out == 0] = 32
+    return out
+
+
+def _getRecords(length, columns):
+    """Returns an array of bytes with a row of *length* characters that ends
+    with a newline for each atom, filled with *columns* that is a list of
+    start positions and arrays of bytes.  **None** is returned if some
+    column is **None**."""
+
+    records = None
+    for start, column in columns:
+        if column is None:
+            return None
+        if records is None:
+            records = np.empty((len(column), length), np.uint8)
+            records.fill(32)
+            records[:, -1] = 10
+        records[:, start:start + column.shape[1]] = column
+    return records
+
+
 def writePDBStream(stream, atoms, csets=None, **kwargs):
     """Write *atoms* in PDB format to a *stream*.
 
@@ -1271,58 +1989,137 @@ def writePDBStream(stream, atoms, csets=None, **kwargs):
         pass
 
     # write atoms
+    pdbter = atoms.getFlags('pdbter')
+    if pdbter is None:
+        terindices = []
+    else:
+        terindices = pdbter.nonzero()[0]
+
+    # atoms starting from ge100k have hexadecimal or hybrid36 serials
+    ge100k = min(n_atoms, MAX_N_ATOM)
+    if len(serials) and serials.max() > MAX_N_ATOM:
+        ge100k = min(ge100k, (serials > MAX_N_ATOM).argmax())
+
+    # records are formatted once, and only coordinates are updated per model
+    if ge100k == n_atoms:
+        serialcolumn = _formatFixed(serials, 5, 0)
+    else:
+        if hybrid36:
+            serials100k = [decToHybrid36(serial)
+                           for serial in serials[ge100k:]]
+        else:
+            serials100k = ['%x' % serial for serial in serials[ge100k:]]
+        serialcolumn = [_formatFixed(serials[:ge100k], 5, 0),
+                        _formatStrings(np.array(serials100k), 5, True)]
+        if serialcolumn[0] is None or serialcolumn[1] is None:
+            serialcolumn = None
+        else:
+            serialcolumn = np.concatenate(serialcolumn)
+
+    columns = [(0, _formatStrings(hetero, 6)),
+               (6, serialcolumn),
+               (12, _formatStrings(atomnames, 4)),
+               (16, _formatStrings(altlocs, 1)),
+               (17, _formatStrings(resnames, 4)),
+               (21, _formatStrings(chainids, 1)),
+               (22, _formatFixed(resnums, 4, 0)),
+               (26, _formatStrings(icodes, 1)),
+               (54, _formatFixed(occupancies, 6, 2)),
+               (60, _formatFixed(bfactors, 6, 2)),
+               (72, _formatStrings(segments, 4, True)),
+               (76, _formatStrings(elements, 2, True)),
+               (78, _formatStrings(charges2, 2, True))]
+    records = _getRecords(81, columns)
+
+    if records is not None and anisous is not None:
+        anisoucolumn = _formatFixed(anisous, 7, 0)
+        if anisoucolumn is None:
+            records = None
+        else:
+            anisourecords = records.copy()
+            anisourecords[:, :6] = np.frombuffer(b'ANISOU', np.uint8)
+            anisourecords[:, 27:72] = 32
+            anisourecords[:, 28:70] = anisoucolumn.reshape((n_atoms, 42))
+            records = np.concatenate([records, anisourecords], 1)
+
     multi = len(coordsets) > 1
     write = stream.write
     for m, coords in enumerate(coordsets):
-        using_hybrid36 = False
-        reached_max_n_atom = False
-        pdbline = PDBLINE_LT100K
-        anisouline = ANISOULINE_LT100K
-        if multi:
-            write('MODEL{0:9d}\n'.format(m+1))
-        for i, xyz in enumerate(coords):
-            if not reached_max_n_atom and (i == MAX_N_ATOM or serials[i] > MAX_N_ATOM):
-                reached_max_n_atom = True
-                if not hybrid36:
-                    pdbline = PDBLINE_GE100K
-                    anisouline = ANISOULINE_GE100K
-                    LOGGER.warn('Indices are exceeding 99999 and hexadecimal format is being used')
+        if ge100k < n_atoms:
+            if hybrid36:
+                LOGGER.warn('Indices are exceeding 99999 and hybrid36 format is being used')
+            else:
+                LOGGER.warn('Indices are exceeding 99999 and hexadecimal format is being used')
+
+        xyz = None
+        if records is not None:
+            xyz = _formatFixed(coords, 8, 3)
+
+        if xyz is not None:
+            records[:, 30:54] = xyz.reshape((n_atoms, 24))
+            text = records.tobytes().decode('ascii')
+            if len(terindices):
+                length = records.shape[1]
+                start = 0
+                lines = []
+                for i in terindices:
+                    lines.append(text[start:(i + 1) * length])
+                    lines.append('TER\n')
+                    start = (i + 1) * length
+                lines.append(text[start:])
+                text = ''.join(lines)
+            if multi:
+                text = 'MODEL{0:9d}\n'.format(m+1) + text + 'ENDMDL\n'
+            write(text)
+
+        else:
+            pdbline = PDBLINE_LT100K
+            anisouline = ANISOULINE_LT100K
+            if multi:
+                write('MODEL{0:9d}\n'.format(m+1))
+            for i, xyz in enumerate(coords):
+                if i == ge100k:
+                    if hybrid36:
+                        pdbline = PDBLINE_GE100K_H36
+                        anisouline = ANISOULINE_GE100K_H36
+                    else:
+                        pdbline = PDBLINE_GE100K
+                        anisouline = ANISOULINE_GE100K
+
+                if i >= ge100k and hybrid36:
+                    serial = decToHybrid36(serials[i])
                 else:
-                    pdbline = PDBLINE_GE100K_H36
-                    anisouline = ANISOULINE_GE100K_H36
-                    LOGGER.warn('Indices are exceeding 99999 and hybrid36 format is being used')
-                    using_hybrid36 = True
+                    serial = serials[i]
 
-            if using_hybrid36:
-                serial = decToHybrid36(serials[i])
-            else:
-                serial = serials[i]
-
-            write(pdbline % (hetero[i], serial,
-                             atomnames[i], altlocs[i],
-                             resnames[i], chainids[i], resnums[i],
-                             icodes[i],
-                             xyz[0], xyz[1], xyz[2],
-                             occupancies[i], bfactors[i],
-                             segments[i], elements[i], charges2[i]))
-
-            if anisous is not None:
-                anisou = anisous[i]
-
-                write(anisouline % ("ANISOU", serial,
-                                    atomnames[i], altlocs[i],
-                                    resnames[i], chainids[i], resnums[i],
-                                    icodes[i],
-                                    anisou[0], anisou[1], anisou[2],
-                                    anisou[3], anisou[4], anisou[5],
-                                    segments[i], elements[i], charges2[i]))
-
-            if atoms.getFlags('pdbter') is not None and atoms.getFlags('pdbter')[i]:
-                write('TER\n')
+                write(pdbline % (hetero[i], serial,
+                                 atomnames[i], altlocs[i],
+                                 resnames[i], chainids[i], resnums[i],
+                                 icodes[i],
+                                 xyz[0], xyz[1], xyz[2],
+                                 occupancies[i], bfactors[i],
+                                 segments[i], elements[i], charges2[i]))
+
+                if anisous is not None:
+                    anisou = anisous[i]
+
+                    write(anisouline % ("ANISOU", serial,
+                                        atomnames[i], altlocs[i],
+                                        resnames[i], chainids[i], resnums[i],
+                                        icodes[i],
+                                        anisou[0], anisou[1], anisou[2],
+                                        anisou[3], anisou[4], anisou[5],
+                                        segments[i], elements[i], charges2[i]))
+
+                if pdbter is not None and pdbter[i]:
+                    write('TER\n')
+
+            if multi:
+                write('ENDMDL\n')
 
         if multi:
-            write('ENDMDL\n')
             altlocs = np.zeros(n_atoms, s_or_u + '1')
+            if records is not None:
+                records[:, 16::81] = 32
 
 writePDBStream.__doc__ += _writePDBdoc
 
@@ -1395,11 +2192,33 @@ def writePQRStream(stream, atoms, **kwargs):
     if altlocs is None:
         altlocs = np.zeros(n_atoms, s_or_u + '1')
 
+    coords = atoms._getCoords()
+
+    columns = [(0, _formatStrings(hetero, 6)),
+               (7, _formatFixed(np.arange(1, n_atoms + 1), 5, 0)),
+               (13, _formatStrings(atomnames, 4)),
+               (18, _formatStrings(altlocs, 1)),
+               (19, _formatStrings(resnames, 4)),
+               (24, _formatStrings(chainids, 1)),
+               (26, _formatFixed(resnums, 4, 0)),
+               (31, _formatStrings(icodes, 1)),
+               (61, _formatFixed(charges, 8, 4)),
+               (70, _formatFixed(radii, 7, 4))]
+    records = _getRecords(78, columns)
+    if records is not None and coords is not None:
+        xyz = _formatFixed(coords, 8, 3)
+        if xyz is not None:
+            xyz = xyz.reshape((n_atoms, 3, 8))
+            records[:, 35:43] = xyz[:, 0]
+            records[:, 44:52] = xyz[:, 1]
+            records[:, 53:61] = xyz[:, 2]
+            stream.write(records.tobytes().decode('ascii'))
+            return
+
     format = ('{0:6s} {1:5d} {2:4s} {3:1s}' +
               '{4:4s} {5:1s} {6:4d} {7:1s}   ' +
               '{8:8.3f} {9:8.3f} {10:8.3f}' +
               '{11:8.4f} {12:7.4f}\n').format
-    coords = atoms._getCoords()
     write = stream.write
     for i, xyz in enumerate(coords):
         write(format(hetero[i], i+1, atomnames[i], altlocs[i],
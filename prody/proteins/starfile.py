@@ -8,7 +8,12 @@ the Crystallographic Information File (CIF) format used for much of the PDB.
 """
 
 from collections import OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 import os.path
+import re
 from numbers import Integral
 import numpy as np
 import sys
@@ -21,6 +26,265 @@ from .emdfile import parseEMD
 __all__ = ['parseSTAR', 'writeSTAR', 'parseImagesFromSTAR',
            'StarDict', 'StarDataBlock', 'StarLoop', ]
 
+# a quoted value ends at a matching quote that is followed by white space
+STAR_TOKEN = re.compile(r"""'.*?'(?=\s)|".*?"(?=\s)|\S+""")
+
+
+def _splitValues(text):
+    """Returns a list of white space separated values in *text*, with quotes
+    around quoted values removed."""
+
+    if "'" not in text and '"' not in text:
+        return text.split()
+    values = []
+    for line in text.split('\n'):
+        if "'" in line or '"' in line:
+            values.extend(token[1:-1] if len(token) > 1 and
+                          token[0] == token[-1] and token[0] in '\'"'
+                          else token
+                          for token in STAR_TOKEN.findall(line + '\n'))
+        else:
+            values.extend(line.split())
+    return values
+
+
+def _parseLoopLines(lines, fields, shlex=False):
+    """Returns an :class:`~collections.OrderedDict` of rows parsed from loop
+    data *lines* one line at a time, which allows rows to be broken across
+    lines and values to span multiple lines between semi-colons."""
+
+    rows = OrderedDict()
+    numFields = len(fields)
+    dataItemsCounter = 0
+    active_fieldCounter = 0
+    inShortBlock = False
+    inSplitField = False
+    for line in lines:
+        if not inShortBlock and len(split(line, shlex=shlex)) == numFields:
+            # This is the usual case where each entry in the line corresponds to a field
+            rows[dataItemsCounter] = OrderedDict(
+                zip(fields.values(), split(line.strip(), shlex=shlex)))
+            dataItemsCounter += 1
+            continue
+
+        # The data is now being broken across lines.
+        if not inShortBlock:
+            inShortBlock = True
+            rows[dataItemsCounter] = OrderedDict()
+            active_fieldCounter = 0
+            if not line.startswith(';'):
+                # Then we haven't got a split field and can treat fields as normal
+                inSplitField = False
+                for fieldEntry in split(line.strip(), shlex=shlex):
+                    currentField = fields[active_fieldCounter]
+                    rows[dataItemsCounter][currentField] = fieldEntry
+                    active_fieldCounter += 1
+            else:
+                # We have a single field split over many lines
+                inSplitField = True
+                currentField = fields[active_fieldCounter]
+                rows[dataItemsCounter][currentField] = line.strip() + ' '
+        else:
+            if not inSplitField:
+                # check if we are entering one
+                if line.startswith(';'):
+                    inSplitField = True
+                    currentField = fields[active_fieldCounter]
+                    rows[dataItemsCounter][currentField] = line.strip() + ' '
+                else:
+                    # continue as normal
+                    for fieldEntry in split(line.strip(), shlex=shlex):
+                        currentField = fields[active_fieldCounter]
+                        rows[dataItemsCounter][currentField] = fieldEntry
+                        active_fieldCounter += 1
+            else:
+                rows[dataItemsCounter][currentField] += line.strip()
+                if line.strip() == ';':
+                    # This marks the end of the split field
+                    inSplitField = False
+                    active_fieldCounter += 1
+                else:
+                    # Prepare for the next line
+                    rows[dataItemsCounter][currentField] += ' '
+
+            if active_fieldCounter == numFields:
+                inShortBlock = False
+                dataItemsCounter += 1
+
+    return rows
+
+
+def _findTokens(text):
+    """Returns start and end offsets of white space separated values in
+    *text*, and the number of values in each line."""
+
+    try:
+        codes = np.frombuffer(text.encode('ascii'), np.uint8)
+    except UnicodeEncodeError:
+        codes = np.frombuffer(text.encode('utf-32-le'), np.uint32)
+    space = codes <= 32
+    edges = np.flatnonzero(space[1:] != space[:-1]) + 1
+    if len(codes) and not space[0]:
+        edges = np.concatenate([[0], edges])
+    if len(codes) and not space[-1]:
+        edges = np.concatenate([edges, [len(codes)]])
+    starts = edges[::2]
+    ends = edges[1::2]
+    newlines = np.flatnonzero(codes == 10)
+    counts = np.diff(np.concatenate([[0], np.searchsorted(starts, newlines),
+                                     [len(starts)]]))
+    return starts, ends, counts
+
+
+class _StarLoopData(Mapping):
+    """Mapping of row numbers to rows of a STAR loop, each row being an
+    :class:`~collections.OrderedDict` of field names and values.
+
+    :func:`parseSTARLines` only records which lines hold the data of a
+    loop, and copies them into a single string when parsing is complete.
+    When the loop is first accessed, offsets of values in the string are
+    found, and if every line has a value for each field, rows and columns
+    are built from the offsets on demand.  Columns are kept as NumPy
+    arrays of strings.  Loops with rows broken across lines or with
+    multi-line values are parsed row by row instead."""
+
+    def __init__(self, fields, lines, shlex=False):
+
+        self._fields = fields
+        self._lines = lines
+        self._shlex = shlex
+        self._ranges = []
+        self._text = None
+        self._starts = None
+        self._ends = None
+        self._columns = None
+        self._numRows = 0
+        self._rows = None
+
+    def _addLine(self, index):
+        """Add the line with *index* to loop data."""
+
+        if self._ranges and self._ranges[-1][1] == index:
+            self._ranges[-1][1] += 1
+        else:
+            self._ranges.append([index, index + 1])
+
+    def _store(self):
+        """Copy recorded lines into a single string, so that the list of all
+        lines is not kept."""
+
+        if self._lines is None:
+            return
+        # lines may keep their line endings, which leaves blank lines
+        self._text = '\n'.join('\n'.join(self._lines[start:stop])
+                               for start, stop in self._ranges)
+        self._lines = None
+        self._ranges = None
+
+    def _parse(self):
+
+        if self._columns is not None or self._rows is not None:
+            return
+
+        self._store()
+        text = self._text
+        numFields = len(self._fields)
+        if not text:
+            self._text = None
+            self._columns = dict((i, np.array([], dtype=str))
+                                 for i in range(numFields))
+            return
+
+        if numFields and not (text.startswith(';') or '\n;' in text):
+            if self._shlex and ("'" in text or '"' in text):
+                values = [_splitValues(line) for line in text.split('\n')
+                          if line.strip()]
+                if all(len(items) == numFields for items in values):
+                    self._text = None
+                    self._columns = dict(enumerate(
+                        np.array(column) for column in zip(*values)))
+                    self._numRows = len(values)
+                    return
+            else:
+                starts, ends, counts = _findTokens(text)
+                counts = counts[counts > 0]
+                if (counts == numFields).all():
+                    self._starts = starts.reshape((len(counts), numFields))
+                    self._ends = ends.reshape((len(counts), numFields))
+                    self._columns = {}
+                    self._numRows = len(counts)
+                    return
+
+        self._text = None
+        self._rows = _parseLoopLines([line for line in text.split('\n')
+                                      if line.strip()],
+                                     self._fields, self._shlex)
+
+    def __len__(self):
+
+        self._parse()
+        if self._rows is not None:
+            return len(self._rows)
+        return self._numRows
+
+    def __iter__(self):
+
+        self._parse()
+        if self._rows is not None:
+            return iter(self._rows)
+        return iter(range(self._numRows))
+
+    def __getitem__(self, index):
+
+        self._parse()
+        if self._rows is not None:
+            return self._rows[index]
+        if (not isinstance(index, Integral) or index < 0 or
+            index >= self._numRows):
+            raise KeyError(index)
+        if self._starts is None:
+            values = [str(self._columns[i][index])
+                      for i in range(len(self._fields))]
+        else:
+            text = self._text
+            values = [text[start:end] for start, end in
+                      zip(self._starts[index].tolist(),
+                          self._ends[index].tolist())]
+        return OrderedDict(zip(self._fields.values(), values))
+
+    def isColumnar(self):
+        """Returns **True** if values are stored in columns."""
+
+        self._parse()
+        return self._columns is not None
+
+    def _getValues(self, field):
+        """Returns a list of values of *field* in all rows."""
+
+        self._parse()
+        if self._rows is not None:
+            return [row[field] for row in self._rows.values()]
+        return self.getColumn(field).tolist()
+
+    def getColumn(self, field):
+        """Returns values of *field* in all rows as an array of strings."""
+
+        self._parse()
+        if self._rows is not None:
+            return np.array(self._getValues(field))
+        for i, name in enumerate(self._fields.values()):
+            if name == field:
+                break
+        else:
+            raise KeyError(field)
+        if i not in self._columns:
+            text = self._text
+            self._columns[i] = np.array(
+                [text[start:end] for start, end in
+                 zip(self._starts[:, i].tolist(), self._ends[:, i].tolist())],
+                dtype=str)
+        return self._columns[i]
+
 
 class StarDict:
     def __init__(self, parsingDict, prog, title='unnamed', indices=None):
@@ -366,13 +630,27 @@ class StarLoop:
 
         self._prog = dataBlock._prog
         self.fields = list(self._dict['fields'].values())
-        self.data = list(self._dict['data'].values())
+        self._data = None
         self.numFields = len(self.fields)
-        self.numRows = len(self.data)
         self._title = dataBlock._title + ' loop ' + str(key)
 
+    @property
+    def data(self):
+        """List of rows, which is built when first accessed."""
+
+        if self._data is None:
+            self._data = list(self._dict['data'].values())
+        return self._data
+
+    @property
+    def numRows(self):
+        return len(self._dict['data'])
+
     def getData(self, key):
         if key in self.fields:
+            rows = self._dict['data']
+            if isinstance(rows, _StarLoopData):
+                return rows._getValues(key)
             return [row[key] for row in self.data]
         else:
             raise ValueError('That field is not present in this loop')
@@ -388,6 +666,10 @@ class StarLoop:
 
     def __getitem__(self, key):
         try:
+            rows = self._dict['data']
+            if isinstance(key, Integral) and isinstance(rows, _StarLoopData):
+                # get a single row without building the others
+                return rows[key + len(rows) if key < 0 else key]
             return np.array(self.data)[key]
         except:
             try:
@@ -416,7 +698,19 @@ class StarLoop:
 
     def search(self, substr, return_indices=False):
         indices = []
-        for j, row in self._dict['data'].items():
+        rows = self._dict['data']
+        if isinstance(rows, _StarLoopData) and rows.isColumnar():
+            # search columns rather than rows
+            if any(field.find(substr) != -1 for field in self.fields):
+                indices = list(rows)
+            elif len(rows):
+                found = np.zeros(len(rows), dtype=bool)
+                for field in self.fields:
+                    found |= np.char.find(rows.getColumn(field), substr) != -1
+                indices = found.nonzero()[0].tolist()
+            rows = {}
+
+        for j, row in rows.items():
             found_it = False
             for entry in row.items():
                 field, value = entry
@@ -496,15 +790,14 @@ def parseSTARLines(lines, **kwargs):
     shlex = kwargs.get('shlex', False)
 
     finalDictionary = OrderedDict()
+    loops = []
     currentLoop = -1
     block_fieldCounter = 0
     loop_fieldCounter = 0
-    active_fieldCounter = 0
-    dataItemsCounter = 0
     lineNumber = 0
     inLoop = False
     inShortBlock = False
-    for line in lines[start:stop]:
+    for index, line in enumerate(lines[start:stop], start):
         if line.startswith('data_'):
             currentDataBlock = line[5:].strip()
             finalDictionary[currentDataBlock] = OrderedDict()
@@ -518,9 +811,12 @@ def parseSTARLines(lines, **kwargs):
             currentLoop += 1
             inLoop = True
             inShortBlock = False
+            loopFields = OrderedDict()
+            loopData = _StarLoopData(loopFields, lines, shlex)
+            loops.append(loopData)
             finalDictionary[currentDataBlock][currentLoop] = OrderedDict()
-            finalDictionary[currentDataBlock][currentLoop]['fields'] = OrderedDict()
-            finalDictionary[currentDataBlock][currentLoop]['data'] = OrderedDict()
+            finalDictionary[currentDataBlock][currentLoop]['fields'] = loopFields
+            finalDictionary[currentDataBlock][currentLoop]['data'] = loopData
             loop_fieldCounter = 0
 
         elif line.startswith('_') or line.startswith(' _'):
@@ -532,8 +828,7 @@ def parseSTARLines(lines, **kwargs):
 
                 if len(split(line.strip(), shlex=shlex)) == 1:
                     # This is what we expect for a data loop
-                    finalDictionary[currentDataBlock][currentLoop]['fields'][loop_fieldCounter] = currentField
-                    dataItemsCounter = 0
+                    loopFields[loop_fieldCounter] = currentField
                     loop_fieldCounter += 1
 
                 else:
@@ -579,61 +874,10 @@ def parseSTARLines(lines, **kwargs):
             pass
 
         elif inLoop:
-            # Here we handle the data part of the loop.
-            # Data outside a loop is handled in line with the fields above or in shortDataBlocks below.
-            if not inShortBlock and len(split(line, shlex=shlex)) == loop_fieldCounter:
-                # This is the usual case where each entry in the line corresponds to a field
-                finalDictionary[currentDataBlock][currentLoop]['data'][dataItemsCounter] = OrderedDict()
-                active_fieldCounter = 0
-                for fieldEntry in split(line.strip(), shlex=shlex):
-                    currentField = finalDictionary[currentDataBlock][currentLoop]['fields'][active_fieldCounter]
-                    finalDictionary[currentDataBlock][currentLoop]['data'][dataItemsCounter][currentField] = fieldEntry
-                    active_fieldCounter += 1
-                dataItemsCounter += 1
-            else:
-                # The data is now being broken across lines.
-                if not inShortBlock:
-                    inShortBlock = True
-                    finalDictionary[currentDataBlock][currentLoop]['data'][dataItemsCounter] = OrderedDict()
-                    active_fieldCounter = 0
-                    if not line.startswith(';'):
-                        # Then we haven't got a split field and can treat fields as normal
-                        inSplitField = False
-                        for fieldEntry in split(line.strip(), shlex=shlex):
-                            currentField = finalDictionary[currentDataBlock][currentLoop]['fields'][active_fieldCounter]
-                            finalDictionary[currentDataBlock][currentLoop]['data'][dataItemsCounter][currentField] = fieldEntry
-                            active_fieldCounter += 1
-                    else:
-                        # We have a single field split over many lines
-                        inSplitField = True
-                        currentField = finalDictionary[currentDataBlock][currentLoop]['fields'][active_fieldCounter]
-                        finalDictionary[currentDataBlock][currentLoop]['data'][dataItemsCounter][currentField] = line.strip() + ' '
-                else:
-                    if not inSplitField:
-                        # check if we are entering one
-                        if line.startswith(';'):
-                            inSplitField = True
-                            currentField = finalDictionary[currentDataBlock][currentLoop]['fields'][active_fieldCounter]
-                            finalDictionary[currentDataBlock][currentLoop]['data'][dataItemsCounter][currentField] = line.strip() + ' '
-                        else:
-                            # continue as normal
-                            for fieldEntry in split(line.strip(), shlex=shlex):
-                                currentField = finalDictionary[currentDataBlock][currentLoop]['fields'][active_fieldCounter]
-                                finalDictionary[currentDataBlock][currentLoop]['data'][dataItemsCounter][currentField] = fieldEntry
-                                active_fieldCounter += 1
-                    else:
-                        finalDictionary[currentDataBlock][currentLoop]['data'][dataItemsCounter][currentField] += line.strip()
-                        if line.strip() == ';':
-                            # This marks the end of the split field
-                            inSplitField = False
-                            active_fieldCounter += 1
-                        else:
-                            # Prepare for the next line
-                            finalDictionary[currentDataBlock][currentLoop]['data'][dataItemsCounter][currentField] += ' '
-
-                    if active_fieldCounter == loop_fieldCounter:
-                        inShortBlock = False
-                        dataItemsCounter += 1
+            # Loop data lines are only recorded here, and they are split into
+            # values when the loop is first accessed, see _parseLoopLines for
+            # rows broken across lines.
+            loopData._addLine(index)
 
         elif inShortBlock:
             # We can now append the data in the lines here.
@@ -664,6 +908,8 @@ def parseSTARLines(lines, **kwargs):
 
         lineNumber += 1
 
+    for loopData in loops:
+        loopData._store()
     return finalDictionary, prog
 
 
@@ -690,9 +936,10 @@ def writeSTAR(filename, starDict):
             for fieldNumber in starDict[dataBlockKey][loopNumber]['fields']:
                 star.write('_' + starDict[dataBlockKey][loopNumber]['fields'][fieldNumber] + '\n')
             for dataItemNumber in starDict[dataBlockKey][loopNumber]['data']:
+                dataItem = starDict[dataBlockKey][loopNumber]['data'][dataItemNumber]
                 for fieldNumber in starDict[dataBlockKey][loopNumber]['fields']:
                     currentField = starDict[dataBlockKey][loopNumber]['fields'][fieldNumber]
-                    star.write(starDict[dataBlockKey][loopNumber]['data'][dataItemNumber][currentField] + ' ')
+                    star.write(dataItem[currentField] + ' ')
                 star.write('\n')
 
     star.close()
@@ -929,16 +1176,35 @@ def parseImagesFromSTAR(particlesSTAR, **kwargs):
         raise ValueError(
             'selection does not contain any rows with image fields')
 
-    # Use indices to collect particle data dictionaries
+    if particlesSTAR._prog == 'XMIPP':
+        imageFieldKey = '_image'
+        rotationFieldKeys = ['_anglePsi', '_shiftX', '_shiftY']
+    else:
+        imageFieldKey = '_rlnImageName'
+        rotationFieldKeys = ['_rlnAnglePsi', '_rlnOriginX', '_rlnOriginY']
+
+    fieldKeys = [imageFieldKey]
+    if rotateImages:
+        fieldKeys.extend(rotationFieldKeys)
+
+    # Use indices to collect particle data dictionaries,
+    # taking only the needed columns from each loop
     particles = []
+    columns = {}
 
     for i, index_i in enumerate(indices):
         for j, index_j in enumerate(index_i):
             for k, index_k in enumerate(index_j):
                 if not (np.array_equal(index_k, np.array([0, 0, 0]))
                         and not (i == 0 and j == 0 and k == 0)):
-                    particles.append(
-                        particlesSTAR[index_k[0]][index_k[1]][index_k[2]])
+                    n, m, row = [int(index) for index in index_k]
+                    if (n, m) not in columns:
+                        loop = particlesSTAR[n][m]
+                        columns[n, m] = [(key, loop.getData(key))
+                                         for key in fieldKeys
+                                         if key in loop.fields]
+                    particles.append(OrderedDict((key, column[row])
+                                     for key, column in columns[n, m]))
 
     if particle_indices is None:
         particle_indices = list(range(len(particles)))
@@ -948,10 +1214,6 @@ def parseImagesFromSTAR(particlesSTAR, **kwargs):
     images = []
     parsed_images_data = []
     stk_images = []
-    if particlesSTAR._prog == 'XMIPP':
-        imageFieldKey = '_image'
-    else:
-        imageFieldKey = '_rlnImageName'
 
     for i in particle_indices:
         particle = particles[i]
@@ -1,13 +1,14 @@
 # -*- coding: utf-8 -*-
 """This module defines functions for accessing wwPDB servers."""
 
+import os
 from os import getcwd
 from glob import glob
 from os.path import sep as pathsep
 from os.path import isdir, isfile, join, split, splitext, normpath
 
 from prody import LOGGER, SETTINGS
-from prody.utilities import makePath, gunzip, relpath, copyFile, openURL
+from prody.utilities import makePath, gunzip, relpath, copyFile
 from prody.utilities import sympath, checkIdentifiers
 
 __all__ = ['wwPDBServer', 'fetchPDBviaFTP', 'fetchPDBviaHTTP', 'WWPDB_FTP_SERVERS']
@@ -100,7 +101,16 @@ def fetchPDBviaFTP(*pdb, **kwargs):
     and `PDBML <ftp://ftp.wwpdb.org/pub/emdb/doc/Map-format/current/EMDB_map_format.pdf>`_ 
     files: ``format='cif'`` will fetch an mmCIF file, ``format='emd'`` will fetch an EMD file,
     and ``format='xml'`` will fetch a PDBML file. 
-    If PDBML header file is desired, ``noatom=True`` argument will do the job."""
+    If PDBML header file is desired, ``noatom=True`` argument will do the job.
+
+    Files are downloaded concurrently over *n_threads* (default is 4)
+    connections that are reused for consecutive files.  Downloads that
+    fail due to transient errors, e.g. timeouts, are retried *retries*
+    (default is 3) times.  Interrupted transfers are resumed, also in a
+    later call, since partially downloaded data is kept in a ``.part``
+    file until the download completes.  If *return_status* is **True**,
+    a status string, e.g. ``'downloaded'`` or ``'not found'``, for each
+    identifier is returned as well."""
 
     format = str(kwargs.pop('format', 'pdb')).lower()
     if kwargs.get('check', True):
@@ -173,69 +183,34 @@ def fetchPDBviaFTP(*pdb, **kwargs):
     ftp_name, ftp_host, ftp_path = WWPDB_FTP_SERVERS[wwPDBServer() or 'us']
     LOGGER.debug('Connecting wwPDB FTP server {0}.'.format(ftp_name))
 
-    from ftplib import FTP
+    timeout = kwargs.get('timeout', 60)
     try:
-        ftp = FTP(ftp_host)
+        ftp = _connectFTP(ftp_host, timeout)
     except Exception as error:
         raise type(error)('FTP connection problem, potential reason: '
                           'no internet connectivity')
-    else:
-        success = 0
-        failure = 0
-        filenames = []
-        ftp.login('')
-        for pdb in identifiers:
-            if pdb is None:
-                filenames.append(None)
-                continue
-            data = []
-            ftp_fn = ftp_prefix + pdb + ftp_pdbext
-            try:
-                ftp.cwd(ftp_path)
-                ftp.cwd(ftp_divided)
-                if format == 'emd':
-                    ftp.cwd('EMD-{0}/map'.format(pdb))
-                else:
-                    ftp.cwd(pdb[1:3])
-                ftp.retrbinary('RETR ' + ftp_fn, data.append)
-            except Exception as error:
-                if ftp_fn in ftp.nlst():
-                    LOGGER.warn('{0} download failed ({1}). It is '
-                                'possible that you do not have rights to '
-                                'download .gz files in the current network.'
-                                .format(pdb, str(error)))
-                else:
-                    LOGGER.info('{0} download failed. {1} does not exist '
-                                'on {2}.'.format(ftp_fn, pdb, ftp_host))
-                failure += 1
-                filenames.append(None)
-            else:
-                if len(data):
-                    filename = getPath(pdb)
-
-                    with open(filename, 'w+b') as pdbfile:
-                        write = pdbfile.write
-                        [write(block) for block in data]
-
-                    filename = normpath(relpath(second(filename, pdb)))
-                    LOGGER.debug('{0} downloaded ({1})'
-                                 .format(pdb, sympath(filename)))
-                    success += 1
-                    filenames.append(filename)
-                else:
-                    LOGGER.warn('{0} download failed, reason unknown.'
-                                .format(pdb))
-                    failure += 1
-                    filenames.append(None)
 
-        ftp.quit()
+    def getRemotePath(pdb):
+        if format == 'emd':
+            folder = 'EMD-{0}/map'.format(pdb)
+        else:
+            folder = pdb[1:3]
+        return '/'.join([ftp_path.rstrip('/'), ftp_divided, folder,
+                         ftp_prefix + pdb + ftp_pdbext])
 
-    LOGGER.debug('PDB download via FTP completed ({0} downloaded, '
-                 '{1} failed).'.format(success, failure))
-    if len(identifiers) == 1:
-        return filenames[0]
-    else:
-        return filenames
+    def fetch(item, session):
+        pdb, filename = item
+        path = getRemotePath(pdb)
+        return _retryDownload(pdb, filename, lambda: _downloadFTP(
+            ftp_host, path, filename, session, timeout), failures, **kwargs)
+
+    failures = []
+    items = [(pdb, getPath(pdb)) for pdb in identifiers if pdb is not None]
+    results = _downloadConcurrently(fetch, items,
+                                    kwargs.get('n_threads', 4),
+                                    session={'ftp': ftp})
+    return _collectDownloads(identifiers, results, second, 'FTP',
+                             kwargs.get('return_status', False))
 
 
 def fetchPDBviaHTTP(*pdb, **kwargs):
@@ -244,7 +219,17 @@ def fetchPDBviaHTTP(*pdb, **kwargs):
     is set using :meth:`.pathPDBFolder`, and copied into *folder*, if
     specified by the user.  If no destination folder is specified, files
     will be saved in the current working directory.  If *compressed* is
-    **False**, decompressed files will be copied into *folder*."""
+    **False**, decompressed files will be copied into *folder*.
+
+    Files are downloaded concurrently over *n_threads* (default is 4)
+    keep-alive connections, through the proxy set in :envvar:`http_proxy`
+    or :envvar:`https_proxy`, if any.  Downloads that fail due to transient
+    errors, e.g. timeouts or server errors, are retried *retries* (default
+    is 3) times.  Interrupted transfers are resumed with range requests,
+    also in a later call, since partially downloaded data is kept in a
+    ``.part`` file until the download completes.  If *return_status* is
+    **True**, a status string, e.g. ``'downloaded'`` or ``'not found'``,
+    for each identifier is returned as well."""
 
     if kwargs.get('check', True):
         identifiers = checkIdentifiers(*pdb)
@@ -285,44 +270,387 @@ def fetchPDBviaHTTP(*pdb, **kwargs):
 
 
     getURL = WWPDB_HTTP_URL[wwPDBServer() or 'us']
+    timeout = kwargs.get('timeout', 60)
+
+    def fetch(item, session):
+        pdb, filename = item
+        url = getURL(pdb)
+        return _retryDownload(pdb, filename, lambda: _downloadHTTP(
+            url, filename, session, timeout), failures, **kwargs)
+
+    failures = []
+    items = [(pdb, getPath(pdb)) for pdb in identifiers if pdb is not None]
+    results = _downloadConcurrently(fetch, items, kwargs.get('n_threads', 4))
+    return _collectDownloads(identifiers, results, second, 'HTTP',
+                             kwargs.get('return_status', False))
+
+
+def _downloadConcurrently(fetch, items, n_threads=4, session=None):
+    """Returns results of calling *fetch* for *items* in a pool of
+    *n_threads* threads.  *fetch* is called with an item and a dictionary
+    that is private to the calling thread, where connections can be kept
+    open and reused for the following items.  *session* is the dictionary
+    for the first thread.  Connections left in dictionaries are closed
+    when all items are processed.  Repeated items are fetched once, and
+    the result is returned for each of them."""
+
+    from threading import Thread
+    try:
+        from queue import Queue, Empty
+    except ImportError:
+        from Queue import Queue, Empty
+
+    distinct = {}
+    for item in items:
+        distinct.setdefault(item, len(distinct))
+    n_threads = max(1, min(int(n_threads), len(distinct)))
+    results = [None] * len(distinct)
+    tasks = Queue()
+    for item, i in distinct.items():
+        tasks.put((i, item))
+    sessions = [{} for _ in range(n_threads)]
+    if session is not None:
+        sessions[0] = session
+
+    def work(session):
+        while True:
+            try:
+                i, item = tasks.get_nowait()
+            except Empty:
+                break
+            results[i] = fetch(item, session)
+
+    if n_threads == 1:
+        work(sessions[0])
+    else:
+        threads = [Thread(target=work, args=(session,))
+                   for session in sessions]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    for session in sessions:
+        for conn in session.values():
+            if isinstance(conn, tuple):
+                conn = conn[0]
+            try:
+                if hasattr(conn, 'quit'):
+                    conn.quit()
+                else:
+                    conn.close()
+            except Exception:
+                pass
+    return [results[distinct[item]] for item in items]
+
+
+class _TransientError(IOError):
+
+    """Raised for download failures that are likely to be resolved by trying
+    again, such as interrupted transfers and server errors."""
+
+    pass
+
+
+def _isTransient(err):
+    """Returns **True** if *err* is a transient network error, i.e. a timeout,
+    an interrupted transfer or connection, or an error reported by the
+    server that is worth retrying."""
+
+    import errno
+    import socket
+    from ftplib import error_temp
+    try:
+        from http.client import HTTPException
+    except ImportError:
+        from httplib import HTTPException
+
+    if isinstance(err, (_TransientError, socket.timeout, HTTPException,
+                        error_temp)):
+        return True
+    if isinstance(err, socket.gaierror):
+        return False
+    return getattr(err, 'errno', None) in (errno.ECONNRESET, errno.EPIPE,
+                                           errno.ETIMEDOUT, errno.ECONNABORTED)
+
+
+def _isUnreachable(err):
+    """Returns **True** if *err* shows that the server cannot be reached,
+    i.e. its name cannot be resolved or it refuses connections."""
+
+    import errno
+    import socket
+
+    if isinstance(err, socket.gaierror):
+        return True
+    return getattr(err, 'errno', None) in (errno.ECONNREFUSED,
+                                           errno.EHOSTUNREACH,
+                                           errno.ENETUNREACH)
+
+
+def _retryDownload(pdb, filename, download, failures=None, **kwargs):
+    """Call *download* for *pdb* until it succeeds or fails *retries* times,
+    waiting *backoff* seconds after the first failure and twice as long
+    after each following one.  Returns *filename* (or **None**) and status
+    of the download.  Data received before a failure is kept in a ``.part``
+    file, also after the last attempt, so that the next attempt or a later
+    call resumes the download from where it was interrupted.
+
+    Only transient errors are retried.  Other errors, e.g. when the server
+    cannot be resolved or refuses connections, are appended to *failures*,
+    a list shared by downloads from the same server, and following
+    downloads fail immediately with the same error."""
+
+    from time import sleep
+
+    retries = int(kwargs.get('retries', 3))
+    backoff = float(kwargs.get('backoff', 0.5))
+    status = None
+    for attempt in range(retries + 1):
+        if failures:
+            status = 'failed ({0})'.format(failures[0])
+            break
+        try:
+            found = download()
+        except Exception as err:
+            status = 'failed ({0})'.format(err)
+            LOGGER.debug('{0} download attempt {1} failed ({2}).'
+                         .format(pdb, attempt + 1, err))
+            if not _isTransient(err):
+                if failures is not None and _isUnreachable(err):
+                    failures.append(err)
+                break
+            if attempt < retries:
+                sleep(backoff * 2 ** attempt)
+        else:
+            if not found:
+                return None, 'not found'
+            if not os.path.getsize(filename):
+                os.remove(filename)
+                return None, 'failed (empty file)'
+            return filename, 'downloaded'
+
+    return None, status
+
+
+def _savePartial(read, filename, append):
+    """Write blocks returned by *read* into partial download file, and
+    return the number of bytes written."""
 
-    success = 0
-    failure = 0
+    size = 0
+    with open(filename + '.part', 'ab' if append else 'wb') as out:
+        while True:
+            block = read(65536)
+            if not block:
+                break
+            out.write(block)
+            size += len(block)
+    return size
+
+
+def _completePartial(filename):
+
+    if isfile(filename):
+        os.remove(filename)
+    os.rename(filename + '.part', filename)
+
+
+def _connectHTTP(scheme, netloc, timeout):
+    """Returns a connection to *netloc* for *scheme* (``'http'`` or
+    ``'https'``), headers to send with requests, and whether requests must
+    be made with absolute URLs.  Proxies set in environment variables,
+    e.g. :envvar:`https_proxy`, are used as :func:`urllib.request.urlopen`
+    does."""
+
+    try:
+        from urllib.parse import urlsplit, unquote
+        from urllib.request import getproxies, proxy_bypass
+        from http.client import HTTPConnection, HTTPSConnection
+    except ImportError:
+        from urlparse import urlsplit
+        from urllib import getproxies, proxy_bypass, unquote
+        from httplib import HTTPConnection, HTTPSConnection
+
+    Connection = HTTPSConnection if scheme == 'https' else HTTPConnection
+    proxy = getproxies().get(scheme)
+    if not proxy or proxy_bypass(netloc.rsplit(':', 1)[0]):
+        return Connection(netloc, timeout=timeout), {}, False
+
+    if '://' not in proxy:
+        proxy = 'http://' + proxy
+    parts = urlsplit(proxy)
+    headers = {}
+    if parts.username is not None:
+        from base64 import b64encode
+        credentials = '{0}:{1}'.format(unquote(parts.username),
+                                       unquote(parts.password or ''))
+        headers['Proxy-Authorization'] = 'Basic ' + b64encode(
+            credentials.encode('utf-8')).decode('ascii')
+    address = parts.hostname
+    if parts.port:
+        address += ':{0}'.format(parts.port)
+    if parts.scheme == 'https':
+        conn = HTTPSConnection(address, timeout=timeout)
+    else:
+        conn = HTTPConnection(address, timeout=timeout)
+    if scheme == 'https':
+        conn.set_tunnel(netloc, headers=headers)
+        return conn, {}, False
+    return conn, headers, True
+
+
+def _downloadHTTP(url, filename, session, timeout):
+    """Download *url* into *filename* using a keep-alive connection kept in
+    *session*.  Returns **False** if *url* is not found."""
+
+    try:
+        from urllib.parse import urlsplit, urljoin
+    except ImportError:
+        from urlparse import urlsplit, urljoin
+
+    partial = filename + '.part'
+    for _ in range(5):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        conn = session.get(key)
+        if conn is None:
+            conn = session[key] = _connectHTTP(parts.scheme, parts.netloc,
+                                               timeout)
+        conn, proxy_headers, absolute = conn
+
+        if absolute:
+            path = url.split('#')[0]
+        else:
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+        headers = {'Accept-Encoding': 'identity'}
+        headers.update(proxy_headers)
+        offset = os.path.getsize(partial) if isfile(partial) else 0
+        if offset:
+            headers['Range'] = 'bytes={0}-'.format(offset)
+
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            status = response.status
+            if status in (301, 302, 303, 307, 308):
+                response.read()
+                url = urljoin(url, response.getheader('Location'))
+                continue
+            if status in (200, 206):
+                length = response.getheader('Content-Length')
+                size = _savePartial(response.read, filename, status == 206)
+                if length is not None and size < int(length):
+                    raise _TransientError('connection closed after {0} of '
+                                          '{1} bytes'.format(size, length))
+            else:
+                response.read()
+        except Exception:
+            session.pop(key, None)
+            conn.close()
+            raise
+        if status == 404:
+            return False
+        if status == 416:
+            os.remove(partial)
+        if status not in (200, 206):
+            error = 'HTTP error {0} ({1})'.format(status, response.reason)
+            if status >= 500 or status in (408, 416, 429):
+                raise _TransientError(error)
+            raise IOError(error)
+        if response.will_close:
+            session.pop(key, None)
+            conn.close()
+        _completePartial(filename)
+        return True
+    raise IOError('too many redirects')
+
+
+def _connectFTP(host, timeout):
+    """Returns an FTP connection to *host*, which may include a port number
+    after a colon, logged in anonymously."""
+
+    from ftplib import FTP
+
+    host, _, port = host.partition(':')
+    ftp = FTP(timeout=timeout)
+    ftp.connect(host, int(port or 21))
+    ftp.login('')
+    return ftp
+
+
+def _downloadFTP(host, path, filename, session, timeout):
+    """Download *path* from FTP *host* into *filename* using a connection
+    kept in *session*.  Returns **False** if *path* is not found."""
+
+    from ftplib import error_perm
+
+    ftp = session.get('ftp')
+    if ftp is None:
+        ftp = session['ftp'] = _connectFTP(host, timeout)
+
+    partial = filename + '.part'
+    offset = os.path.getsize(partial) if isfile(partial) else 0
+    try:
+        with open(partial, 'ab' if offset else 'wb') as out:
+            ftp.retrbinary('RETR ' + path, out.write, rest=offset or None)
+    except error_perm as err:
+        if str(err).startswith('550'):
+            if not offset:
+                os.remove(partial)
+            return False
+        raise
+    except Exception:
+        session.pop('ftp', None)
+        ftp.close()
+        raise
+    _completePartial(filename)
+    return True
+
+
+def _collectDownloads(identifiers, results, second, protocol, return_status):
+    """Returns filenames for *identifiers* from download *results*, after
+    calling *second* for downloaded files, and log download status."""
+
+    results = iter(results)
+    collected = {}
     filenames = []
+    statuses = []
+    success = failure = 0
     for pdb in identifiers:
         if pdb is None:
             filenames.append(None)
+            statuses.append(None)
             continue
-        try:
-            handle = openURL(getURL(pdb))
-        except Exception as err:
-            LOGGER.warn('{0} download failed ({1}).'.format(pdb, str(err)))
+        filename, status = next(results)
+        if filename is None:
+            if status == 'not found':
+                LOGGER.info('{0} download failed, it does not exist on '
+                            'the server.'.format(pdb))
+            else:
+                LOGGER.warn('{0} download {1}.'.format(pdb, status))
             failure += 1
-            filenames.append(None)
         else:
-            data = handle.read()
-            if len(data):
-                filename = getPath(pdb)
-
-                with open(filename, 'w+b') as pdbfile:
-                    pdbfile.write(data)
-
-                filename = normpath(relpath(second(filename, pdb)))
-                LOGGER.debug('{0} downloaded ({1})'
-                             .format(pdb, sympath(filename)))
-                success += 1
-                filenames.append(filename)
-            else:
-                LOGGER.warn('{0} download failed, reason unknown.'
-                            .format(pdb))
-                failure += 1
-                filenames.append(None)
-    LOGGER.debug('PDB download via HTTP completed ({0} downloaded, '
-                 '{1} failed).'.format(success, failure))
+            if filename not in collected:
+                collected[filename] = normpath(relpath(second(filename,
+                                                              pdb)))
+            filename = collected[filename]
+            LOGGER.debug('{0} downloaded ({1})'
+                         .format(pdb, sympath(filename)))
+            success += 1
+        filenames.append(filename)
+        statuses.append(status)
+
+    LOGGER.debug('PDB download via {0} completed ({1} downloaded, '
+                 '{2} failed).'.format(protocol, success, failure))
     if len(identifiers) == 1:
-        return filenames[0]
-    else:
-        return filenames
+        filenames = filenames[0]
+        statuses = statuses[0]
+    if return_status:
+        return filenames, statuses
+    return filenames
 
 if __name__ == '__main__':
 
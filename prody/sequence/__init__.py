@@ -5,6 +5,7 @@ Classes
 =======
 
   * :class:`.MSA` - store MSA data indexed by label
+  * :class:`.MSAProfile` - store per-column statistics of an MSA
   * :class:`.Sequence` - store sequence data
 
 
@@ -14,6 +15,9 @@ MSA IO
   * :class:`.MSAFile` - read/write MSA files in FASTA/SELEX/Stockholm formats
   * :func:`.parseMSA` - parse MSA files
   * :func:`.writeMSA` - parse MSA files
+  * :func:`.saveMSA` - save MSA in memory mappable :file:`.npz` format
+  * :func:`.loadMSA` - load MSA saved using :func:`.saveMSA`
+  * :func:`.indexMSA` - index MSA files for parsing selected sequences
 
 Editing
 ========
@@ -38,6 +42,9 @@ Analysis
     matrix
   * :func:`.calcMeff` - calculate sequence weights
   * :func:`.calcRankorder` - rank order scores
+  * :func:`.calcResampledMatrices` - calculate coevolution statistics for
+    resampled MSAs
+  * :func:`.alignPairwise` - align sequences pairwise
 
 
 Plotting
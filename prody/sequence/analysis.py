@@ -8,18 +8,20 @@ import os
 
 from numpy import dtype, zeros, empty, ones, where, ceil, shape, eye
 from numpy import indices, tril_indices, array, ndarray, isscalar, unique
+from numpy import dot, log, bincount, arange, repeat, errstate
+from numpy import exp, sqrt, outer, absolute
 
 from prody import LOGGER
 from prody.utilities import which, MATCH_SCORE, MISMATCH_SCORE
 from prody.utilities import GAP_PENALTY, GAP_EXT_PENALTY, ALIGNMENT_METHOD
 
-from prody.sequence.msa import MSA, refineMSA
+from prody.sequence.msa import MSA, MSA_CODES, AMBIGUOUS, refineMSA
+from prody.sequence.msa import MSAProfile, _countCodes, _allocateAmbiguous
 from prody.sequence.msafile import parseMSA, writeMSA
 from prody.sequence.sequence import Sequence
 from prody.atomic import Atomic
 from prody.measure import calcDistance
 
-from Bio import pairwise2
 import sys
 
 __all__ = ['calcShannonEntropy', 'buildMutinfoMatrix', 'calcMSAOccupancy',
@@ -28,7 +30,7 @@ __all__ = ['calcShannonEntropy', 'buildMutinfoMatrix', 'calcMSAOccupancy',
            'buildSCAMatrix', 'buildDirectInfoMatrix', 'calcMeff', 
            'buildPCMatrix', 'buildMSA', 'showAlignment', 'alignTwoSequencesWithBiopython', 
            'alignSequenceToMSA', 'calcPercentIdentities', 'alignSequencesByChain',
-           'trimAtomsUsingMSA']
+           'trimAtomsUsingMSA', 'alignPairwise', 'calcResampledMatrices']
 
 
 doc_turbo = """
@@ -92,7 +94,16 @@ def calcShannonEntropy(msa, ambiguity=True, omitgaps=True, **kwargs):
       * non-existent, the probability of observing amino acids in a given
         column is adjusted, by default
       * as a distinct character with its own probability, when *omitgaps* is
-        **False**"""
+        **False**
+
+    Sequences can be weighted by passing *weights*, an array with a weight
+    for each sequence, or **True** to use weights calculated by
+    :func:`.calcMeff`.  For :class:`.MSA` instances, entropy is calculated
+    from the profile cached by :meth:`.MSA.getProfile`."""
+
+    weights = kwargs.get('weights')
+    if isinstance(msa, MSA) or weights is not None:
+        return _getProfile(msa, ambiguity, weights).getEntropy(omitgaps)
 
     msa = getMSA(msa)
     length = msa.shape[1]
@@ -102,6 +113,111 @@ def calcShannonEntropy(msa, ambiguity=True, omitgaps=True, **kwargs):
                       ambiguity=bool(ambiguity), omitgaps=bool(omitgaps))
 
 
+def _getProfile(msa, ambiguity=True, weights=None):
+    """Returns an :class:`.MSAProfile` for *msa*, which is cached for
+    :class:`.MSA` instances."""
+
+    if isinstance(msa, MSA):
+        return msa.getProfile(ambiguity, weights)
+
+    codes = _encodeMSA(msa)
+    number = codes.shape[0]
+    if weights is not None:
+        weights = _getSeqWeights(msa, number, weights)
+        number = weights.sum()
+    counts = _countCodes(codes, weights)
+    if ambiguity:
+        _allocateAmbiguous(counts)
+    return MSAProfile(counts, number)
+
+
+COEV_COLUMNS = 32
+
+COEV_ROWS = 10000
+
+
+def _getStateMap(ambiguity=True):
+    """Returns an array that maps character codes (see :meth:`.MSA.getCodes`)
+    to probabilities of characters.  When *ambiguity* is **True**, ambiguous
+    amino acids are distributed over the amino acids they represent."""
+
+    states = eye(27)
+    if ambiguity:
+        for code, targets in AMBIGUOUS:
+            states[code] = 0
+            states[code, targets] = 1. / len(targets)
+    return states
+
+
+def _getSeqWeights(msa, number, weights):
+
+    if weights is None:
+        return ones(number)
+    if weights is True:
+        return calcMeff(msa, weight=True)[1]
+    weights = array(weights, float)
+    if weights.shape != (number,):
+        raise ValueError('weights must be an array with an element for '
+                         'each sequence')
+    return weights
+
+
+def _calcCoevolution(msa, omes=False, ambiguity=True, **kwargs):
+    """Returns a symmetric matrix with zero diagonal containing mutual
+    information, or OMES when *omes* is **True**, for all pairs of
+    columns of *msa*.  Pairs of columns are evaluated in tiles of *columns*
+    columns using *n_cpu* threads, and sequences are optionally weighted by
+    *weights*."""
+
+    from .msatools import msacoevol
+
+    codes = _encodeMSA(msa)
+    number, length = codes.shape
+    weights = _getSeqWeights(msa, number, kwargs.get('weights'))
+    norm = not omes and bool(kwargs.get('norm', False))
+
+    # columns are stored contiguously for counting
+    columns = codes.T.copy()
+    counts = zeros(length * 27)
+    offset = arange(length) * 27
+    for start in range(0, number, COEV_ROWS):
+        chunk = codes[start:start + COEV_ROWS]
+        counts += bincount((chunk + offset).ravel(),
+                           repeat(weights[start:start + COEV_ROWS], length),
+                           minlength=length * 27)
+    probs = dot(counts.reshape((length, 27)), _getStateMap(ambiguity))
+    probs /= weights.sum()
+
+    matrix = zeros((length, length))
+
+    def tile(task):
+        (istart, istop), (jstart, jstop) = task
+        values = zeros((istop - istart, jstop - jstart))
+        msacoevol(columns[istart:istop], columns[jstart:jstop], weights,
+                  probs[istart:istop], probs[jstart:jstop], values,
+                  ambiguity=bool(ambiguity), method=int(omes), norm=norm,
+                  diagonal=istart == jstart)
+        if istart == jstart:
+            values += values.T
+        matrix[istart:istop, jstart:jstop] = values
+        matrix[jstart:jstop, istart:istop] = values.T
+
+    blocks = list(_iterBlocks(length, kwargs.get('columns', COEV_COLUMNS)))
+    _mapTiles(tile, [(blocks[i], blocks[j]) for i in range(len(blocks))
+                     for j in range(i, len(blocks))], kwargs.get('n_cpu'))
+    return matrix
+
+
+doc_coevolution = """
+
+    Joint probabilities for all pairs of columns are calculated in tiles of
+    *columns* columns (default is 32) using *n_cpu* threads (default is
+    number of processors).  Sequences can be weighted by passing *weights*,
+    an array with a weight for each sequence, or **True** to use weights
+    calculated by :func:`.calcMeff`.  *turbo* is accepted for backwards
+    compatibility."""
+
+
 def buildMutinfoMatrix(msa, ambiguity=True, turbo=True, **kwargs):
     """Returns mutual information matrix calculated for *msa*, which may be an
     :class:`.MSA` instance or a 2D Numpy character array.  Implementation
@@ -125,47 +241,53 @@ def buildMutinfoMatrix(msa, ambiguity=True, turbo=True, **kwargs):
     Mutual information matrix can be normalized or corrected using
     :func:`applyMINormalization` and :func:`applyMICorrection` methods,
     respectively.  Normalization by joint entropy can performed using this
-    function with *norm* option set **True**."""
+    function with *norm* option set **True**, and it is 0 for pairs of
+    conserved columns."""
 
-    msa = getMSA(msa)
+    getMSA(msa)
 
-    from .msatools import msamutinfo
     LOGGER.timeit('_mutinfo')
-    length = msa.shape[1]
-    mutinfo = empty((length, length), float)
-    mutinfo = msamutinfo(msa, mutinfo,
-                         ambiguity=bool(ambiguity), turbo=bool(turbo),
-                         norm=bool(kwargs.get('norm', False)),
-                         debug=bool(kwargs.get('debug', False)))
+    mutinfo = _calcCoevolution(msa, False, ambiguity, **kwargs)
     LOGGER.report('Mutual information matrix was calculated in %.2fs.',
                   '_mutinfo')
 
     return mutinfo
 
-buildMutinfoMatrix.__doc__ += doc_turbo
+buildMutinfoMatrix.__doc__ += doc_coevolution
 
 
-def calcMSAOccupancy(msa, occ='res', count=False):
+def calcMSAOccupancy(msa, occ='res', count=False, **kwargs):
     """Returns occupancy array calculated for residue positions (default,
     ``'res'`` or ``'col'`` for *occ*) or sequences (``'seq'`` or ``'row'``
     for *occ*) of *msa*, which may be an :class:`.MSA` instance or a 2D
     NumPy character array.  By default, occupancy [0-1] will be calculated.
     If *count* is **True**, count of non-gap characters will be returned.
-    Implementation is case insensitive."""
+    Implementation is case insensitive.
+
+    Residue position occupancy can be calculated for weighted sequences by
+    passing *weights*, an array with a weight for each sequence, or **True**
+    to use weights calculated by :func:`.calcMeff`.  For :class:`.MSA`
+    instances, it is obtained from the profile cached by
+    :meth:`.MSA.getProfile`."""
 
     from .msatools import msaocc
 
-    msa = getMSA(msa)
+    arr = getMSA(msa)
 
     try:
         dim = occ.startswith('res') or occ.startswith('col')
     except AttributeError:
         raise TypeError('occ must be a string')
-    occ = zeros(msa.shape[int(dim)], float)
-    return msaocc(msa, occ, dim, count=bool(count))
+
+    weights = kwargs.get('weights')
+    if dim and (isinstance(msa, MSA) or weights is not None):
+        return _getProfile(msa, True, weights).getOccupancy(bool(count))
+
+    occ = zeros(arr.shape[int(dim)], float)
+    return msaocc(arr, occ, dim, count=bool(count))
 
 
-def applyMutinfoNorm(mutinfo, entropy, norm='sument'):
+def applyMutinfoNorm(mutinfo, entropy, norm='sument', inplace=False):
     """Apply one of the normalizations discussed in [MLC05]_ to *mutinfo*
     matrix.  *norm* can be one of the following:
 
@@ -180,7 +302,8 @@ def applyMutinfoNorm(mutinfo, entropy, norm='sument'):
     where :math:`H(X)` is the entropy of a column, and
     :math:`H(X|Y) = H(X) - MI(X, Y)`.  Normalization with joint entropy, i.e.
     :math:`H(X, Y)`, can be done using :func:`.buildMutinfoMatrix` *norm*
-    argument.
+    argument.  When *inplace* is **True**, *mutinfo* is normalized in place
+    and returned.
 
     .. [MLC05] Martin LC, Gloor GB, Dunn SD, Wahl LM. Using information theory
        to search for co-evolving residues in proteins. *Bioinformatics*
@@ -210,20 +333,23 @@ def applyMutinfoNorm(mutinfo, entropy, norm='sument'):
     except AttributeError:
         raise TypeError('norm must be a string')
 
+    from numpy import add, minimum, maximum
+
+    i_val, j_val = entropy[:, None], entropy[None, :]
     if sw('sument'):
-        norm = lambda i_val, j_val, val: i_val + j_val
+        div = add.outer(entropy, entropy)
 
     elif sw('minent'):
-        norm = lambda i_val, j_val, val: min(i_val, j_val)
+        div = minimum.outer(entropy, entropy)
 
     elif sw('maxent'):
-        norm = lambda i_val, j_val, val: max(i_val, j_val)
+        div = maximum.outer(entropy, entropy)
 
     elif sw('mincon'):
-        norm = lambda i_val, j_val, val: min(i_val - val, j_val - val)
+        div = minimum(i_val - mutinfo, j_val - mutinfo)
 
     elif sw('maxcon'):
-        norm = lambda i_val, j_val, val: max(i_val - val, j_val - val)
+        div = maximum(i_val - mutinfo, j_val - mutinfo)
 
     elif sw('joint'):
         raise ValueError('for joint entropy normalization, use '
@@ -232,22 +358,19 @@ def applyMutinfoNorm(mutinfo, entropy, norm='sument'):
         raise ValueError('norm={0} is not a valid normalization type'
                          .format(norm))
 
-    mi = mutinfo.copy()
-    for i, i_val in enumerate(entropy):
-        for j, j_val in enumerate(entropy):
-            val = mi[i, j]
-            div = norm(i_val, j_val, val)
-            if div == 0:
-                mi[i, j] = 0
-            else:
-                mi[i, j] /= div
+    mi = mutinfo if inplace else mutinfo.copy()
+    zero = div == 0
+    div[zero] = 1
+    mi /= div
+    mi[zero] = 0
 
     return mi
 
 
-def applyMutinfoCorr(mutinfo, corr='prod'):
+def applyMutinfoCorr(mutinfo, corr='prod', inplace=False):
     """Returns a copy of *mutinfo* array after average product correction
     (default) or average sum correction is applied.  See [DSD08]_ for details.
+    When *inplace* is **True**, *mutinfo* is corrected in place and returned.
 
     .. [DSD08] Dunn SD, Wahl LM, Gloor GB. Mutual information without the
        influence of phylogeny or entropy dramatically improves residue
@@ -269,18 +392,20 @@ def applyMutinfoCorr(mutinfo, corr='prod'):
     avg_mipos = mutinfo.sum(1) / (shape[0] - 1)
     avg_mi = avg_mipos.mean()
 
-    mi = mutinfo.copy()
+    from numpy import add, multiply
+
     if sw('prod') or sw('apc'):
-        for i, i_avg in enumerate(avg_mipos):
-            for j, j_avg in enumerate(avg_mipos):
-                mi[i, j] -= (i_avg * j_avg) / avg_mi
+        corr = multiply.outer(avg_mipos, avg_mipos)
+        corr /= avg_mi
     elif sw('sum') or sw('asc'):
-        for i, i_avg in enumerate(avg_mipos):
-            for j, j_avg in enumerate(avg_mipos):
-                mi[i, j] -= i_avg + j_avg - avg_mi
+        corr = add.outer(avg_mipos, avg_mipos)
+        corr -= avg_mi
     else:
         raise ValueError('correction must be prod or sum, not ' + corr)
 
+    mi = mutinfo if inplace else mutinfo.copy()
+    mi -= corr
+
     return mi
 
 def filterRankedPairs(pdb, indices, msa_indices, rank_row, rank_col, zscore_sort, \
@@ -360,16 +485,144 @@ def filterRankedPairs(pdb, indices, msa_indices, rank_row, rank_col, zscore_sort
     
     return pairList
 
-def buildSeqidMatrix(msa, turbo=True):
-    """Returns sequence identity matrix for *msa*."""
+MEFF_CODES = zeros(256, 'uint8')
+MEFF_CODES[65:91] = [1, 0, 2, 3, 4, 5, 6, 7, 8, 0, 9, 10, 11, 12,
+                     0, 13, 14, 15, 16, 17, 0, 18, 19, 0, 20, 0]
 
+SEQID_BLOCK = 256
+
+SEQID_GROUP = 32
+
+
+def _encodeMSA(msa, codes=MSA_CODES):
+    """Returns *msa* encoded as an unsigned integer array, where gaps and
+    unknown characters are 0.  Codes cached by :class:`.MSA` instances are
+    used when *codes* is :data:`MSA_CODES`."""
+
+    if codes is MSA_CODES:
+        try:
+            return msa._getCodes()
+        except AttributeError:
+            pass
+    return codes[getMSA(msa).view('uint8')]
+
+
+def _calcIdentityTile(rows, cols, gaps=False):
+    """Returns number of identical and compared columns for all pairs of
+    sequences in *rows* and *cols*, both encoded with :func:`_encodeMSA`.
+    When *gaps* is **True**, all columns are compared."""
+
+    from .seqtools import msaidentity
+
+    score = empty((len(rows), len(cols)), 'int32')
+    ncols = empty((len(rows), len(cols)), 'int32')
+    msaidentity(rows, cols, score, ncols, gaps=int(bool(gaps)))
+    return score, ncols
+
+
+def _checkCPU(n_cpu):
+    """Returns *n_cpu* after checking it, or number of processors when it is
+    **None**."""
+
+    if n_cpu is None:
+        from multiprocessing import cpu_count
+        n_cpu = cpu_count()
+    if not isinstance(n_cpu, Integral):
+        raise TypeError('n_cpu must be an integer')
+    elif n_cpu < 1:
+        raise ValueError('n_cpu must be equal to or greater than 1')
+    return n_cpu
+
+
+def _mapTiles(func, tasks, n_cpu=None):
+    """Returns results of calling *func* for each tile in *tasks*.  Tiles
+    are calculated in *n_cpu* threads, identity calculations release the
+    global interpreter lock."""
+
+    n_cpu = _checkCPU(n_cpu)
+    tasks = list(tasks)
+    if n_cpu == 1 or len(tasks) < 2:
+        return [func(task) for task in tasks]
+
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(min(n_cpu, len(tasks)))
+    try:
+        return pool.map(func, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _iterBlocks(number, block=SEQID_BLOCK):
+
+    for start in range(0, number, block):
+        yield start, min(start + block, number)
+
+
+def _calcSeqidPairs(codes, threshold, n_cpu=None, block=SEQID_BLOCK):
+    """Returns row indices, column indices and identities of sequence pairs
+    sharing *threshold* or more sequence identity, calculated in tiles."""
+
+    from numpy import nonzero, concatenate
+
+    blocks = list(_iterBlocks(len(codes), block))
+
+    def tile(task):
+        (istart, istop), (jstart, jstop) = task
+        score, ncols = _calcIdentityTile(codes[istart:istop],
+                                         codes[jstart:jstop])
+        with errstate(divide='ignore', invalid='ignore'):
+            seqid = score / ncols.astype(float)
+        seqid[ncols == 0] = 0.
+        if istart == jstart:
+            seqid[tril_indices(istop - istart)] = 0.
+        rows, cols = nonzero(seqid >= threshold)
+        return rows + istart, cols + jstart, seqid[rows, cols]
+
+    tasks = [(blocks[i], blocks[j]) for i in range(len(blocks))
+             for j in range(i, len(blocks))]
+    pairs = _mapTiles(tile, tasks, n_cpu)
+    if not pairs:
+        return (zeros(0, int), zeros(0, int), zeros(0, float))
+    return tuple(concatenate(arrays) for arrays in zip(*pairs))
+
+
+def buildSeqidMatrix(msa, turbo=True, **kwargs):
+    """Returns sequence identity matrix for *msa*.
+
+    When *threshold* is given, a :class:`scipy.sparse.csr_matrix` that
+    contains only pairs sharing *threshold* or more sequence identity is
+    returned.  In this case, identities are calculated in blocks of
+    sequences using *n_cpu* threads (default is number of processors)
+    and a dense matrix is never allocated."""
+
+    threshold = kwargs.get('threshold')
+    if threshold is not None:
+        codes = _encodeMSA(msa)
     msa = getMSA(msa)
 
     LOGGER.timeit('_seqid')
-    from .seqtools import msaeye
 
-    dim = msa.shape[0]
-    seqid = msaeye(msa, ones((dim, dim), float), turbo=bool(turbo))
+    if threshold is not None:
+        from numpy import concatenate
+        from scipy.sparse import csr_matrix
+
+        if not (0 <= threshold <= 1):
+            raise ValueError('threshold must satisfy 0 <= threshold <= 1')
+
+        dim = msa.shape[0]
+        rows, cols, values = _calcSeqidPairs(codes, threshold,
+                                             kwargs.get('n_cpu'))
+        diag = arange(dim)
+        seqid = csr_matrix((concatenate([values, values, ones(dim)]),
+                            (concatenate([rows, cols, diag]),
+                             concatenate([cols, rows, diag]))),
+                           shape=(dim, dim))
+    else:
+        from .seqtools import msaeye
+
+        dim = msa.shape[0]
+        seqid = msaeye(msa, ones((dim, dim), float), turbo=bool(turbo))
 
     LOGGER.report('Sequence identity matrix was calculated in %.2fs.',
                   '_seqid')
@@ -378,22 +631,87 @@ def buildSeqidMatrix(msa, turbo=True):
 buildSeqidMatrix.__doc__ += doc_turbo
 
 
-def uniqueSequences(msa, seqid=0.98, turbo=True):
+def uniqueSequences(msa, seqid=0.98, turbo=True, **kwargs):
     """Returns a boolean array marking unique sequences in *msa*.  A sequence
     sharing sequence identity of *seqid* or more with another sequence coming
-    before itself in *msa* will have a **True** value in the array."""
+    before itself in *msa* will have a **True** value in the array.
 
-    msa = getMSA(msa)
+    Sequences are compared in blocks against unique sequences found so far,
+    using *n_cpu* threads (default is number of processors).  Repeats of a
+    sequence are not compared, and a sequence is compared only with unique
+    sequences whose number of residues is within *seqid* fraction of its
+    own, since identity cannot exceed the ratio of the numbers of residues.
+    *turbo* is accepted for backwards compatibility."""
 
-    from .seqtools import msaeye
+    from numpy import nonzero, concatenate, floor
+
+    codes = _encodeMSA(msa)
+    msa = getMSA(msa)
 
     if not (0 < seqid <= 1):
         raise ValueError('seqid must satisfy 0 < seqid <= 1')
 
-    return msaeye(msa, zeros(msa.shape[0], bool),
-                  unique=seqid, turbo=bool(turbo))
-
-uniqueSequences.__doc__ += doc_turbo
+    n_cpu = kwargs.get('n_cpu')
+    block = kwargs.get('block', SEQID_BLOCK)
+
+    number, length = codes.shape
+    unique = zeros(number, bool)
+    if not number:
+        return unique
+    residues = (codes != 0).sum(1)
+    # sequences without residues are not similar to any sequence, and
+    # repeats of other sequences are similar to their first occurrence
+    unique[residues == 0] = True
+    first = _findDuplicates(codes)[0]
+    first = first[residues[first] > 0]
+    # unique sequences found so far are kept by number of residues
+    found = [[] for _ in range(length + 1)]
+
+    def similar(rows, cols):
+        score, ncols = _calcIdentityTile(rows, cols)
+        with errstate(divide='ignore', invalid='ignore'):
+            return score / ncols.astype(float) >= seqid
+
+    def tile(task):
+        rows, cols = task
+        return rows, similar(codes[cols], codes[indices[rows]]).any(0)
+
+    for start, stop in _iterBlocks(len(first), block):
+        indices = first[start:stop]
+        current = codes[indices]
+        # compare with unique sequences from earlier blocks, in groups of
+        # sequences with similar number of residues
+        order = residues[indices].argsort(kind='mergesort')
+        tasks = []
+        for k in range(0, len(order), SEQID_GROUP):
+            rows = order[k:k + SEQID_GROUP]
+            low = max(int(floor(residues[indices[rows[0]]] * seqid)) - 1, 1)
+            high = min(int(residues[indices[rows[-1]]] / seqid) + 1, length)
+            cols = [chunk for size in range(low, high + 1)
+                    for chunk in found[size]]
+            if cols:
+                cols = concatenate(cols)
+                tasks.extend((rows, cols[i:i + block])
+                             for i in range(0, len(cols), block))
+        candidates = ones(stop - start, bool)
+        for rows, tile_similar in _mapTiles(tile, tasks, n_cpu):
+            candidates[rows] &= ~tile_similar
+
+        # resolve sequences within the block in order
+        rows = nonzero(candidates)[0]
+        within = similar(current[rows], current[rows])
+        keep = ones(len(rows), bool)
+        for i in range(len(rows)):
+            if keep[i]:
+                keep[i + 1:] &= ~within[i, i + 1:]
+        candidates[rows[~keep]] = False
+
+        new = indices[candidates]
+        unique[new] = True
+        for size in set(residues[new]):
+            found[size].append(new[residues[new] == size])
+
+    return unique
 
 
 def calcRankorder(matrix, zscore=False, **kwargs):
@@ -402,7 +720,11 @@ def calcRankorder(matrix, zscore=False, **kwargs):
     normalization; by default along *axis* - 0 such that each column has
     ``mean=0`` and ``std=1``.  If *zcore* analysis is used, return value contains the
     zscores. If matrix is symmetric only lower triangle indices will be
-    returned, with diagonal elements if *diag* is **True** (default)."""
+    returned, with diagonal elements if *diag* is **True** (default).
+
+    Z-scores can instead be calculated element-wise relative to replicates
+    of an MSA by passing mean and variance matrices returned by
+    :func:`.calcResampledMatrices` as *resampled*."""
 
     try:
         ndim, shape = matrix.ndim, matrix.shape
@@ -419,8 +741,15 @@ def calcRankorder(matrix, zscore=False, **kwargs):
         symm = False
 
     if zscore:
-        axis = int(bool(kwargs.get('axis', 0)))
-        matrix = (matrix - matrix.mean(axis)) / matrix.std(axis)
+        resampled = kwargs.get('resampled')
+        if resampled is None:
+            axis = int(bool(kwargs.get('axis', 0)))
+            matrix = (matrix - matrix.mean(axis)) / matrix.std(axis)
+        else:
+            mean, variance = resampled[:2]
+            std = sqrt(variance)
+            with errstate(divide='ignore', invalid='ignore'):
+                matrix = where(std > 0, (matrix - mean) / std, 0)
         LOGGER.info('Zscore normalization has been applied.')
 
     descend = kwargs.get('descend', True)
@@ -477,20 +806,16 @@ def buildOMESMatrix(msa, ambiguity=True, turbo=True, **kwargs):
     characters as considered as distinct types.  All non-alphabet characters
     are considered as gaps."""
 
-    msa = getMSA(msa)
+    getMSA(msa)
 
-    from .msatools import msaomes
     LOGGER.timeit('_omes')
-    length = msa.shape[1]
-    omes = empty((length, length), float)
-    omes = msaomes(msa, omes, ambiguity=bool(ambiguity), turbo=bool(turbo),
-                   debug=bool(kwargs.get('debug', False)))
+    omes = _calcCoevolution(msa, True, ambiguity, **kwargs)
     LOGGER.report('OMES matrix was calculated in %.2fs.',
                   '_omes')
 
     return omes
 
-buildOMESMatrix.__doc__ += doc_turbo
+buildOMESMatrix.__doc__ += doc_coevolution
 
 
 def buildSCAMatrix(msa, turbo=True, **kwargs):
@@ -513,22 +838,73 @@ def buildSCAMatrix(msa, turbo=True, **kwargs):
     Selenocysteine (**U**, Sec) and pyrrolysine (**O**, Pyl) are considered
     as distinct amino acids.  When *ambiguity* is set **False**, all alphabet
     characters as considered as distinct types.  All non-alphabet characters
-    are considered as gaps."""
+    are considered as gaps.
 
-    msa = getMSA(msa)
-    if msa.shape[0]<100:
+    Column frequencies are obtained from the profile cached by
+    :meth:`.MSA.getProfile` for :class:`.MSA` instances.  Sequences can be
+    weighted by passing *weights*, an array with a weight for each sequence,
+    or **True** to use weights calculated by :func:`.calcMeff`.  *turbo* is
+    accepted for backwards compatibility."""
+
+    codes = _encodeMSA(msa)
+    number, length = codes.shape
+    if number < 100:
         LOGGER.warning('SCA performs the best with higher number of sequences, and '
                        'minimal number of sequences is recommended as 100.')
-                       
-    from .msatools import msasca
+
     LOGGER.timeit('_sca')
-    length = msa.shape[1]
-    sca = zeros((length, length), float)
-    sca = msasca(msa, sca, turbo=bool(turbo))
+    weights = kwargs.get('weights')
+    if weights is None:
+        profile = _getProfile(msa)
+        weights = ones(number)
+    else:
+        weights = _getSeqWeights(msa, number, weights)
+        profile = _getProfile(msa, True, weights)
+    values = _calcSCAValues(profile.getFrequencies()).ravel()
+
+    # values of characters of sequences are accumulated in blocks of rows
+    offset = arange(length) * 27
+    sums = zeros(length)
+    sca = zeros((length, length))
+    for start in range(0, number, COEV_ROWS):
+        block = values[codes[start:start + COEV_ROWS] + offset]
+        block_weights = weights[start:start + COEV_ROWS]
+        sums += dot(block_weights, block)
+        sca += dot(block.T * block_weights, block)
+    total = weights.sum()
+    means = sums / total
+    sca /= total
+    sca -= outer(means, means)
+    absolute(sca, sca)
     LOGGER.report('SCA matrix was calculated in %.2fs.', '_sca')
     return sca
 
-buildSCAMatrix.__doc__ += doc_turbo
+
+SCA_BACKGROUND = array([0., 0.073, 0., 0.025, 0.05, 0.061, 0.042, 0.072,
+                        0.023, 0.053, 0., 0.064, 0.089, 0.023, 0.043, 0.,
+                        0.052, 0.04, 0.052, 0.073, 0.056, 0., 0.063, 0.013,
+                        0., 0.033, 0.])
+
+
+def _calcSCAValues(freqs):
+    """Returns values of characters in each column, i.e. frequencies weighted
+    by squared conservation relative to :data:`SCA_BACKGROUND` and normalized
+    per column.  Ambiguous amino acids take mean value of the amino acids
+    they represent."""
+
+    back = SCA_BACKGROUND
+    with errstate(divide='ignore', invalid='ignore'):
+        phi = abs(log(freqs * (1 - back) / (1 - freqs) / back))
+    phi[(freqs == 0) | (freqs == 1) | (back == 0)] = 0
+    values = freqs * phi
+    norm = sqrt((values ** 2).sum(1))
+    values *= phi
+    with errstate(divide='ignore', invalid='ignore'):
+        values = where(norm[:, None] > 0, values / norm[:, None], 0)
+    for code, targets in AMBIGUOUS:
+        values[:, code] = values[:, targets].mean(1)
+    values[:, 0] = 0
+    return values
 
 def buildPCMatrix(msa, turbo=False, **kwargs):
     """Returns PC matrix calculated for *msa*, which may be an :class:`.MSA`
@@ -562,6 +938,259 @@ def buildPCMatrix(msa, turbo=False, **kwargs):
     LOGGER.report('PC matrix was calculated in %.2fs.', '_psicov')
     return pc
 
+DI_METHODS = ('mean-field', 'plm')
+
+DI_EPSILON = 1e-4
+
+DI_MAX_ITER = 100000
+
+
+def _getDirectInfoData(msa, seqid, pseudo_weight, refine, **kwargs):
+    """Returns align codes of columns, normalized sequence weights, number
+    of states and pseudocount weighted single site probabilities used for
+    calculating direct information."""
+
+    codes = _encodeMSA(msa, MEFF_CODES)
+    if refine:
+        codes = codes[:, (msa[0] >= b'A') & (msa[0] <= b'Z')]
+    meff, weights = calcMeff(msa, seqid=seqid, refine=refine, weight=True,
+                             n_cpu=kwargs.get('n_cpu'))
+    weights /= meff
+    number, length = codes.shape
+    q = int(codes.max()) + 1 if codes.size else 1
+
+    offset = arange(length) * q
+    probs = bincount((codes + offset).ravel(), repeat(weights, length),
+                     minlength=length * q).reshape((length, q))
+    probs = pseudo_weight / q + (1. - pseudo_weight) * probs
+    return codes.T.copy(), weights, q, probs
+
+
+def _calcCovariance(encoded, weights, q, probs, pseudo_weight, **kwargs):
+    """Returns the upper triangle of the connected correlation matrix of
+    the first *q* - 1 states of all columns, calculated in tiles."""
+
+    from .msatools import msajoint
+
+    length = len(encoded)
+    size = q - 1
+    cov = zeros((length * size, length * size),
+                kwargs.get('dtype', float))
+
+    def tile(task):
+        (istart, istop), (jstart, jstop) = task
+        joint = zeros((istop - istart, jstop - jstart, q, q))
+        msajoint(encoded[istart:istop], encoded[jstart:jstop], weights,
+                 joint)
+        joint *= 1. - pseudo_weight
+        if istart == jstart:
+            same = arange(istop - istart)
+            joint += pseudo_weight / q / q
+            joint[same, same] -= pseudo_weight / q / q
+            joint[same, same] += eye(q) * pseudo_weight / q
+        else:
+            joint += pseudo_weight / q / q
+        block = (joint[:, :, :size, :size] -
+                 probs[istart:istop, None, :size, None] *
+                 probs[None, jstart:jstop, None, :size])
+        cov[istart * size:istop * size, jstart * size:jstop * size] = \
+            block.transpose(0, 2, 1, 3).reshape(((istop - istart) * size,
+                                                 (jstop - jstart) * size))
+
+    blocks = list(_iterBlocks(length, kwargs.get('columns', COEV_COLUMNS)))
+    _mapTiles(tile, [(blocks[i], blocks[j]) for i in range(len(blocks))
+                     for j in range(i, len(blocks))], kwargs.get('n_cpu'))
+    return cov
+
+
+def _invertCovariance(cov, shrinkage=0.):
+    """Inverts *cov* in place using its Cholesky factorization, and returns
+    the upper triangle of the inverse.  When *shrinkage* is given, *cov* is
+    shrunk towards a multiple of the identity matrix before inversion."""
+
+    from scipy.linalg import lapack
+
+    if not 0 <= shrinkage < 1:
+        raise ValueError('shrinkage must be a number in [0, 1)')
+    if shrinkage:
+        diagonal = cov.diagonal().mean()
+        cov *= 1. - shrinkage
+        cov.flat[::len(cov) + 1] += shrinkage * diagonal
+
+    potrf, potri = lapack.get_lapack_funcs(('potrf', 'potri'), (cov,))
+    chol, info = potrf(cov, lower=False, overwrite_a=True, clean=False)
+    if info == 0:
+        cov, info = potri(chol, lower=False, overwrite_c=True)
+    if info:
+        raise ValueError('covariance matrix is not positive definite, use '
+                         'a greater pseudo_weight or shrinkage')
+    return cov
+
+
+def _calcDirectInfo(getCouplings, probs, **kwargs):
+    """Returns direct information matrix for columns with single site
+    probabilities *probs*.  *getCouplings* returns exponentials of coupling
+    energies for a tile of columns.  Fields of each pair are found in at most
+    :data:`DI_MAX_ITER` fixed-point iterations."""
+
+    from .msatools import msadirectinfo
+
+    length = len(probs)
+    di = zeros((length, length), kwargs.get('dtype', float))
+    unconverged = []
+
+    def tile(task):
+        (istart, istop), (jstart, jstop) = task
+        values = zeros((istop - istart, jstop - jstart))
+        unconverged.append(msadirectinfo(
+            getCouplings(istart, istop, jstart, jstop),
+            probs[istart:istop], probs[jstart:jstop], values,
+            diagonal=istart == jstart, maxiter=DI_MAX_ITER,
+            epsilon=DI_EPSILON))
+        if istart == jstart:
+            values += values.T
+        di[istart:istop, jstart:jstop] = values
+        di[jstart:jstop, istart:istop] = values.T
+
+    blocks = list(_iterBlocks(length, kwargs.get('columns', COEV_COLUMNS)))
+    _mapTiles(tile, [(blocks[i], blocks[j]) for i in range(len(blocks))
+                     for j in range(i, len(blocks))], kwargs.get('n_cpu'))
+    if sum(unconverged):
+        LOGGER.warn('Fields of {0} column pairs did not converge in {1} '
+                    'iterations.'.format(sum(unconverged), DI_MAX_ITER))
+    return di
+
+
+def _calcMeanFieldCouplings(encoded, weights, q, probs, pseudo_weight,
+                            **kwargs):
+    """Returns a function that returns exponentials of mean-field coupling
+    energies, negative elements of the inverse of the connected correlation
+    matrix.  Tiles are taken from the upper triangle of the inverse, where
+    the first column of a pair precedes the second."""
+
+    inverse = _invertCovariance(_calcCovariance(encoded, weights, q, probs,
+                                                pseudo_weight, **kwargs),
+                                float(kwargs.get('shrinkage', 0.)))
+    size = q - 1
+
+    def getCouplings(istart, istop, jstart, jstop):
+        block = inverse[istart * size:istop * size,
+                        jstart * size:jstop * size].astype(float)
+        block = block.reshape((istop - istart, size, jstop - jstart, size))
+        couplings = ones((istop - istart, jstop - jstart, q, q))
+        couplings[:, :, :size, :size] = exp(-block.transpose(0, 2, 1, 3))
+        return couplings
+
+    return getCouplings
+
+
+def _getPlmData(encoded, weights, q, lambda_h, lambda_J, max_iter):
+    """Returns a dictionary of data used for pseudo-likelihood fits."""
+
+    from scipy.sparse import csr_matrix
+
+    length, number = encoded.shape
+    rows = repeat(arange(number), length)
+    onehot = csr_matrix((ones(number * length),
+                         (rows, (encoded.T + arange(length) * q).ravel())),
+                        shape=(number, length * q))
+    return {'encoded': encoded, 'weights': weights, 'q': q,
+            'lambda_h': lambda_h, 'lambda_J': lambda_J,
+            'max_iter': max_iter, 'onehot': onehot,
+            'transpose': onehot.T.tocsr()}
+
+
+def _fitPlmColumn(data, column):
+    """Returns coupling energies of *column* with states of all columns,
+    inferred by maximizing its pseudo-likelihood."""
+
+    from numpy import concatenate
+    from scipy.optimize import minimize
+
+    encoded = data['encoded']
+    weights = data['weights']
+    q = data['q']
+    lambda_h = data['lambda_h']
+    lambda_J = data['lambda_J']
+    onehot = data['onehot']
+    transpose = data['transpose']
+    length, number = encoded.shape
+    sequences = arange(number)
+    target = encoded[column]
+
+    def objective(x):
+        h = x[:q]
+        J = x[q:].reshape((length * q, q))
+        energies = onehot.dot(J) + h
+        energies -= energies.max(1)[:, None]
+        norm = log(exp(energies).sum(1))
+        value = (dot(weights, norm - energies[sequences, target]) +
+                 lambda_h * dot(h, h) + lambda_J * (J * J).sum())
+        residual = exp(energies - norm[:, None])
+        residual[sequences, target] -= 1.
+        residual *= weights[:, None]
+        grad_J = transpose.dot(residual) + 2. * lambda_J * J
+        grad_J[column * q:(column + 1) * q] = 0.
+        grad_h = residual.sum(0) + 2. * lambda_h * h
+        return value, concatenate([grad_h, grad_J.ravel()])
+
+    result = minimize(objective, zeros(q + length * q * q), jac=True,
+                      method='L-BFGS-B',
+                      options={'maxiter': data['max_iter']})
+    return result.x[q:].reshape((length * q, q))
+
+
+_PLM_DATA = {}
+
+
+def _initPlmWorker(*args):
+    """Builds data for pseudo-likelihood fits in a worker process."""
+
+    _PLM_DATA.update(_getPlmData(*args))
+
+
+def _fitPlmWorker(column):
+    """Returns coupling energies of *column* fitted in a worker process."""
+
+    return _fitPlmColumn(_PLM_DATA, column)
+
+
+def _calcPlmCouplings(encoded, weights, q, **kwargs):
+    """Returns a function that returns exponentials of coupling energies
+    inferred by maximizing asymmetric pseudo-likelihood of each column with
+    L2 regularization, symmetrized by averaging.  Objective function of the
+    fits is evaluated in Python, so columns are fitted in *n_cpu* processes
+    rather than threads."""
+
+    length = len(encoded)
+    args = (encoded, weights, q, float(kwargs.get('lambda_h', 0.01)),
+            float(kwargs.get('lambda_J', 0.01)),
+            int(kwargs.get('max_iter', 100)))
+    n_cpu = min(_checkCPU(kwargs.get('n_cpu')), length)
+
+    if n_cpu <= 1:
+        data = _getPlmData(*args)
+        couplings = [_fitPlmColumn(data, column) for column in range(length)]
+    else:
+        from multiprocessing import Pool
+        pool = Pool(n_cpu, _initPlmWorker, args)
+        try:
+            couplings = pool.map(_fitPlmWorker, range(length))
+        finally:
+            pool.close()
+            pool.join()
+
+    # couplings[i, j, b, a] is coupling of state a of i with state b of j
+    couplings = array(couplings).reshape((length, length, q, q))
+
+    def getCouplings(istart, istop, jstart, jstop):
+        return exp(0.5 * (
+            couplings[istart:istop, jstart:jstop].transpose(0, 1, 3, 2) +
+            couplings[jstart:jstop, istart:istop].transpose(1, 0, 2, 3)))
+
+    return getCouplings
+
+
 def buildDirectInfoMatrix(msa, seqid=.8, pseudo_weight=.5, refine=False,
                           **kwargs):
     """Returns direct information matrix calculated for *msa*, which may be an
@@ -576,37 +1205,333 @@ def buildDirectInfoMatrix(msa, seqid=.8, pseudo_weight=.5, refine=False,
     Sequences are not refined by default. When *refine* is set **True**,
     the MSA will be refined by the first sequence and the shape of direct
     information matrix will be smaller.
-    """
+
+    Coupling energies are inferred using *method*, one of:
+
+      * ``'mean-field'`` (default), negative inverse of the connected
+        correlation matrix, which is inverted using its Cholesky
+        factorization.  The matrix can be shrunk towards a multiple of the
+        identity matrix by *shrinkage* (default is 0).
+      * ``'plm'``, maximizing pseudo-likelihood of each column with
+        regularization strengths *lambda_h* and *lambda_J* (default is
+        0.01 for both) in at most *max_iter* iterations (default is 100).
+        Columns are fitted in *n_cpu* processes.
+
+    Correlations and direct information are calculated in tiles of
+    *columns* columns (default is 32) using *n_cpu* threads (default is
+    number of processors).  Passing ``dtype='float32'`` halves memory usage
+    by storing the correlation matrix and the returned direct information
+    matrix in single precision."""
 
     msa = getMSA(msa)
-    from .msatools import msadipretest, msadirectinfo1, msadirectinfo2
-    from numpy import matrix
+    method = kwargs.get('method', 'mean-field')
+    if method not in DI_METHODS:
+        raise ValueError('method must be one of ' + ', '.join(
+            repr(m) for m in DI_METHODS))
+    if dtype(kwargs.get('dtype', float)) not in (dtype('float64'),
+                                                 dtype('float32')):
+        raise ValueError('dtype must be float64 or float32')
 
     LOGGER.timeit('_di')
     if msa.shape[0]<250:
         LOGGER.warning('DI performs the best with higher number of sequences, and '
                        'minimal number of sequences is recommended as 250.')
-    refine = 1 if refine else 0
-    # msadipretest get some parameter from msa to set matrix size
-    length, q = msadipretest(msa, refine=refine)
-    c = matrix.dot(matrix(zeros((length*q, 1), float)),
-                   matrix(zeros((1, length*q), float)))
-    prob = zeros((length, q+1), float)
-    # msadirectinfo1 return c to be inversed and prob to be used
-    meff, n, length, c, prob = msadirectinfo1(msa, c, prob, theta=1.-seqid,
-                                              pseudocount_weight=pseudo_weight,
-                                              refine=refine, q=q+1)
-
-    c = c.I
-
-    di = zeros((length, length), float)
-    # get final DI
-    di = msadirectinfo2(n, length, c, prob, di, q+1)
-    del prob, c
+    encoded, weights, q, probs = _getDirectInfoData(msa, seqid, pseudo_weight,
+                                                    refine, **kwargs)
+    if method == 'plm':
+        getCouplings = _calcPlmCouplings(encoded, weights, q, **kwargs)
+    else:
+        getCouplings = _calcMeanFieldCouplings(encoded, weights, q, probs,
+                                               pseudo_weight, **kwargs)
+    di = _calcDirectInfo(getCouplings, probs, **kwargs)
     LOGGER.report('DI matrix was calculated in %.2fs.', '_di')
     return di
 
 
+RESAMPLE_METHODS = ('bootstrap', 'subsample', 'shuffle')
+
+
+def _getResampleMetric(metric):
+    """Returns the function that calculates coevolution *metric*."""
+
+    if callable(metric):
+        return metric
+    metrics = {'mutinfo': buildMutinfoMatrix, 'omes': buildOMESMatrix,
+               'sca': buildSCAMatrix, 'di': buildDirectInfoMatrix}
+    try:
+        return metrics[metric]
+    except (KeyError, TypeError):
+        raise ValueError('metric must be one of ' + ', '.join(
+            repr(m) for m in sorted(metrics)) + ', or a function')
+
+
+def _getReplicate(msa, resample, fraction, random):
+    """Returns a replicate of character array *msa* drawn using *random*."""
+
+    number, length = msa.shape
+    if resample == 'bootstrap':
+        return msa[random.randint(0, number, number)]
+    elif resample == 'subsample':
+        size = max(int(round(number * fraction)), 1)
+        rows = random.permutation(number)[:size]
+        rows.sort()
+        return msa[rows]
+    else:
+        rows = random.rand(number, length).argsort(0)
+        return msa[rows, arange(length)]
+
+
+def calcResampledMatrices(msa, metric='mutinfo', resample='bootstrap',
+                          replicates=20, **kwargs):
+    """Returns mean, variance and z-score matrices of coevolution *metric*
+    calculated for replicates of *msa*, which may be an :class:`.MSA`
+    instance or a 2D Numpy character array.  *metric* may be one of
+    ``'mutinfo'``, ``'omes'``, ``'sca'``, ``'di'``, or a function that
+    accepts a character array and keyword arguments and returns a matrix.
+    Other keyword arguments are passed to the metric function.
+
+    Replicates are drawn using *resample* method, one of:
+
+      * ``'bootstrap'`` (default), sequences sampled with replacement
+      * ``'subsample'``, a *fraction* (default is 0.8) of sequences sampled
+        without replacement
+      * ``'shuffle'``, sequences in each column shuffled independently,
+        which keeps column compositions but removes coevolution
+
+    For ``'shuffle'`` replicates, z-scores of the metric calculated for
+    *msa* relative to replicates are returned, which can be ranked using
+    :func:`.calcRankorder`.  For other methods, z-scores are ratios of
+    means to standard deviations of replicates.  Alternatively, mean and
+    variance matrices can be passed to :func:`.calcRankorder` as
+    *resampled* to normalize another matrix.
+
+    *replicates* are drawn using a random number generator seeded with
+    *seed* and evaluated in batches using *n_cpu* threads (default is
+    number of processors), so that only one matrix per thread is kept in
+    memory while mean and variance are accumulated.  Built-in metrics
+    evaluate each replicate in a single thread."""
+
+    arr = getMSA(msa)
+    calcMetric = _getResampleMetric(metric)
+    if resample not in RESAMPLE_METHODS:
+        raise ValueError('resample must be one of ' + ', '.join(
+            repr(m) for m in RESAMPLE_METHODS))
+    if not isinstance(replicates, Integral) or replicates < 2:
+        raise ValueError('replicates must be an integer greater than 1')
+    fraction = float(kwargs.pop('fraction', 0.8))
+    if not 0. < fraction <= 1.:
+        raise ValueError('fraction must be between 0 and 1')
+
+    from numpy.random import RandomState
+    random = RandomState(kwargs.pop('seed', None))
+    n_cpu = kwargs.get('n_cpu')
+    if n_cpu is None:
+        from multiprocessing import cpu_count
+        n_cpu = cpu_count()
+    replicate_kwargs = dict(kwargs)
+    if not callable(metric):
+        replicate_kwargs['n_cpu'] = 1
+
+    LOGGER.timeit('_resample')
+    mean = variance = None
+    LOGGER.progress('Evaluating {0} {1} replicates...'
+                    .format(replicates, resample), replicates, '_resample')
+    done = 0
+    while done < replicates:
+        batch = [_getReplicate(arr, resample, fraction, random)
+                 for _ in range(min(n_cpu, replicates - done))]
+        for matrix in _mapTiles(lambda replicate:
+                                calcMetric(replicate, **replicate_kwargs),
+                                batch, n_cpu):
+            # mean and variance are updated as in Welford's algorithm
+            done += 1
+            if mean is None:
+                mean = array(matrix, float)
+                variance = zeros(mean.shape)
+                continue
+            delta = matrix - mean
+            mean += delta / done
+            variance += delta * (matrix - mean)
+        LOGGER.update(done, label='_resample')
+    LOGGER.finish()
+    variance /= replicates - 1
+
+    std = sqrt(variance)
+    if resample == 'shuffle':
+        delta = calcMetric(arr, **kwargs) - mean
+    else:
+        delta = mean
+    with errstate(divide='ignore', invalid='ignore'):
+        zscore = where(std > 0, delta / std, 0)
+    LOGGER.report('Resampled matrices were calculated in %.2fs.',
+                  '_resample')
+    return mean, variance, zscore
+
+
+def _findDuplicates(codes):
+    """Returns indices of first occurrences of distinct rows of *codes* in
+    order, indices of distinct rows for all rows, and number of
+    occurrences of distinct rows."""
+
+    from numpy import ascontiguousarray, void
+
+    codes = ascontiguousarray(codes)
+    rows = codes.view(dtype((void, codes.shape[1]))).ravel()
+    _, first, inverse, counts = unique(rows, return_index=True,
+                                       return_inverse=True,
+                                       return_counts=True)
+    order = first.argsort()
+    rank = empty(len(order), int)
+    rank[order] = arange(len(order))
+    return first[order], rank[inverse.ravel()], counts[order]
+
+
+def _clusterLeaders(codes, radius, n_cpu=None, block=SEQID_BLOCK):
+    """Returns cluster indices of rows of *codes* and their distances to
+    cluster leaders, and pairs of clusters with distances of leaders.  Rows
+    are assigned in order to the first leader within *radius* mismatches,
+    or become leaders.  Pairs of leaders that are more than three times
+    *radius* apart are not returned."""
+
+    from numpy import nonzero, concatenate, triu_indices
+
+    number, length = codes.shape
+    limit = 3 * radius
+    cluster = empty(number, int)
+    distance = empty(number, int)
+    leaders = zeros(0, int)
+    pairs = []
+
+    def tile(task):
+        start, stop, offset = task
+        score, _ = _calcIdentityTile(codes[start:stop],
+                                     codes[leaders[offset:offset + block]],
+                                     gaps=True)
+        dist = length - score
+        hits = dist <= radius
+        first = hits.argmax(1)
+        first_dist = dist[arange(len(dist)), first]
+        first = where(hits.any(1), first + offset, -1)
+        rows, cols = nonzero(dist <= limit)
+        return first, first_dist, rows, cols + offset, dist[rows, cols]
+
+    for start, stop in _iterBlocks(number, block):
+        size = stop - start
+        assigned = -ones(size, int)
+        dist = zeros(size, int)
+        near = []
+        tasks = [(start, stop, offset)
+                 for offset in range(0, len(leaders), block)]
+        for first, first_dist, rows, cols, values in _mapTiles(tile, tasks,
+                                                                n_cpu):
+            # leaders in earlier tiles come first
+            new = (assigned < 0) & (first >= 0)
+            assigned[new] = first[new]
+            dist[new] = first_dist[new]
+            near.append((rows, cols, values))
+
+        # remaining rows are resolved in order within the block
+        within = length - _calcIdentityTile(codes[start:stop],
+                                            codes[start:stop], gaps=True)[0]
+        new_leaders = []
+        for i in nonzero(assigned < 0)[0]:
+            if new_leaders:
+                hits = within[i, new_leaders] <= radius
+                if hits.any():
+                    j = new_leaders[hits.argmax()]
+                    assigned[i] = assigned[j]
+                    dist[i] = within[i, j]
+                    continue
+            assigned[i] = len(leaders) + len(new_leaders)
+            new_leaders.append(i)
+
+        if new_leaders:
+            is_new = zeros(size, bool)
+            is_new[new_leaders] = True
+            for rows, cols, values in near:
+                mask = is_new[rows]
+                pairs.append((cols[mask], assigned[rows[mask]],
+                              values[mask]))
+            new_leaders = array(new_leaders)
+            irow, icol = triu_indices(len(new_leaders), 1)
+            values = within[new_leaders[irow], new_leaders[icol]]
+            mask = values <= limit
+            pairs.append((assigned[new_leaders[irow[mask]]],
+                          assigned[new_leaders[icol[mask]]], values[mask]))
+            leaders = concatenate([leaders, new_leaders + start])
+
+        cluster[start:stop] = assigned
+        distance[start:stop] = dist
+
+    if pairs:
+        pairs = tuple(concatenate(arrays) for arrays in zip(*pairs))
+    else:
+        pairs = (zeros(0, int), zeros(0, int), zeros(0, int))
+    return cluster, distance, pairs
+
+
+def _countNeighbors(codes, radius, n_cpu=None, block=SEQID_BLOCK):
+    """Returns number of other rows of *codes* that differ from each row at
+    *radius* or fewer columns.  Distinct rows are clustered using
+    :func:`_clusterLeaders`, and rows are compared only within clusters and
+    with clusters whose leaders are close enough by triangle inequality."""
+
+    from numpy import concatenate, maximum
+
+    number, length = codes.shape
+    if radius < 0:
+        return zeros(number)
+
+    first, inverse, counts = _findDuplicates(codes)
+    codes = codes[first]
+    counts = counts.astype(float)
+    cluster, distance, (ileader, jleader, values) = _clusterLeaders(
+        codes, radius, n_cpu, block)
+
+    n_clusters = cluster.max() + 1
+    radii = zeros(n_clusters, int)
+    maximum.at(radii, cluster, distance)
+    close = values <= radius + radii[ileader] + radii[jleader]
+    ileader, jleader = ileader[close], jleader[close]
+
+    order = cluster.argsort(kind='mergesort')
+    bounds = cluster[order].searchsorted(arange(n_clusters + 1))
+    members = lambda i: order[bounds[i]:bounds[i + 1]]
+    partners = jleader[ileader.argsort(kind='mergesort')]
+    pbounds = ileader[ileader.argsort(kind='mergesort')].searchsorted(
+        arange(n_clusters + 1))
+
+    tasks = []
+    for i in range(n_clusters):
+        rows = members(i)
+        chunks = [rows[k:k + block] for k in range(0, len(rows), block)]
+        for k, chunk in enumerate(chunks):
+            for other in chunks[k:]:
+                tasks.append((chunk, other, other is chunk))
+        others = partners[pbounds[i]:pbounds[i + 1]]
+        if len(others):
+            cols = concatenate([members(j) for j in others])
+            for chunk in chunks:
+                for k in range(0, len(cols), block):
+                    tasks.append((chunk, cols[k:k + block], False))
+
+    def tile(task):
+        rows, cols, diagonal = task
+        score, _ = _calcIdentityTile(codes[rows], codes[cols], gaps=True)
+        similar = (length - score <= radius).astype(float)
+        if diagonal:
+            similar[tril_indices(len(rows))] = 0
+        return rows, dot(similar, counts[cols]), cols, dot(counts[rows],
+                                                           similar)
+
+    # repeats of a row are its neighbors
+    neighbors = counts - 1
+    for rows, rsum, cols, csum in _mapTiles(tile, tasks, n_cpu):
+        neighbors += bincount(rows, rsum, minlength=len(codes))
+        neighbors += bincount(cols, csum, minlength=len(codes))
+    return neighbors[inverse]
+
+
 def calcMeff(msa, seqid=.8, refine=False, weight=False, **kwargs):
     """Returns the Meff for *msa*, which may be an :class:`.MSA`
     instance or a 2D Numpy character array.
@@ -625,20 +1550,63 @@ def calcMeff(msa, seqid=.8, refine=False, weight=False, **kwargs):
     Sequences are not refined by default. When *refine* is set **True**, the
     MSA will be refined by the first sequence.
 
-    The weight for each sequence are returned when *weight* is **True**."""
+    The weight for each sequence are returned when *weight* is **True**.
+
+    Sequence pairs are compared in blocks using *n_cpu* threads (default
+    is number of processors), without allocating a matrix for all pairs.
+    By default, repeated sequences are counted once and remaining sequences
+    are clustered around leader sequences, so that only sequences in
+    clusters whose leaders are close enough to contain similar sequences
+    are compared.  Results are identical to comparing all pairs, which is
+    done when *prefilter* is **False**."""
 
     msa = getMSA(msa)
-    from .msatools import msameff
     LOGGER.timeit('_meff')
-    refine = 1 if refine else 0
-    weight = 0 if weight else 1  # A Mark for return weighted array.
-    if (not weight):
-        w = zeros((msa.shape[0]), float)
-        meff = msameff(msa, theta=1.-seqid, meff_only=weight,
-                       refine=refine, w=w)
-    else:
-        meff = msameff(msa, theta=1.-seqid, meff_only=weight, refine=refine)
+
+    codes = _encodeMSA(msa, MEFF_CODES)
+    if refine:
+        codes = codes[:, (msa[0] >= b'A') & (msa[0] <= b'Z')]
+    length = codes.shape[1]
+    theta = 1. - seqid
+    number = msa.shape[0]
+    block = kwargs.get('block', SEQID_BLOCK)
+
+    if kwargs.get('prefilter', True) and length:
+        with errstate(divide='ignore', invalid='ignore'):
+            radius = (arange(length + 1) / float(length) < theta).sum() - 1
+        w = 1. + _countNeighbors(codes, radius, kwargs.get('n_cpu'), block)
+        w = 1. / w
+        meff = w.sum()
+        LOGGER.report('Meff was calculated in %.2fs.', '_meff')
+        if weight:
+            return meff, w
+        return meff
+
+    blocks = list(_iterBlocks(number, block))
+
+    def tile(task):
+        (istart, istop), (jstart, jstop) = task
+        score, _ = _calcIdentityTile(codes[istart:istop],
+                                     codes[jstart:jstop], gaps=True)
+        with errstate(divide='ignore', invalid='ignore'):
+            similar = (length - score) / float(length) < theta
+        if istart == jstart:
+            similar[tril_indices(istop - istart)] = False
+        return istart, jstart, similar.sum(1), similar.sum(0)
+
+    tasks = [(blocks[i], blocks[j]) for i in range(len(blocks))
+             for j in range(i, len(blocks))]
+    w = ones(number, float)
+    for istart, jstart, isum, jsum in _mapTiles(tile, tasks,
+                                                kwargs.get('n_cpu')):
+        w[istart:istart + len(isum)] += isum
+        w[jstart:jstart + len(jsum)] += jsum
+    w = 1. / w
+    meff = w.sum()
+
     LOGGER.report('Meff was calculated in %.2fs.', '_meff')
+    if weight:
+        return meff, w
     return meff
 
 def alignSequencesByChain(PDBs, **kwargs):
@@ -741,8 +1709,8 @@ def buildMSA(sequences, title='Unknown', labels=None, **kwargs):
         default True
     :type align: bool
 
-    :arg method: alignment method, one of either 'global' (biopython.pairwise2.align.globalms),
-        'local' (biopython.pairwise2.align.localms), clustalw(2), or another software in your path.
+    :arg method: alignment method, one of either 'global' or 'local' (:func:`.alignPairwise`),
+        clustalw(2), or another software in your path.
         Default is 'clustalw'
     :type align: str
     """
@@ -930,6 +1898,108 @@ def showAlignment(alignment, **kwargs):
         
     return
 
+def _encodeSequence(seq):
+
+    seq = str(seq)
+    if not isinstance(seq, bytes):
+        seq = seq.encode()
+    return seq
+
+
+def _alignPair(seqa, seqb, local, scores, score_only=False):
+    """Returns alignment of byte strings *seqa* and *seqb* in the layout of
+    Biopython ``pairwise2`` alignments, or only its score."""
+
+    from numpy import frombuffer
+    from .seqtools import pairalign
+
+    ops = None if score_only else empty(len(seqa) + len(seqb), 'uint8')
+    score, count, istart, jstart, iend, jend = pairalign(
+        frombuffer(seqa, 'uint8'), frombuffer(seqb, 'uint8'), ops,
+        *scores, local=int(local))
+    if score_only:
+        return score
+    if local and score <= 0:
+        return None
+
+    ops = ops[:count]
+    aligned = []
+    for seq, start, stop, skip in ((seqa, istart, iend, 2),
+                                   (seqb, jstart, jend, 1)):
+        chars = zeros(count, '|S1')
+        chars[:] = b'-'
+        chars[ops != skip] = frombuffer(seq[start:stop], '|S1')
+        aligned.append(chars.tostring())
+
+    seqa_aligned, seqb_aligned = aligned
+    begin, end = 0, count
+    if local:
+        # unaligned ends are shown like pairwise2 does, with starts
+        # right-justified and ends left-justified
+        width = max(istart, jstart)
+        seqa_aligned = (b'-' * (width - istart) + seqa[:istart] +
+                        seqa_aligned + seqa[iend:])
+        seqb_aligned = (b'-' * (width - jstart) + seqb[:jstart] +
+                        seqb_aligned + seqb[jend:])
+        length = max(len(seqa_aligned), len(seqb_aligned))
+        seqa_aligned += b'-' * (length - len(seqa_aligned))
+        seqb_aligned += b'-' * (length - len(seqb_aligned))
+        begin, end = width, width + count
+    return seqa_aligned.decode(), seqb_aligned.decode(), score, begin, end
+
+
+def alignPairwise(seq1, seq2, **kwargs):
+    """Returns global or local alignment of *seq1* and *seq2* with affine
+    gap penalties, calculated using C code.  Alignment is a tuple of
+    aligned *seq1*, aligned *seq2*, score, and beginning and end of the
+    aligned region, like those of Biopython ``pairwise2`` functions.  For
+    local alignments, unaligned residues are included and **None** is
+    returned when there is no alignment with a positive score.
+
+    When *seq2* is a list of sequences, a list of alignments of *seq1*
+    with each of them is returned, calculated using *n_cpu* threads
+    (default is number of processors).
+
+    :arg match: score of identical residues, default is 1
+    :type match: float
+
+    :arg mismatch: score of different residues, default is 0
+    :type mismatch: float
+
+    :arg gap_opening: score of opening a gap, default is -1
+    :type gap_opening: float
+
+    :arg gap_extension: score of extending a gap, default is -0.1
+    :type gap_extension: float
+
+    :arg method: ``"local"`` (default) or ``"global"``
+    :type method: str
+
+    :arg score_only: return only alignment scores, which are calculated
+        using memory proportional to sequence length, default is **False**
+    :type score_only: bool
+    """
+
+    scores = (float(kwargs.get('match', MATCH_SCORE)),
+              float(kwargs.get('mismatch', MISMATCH_SCORE)),
+              float(kwargs.get('gap_opening', GAP_PENALTY)),
+              float(kwargs.get('gap_extension', GAP_EXT_PENALTY)))
+    method = kwargs.get('method', ALIGNMENT_METHOD)
+    if method not in ('local', 'global'):
+        raise ValueError('method should be local or global')
+    local = method == 'local'
+    score_only = bool(kwargs.get('score_only', False))
+
+    seq1 = _encodeSequence(seq1)
+    if isinstance(seq2, (str, bytes, Sequence)):
+        return _alignPair(seq1, _encodeSequence(seq2), local, scores,
+                          score_only)
+
+    return _mapTiles(lambda seq: _alignPair(seq1, _encodeSequence(seq), local,
+                                            scores, score_only),
+                     seq2, kwargs.get('n_cpu'))
+
+
 def alignSequenceToMSA(seq, msa, **kwargs):
     """
     Align a sequence from a PDB or Sequence to a sequence from an MSA
@@ -959,7 +2029,7 @@ def alignSequenceToMSA(seq, msa, **kwargs):
         not an :class:`.Atomic` object.
     :type chain: str
     
-    Parameters for Biopython ``pairwise2`` alignments can be provided as 
+    Parameters for :func:`.alignPairwise` alignments can be provided as 
     keyword arguments. Default values are originally from ``proteins.compare`` 
     module, but now found in ``utilities.seqtools``.
 
@@ -975,7 +2045,7 @@ def alignSequenceToMSA(seq, msa, **kwargs):
     :arg gap_extension: a negative integer, used to penalise extending a gap
     :type gap_extension: int
 
-    :arg method: method for pairwise2 alignment. 
+    :arg method: method for pairwise alignment. 
         Possible values are ``"local"`` and ``"global"``
     :type method: str
     """
@@ -1076,16 +2146,11 @@ def alignSequenceToMSA(seq, msa, **kwargs):
     else:
         raise TypeError('The output from querying that label against msa is not a single sequence.')
     
-    if method == 'local':
-        alignment = pairwise2.align.localms(sequence, str(refMsaSeq),
-                                            match, mismatch, gap_opening, gap_extension,
-                                            one_alignment_only=1)
-    elif method == 'global':
-        alignment = pairwise2.align.globalms(sequence, str(refMsaSeq),
-                                       match, mismatch, gap_opening, gap_extension,
-                                       one_alignment_only=1)
-    else:
-        raise ValueError('method should be local or global')
+    alignment = [alignPairwise(sequence, str(refMsaSeq), match=match,
+                               mismatch=mismatch, gap_opening=gap_opening,
+                               gap_extension=gap_extension, method=method)]
+    if alignment[0] is None:
+        raise ValueError('sequence could not be aligned to {0}'.format(label))
 
     seq_indices = [0]
     msa_indices = [0]
@@ -1117,7 +2182,7 @@ def alignSequenceToMSA(seq, msa, **kwargs):
     return alignment, seq_indices, msa_indices
 
 def alignTwoSequencesWithBiopython(seq1, seq2, **kwargs):
-    """Easily align two sequences with Biopython's globalms or localms.
+    """Easily align two sequences with :func:`.alignPairwise`.
     Returns an MSA and indices for use with :func:`.showAlignment`.
 
     Alignment parameters can be provided as keyword arguments. 
@@ -1136,7 +2201,7 @@ def alignTwoSequencesWithBiopython(seq1, seq2, **kwargs):
     :arg gap_extension: a negative integer, used to penalise extending a gap
     :type gap_extension: int
 
-    :arg method: method for pairwise2 alignment. 
+    :arg method: method for pairwise alignment. 
         Possible values are 'local' and 'global'
     :type method: str
     """
@@ -1147,12 +2212,11 @@ def alignTwoSequencesWithBiopython(seq1, seq2, **kwargs):
     gap_extension = kwargs.get('gap_extension', GAP_EXT_PENALTY)
     method = kwargs.get('method', ALIGNMENT_METHOD)
     
-    if method == 'local':
-        alignment = pairwise2.align.localms(seq1, seq2, match, mismatch, gap_opening, gap_extension)
-    elif method == 'global':
-        alignment = pairwise2.align.globalms(seq1, seq2, match, mismatch, gap_opening, gap_extension)
-    else:
-        raise ValueError('method should be local or global')
+    alignment = [alignPairwise(seq1, seq2, match=match, mismatch=mismatch,
+                               gap_opening=gap_opening,
+                               gap_extension=gap_extension, method=method)]
+    if alignment[0] is None:
+        raise ValueError('sequences could not be aligned')
 
     seq_indices = [0]
     msa_indices = [0]
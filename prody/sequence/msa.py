@@ -5,9 +5,9 @@ from numbers import Integral
 
 from numpy import all, zeros, dtype, array, char, cumsum, ceil, reshape
 from numpy import where, sort, concatenate, vstack, isscalar, chararray
+from numpy import arange, bincount, repeat, log, errstate
 
 from Bio import AlignIO
-from Bio import pairwise2
 
 from prody import LOGGER, PY3K
 from prody.atomic import Atomic
@@ -16,7 +16,133 @@ from .sequence import Sequence
 
 import sys
 
-__all__ = ['MSA', 'refineMSA', 'mergeMSA', 'specMergeMSA',]
+__all__ = ['MSA', 'MSAProfile', 'refineMSA', 'mergeMSA', 'specMergeMSA',]
+
+MSA_CODES = zeros(256, 'uint8')
+MSA_CODES[65:91] = MSA_CODES[97:123] = range(1, 27)
+
+TWENTY = [1, 3, 4, 5, 6, 7, 8, 9, 11, 12, 13, 14, 16, 17, 18, 19, 20, 22,
+          23, 25]
+
+AMBIGUOUS = [(2, [4, 14]),    # B: D, N
+             (26, [5, 17]),   # Z: E, Q
+             (10, [9, 12]),   # J: I, L
+             (24, TWENTY)]    # X
+
+COUNT_ROWS = 10000
+
+
+def _countCodes(codes, weights=None):
+    """Returns an array with shape ``(length, 27)`` containing counts of
+    integer *codes* in each column, optionally weighted by *weights*."""
+
+    number, length = codes.shape
+    offset = arange(length) * 27
+    counts = zeros((length, 27))
+    for start in range(0, number, COUNT_ROWS):
+        block = codes[start:start + COUNT_ROWS] + offset
+        if weights is None:
+            block_weights = None
+        else:
+            block_weights = repeat(weights[start:start + COUNT_ROWS], length)
+        counts += bincount(block.ravel(), block_weights,
+                           minlength=length * 27).reshape((length, 27))
+    return counts
+
+
+def _allocateAmbiguous(counts):
+    """Allocate *counts* of ambiguous amino acids to the amino acids they
+    represent, in place."""
+
+    for code, targets in AMBIGUOUS:
+        counts[:, targets] += counts[:, [code]] / len(targets)
+        counts[:, code] = 0
+    return counts
+
+
+class MSAProfile(object):
+
+    """Per-column character statistics of an MSA, i.e. counts, frequencies,
+    gap fractions, occupancy and Shannon entropy of columns.  Profiles are
+    calculated once by :meth:`.MSA.getProfile` and shared by analysis
+    functions."""
+
+    def __init__(self, counts, number):
+        """*counts* is an array with shape ``(length, 27)`` as returned by
+        :meth:`.MSA.getCounts` and *number* is the total count (or weight)
+        of sequences."""
+
+        self._counts = counts
+        self._number = float(number)
+
+    def __repr__(self):
+
+        return '<MSAProfile: {0} residues>'.format(self.numResidues())
+
+    def __len__(self):
+
+        return len(self._counts)
+
+    def numResidues(self):
+        """Returns number of columns."""
+
+        return len(self._counts)
+
+    def getCounts(self):
+        """Returns a copy of the character counts array, where the first
+        column contains counts of gaps."""
+
+        return self._counts.copy()
+
+    def getFrequencies(self, omitgaps=False):
+        """Returns character frequencies in an array with shape
+        ``(length, 27)``.  When *omitgaps* is **True**, frequencies of letters
+        are calculated among non-gap characters and the gap column is zero."""
+
+        counts = self._counts
+        if not omitgaps:
+            return counts / self._number
+        freqs = zeros(counts.shape)
+        letters = counts[:, 1:]
+        with errstate(divide='ignore', invalid='ignore'):
+            freqs[:, 1:] = letters / letters.sum(1)[:, None]
+        return freqs
+
+    def getGapFraction(self):
+        """Returns fraction of gaps in each column."""
+
+        return self._counts[:, 0] / self._number
+
+    def getOccupancy(self, count=False):
+        """Returns occupancy of columns, i.e. fraction of non-gap characters.
+        If *count* is **True**, count of non-gap characters is returned."""
+
+        occupied = self._number - self._counts[:, 0]
+        if count:
+            return occupied
+        return occupied / self._number
+
+    def getEntropy(self, omitgaps=True):
+        """Returns Shannon entropy of columns, see
+        :func:`.calcShannonEntropy` for handling of gaps."""
+
+        number = self._number
+        letters = self._counts[:, 1:]
+        numgap = number - letters.sum(1)
+        if omitgaps:
+            denom = (number - numgap)[:, None]
+        else:
+            denom = number
+        with errstate(divide='ignore', invalid='ignore'):
+            probability = letters / denom
+            shannon = where(letters > 0, probability * log(probability), 0)
+            shannon = shannon.sum(1)
+            if not omitgaps:
+                probability = numgap / number
+                shannon += where(numgap > 0, probability * log(probability),
+                                 0)
+        return -shannon
+
 
 class MSA(object):
 
@@ -51,6 +177,14 @@ class MSA(object):
         self._msa = msa
         self._title = str(title) or 'Unknown'
         self._split = bool(kwargs.get('split', True))
+        self._resetCaches()
+
+    def _resetCaches(self):
+        """Reset arrays calculated from the character array."""
+
+        self._codes = None
+        self._counts = {}
+        self._profiles = {}
 
     def _map(self, mapping=None):
 
@@ -265,6 +399,7 @@ class MSA(object):
         self._msa = AB
         self._labels = labels
         self._map()
+        self._resetCaches()
 
     def isAligned(self):
         """Returns **True** if MSA is aligned."""
@@ -337,6 +472,82 @@ class MSA(object):
 
         return self._msa
 
+    def getCodes(self):
+        """Returns a copy of the integer encoded MSA array.  Letters are
+        encoded case insensitively from 1 (**A**) to 26 (**Z**), and all
+        other characters, i.e. gaps, are encoded as 0."""
+
+        return self._getCodes().copy()
+
+    def _getCodes(self):
+        """Returns integer encoded MSA array, which is calculated once."""
+
+        if self._codes is None:
+            self._codes = MSA_CODES[self._msa.view('uint8')]
+        return self._codes
+
+    def getCounts(self, ambiguity=True):
+        """Returns an array of character counts with shape ``(numResidues(),
+        27)``, where the first column contains number of gaps and the others
+        contain counts of letters encoded as in :meth:`getCodes`.  When
+        *ambiguity* is **True**, counts of ambiguous amino acids are
+        allocated as described in :func:`.calcShannonEntropy`."""
+
+        return self._getCounts(ambiguity).copy()
+
+    def _getCounts(self, ambiguity=True):
+        """Returns character counts array, which is calculated once."""
+
+        ambiguity = bool(ambiguity)
+        try:
+            return self._counts[ambiguity]
+        except KeyError:
+            pass
+
+        counts = _countCodes(self._getCodes())
+        if ambiguity:
+            _allocateAmbiguous(counts)
+
+        self._counts[ambiguity] = counts
+        return counts
+
+    def getProfile(self, ambiguity=True, weights=None):
+        """Returns an :class:`.MSAProfile` of columns.  Sequences are weighted
+        by *weights*, an array with a weight for each sequence, or **True** to
+        use weights calculated by :func:`.calcMeff`.  Profiles for unweighted
+        sequences and for :func:`.calcMeff` weights are calculated once and
+        reused, and *ambiguity* is handled as in :meth:`getCounts`."""
+
+        ambiguity = bool(ambiguity)
+        cache = weights is None or weights is True
+        if cache:
+            key = (ambiguity, weights is True)
+            try:
+                return self._profiles[key]
+            except KeyError:
+                pass
+
+        number = self.numSequences()
+        if weights is None:
+            profile = MSAProfile(self._getCounts(ambiguity), number)
+        else:
+            if weights is True:
+                from .analysis import calcMeff
+                weights = calcMeff(self, weight=True)[1]
+            else:
+                weights = array(weights, float)
+                if weights.shape != (number,):
+                    raise ValueError('weights must be an array with an '
+                                     'element for each sequence')
+            counts = _countCodes(self._getCodes(), weights)
+            if ambiguity:
+                _allocateAmbiguous(counts)
+            profile = MSAProfile(counts, weights.sum())
+
+        if cache:
+            self._profiles[key] = profile
+        return profile
+
     def getIndex(self, label):
         """Returns index of the sequence that *label* maps onto.  If *label*
         maps onto multiple sequences or *label* is a list of labels, a list
@@ -346,9 +557,17 @@ class MSA(object):
         try:
             index = self._mapping[label]
         except KeyError:
+            # full labels are found through their identifiers
+            key = splitSeqLabel(label)[0]
+            if key != label and key in self._mapping:
+                index = self._mapping[key]
+                rows = index if isinstance(index, list) else [index]
+                rows = [i for i in rows if self._labels[i] == label]
+                if rows:
+                    return rows[0] if len(rows) == 1 else rows
             try:
-                return list(v for k, v in self._mapping.items() if label in k)[0]
-            except:
+                return next(v for k, v in self._mapping.items() if label in k)
+            except Exception:
                 return None
         except TypeError:
             mapping = self._mapping
@@ -545,17 +764,21 @@ def refineMSA(msa, index=None, label=None, rowocc=None, seqid=None, colocc=None,
                 before = arr.shape[1]
                 LOGGER.timeit('_refine')
                 
-                from Bio import pairwise2
+                from .analysis import alignPairwise
                 from prody.utilities import MATCH_SCORE, MISMATCH_SCORE
-                from prody.utilities import GAP_PENALTY, GAP_EXT_PENALTY, ALIGNMENT_METHOD
+                from prody.utilities import GAP_PENALTY, GAP_EXT_PENALTY
 
                 chseq = chain.getSequence()
-                algn = pairwise2.align.localms(pystr(arr[index].tostring().upper()), pystr(chseq),
-                                         MATCH_SCORE, MISMATCH_SCORE,
-                                         GAP_PENALTY, GAP_EXT_PENALTY,
-                                         one_alignment_only=1)
+                algn = alignPairwise(pystr(arr[index].tostring().upper()), pystr(chseq),
+                                     method='local', match=MATCH_SCORE,
+                                     mismatch=MISMATCH_SCORE,
+                                     gap_opening=GAP_PENALTY,
+                                     gap_extension=GAP_EXT_PENALTY)
+                if algn is None:
+                    raise ValueError('chain sequence does not align to the '
+                                     'reference sequence')
                 torf = []
-                for s, c in zip(*algn[0][:2]):
+                for s, c in zip(*algn[:2]):
                     if s == '-':
                         continue
                     elif c != '-':
@@ -567,6 +790,7 @@ def refineMSA(msa, index=None, label=None, rowocc=None, seqid=None, colocc=None,
                 assert tsum <= before, 'problem in mapping sequence to structure'
                 if tsum < before:
                     arr = arr.take(torf.nonzero()[0], 1)
+                    cols = cols[torf.nonzero()[0]]
                     resnums = resnums.take(torf.nonzero()[0]-torf.nonzero()[0][0]+1)
                     LOGGER.report('Structure refinement reduced number of '
                                   'columns from {0} to {1} in %.2fs.'
@@ -626,7 +850,14 @@ def refineMSA(msa, index=None, label=None, rowocc=None, seqid=None, colocc=None,
             raise TypeError('colocc must be a float ({0})'.format(str(err)))
         assert 0. <= colocc <= 1., 'colocc must be between 0 and 1'
 
-        cols = (calcMSAOccupancy(arr, 'col') >= colocc).nonzero()[0]
+        if msa is not None and rows is None:
+            # columns of the original alignment have cached occupancy
+            occupancy = calcMSAOccupancy(msa, 'col')
+            if cols is not None:
+                occupancy = occupancy[cols]
+        else:
+            occupancy = calcMSAOccupancy(arr, 'col')
+        cols = (occupancy >= colocc).nonzero()[0]
         arr = arr.take(cols, 1)
         title.append('colocc>=' + str(colocc))
         LOGGER.report('Column occupancy refinement reduced number of columns '
@@ -4,16 +4,19 @@ analyzing multiple sequence alignments."""
 
 __author__ = 'Anindita Dutta, Ahmet Bakan'
 
+import os
 from os.path import isfile, splitext, split, getsize
 
-from numpy import array, fromstring, empty
+from numpy import array, fromstring, empty, load, arange
+from numpy import savez, searchsorted, argsort, unique, concatenate
 
 from .sequence import splitSeqLabel, Sequence
 
 from prody import LOGGER, PY3K
 from prody.utilities import openFile, isListLike
 
-__all__ = ['MSAFile', 'splitSeqLabel', 'parseMSA', 'writeMSA']
+__all__ = ['MSAFile', 'splitSeqLabel', 'parseMSA', 'writeMSA',
+           'saveMSA', 'loadMSA', 'indexMSA']
 
 if PY3K:
     basestring = str
@@ -55,6 +58,8 @@ NUMLINES = 1000
 LEN_FASTA_LINE = 60
 LEN_SELEX_LABEL = 31
 
+MSA_INDEX = '.index'
+
 
 class MSAFile(object):
 
@@ -331,10 +336,9 @@ class MSAFile(object):
         lines = readlines(NUMLINES)
         while lines:
             for line in lines:
-                ch = line[0]
-                if ch == '#' or ch == '/':
-                    continue
                 items = line.split()
+                if not items or line[0] == '#' or line[0] == '/':
+                    continue
                 if len(items) == 2:
                     label = items[0]
                     seq = items[1]
@@ -521,9 +525,16 @@ def parseMSAHeader(filename, **kwargs):
 def parseMSA(filename, **kwargs):
     """Returns an :class:`.MSA` instance that stores multiple sequence alignment
     and sequence labels parsed from Stockholm, SELEX, CLUSTAL, PIR, or FASTA format
-    *filename* file, which may be a compressed file. Uncompressed MSA files
-    are parsed using C code at a fraction of the time it would take to parse
-    compressed files in Python."""
+    *filename* file, which may be a compressed file. Aligned FASTA, SELEX and
+    Stockholm files, including gzip compressed ones, are parsed using C code
+    at a fraction of the time it would take to parse them in Python.
+    *filter*, *filter_full* and *slice* arguments are applied while parsing,
+    see :class:`.MSAFile` for details.
+
+    When *labels*, a list of full sequence labels or identifiers, is given,
+    only matching sequences are parsed in the order they appear in the file.
+    Records of uncompressed FASTA and SELEX/Stockholm files are read
+    directly using an index built by :func:`indexMSA`."""
 
     from .msa import MSA
 
@@ -536,18 +547,76 @@ def parseMSA(filename, **kwargs):
             raise IOError('[Errno 2] No such file or directory: ' +
                           repr(filename))
 
-    # if MSA is a compressed file or filter/slice is passed, use
-    #   Python parsers
-
     LOGGER.timeit('_parsemsa')
 
     title, ext = splitext(filename)
     title = split(title)[1]
+    compressed = ext.lower() == '.gz'
+    if compressed:
+        title, ext = splitext(title)
+    format = kwargs.get('format', MSAEXTMAP.get(ext.lower()))
+    try:
+        format = MSAFORMATS.get(format.lower(), format)
+    except AttributeError:
+        pass
     aligned = kwargs.get('aligned', True)
-    if (ext.lower() == '.gz' or 'filter' in kwargs or 'slice' in kwargs or
+
+    labels = kwargs.pop('labels', None)
+    if labels is not None:
+        if isinstance(labels, basestring) or not isListLike(labels):
+            raise TypeError('labels must be a list of strings')
+        if not compressed and aligned and format in (FASTA, SELEX, STOCKHOLM):
+            msa = _parseIndexed(filename, labels, format, title, **kwargs)
+            if msa is not None:
+                LOGGER.report('{0} sequence(s) with {1} residues were parsed '
+                              'in %.2fs.'.format(*msa._getArray().shape),
+                              '_parsemsa')
+            return msa
+        wanted = set(labels)
+        filter = kwargs.get('filter', None)
+        if filter is not None and not kwargs.get('filter_full', False):
+            filter = lambda label, seq, func=filter: func(
+                splitSeqLabel(label)[0], seq)
+        kwargs['filter'] = lambda label, seq, func=filter: (
+            (label in wanted or splitSeqLabel(label)[0] in wanted) and
+            (func is None or func(label, seq)))
+        kwargs['filter_full'] = True
+
+    # aligned FASTA and SELEX/Stockholm files are parsed, filtered and
+    #   sliced in C, other compressed or unaligned MSAs use Python parsers,
+    #   as do compressed files when C parsers are built without zlib
+    from .msaio import HAS_ZLIB
+    if (aligned and format in (FASTA, SELEX, STOCKHOLM) and
+            (HAS_ZLIB or not compressed)):
+        if format == FASTA:
+            from .msaio import parseFasta as parser
+        else:
+            from .msaio import parseSelex as parser
+        filesize = getsize(filename)
+        msaarr = empty(filesize * 4 if compressed else filesize, '|S1')
+
+        filter = kwargs.get('filter', None)
+        if filter is not None:
+            if not callable(filter):
+                raise TypeError('filter must be callable')
+            if not kwargs.get('filter_full', False):
+                filter = lambda label, seq, func=filter: func(
+                    splitSeqLabel(label)[0], seq)
+        slc = kwargs.get('slice', None)
+        if slc is not None:
+            slc = lambda length, slc=slc: arange(length)[slc]
+
+        msaarr, labels, mapping, lcount = parser(filename, msaarr,
+                                                 filter=filter, slice=slc)
+        if lcount != len(msaarr):
+            LOGGER.warn('Failed to parse {0} sequence labels.'
+                        .format(len(msaarr) - lcount))
+        if not len(msaarr):
+            LOGGER.warn('No sequences were parsed from {0}.'.format(filename))
+            return
+
+    elif (compressed or 'filter' in kwargs or 'slice' in kwargs or
             not aligned):
-        if ext.lower() == '.gz':
-            title = splitext(title)[0]
         msa = MSAFile(filename, **kwargs)
         seqlist = []
         sappend = seqlist.append
@@ -580,26 +649,14 @@ def parseMSA(filename, **kwargs):
         else:
             msaarr = array(seqlist, '|S' + str(maxlen))
     else:
-        filesize = getsize(filename)
-        format = MSAEXTMAP.get(splitext(filename)[1])
-        format = kwargs.get('format', format)
-
-        if format == FASTA:
-            from .msaio import parseFasta as parser
-            msaarr = empty(filesize, '|S1')
-        elif format == SELEX or format == STOCKHOLM:
-            from .msaio import parseSelex as parser
-            msaarr = empty(filesize, '|S1')
-        elif format == CLUSTAL:
+        if format == CLUSTAL:
             parser = parseClustal
-            msaarr = []
         elif format == PIR:
             parser = parsePIR
-            msaarr = []
         else:
             raise IOError('MSA file format is not recognized from the '
                           'extension')
-        msaarr, labels, mapping, lcount = parser(filename, msaarr)
+        msaarr, labels, mapping, lcount = parser(filename, [])
         if lcount != len(msaarr):
             LOGGER.warn('Failed to parse {0} sequence labels.'
                         .format(len(msaarr) - lcount))
@@ -945,3 +1002,265 @@ def writeMSA(filename, msa, **kwargs):
                        label_length=kwargs.get('label_length',
                                                LEN_SELEX_LABEL))
     return filename
+
+
+def saveMSA(msa, filename=None):
+    """Save *msa* in ProDy internal format and return the path.  Character
+    and integer encoded arrays, sequence labels, and attributes of *msa* are
+    saved in an uncompressed file with :file:`.msa.npz` extension.  Title of
+    *msa* is used as the filename, when *filename* is not given.  Use
+    :func:`loadMSA` to load the saved alignment."""
+
+    from .msa import MSA
+
+    if not isinstance(msa, MSA):
+        raise TypeError('msa must be an MSA instance, not {0}'
+                        .format(type(msa).__name__))
+
+    if filename is None:
+        filename = msa.getTitle().replace(' ', '_')
+    if not filename.endswith('.msa.npz'):
+        filename += '.msa.npz'
+
+    attr_dict = {'msa': msa._getArray(), 'codes': msa._getCodes(),
+                 'labels': array(msa._labels, dtype=str),
+                 'title': array(msa.getTitle()),
+                 'aligned': array(bool(msa._aligned)),
+                 'split': array(bool(msa._split))}
+    ostream = openFile(filename, 'wb')
+    savez(ostream, **attr_dict)
+    ostream.close()
+    return filename
+
+
+def loadMSA(filename, mmap=True):
+    """Returns an :class:`.MSA` instance loaded from *filename* saved using
+    :func:`saveMSA`.  By default, character and integer encoded arrays are
+    memory mapped in read-only mode, so that large alignments are opened
+    instantly and their memory is shared by processes loading the same
+    file.  Pass ``mmap=False`` to read arrays into memory."""
+
+    from .msa import MSA
+
+    if not isfile(filename):
+        raise IOError('{0} is not a valid file'.format(repr(filename)))
+
+    attr_dict = load(filename, allow_pickle=False)
+    try:
+        files = set(attr_dict.files)
+        if not files.issuperset(['msa', 'codes', 'labels', 'title']):
+            raise IOError('{0} is not a saved MSA'.format(repr(filename)))
+        msa = MSA.__new__(MSA)
+        msa._title = str(attr_dict['title'])
+        msa._labels = attr_dict['labels'].tolist()
+        msa._aligned = bool(attr_dict['aligned'])
+        msa._split = bool(attr_dict['split'])
+        if mmap:
+            arrays = _mapArchive(filename, ('msa', 'codes'))
+        else:
+            arrays = attr_dict['msa'], attr_dict['codes']
+    finally:
+        attr_dict.close()
+
+    msa._msa = arrays[0]
+    msa._map()
+    msa._resetCaches()
+    msa._codes = arrays[1]
+    return msa
+
+
+def _mapArchive(filename, names):
+    """Returns read-only memory maps of arrays *names* stored without
+    compression in :file:`.npz` *filename*."""
+
+    from zipfile import ZipFile, ZIP_STORED
+    from numpy import memmap
+    from numpy.lib import format as npyformat
+
+    arrays = []
+    with ZipFile(filename) as archive:
+        infos = [archive.getinfo(name + '.npy') for name in names]
+    with open(filename, 'rb') as stream:
+        for info in infos:
+            if info.compress_type != ZIP_STORED:
+                raise IOError('{0} is compressed and cannot be memory mapped'
+                              .format(info.filename))
+            stream.seek(info.header_offset)
+            header = stream.read(30)
+            skip = (ord(header[26:27]) + 256 * ord(header[27:28]) +
+                    ord(header[28:29]) + 256 * ord(header[29:30]))
+            stream.seek(info.header_offset + 30 + skip)
+            version = npyformat.read_magic(stream)
+            if version == (1, 0):
+                shape, fortran, dtype = \
+                    npyformat.read_array_header_1_0(stream)
+            else:
+                shape, fortran, dtype = \
+                    npyformat.read_array_header_2_0(stream)
+            arrays.append(memmap(filename, dtype, 'r', stream.tell(), shape,
+                                 'F' if fortran else 'C'))
+    return arrays
+
+
+def indexMSA(filename, **kwargs):
+    """Returns path of the index of uncompressed FASTA or SELEX/Stockholm
+    *filename*, which stores labels, file offsets and lengths of sequences
+    for reading them directly, see *labels* argument of :func:`parseMSA`.
+    Index is saved next to *filename* with :file:`.index` extension, and
+    is built again when *filename* is modified."""
+
+    index = _loadIndex(filename, kwargs.get('format'))
+    return index['path']
+
+
+def _getIndexFormat(filename, format=None):
+
+    title, ext = splitext(filename)
+    if ext.lower() == '.gz':
+        raise ValueError('compressed files cannot be indexed')
+    if format is None:
+        format = MSAEXTMAP.get(ext.lower())
+    try:
+        format = MSAFORMATS.get(format.lower(), format)
+    except AttributeError:
+        pass
+    if format not in (FASTA, SELEX, STOCKHOLM):
+        raise ValueError('only FASTA and SELEX/Stockholm files can be '
+                         'indexed')
+    return format
+
+
+def _buildIndex(filename, format):
+    """Returns full labels, identifiers, byte offsets and lengths of
+    sequence records in *filename*."""
+
+    labels = []
+    offsets = []
+    lengths = []
+    offset = 0
+    with open(filename, 'rb') as stream:
+        if format == FASTA:
+            start = None
+            for line in stream:
+                if line.startswith(b'>'):
+                    if start is not None:
+                        lengths.append(offset - start)
+                    labels.append(line[1:].strip())
+                    start = offset + len(line)
+                    offsets.append(start)
+                offset += len(line)
+            if start is not None:
+                lengths.append(offset - start)
+        else:
+            for line in stream:
+                if line[:1] in (b'#', b'/', b'%') or not line.strip():
+                    offset += len(line)
+                    continue
+                items = line.split()
+                seq = items[-1]
+                labels.append(b' '.join(items[:-1]))
+                offsets.append(offset + line.rindex(seq))
+                lengths.append(len(seq))
+                offset += len(line)
+
+    keys = [splitSeqLabel(label.decode())[0].encode() for label in labels]
+    return (array(labels, 'S'), array(keys, 'S'), array(offsets, 'int64'),
+            array(lengths, 'int64'))
+
+
+def _loadIndex(filename, format=None):
+    """Returns index of *filename* as a dictionary, after building and
+    saving it when it is missing or outdated."""
+
+    format = _getIndexFormat(filename, format)
+    path = filename + MSA_INDEX
+    stamp = array([os.path.getsize(filename), os.path.getmtime(filename)])
+    try:
+        with load(path) as data:
+            index = dict(data)
+    except Exception:
+        pass
+    else:
+        if (str(index.get('format')) == format and
+                (index.get('stamp') == stamp).all()):
+            index['path'] = path
+            return index
+
+    LOGGER.timeit('_indexmsa')
+    labels, keys, offsets, lengths = _buildIndex(filename, format)
+    index = {'format': array(format), 'stamp': stamp, 'labels': labels,
+             'keys': keys, 'offsets': offsets, 'lengths': lengths,
+             'label_order': argsort(labels, kind='mergesort'),
+             'key_order': argsort(keys, kind='mergesort')}
+    try:
+        with open(path, 'wb') as out:
+            savez(out, **index)
+    except (IOError, OSError) as err:
+        LOGGER.warn('Index of {0} could not be saved ({1}).'
+                    .format(filename, err))
+        path = None
+    LOGGER.report('{0} sequence(s) were indexed in %.2fs.'
+                  .format(len(labels)), '_indexmsa')
+    index['path'] = path
+    return index
+
+
+def _findIndexed(values, order, wanted):
+    """Returns positions of elements of *values*, which are sorted by
+    *order*, equal to elements of *wanted*, and whether each element of
+    *wanted* is found."""
+
+    ordered = values[order]
+    starts = searchsorted(ordered, wanted, 'left')
+    stops = searchsorted(ordered, wanted, 'right')
+    found = [order[start:stop] for start, stop in zip(starts, stops)]
+    return concatenate(found + [array([], int)]), stops > starts
+
+
+def _parseIndexed(filename, labels, format, title=None, **kwargs):
+    """Returns an :class:`.MSA` with sequences from *filename* whose full
+    labels or identifiers are in *labels*, read using the index."""
+
+    from .msa import MSA
+
+    index = _loadIndex(filename, format)
+    wanted = unique(array([label.encode() if PY3K and
+                           isinstance(label, str) else label
+                           for label in labels], 'S'))
+    full, infull = _findIndexed(index['labels'], index['label_order'],
+                                wanted)
+    split, insplit = _findIndexed(index['keys'], index['key_order'], wanted)
+    rows = unique(concatenate([full, split]))
+    missing = len(wanted) - (infull | insplit).sum()
+    if missing:
+        LOGGER.warn('{0} of {1} labels were not found in {2}.'
+                    .format(missing, len(wanted), filename))
+
+    filter = kwargs.get('filter', None)
+    filter_full = kwargs.get('filter_full', False)
+    offsets, lengths = index['offsets'], index['lengths']
+    seqlist = []
+    labels = []
+    with open(filename, 'rb') as stream:
+        for row in rows:
+            stream.seek(offsets[row])
+            seq = b''.join(stream.read(lengths[row]).split())
+            label = index['labels'][row].decode()
+            if filter is not None:
+                if not filter(label if filter_full else
+                              splitSeqLabel(label)[0], seq.decode()):
+                    continue
+            if seqlist and len(seq) != len(seqlist[0]):
+                raise IOError('sequence for {0} does not have expected '
+                              'length {1}'.format(label, len(seqlist[0])))
+            seqlist.append(seq)
+            labels.append(label)
+
+    if not seqlist:
+        LOGGER.warn('No sequences were parsed from {0}.'.format(filename))
+        return
+    msaarr = array(seqlist, 'S').view('|S1').reshape((len(seqlist), -1))
+    slc = kwargs.get('slice', None)
+    if slc is not None:
+        msaarr = msaarr[:, arange(msaarr.shape[1])[slc]]
+    return MSA(msa=msaarr, title=title, labels=labels)
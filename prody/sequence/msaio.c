@@ -1,6 +1,32 @@
+#define PY_SSIZE_T_CLEAN
 #include "Python.h"
 #define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
 #include "numpy/arrayobject.h"
+
+#ifdef MSAIO_NO_ZLIB
+#include <stdio.h>
+#define MSASTREAM FILE *
+#define msaopen(filename) fopen(filename, "rb")
+#define msagets(line, size, file) fgets(line, size, file)
+#define msaclose(file) fclose(file)
+#define MSAIO_HAS_ZLIB 0
+#else
+/* files are read through zlib, which reads uncompressed files as they are */
+#include <zlib.h>
+#define MSASTREAM gzFile
+#define MSABUFFER 131072
+static gzFile msaopen(char *filename) {
+    gzFile file = gzopen(filename, "rb");
+    #if ZLIB_VERNUM >= 0x1240
+    if (file)
+        gzbuffer(file, MSABUFFER);
+    #endif
+    return file;
+}
+#define msagets(line, size, file) gzgets(file, line, size)
+#define msaclose(file) gzclose(file)
+#define MSAIO_HAS_ZLIB 1
+#endif
 #define LENLABEL 100
 #define FASTALINELEN 10000
 #define SELEXLINELEN 10000
@@ -87,79 +113,379 @@ static int parseLabel(PyObject *labels, PyObject *mapping, char *line,
 }
 
 
-static PyObject *parseFasta(PyObject *self, PyObject *args) {
+/* Read a whole line of *file* into *line*, growing it as needed, and return
+   its length including the newline character, or -1 at the end of file. */
+
+static long readLine(MSASTREAM file, char **line, long *size) {
+
+    long length = 0;
+    char *grown;
+
+    while (msagets(*line + length, *size - length, file) != NULL) {
+        length += strlen(*line + length);
+        if (length && (*line)[length - 1] == '\n')
+            return length;
+        if (length < *size - 1)
+            return length;
+        grown = realloc(*line, *size * 2);
+        if (!grown) {
+            PyErr_NoMemory();
+            return -2;
+        }
+        *line = grown;
+        *size *= 2;
+    }
+    return length ? length : -1;
+}
+
+
+/* Return a pointer to the data of 1-dimensional *msa* with room for at
+   least *need* characters, resizing the array when necessary. */
+
+static char *growArray(PyArrayObject *msa, npy_intp need) {
+
+    npy_intp size = PyArray_SIZE(msa);
+    if (need <= size)
+        return (char *) PyArray_DATA(msa);
+
+    size = size * 2 > need ? size * 2 : need;
+    PyArray_Dims dims = {&size, 1};
+    PyObject *none = PyArray_Resize(msa, &dims, 0, NPY_CORDER);
+    if (!none)
+        return NULL;
+    Py_DECREF(none);
+    return (char *) PyArray_DATA(msa);
+}
+
+
+typedef struct {
+    PyArrayObject *msa;
+    PyObject *labels, *mapping, *filter, *slice, *columns;
+    npy_intp *cols, ncols, index;
+    long seqlen, count;
+} Records;
+
+
+/* Append sequence *seq* with *label* to *records*, unless it is rejected
+   by the filter.  Selected columns are copied into the MSA array.  Return
+   0 when successful, -1 when a Python error is raised, and 1 when sequence
+   length differs from that of the first sequence. */
+
+static int addRecord(Records *records, char *seq, long seqlen,
+                     char *label, long lablen) {
+
+    npy_intp i;
+    char *data;
+
+    if (records->seqlen < 0) {
+        records->seqlen = seqlen;
+        if (records->slice != Py_None) {
+            PyObject *columns = PyObject_CallFunction(records->slice, "l",
+                                                      seqlen);
+            if (!columns)
+                return -1;
+            records->columns = PyArray_FROMANY(columns, NPY_INTP, 1, 1,
+                                               NPY_ARRAY_CARRAY);
+            Py_DECREF(columns);
+            if (!records->columns)
+                return -1;
+            records->cols = (npy_intp *) PyArray_DATA(
+                (PyArrayObject *) records->columns);
+            records->ncols = PyArray_SIZE((PyArrayObject *) records->columns);
+            for (i = 0; i < records->ncols; i++)
+                if (records->cols[i] < 0 || records->cols[i] >= seqlen) {
+                    PyErr_SetString(PyExc_IndexError,
+                                    "slice selects invalid columns");
+                    return -1;
+                }
+        } else
+            records->ncols = seqlen;
+    } else if (records->seqlen != seqlen)
+        return 1;
+
+    if (records->filter != Py_None) {
+        for (i = 0; i < lablen; i++)
+            if (label[i] < 32 && label[i] != 20)
+                break;
+        PyObject *result = PyObject_CallFunction(records->filter, "s#s#",
+                                                 label, (Py_ssize_t) i,
+                                                 seq, (Py_ssize_t) seqlen);
+        if (!result)
+            return -1;
+        int keep = PyObject_IsTrue(result);
+        Py_DECREF(result);
+        if (keep < 0)
+            return -1;
+        if (!keep)
+            return 0;
+    }
+
+    data = growArray(records->msa, records->index + records->ncols);
+    if (!data)
+        return -1;
+    data += records->index;
+    if (records->cols) {
+        npy_intp *cols = records->cols;
+        for (i = 0; i < records->ncols; i++)
+            data[i] = seq[cols[i]];
+    } else
+        memcpy(data, seq, seqlen);
+    records->index += records->ncols;
+
+    records->count += parseLabel(records->labels, records->mapping, label,
+                                 lablen);
+    return 0;
+}
 
-    /* Parse sequences from *filename* into the memory pointed by the
-       Numpy array passed as Python object. */
+
+/* Reshape MSA array to 2 dimensions and return the parsing result, or
+   release references and return NULL when *error* is set. */
+
+static PyObject *finishRecords(Records *records, int error) {
+
+    PyObject *result = NULL;
+
+    if (!error) {
+        npy_intp ncols = records->ncols > 0 ? records->ncols : 0;
+        npy_intp dims[2] = {ncols ? records->index / ncols : 0, ncols};
+        PyArray_Dims arr_dims = {dims, 2};
+        PyObject *none = PyArray_Resize(records->msa, &arr_dims, 0,
+                                        NPY_CORDER);
+        if (none) {
+            Py_DECREF(none);
+            result = Py_BuildValue("(OOOl)", records->msa, records->labels,
+                                   records->mapping, records->count);
+        }
+    }
+    Py_XDECREF(records->columns);
+    Py_DECREF(records->labels);
+    Py_DECREF(records->mapping);
+    return result;
+}
+
+
+static int initRecords(Records *records, PyArrayObject *msa,
+                       PyObject *filter, PyObject *slice) {
+
+    if (!PyArray_Check(msa) || PyArray_NDIM(msa) != 1 ||
+        PyArray_ITEMSIZE(msa) != 1 || !PyArray_ISCARRAY(msa)) {
+        PyErr_SetString(PyExc_TypeError, "msa must be a contiguous "
+                        "1-dimensional character array");
+        return 0;
+    }
+    if ((filter != Py_None && !PyCallable_Check(filter)) ||
+        (slice != Py_None && !PyCallable_Check(slice))) {
+        PyErr_SetString(PyExc_TypeError, "filter and slice must be callable");
+        return 0;
+    }
+    records->msa = msa;
+    records->labels = PyList_New(0);
+    records->mapping = PyDict_New();
+    if (!records->labels || !records->mapping) {
+        Py_XDECREF(records->labels);
+        Py_XDECREF(records->mapping);
+        PyErr_NoMemory();
+        return 0;
+    }
+    records->filter = filter;
+    records->slice = slice;
+    records->columns = NULL;
+    records->cols = NULL;
+    records->ncols = -1;
+    records->index = 0;
+    records->seqlen = -1;
+    records->count = 0;
+    return 1;
+}
+
+
+static PyObject *parseFasta(PyObject *self, PyObject *args,
+                            PyObject *kwargs) {
+
+    /* Parse sequences from *filename*, which may be compressed, into the
+       Numpy array passed as Python object, which is resized as needed.
+       Sequences are selected by *filter* and columns by *slice*, both
+       callables when given. */
 
     char *filename;
     PyArrayObject *msa;
+    PyObject *filter = Py_None, *slice = Py_None;
+
+    static char *kwlist[] = {"filename", "msa", "filter", "slice", NULL};
 
-    if (!PyArg_ParseTuple(args, "sO", &filename, &msa))
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "sO|OO", kwlist,
+                                     &filename, &msa, &filter, &slice))
         return NULL;
 
-    PyObject *labels = PyList_New(0), *mapping = PyDict_New();
-    if (!labels || !mapping)
-        return PyErr_NoMemory();
+    Records records;
+    if (!initRecords(&records, msa, filter, slice))
+        return NULL;
 
-    char *line = malloc((FASTALINELEN) * sizeof(char));
-    if (!line)
-        return PyErr_NoMemory();
+    char errmsg[LENLABEL] = "failed to parse FASTA file at line ";
+    long size = FASTALINELEN, lsize = LENLABEL, ssize = FASTALINELEN;
+    char *line = malloc(size * sizeof(char));
+    char *label = malloc(lsize * sizeof(char));
+    char *seq = malloc(ssize * sizeof(char));
+    if (!line || !label || !seq) {
+        free(line);
+        free(label);
+        free(seq);
+        PyErr_NoMemory();
+        return finishRecords(&records, 1);
+    }
 
-    char *data = (char *) PyArray_DATA(msa);
+    MSASTREAM file = msaopen(filename);
+    if (!file) {
+        free(line);
+        free(label);
+        free(seq);
+        PyErr_SetFromErrnoWithFilename(PyExc_IOError, filename);
+        return finishRecords(&records, 1);
+    }
 
-    int aligned = 1;
-    char ch, errmsg[LENLABEL] = "failed to parse FASTA file at line ";
-    long index = 0, count = 0;
-    long iline = 0, i, seqlen = 0, curlen = 0;
+    long iline = 0, length, lablen = -1, curlen = 0, i;
+    int status = 0;
+    char ch, *grown;
 
-    FILE *file = fopen(filename, "rb");
-    while (fgets(line, FASTALINELEN, file) != NULL) {
+    while ((length = readLine(file, &line, &size)) >= 0) {
         iline++;
         if (line[0] == '>') {
-            if (seqlen != curlen) {
-                if (seqlen) {
-                    aligned = 0;
-                    free(line);
-                    free(data);
-                    fclose(file);
-                    PyErr_SetString(PyExc_IOError, intcat(errmsg, iline));
-                    return NULL;
-                } else
-                    seqlen = curlen;
+            if (lablen >= 0) {
+                status = addRecord(&records, seq, curlen, label, lablen);
+                if (status)
+                    break;
             }
             // `line + 1` is to omit `>` character
-            count += parseLabel(labels, mapping, line + 1, FASTALINELEN);
+            lablen = length - 1;
+            if (lablen >= lsize) {
+                lsize = lablen + 1;
+                grown = realloc(label, lsize);
+                if (!grown) {
+                    PyErr_NoMemory();
+                    status = -1;
+                    break;
+                }
+                label = grown;
+            }
+            memcpy(label, line + 1, lablen);
+            label[lablen] = '\0';
             curlen = 0;
         } else {
-            for (i = 0; i < FASTALINELEN; i++) {
+            if (curlen + length > ssize) {
+                ssize = (curlen + length) * 2;
+                grown = realloc(seq, ssize);
+                if (!grown) {
+                    PyErr_NoMemory();
+                    status = -1;
+                    break;
+                }
+                seq = grown;
+            }
+            for (i = 0; i < length; i++) {
                 ch = line[i];
                 if (ch < 32)
                     break;
-                else {
-                    data[index++] = ch;
-                    curlen++;
-                }
+                seq[curlen++] = ch;
             }
         }
     }
-    fclose(file);
-
+    if (length == -2)
+        status = -1;
+    else if (!status && lablen >= 0)
+        status = addRecord(&records, seq, curlen, label, lablen);
+    msaclose(file);
     free(line);
-    if (aligned && seqlen != curlen) {
+    free(label);
+    free(seq);
+
+    if (status > 0)
         PyErr_SetString(PyExc_IOError, intcat(errmsg, iline));
+    return finishRecords(&records, status);
+}
+
+
+static PyObject *parseSelex(PyObject *self, PyObject *args,
+                            PyObject *kwargs) {
+
+    /* Parse sequences from *filename*, which may be compressed, into the
+       Numpy array passed as Python object, which is resized as needed.
+       Sequences are selected by *filter* and columns by *slice*, both
+       callables when given. */
+
+    char *filename;
+    PyArrayObject *msa;
+    PyObject *filter = Py_None, *slice = Py_None;
+
+    static char *kwlist[] = {"filename", "msa", "filter", "slice", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "sO|OO", kwlist,
+                                     &filename, &msa, &filter, &slice))
+        return NULL;
+
+    Records records;
+    if (!initRecords(&records, msa, filter, slice))
         return NULL;
+
+    char errmsg[LENLABEL] = "failed to parse SELEX/Stockholm file at line ";
+    long size = SELEXLINELEN + 1;
+    char *line = malloc(size * sizeof(char));
+    if (!line) {
+        PyErr_NoMemory();
+        return finishRecords(&records, 1);
     }
 
-    npy_intp dims[2] = {index / seqlen, seqlen};
-    PyArray_Dims arr_dims;
-    arr_dims.ptr = dims;
-    arr_dims.len = 2;
-    PyArray_Resize(msa, &arr_dims, 0, NPY_CORDER);
-    PyObject *result = Py_BuildValue("(OOOi)", msa, labels, mapping, count);
-    Py_DECREF(labels);
-    Py_DECREF(mapping);
-    return result;
+    MSASTREAM file = msaopen(filename);
+    if (!file) {
+        free(line);
+        PyErr_SetFromErrnoWithFilename(PyExc_IOError, filename);
+        return finishRecords(&records, 1);
+    }
+
+    long iline = 0, length, i, beg = -1, end = 0, space = 0;
+    int status = 0;
+
+    while ((length = readLine(file, &line, &size)) >= 0) {
+        iline++;
+        if (line[0] == '#' || line[0] == '/' || line[0] == '%' ||
+            line[0] < 32)
+            continue;
+
+        /* figure out where the sequence starts in the first line */
+        if (beg < 0) {
+            for (i = 0; i < length; i++)
+                if (line[i] == ' ')
+                    break;
+            for (; i < length; i++)
+                if (line[i] != ' ')
+                    break;
+            beg = i;
+            space = beg - 1; /* index of space character before sequence */
+        }
+
+        for (end = beg; end < length; end++)
+            if (line[end] < 32)
+                break;
+        if (space < 0 || space >= length || line[space] != ' ') {
+            status = 1;
+            break;
+        }
+
+        /* labels are padded with spaces to align sequences */
+        for (i = space; i > 0; i--)
+            if (line[i - 1] != ' ')
+                break;
+        status = addRecord(&records, line + beg, end - beg, line, i);
+        if (status)
+            break;
+    }
+    if (length == -2)
+        status = -1;
+    msaclose(file);
+    free(line);
+
+    if (status > 0)
+        PyErr_SetString(PyExc_IOError, intcat(errmsg, iline));
+    return finishRecords(&records, status);
 }
 
 
@@ -233,86 +559,6 @@ static PyObject *writeFasta(PyObject *self, PyObject *args, PyObject *kwargs) {
     return Py_BuildValue("s", filename);
 }
 
-static PyObject *parseSelex(PyObject *self, PyObject *args) {
-
-    /* Parse sequences from *filename* into the the memory pointed by the
-       Numpy array passed as Python object.  */
-
-    char *filename;
-    PyArrayObject *msa;
-
-    if (!PyArg_ParseTuple(args, "sO", &filename, &msa))
-        return NULL;
-
-    long i = 0, beg = 0, end = 0;
-    long size = SELEXLINELEN + 1, iline = 0, seqlen = 0;
-    char errmsg[LENLABEL] = "failed to parse SELEX/Stockholm file at line ";
-
-    PyObject *labels = PyList_New(0), *mapping = PyDict_New();
-    if (!labels || !mapping)
-        return PyErr_NoMemory();
-    char *line = malloc(size * sizeof(char));
-    if (!line)
-        return PyErr_NoMemory();
-    char *data = (char *) PyArray_DATA(msa);
-    /* figure out where the sequence starts and ends in a line*/
-    FILE *file = fopen(filename, "rb");
-    while (fgets(line, size, file) != NULL) {
-        iline++;
-        if (line[0] == '#' || line[0] == '/' || line[0] == '%')
-            continue;
-        for (i = 0; i < size; i++)
-            if (line[i] == ' ')
-                break;
-        for (; i < size; i++)
-            if (line[i] != ' ')
-                break;
-        beg = i;
-        for (; i < size; i++)
-            if (line[i] < 32)
-                break;
-        end = i;
-        seqlen = end - beg;
-        break;
-    }
-    iline--;
-    fseek(file, - strlen(line), SEEK_CUR);
-
-    long index = 0, count = 0;
-
-    int space = beg - 1; /* index of space character before sequence */
-    while (fgets(line, size, file) != NULL) {
-        iline++;
-        if (line[0] == '#' || line[0] == '/' || line[0] == '%')
-            continue;
-
-        if (line[space] != ' ') {
-            free(line);
-            fclose(file);
-            PyErr_SetString(PyExc_IOError, intcat(errmsg, iline));
-            return NULL;
-        }
-
-        count += parseLabel(labels, mapping, line, space);
-
-        for (i = beg; i < end; i++)
-            data[index++] = line[i];
-    }
-    fclose(file);
-    free(line);
-    npy_intp dims[2] = {index / seqlen, seqlen};
-    PyArray_Dims arr_dims;
-    arr_dims.ptr = dims;
-    arr_dims.len = 2;
-    PyArray_Resize(msa, &arr_dims, 0, NPY_CORDER);
-    PyObject *result = Py_BuildValue("(OOOi)", msa, labels, mapping, count);
-    Py_DECREF(labels);
-    Py_DECREF(mapping);
-
-    return result;
-}
-
-
 static PyObject *writeSelex(PyObject *self, PyObject *args, PyObject *kwargs) {
 
     /* Write MSA where inputs are: labels in the form of Python lists
@@ -395,16 +641,18 @@ static PyObject *writeSelex(PyObject *self, PyObject *args, PyObject *kwargs) {
 
 static PyMethodDef msaio_methods[] = {
 
-    {"parseFasta",  (PyCFunction)parseFasta, METH_VARARGS,
+    {"parseFasta",  (PyCFunction)parseFasta, METH_VARARGS | METH_KEYWORDS,
      "Return list of labels and a dictionary mapping labels to sequences \n"
-     "after parsing the sequences into empty numpy character array."},
+     "after parsing the sequences, optionally filtered and sliced, from \n"
+     "a plain or gzip compressed file into a numpy character array."},
 
     {"writeFasta",  (PyCFunction)writeFasta, METH_VARARGS | METH_KEYWORDS,
      "Return filename after writing MSA in FASTA format."},
 
-    {"parseSelex",  (PyCFunction)parseSelex, METH_VARARGS,
+    {"parseSelex",  (PyCFunction)parseSelex, METH_VARARGS | METH_KEYWORDS,
      "Return list of labels and a dictionary mapping labels to sequences \n"
-     "after parsing the sequences into empty numpy character array."},
+     "after parsing the sequences, optionally filtered and sliced, from \n"
+     "a plain or gzip compressed file into a numpy character array."},
 
     {"writeSelex",  (PyCFunction)writeSelex, METH_VARARGS | METH_KEYWORDS,
     "Return filename after writing MSA in SELEX or Stockholm format."},
@@ -422,14 +670,27 @@ static struct PyModuleDef msaiomodule = {
         msaio_methods
 };
 PyMODINIT_FUNC PyInit_msaio(void) {
+    PyObject *module;
     import_array();
-    return PyModule_Create(&msaiomodule);
+    module = PyModule_Create(&msaiomodule);
+    if (module == NULL)
+        return NULL;
+    /* compressed files can be parsed only when linked to zlib */
+    if (PyModule_AddIntConstant(module, "HAS_ZLIB", MSAIO_HAS_ZLIB) < 0) {
+        Py_DECREF(module);
+        return NULL;
+    }
+    return module;
 }
 #else
 PyMODINIT_FUNC initmsaio(void) {
 
-    (void) Py_InitModule3("msaio", msaio_methods,
-                          "Multiple sequence alignment IO tools.");
+    PyObject *module;
+    module = Py_InitModule3("msaio", msaio_methods,
+                            "Multiple sequence alignment IO tools.");
+    if (module == NULL)
+        return;
+    PyModule_AddIntConstant(module, "HAS_ZLIB", MSAIO_HAS_ZLIB);
 
     import_array();
 }
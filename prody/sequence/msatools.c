@@ -2260,6 +2260,421 @@ static PyObject *msapsicov(PyObject *self, PyObject *args, PyObject *kwargs) {
 }
 
 
+static PyObject *msacoevol(PyObject *self, PyObject *args, PyObject *kwargs) {
+
+    PyArrayObject *icols, *jcols, *weights, *iprobs, *jprobs, *result;
+    int ambiguity = 1, method = 0, norm = 0, diagonal = 0;
+
+    static char *kwlist[] = {"icols", "jcols", "weights", "iprobs", "jprobs",
+                             "result", "ambiguity", "method", "norm",
+                             "diagonal", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOOO|iiii", kwlist,
+                                     &icols, &jcols, &weights, &iprobs,
+                                     &jprobs, &result, &ambiguity, &method,
+                                     &norm, &diagonal))
+        return NULL;
+
+    /* icols and jcols are integer encoded MSA columns with shapes (n, number)
+       and (m, number), iprobs and jprobs are probabilities of characters in
+       these columns with shapes (n, 27) and (m, 27), and result is a
+       contiguous array with shape (n, m).  Mutual information (method 0) or
+       OMES (method 1) is calculated for all pairs of columns, or for pairs
+       above the diagonal when the two blocks are the same (diagonal). */
+    icols = PyArray_GETCONTIGUOUS(icols);
+    jcols = PyArray_GETCONTIGUOUS(jcols);
+    weights = PyArray_GETCONTIGUOUS(weights);
+    iprobs = PyArray_GETCONTIGUOUS(iprobs);
+    jprobs = PyArray_GETCONTIGUOUS(jprobs);
+
+    long n = PyArray_DIMS(icols)[0], number = PyArray_DIMS(icols)[1];
+    long m = PyArray_DIMS(jcols)[0];
+
+    unsigned char *iraw = (unsigned char *) PyArray_DATA(icols);
+    unsigned char *jraw = (unsigned char *) PyArray_DATA(jcols);
+    double *w = (double *) PyArray_DATA(weights);
+    double *iprb = (double *) PyArray_DATA(iprobs);
+    double *jprb = (double *) PyArray_DATA(jprobs);
+    double *data = (double *) PyArray_DATA(result);
+
+    /* characters that an encoded character is allocated to */
+    int nchars[NUMCHARS], chars[NUMCHARS][20], ambiguous[NUMCHARS];
+    double fracs[NUMCHARS][20];
+    long i, j, k, x, y;
+
+    for (i = 0; i < NUMCHARS; i++) {
+        nchars[i] = 1;
+        chars[i][0] = i;
+        fracs[i][0] = 1.;
+        ambiguous[i] = 0;
+    }
+    if (ambiguity) {
+        nchars[2] = nchars[10] = nchars[26] = 2;
+        chars[2][0] = 4; chars[2][1] = 14;      /* B -> D, N */
+        chars[10][0] = 9; chars[10][1] = 12;    /* J -> I, L */
+        chars[26][0] = 5; chars[26][1] = 17;    /* Z -> E, Q */
+        nchars[24] = 20;                        /* X -> 20 AA */
+        for (i = 0; i < 20; i++) {
+            chars[24][i] = twenty[i];
+            fracs[24][i] = 1. / 20.;
+        }
+        for (i = 0; i < 2; i++)
+            fracs[2][i] = fracs[10][i] = fracs[26][i] = 1. / 2.;
+        ambiguous[2] = ambiguous[10] = ambiguous[24] = ambiguous[26] = 1;
+    }
+
+    /* columns that contain ambiguous characters */
+    char *iamb = calloc(n, sizeof(char)), *jamb = calloc(m, sizeof(char));
+    if (!iamb || !jamb) {
+        free(iamb);
+        free(jamb);
+        Py_DECREF(icols);
+        Py_DECREF(jcols);
+        Py_DECREF(weights);
+        Py_DECREF(iprobs);
+        Py_DECREF(jprobs);
+        return PyErr_NoMemory();
+    }
+
+    unsigned char a, b;
+    unsigned char *iseq, *jseq;
+    double counts[NUMCHARS * NUMCHARS], total = 0, value, entropy, jp, ep;
+    double *ip, *pp;
+
+    Py_BEGIN_ALLOW_THREADS
+
+    for (k = 0; k < number; k++)
+        total += w[k];
+    for (i = 0; i < n * number; i++)
+        iamb[i / number] |= ambiguous[iraw[i]];
+    for (j = 0; j < m * number; j++)
+        jamb[j / number] |= ambiguous[jraw[j]];
+
+    for (i = 0; i < n; i++) {
+        iseq = iraw + i * number;
+        ip = iprb + i * NUMCHARS;
+        for (j = diagonal ? i + 1 : 0; j < m; j++) {
+            jseq = jraw + j * number;
+            pp = jprb + j * NUMCHARS;
+
+            /* weighted joint counts */
+            for (k = 0; k < NUMCHARS * NUMCHARS; k++)
+                counts[k] = 0;
+            if (iamb[i] || jamb[j]) {
+                for (k = 0; k < number; k++) {
+                    a = iseq[k];
+                    b = jseq[k];
+                    for (x = 0; x < nchars[a]; x++)
+                        for (y = 0; y < nchars[b]; y++)
+                            counts[chars[a][x] * NUMCHARS + chars[b][y]] +=
+                                w[k] * fracs[a][x] * fracs[b][y];
+                }
+            } else {
+                for (k = 0; k < number; k++)
+                    counts[iseq[k] * NUMCHARS + jseq[k]] += w[k];
+            }
+
+            value = entropy = 0;
+            for (x = 0; x < NUMCHARS; x++) {
+                for (y = 0; y < NUMCHARS; y++) {
+                    jp = counts[x * NUMCHARS + y] / total;
+                    ep = ip[x] * pp[y];
+                    if (method) {
+                        if (ep != 0)
+                            value += total * (jp - ep) * (jp - ep) / ep;
+                    } else if (jp > 0) {
+                        value += jp * log(jp / ep);
+                        entropy -= jp * log(jp);
+                    }
+                }
+            }
+            if (norm)
+                value = entropy > 0 ? value / entropy : 0;
+            data[i * m + j] = value;
+        }
+    }
+
+    Py_END_ALLOW_THREADS
+
+    free(iamb);
+    free(jamb);
+    Py_DECREF(icols);
+    Py_DECREF(jcols);
+    Py_DECREF(weights);
+    Py_DECREF(iprobs);
+    Py_DECREF(jprobs);
+    Py_RETURN_NONE;
+}
+
+
+static int checkResult(PyArrayObject *array, int ndim, npy_intp *dims,
+                       const char *name) {
+
+    /* Return 1 if array is a writeable, C contiguous float64 array with
+       shape dims, otherwise set a TypeError or ValueError and return 0. */
+    int i;
+    if (!PyArray_Check(array) || PyArray_TYPE(array) != NPY_DOUBLE ||
+        !PyArray_IS_C_CONTIGUOUS(array) || !PyArray_ISWRITEABLE(array)) {
+        PyErr_Format(PyExc_TypeError, "%s must be a writeable, C contiguous "
+                     "float64 array", name);
+        return 0;
+    }
+    if (PyArray_NDIM(array) != ndim) {
+        PyErr_Format(PyExc_ValueError, "%s must be a %dD array", name, ndim);
+        return 0;
+    }
+    for (i = 0; i < ndim; i++) {
+        if (PyArray_DIMS(array)[i] != dims[i]) {
+            PyErr_Format(PyExc_ValueError, "%s does not have the correct "
+                         "shape", name);
+            return 0;
+        }
+    }
+    return 1;
+}
+
+
+static PyObject *msajoint(PyObject *self, PyObject *args, PyObject *kwargs) {
+
+    PyObject *iobj, *jobj, *wobj;
+    PyArrayObject *icols = NULL, *jcols = NULL, *weights = NULL, *joint;
+
+    static char *kwlist[] = {"icols", "jcols", "weights", "joint", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOO", kwlist,
+                                     &iobj, &jobj, &wobj, &joint))
+        return NULL;
+
+    /* icols and jcols are MSA columns encoded with codes smaller than q with
+       shapes (n, number) and (m, number), and joint is a contiguous array of
+       zeros with shape (n, m, q, q) */
+    icols = (PyArrayObject *) PyArray_FROMANY(iobj, NPY_UBYTE, 2, 2,
+                                              NPY_ARRAY_IN_ARRAY);
+    jcols = (PyArrayObject *) PyArray_FROMANY(jobj, NPY_UBYTE, 2, 2,
+                                              NPY_ARRAY_IN_ARRAY);
+    weights = (PyArrayObject *) PyArray_FROMANY(wobj, NPY_DOUBLE, 1, 1,
+                                                NPY_ARRAY_IN_ARRAY);
+    if (!icols || !jcols || !weights)
+        goto fail;
+
+    long n = PyArray_DIMS(icols)[0], number = PyArray_DIMS(icols)[1];
+    long m = PyArray_DIMS(jcols)[0], q = 0;
+
+    if (PyArray_DIMS(jcols)[1] != number ||
+        PyArray_DIMS(weights)[0] != number) {
+        PyErr_SetString(PyExc_ValueError, "icols, jcols, and weights must "
+                        "have the same number of sequences");
+        goto fail;
+    }
+    if (PyArray_Check(joint) && PyArray_NDIM(joint) == 4)
+        q = PyArray_DIMS(joint)[3];
+    npy_intp dims[4] = {n, m, q, q};
+    if (!checkResult(joint, 4, dims, "joint"))
+        goto fail;
+
+    unsigned char *iraw = (unsigned char *) PyArray_DATA(icols);
+    unsigned char *jraw = (unsigned char *) PyArray_DATA(jcols);
+    double *w = (double *) PyArray_DATA(weights);
+    double *data = (double *) PyArray_DATA(joint);
+
+    long i, j, k;
+    unsigned char *iseq, *jseq;
+    double *counts;
+
+    int invalid = 0;
+    for (k = 0; k < n * number; k++)
+        invalid |= iraw[k] >= q;
+    for (k = 0; k < m * number; k++)
+        invalid |= jraw[k] >= q;
+    if (invalid) {
+        PyErr_SetString(PyExc_ValueError, "codes must be smaller than the "
+                        "number of states in joint");
+        goto fail;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+
+    for (i = 0; i < n; i++) {
+        iseq = iraw + i * number;
+        for (j = 0; j < m; j++) {
+            jseq = jraw + j * number;
+            counts = data + (i * m + j) * q * q;
+            for (k = 0; k < number; k++)
+                counts[iseq[k] * q + jseq[k]] += w[k];
+        }
+    }
+
+    Py_END_ALLOW_THREADS
+
+    Py_DECREF(icols);
+    Py_DECREF(jcols);
+    Py_DECREF(weights);
+    Py_RETURN_NONE;
+
+    fail:
+    Py_XDECREF(icols);
+    Py_XDECREF(jcols);
+    Py_XDECREF(weights);
+    return NULL;
+}
+
+
+static PyObject *msadirectinfo(PyObject *self, PyObject *args,
+                               PyObject *kwargs) {
+
+    PyObject *cobj, *iobj, *jobj;
+    PyArrayObject *couplings = NULL, *iprobs = NULL, *jprobs = NULL, *result;
+    int diagonal = 0;
+    long maxiter = 1000;
+    double epsilon = 1e-4;
+
+    static char *kwlist[] = {"couplings", "iprobs", "jprobs", "result",
+                             "diagonal", "maxiter", "epsilon", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOO|ild", kwlist,
+                                     &cobj, &iobj, &jobj, &result,
+                                     &diagonal, &maxiter, &epsilon))
+        return NULL;
+
+    /* couplings are exponentials of coupling energies with shape
+       (n, m, q, q), iprobs and jprobs are single site probabilities with
+       shapes (n, q) and (m, q), and result is a contiguous array with shape
+       (n, m).  Direct information is calculated for all pairs of columns,
+       or for pairs above the diagonal when the two blocks are the same
+       (diagonal).  Number of pairs whose fields did not converge in maxiter
+       iterations is returned. */
+    couplings = (PyArrayObject *) PyArray_FROMANY(cobj, NPY_DOUBLE, 4, 4,
+                                                  NPY_ARRAY_IN_ARRAY);
+    iprobs = (PyArrayObject *) PyArray_FROMANY(iobj, NPY_DOUBLE, 2, 2,
+                                               NPY_ARRAY_IN_ARRAY);
+    jprobs = (PyArrayObject *) PyArray_FROMANY(jobj, NPY_DOUBLE, 2, 2,
+                                               NPY_ARRAY_IN_ARRAY);
+    if (!couplings || !iprobs || !jprobs)
+        goto fail;
+
+    npy_intp *cdims = PyArray_DIMS(couplings);
+    long n = cdims[0], m = cdims[1], q = cdims[2];
+    if (cdims[3] != q || PyArray_DIMS(iprobs)[0] != n ||
+        PyArray_DIMS(iprobs)[1] != q || PyArray_DIMS(jprobs)[0] != m ||
+        PyArray_DIMS(jprobs)[1] != q) {
+        PyErr_SetString(PyExc_ValueError, "couplings, iprobs, and jprobs "
+                        "shapes do not match");
+        goto fail;
+    }
+    npy_intp dims[2] = {n, m};
+    if (!checkResult(result, 2, dims, "result"))
+        goto fail;
+
+    double *cpl = (double *) PyArray_DATA(couplings);
+    double *iprb = (double *) PyArray_DATA(iprobs);
+    double *jprb = (double *) PyArray_DATA(jprobs);
+    double *data = (double *) PyArray_DATA(result);
+
+    double *w = malloc(q * q * sizeof(double));
+    double *mu1 = malloc(q * sizeof(double)), *mu2 = malloc(q * sizeof(double));
+    double *scra1 = malloc(q * sizeof(double));
+    double *scra2 = malloc(q * sizeof(double));
+    if (!w || !mu1 || !mu2 || !scra1 || !scra2) {
+        free(w);
+        free(mu1);
+        free(mu2);
+        free(scra1);
+        free(scra2);
+        PyErr_NoMemory();
+        goto fail;
+    }
+
+    long i, j, k1, k2, iter, unconverged = 0;
+    double diff, sum1, sum2, sumpdir, sumdi, tiny = 1.0e-100;
+    double *pi, *pj;
+
+    Py_BEGIN_ALLOW_THREADS
+
+    for (i = 0; i < n; i++) {
+        pi = iprb + i * q;
+        for (j = diagonal ? i + 1 : 0; j < m; j++) {
+            pj = jprb + j * q;
+            memcpy(w, cpl + (i * m + j) * q * q, q * q * sizeof(double));
+            for (k1 = 0; k1 < q; k1++) {
+                mu1[k1] = 1. / q;
+                mu2[k1] = 1. / q;
+            }
+            diff = 1.0;
+            for (iter = 0; iter < maxiter && diff > epsilon; iter++) {
+                for (k1 = 0; k1 < q; k1++) {
+                    scra1[k1] = 0.0;
+                    scra2[k1] = 0.0;
+                }
+                for (k1 = 0; k1 < q; k1++) {
+                    for (k2 = 0; k2 < q; k2++) {
+                        scra1[k1] += mu2[k2] * w[k1 * q + k2];
+                        scra2[k1] += mu1[k2] * w[k2 * q + k1];
+                    }
+                }
+                sum1 = 0.0;
+                sum2 = 0.0;
+                for (k1 = 0; k1 < q; k1++) {
+                    scra1[k1] = pi[k1] / scra1[k1];
+                    sum1 += scra1[k1];
+                    scra2[k1] = pj[k1] / scra2[k1];
+                    sum2 += scra2[k1];
+                }
+                diff = 0.0;
+                for (k1 = 0; k1 < q; k1++) {
+                    scra1[k1] /= sum1;
+                    scra2[k1] /= sum2;
+                }
+                for (k1 = 0; k1 < q; k1++) {
+                    if (fabs(mu1[k1] - scra1[k1]) > diff)
+                        diff = fabs(mu1[k1] - scra1[k1]);
+                    if (fabs(mu2[k1] - scra2[k1]) > diff)
+                        diff = fabs(mu2[k1] - scra2[k1]);
+                    mu1[k1] = scra1[k1];
+                    mu2[k1] = scra2[k1];
+                }
+            }
+            if (diff > epsilon)
+                unconverged++;
+
+            sumpdir = 0.0;
+            for (k1 = 0; k1 < q; k1++) {
+                for (k2 = 0; k2 < q; k2++) {
+                    w[k1 * q + k2] *= mu1[k1] * mu2[k2];
+                    sumpdir += w[k1 * q + k2];
+                }
+            }
+            sumdi = 0.0;
+            for (k1 = 0; k1 < q; k1++) {
+                for (k2 = 0; k2 < q; k2++) {
+                    w[k1 * q + k2] /= sumpdir;
+                    sumdi += w[k1 * q + k2] * log((w[k1 * q + k2] + tiny) /
+                                                  (pi[k1] * pj[k2] + tiny));
+                }
+            }
+            data[i * m + j] = sumdi;
+        }
+    }
+
+    Py_END_ALLOW_THREADS
+
+    free(w);
+    free(mu1);
+    free(mu2);
+    free(scra1);
+    free(scra2);
+    Py_DECREF(couplings);
+    Py_DECREF(iprobs);
+    Py_DECREF(jprobs);
+    return Py_BuildValue("l", unconverged);
+
+    fail:
+    Py_XDECREF(couplings);
+    Py_XDECREF(iprobs);
+    Py_XDECREF(jprobs);
+    return NULL;
+}
+
+
 static PyMethodDef msatools_methods[] = {
 
     {"msaentropy",  (PyCFunction)msaentropy,
@@ -2271,6 +2686,19 @@ static PyMethodDef msatools_methods[] = {
      "Return mutual information matrix calculated for given character \n"
      "array that contains an MSA."},
 
+    {"msacoevol",  (PyCFunction)msacoevol, METH_VARARGS | METH_KEYWORDS,
+     "Calculate mutual information or OMES for all pairs of integer \n"
+     "encoded MSA columns in two blocks, using weighted sequences."},
+
+    {"msajoint",  (PyCFunction)msajoint, METH_VARARGS | METH_KEYWORDS,
+     "Calculate weighted joint counts of codes for all pairs of encoded \n"
+     "MSA columns in two blocks."},
+
+    {"msadirectinfo",  (PyCFunction)msadirectinfo,
+     METH_VARARGS | METH_KEYWORDS,
+     "Calculate direct information for all pairs of columns in two blocks\n"
+     "from exponentials of their coupling energies."},
+
     {"msaocc",  (PyCFunction)msaocc, METH_VARARGS | METH_KEYWORDS,
      "Return occupancy (or count) array calculated for MSA rows or columns."},
 
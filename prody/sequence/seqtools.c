@@ -215,6 +215,275 @@ static PyObject *msaeye(PyObject *self, PyObject *args,
     return Py_BuildValue("O", array);
 }
 
+static PyObject *msaidentity(PyObject *self, PyObject *args,
+                             PyObject *kwargs) {
+
+    PyArrayObject *rows, *cols, *score, *ncols;
+    int gaps = 0;
+
+    static char *kwlist[] = {"rows", "cols", "score", "ncols", "gaps", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOO|i", kwlist,
+                                     &rows, &cols, &score, &ncols, &gaps))
+        return NULL;
+
+    /* rows and cols are integer encoded sequences, 0 is a gap, and score
+       and ncols are contiguous int32 arrays of shape (nrows, ncols) */
+    rows = PyArray_GETCONTIGUOUS(rows);
+    cols = PyArray_GETCONTIGUOUS(cols);
+
+    long nrows = PyArray_DIMS(rows)[0], length = PyArray_DIMS(rows)[1];
+    long ncol = PyArray_DIMS(cols)[0];
+
+    unsigned char *rraw = (unsigned char *) PyArray_DATA(rows);
+    unsigned char *craw = (unsigned char *) PyArray_DATA(cols);
+    int *sc = (int *) PyArray_DATA(score);
+    int *nc = (int *) PyArray_DATA(ncols);
+
+    long i, j, k;
+    unsigned char *iseq, *jseq;
+    int s, c, nz;
+
+    Py_BEGIN_ALLOW_THREADS
+
+    for (i = 0; i < nrows; i++) {
+        iseq = rraw + i * length;
+        for (j = 0; j < ncol; j++) {
+            jseq = craw + j * length;
+            s = c = 0;
+            if (gaps) {
+                /* gaps are compared as any other character */
+                for (k = 0; k < length; k++)
+                    s += iseq[k] == jseq[k];
+                c = length;
+            } else {
+                /* columns with gaps in both sequences are skipped */
+                for (k = 0; k < length; k++) {
+                    nz = (iseq[k] | jseq[k]) != 0;
+                    c += nz;
+                    s += (iseq[k] == jseq[k]) & nz;
+                }
+            }
+            sc[i * ncol + j] = s;
+            nc[i * ncol + j] = c;
+        }
+    }
+
+    Py_END_ALLOW_THREADS
+
+    Py_DECREF(rows);
+    Py_DECREF(cols);
+    Py_RETURN_NONE;
+}
+
+
+#define ALIGN_NEG -1e300
+#define ALIGN_M 0
+#define ALIGN_X 1
+#define ALIGN_Y 2
+#define ALIGN_START 3
+
+
+static PyObject *pairalign(PyObject *self, PyObject *args,
+                           PyObject *kwargs) {
+
+    PyArrayObject *seqa, *seqb;
+    PyObject *ops = Py_None;
+    double match = 1., mismatch = 0., gap_open = -1., gap_ext = -0.1;
+    int local = 0;
+
+    static char *kwlist[] = {"seqa", "seqb", "ops", "match", "mismatch",
+                             "gap_open", "gap_ext", "local", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OO|Oddddi", kwlist,
+                                     &seqa, &seqb, &ops, &match, &mismatch,
+                                     &gap_open, &gap_ext, &local))
+        return NULL;
+
+    /* seqa and seqb are unsigned character arrays, and ops is an unsigned
+       character array with at least len(seqa) + len(seqb) elements to
+       store alignment operations, 0 for a pair of residues, 1 for a
+       residue of seqa against a gap, and 2 for a gap against a residue of
+       seqb.  When ops is None, only the score is calculated using linear
+       memory. */
+    seqa = PyArray_GETCONTIGUOUS(seqa);
+    seqb = PyArray_GETCONTIGUOUS(seqb);
+
+    long n = PyArray_SIZE(seqa), m = PyArray_SIZE(seqb);
+    unsigned char *a = (unsigned char *) PyArray_DATA(seqa);
+    unsigned char *b = (unsigned char *) PyArray_DATA(seqb);
+    unsigned char *path = NULL, *trace = NULL;
+
+    if (ops != Py_None) {
+        if (!PyArray_Check(ops) ||
+            PyArray_SIZE((PyArrayObject *) ops) < n + m ||
+            PyArray_ITEMSIZE((PyArrayObject *) ops) != 1 ||
+            !PyArray_ISCARRAY((PyArrayObject *) ops)) {
+            Py_DECREF(seqa);
+            Py_DECREF(seqb);
+            PyErr_SetString(PyExc_ValueError, "ops must be a contiguous "
+                            "byte array with an element for each residue");
+            return NULL;
+        }
+        path = (unsigned char *) PyArray_DATA((PyArrayObject *) ops);
+        trace = malloc((n + 1) * (m + 1) * sizeof(unsigned char));
+    }
+
+    double *rows = malloc(6 * (m + 1) * sizeof(double));
+    if (!rows || (path && !trace)) {
+        free(rows);
+        free(trace);
+        Py_DECREF(seqa);
+        Py_DECREF(seqb);
+        return PyErr_NoMemory();
+    }
+
+    double *pm = rows, *px = rows + (m + 1), *py = rows + 2 * (m + 1);
+    double *cm = rows + 3 * (m + 1), *cx = rows + 4 * (m + 1);
+    double *cy = rows + 5 * (m + 1), *swap;
+    double best = ALIGN_NEG, value, score;
+    long i, j, iend = n, jend = m, istart = 0, jstart = 0, count = 0;
+    int pred, state = ALIGN_M;
+    unsigned char t;
+
+    Py_BEGIN_ALLOW_THREADS
+
+    /* M, X and Y hold best scores of alignments ending with a pair of
+       residues, a residue of seqa against a gap, and a gap against a
+       residue of seqb, respectively; traceback stores predecessor states
+       of M, X and Y in bits 0-1, 2-3 and 4-5 */
+    for (i = 0; i <= n; i++) {
+        for (j = 0; j <= m; j++) {
+            t = 0;
+            if (i && j) {
+                score = a[i - 1] == b[j - 1] ? match : mismatch;
+                value = pm[j - 1];
+                pred = ALIGN_M;
+                if (px[j - 1] > value) {
+                    value = px[j - 1];
+                    pred = ALIGN_X;
+                }
+                if (py[j - 1] > value) {
+                    value = py[j - 1];
+                    pred = ALIGN_Y;
+                }
+                if (local && value <= 0) {
+                    value = 0;
+                    pred = ALIGN_START;
+                }
+                cm[j] = value + score;
+                t |= pred;
+            } else if (!i && !j && !local) {
+                cm[j] = 0;
+                t |= ALIGN_START;
+            } else
+                cm[j] = ALIGN_NEG;
+
+            if (i) {
+                value = pm[j] + gap_open;
+                pred = ALIGN_M;
+                if (px[j] + gap_ext > value) {
+                    value = px[j] + gap_ext;
+                    pred = ALIGN_X;
+                }
+                if (py[j] + gap_open > value) {
+                    value = py[j] + gap_open;
+                    pred = ALIGN_Y;
+                }
+                cx[j] = value;
+                t |= pred << 2;
+            } else
+                cx[j] = ALIGN_NEG;
+
+            if (j) {
+                value = cm[j - 1] + gap_open;
+                pred = ALIGN_M;
+                if (cx[j - 1] + gap_open > value) {
+                    value = cx[j - 1] + gap_open;
+                    pred = ALIGN_X;
+                }
+                if (cy[j - 1] + gap_ext > value) {
+                    value = cy[j - 1] + gap_ext;
+                    pred = ALIGN_Y;
+                }
+                cy[j] = value;
+                t |= pred << 4;
+            } else
+                cy[j] = ALIGN_NEG;
+
+            if (local && cm[j] > best) {
+                best = cm[j];
+                iend = i;
+                jend = j;
+            }
+            if (trace)
+                trace[i * (m + 1) + j] = t;
+        }
+        swap = pm; pm = cm; cm = swap;
+        swap = px; px = cx; cx = swap;
+        swap = py; py = cy; cy = swap;
+    }
+
+    if (!local) {
+        /* previous rows hold the last row after swapping */
+        best = pm[m];
+        state = ALIGN_M;
+        if (px[m] > best) {
+            best = px[m];
+            state = ALIGN_X;
+        }
+        if (py[m] > best) {
+            best = py[m];
+            state = ALIGN_Y;
+        }
+    } else if (best <= 0) {
+        best = 0;
+        iend = jend = 0;
+    }
+
+    if (trace && (!local || best > 0)) {
+        i = iend;
+        j = jend;
+        while (i || j) {
+            t = trace[i * (m + 1) + j];
+            if (state == ALIGN_M) {
+                pred = t & 3;
+                path[count++] = 0;
+                i--;
+                j--;
+                if (pred == ALIGN_START)
+                    break;
+            } else if (state == ALIGN_X) {
+                pred = (t >> 2) & 3;
+                path[count++] = 1;
+                i--;
+            } else {
+                pred = (t >> 4) & 3;
+                path[count++] = 2;
+                j--;
+            }
+            state = pred;
+        }
+        istart = i;
+        jstart = j;
+        for (i = 0; i < count / 2; i++) {
+            t = path[i];
+            path[i] = path[count - 1 - i];
+            path[count - 1 - i] = t;
+        }
+    }
+
+    Py_END_ALLOW_THREADS
+
+    free(rows);
+    free(trace);
+    Py_DECREF(seqa);
+    Py_DECREF(seqb);
+    return Py_BuildValue("(dlllll)", best, count, istart, jstart,
+                         iend, jend);
+}
+
+
 static PyMethodDef seqtools_methods[] = {
 
     {"msaeye",  (PyCFunction)msaeye,
@@ -222,6 +491,17 @@ static PyMethodDef seqtools_methods[] = {
      "Return sequence identity matrix calculated for given character \n"
      "array that contains an MSA."},
 
+    {"pairalign",  (PyCFunction)pairalign,
+     METH_VARARGS | METH_KEYWORDS,
+     "Return score, number of operations and start and end positions of \n"
+     "global or local alignment of two sequences with affine gap \n"
+     "penalties, after writing alignment operations into ops."},
+
+    {"msaidentity",  (PyCFunction)msaidentity,
+     METH_VARARGS | METH_KEYWORDS,
+     "Count identical and compared columns for all pairs of integer \n"
+     "encoded sequences in two blocks of an MSA."},
+
     {NULL, NULL, 0, NULL}
 };
 
@@ -127,4 +127,46 @@ class TestAtomIterations(unittest.TestCase):
     def testAtomMap(self):
 
         sel = AtomMap(ATOMS, range(10), mapping=range(10), dummies=[10,11])
-        self.assertEqual(len(list(sel.iterAtoms())), sel.numAtoms())
\ No newline at end of file
+        self.assertEqual(len(list(sel.iterAtoms())), sel.numAtoms())
+
+class TestFlagInvalidation(unittest.TestCase):
+
+    def setUp(self):
+
+        self.ag = parseDatafile('1ubi')
+        self.protein = self.ag.getFlags('protein')
+        self.water = self.ag.getFlags('water')
+
+    def testUnrelatedField(self):
+
+        ag = self.ag
+        flags = ag._getFlags('protein')
+        ag.setBetas(ag.getBetas() + 1)
+        self.assertIs(ag._getFlags('protein'), flags)
+        ag.setBetas(0)
+        self.assertIs(ag._getFlags('protein'), flags)
+
+    def testNameChange(self):
+
+        ag = self.ag
+        water = ag._getFlags('water')
+        names = ag.getNames()
+        names[names == 'CA'] = 'XX'
+        ag.setNames(names)
+        self.assertIs(ag._getFlags('water'), water)
+        self.assertFalse(ag.getFlags('protein').any())
+        self.assertFalse(ag.getFlags('backbone').any())
+
+    def testResnameChange(self):
+
+        ag = self.ag
+        ag.setResnames('HOH')
+        assert_equal(ag.getFlags('water'), True)
+        self.assertFalse(ag.getFlags('protein').any())
+
+    def testChainChange(self):
+
+        ag = self.ag
+        ag.setChids('B')
+        self.assertNotIn('protein', ag._flags)
+        assert_equal(ag.getFlags('protein'), self.protein)
@@ -45,4 +45,30 @@ class TestTerRecord(TestCase):
 
     def testSelectionResidueIndexing2(self):
 
-        self.assertEqual(len(RTER[20:].getHierView()['A', 866]), 3)
\ No newline at end of file
+        self.assertEqual(len(RTER[20:].getHierView()['A', 866]), 3)
+
+class TestSegments(TestCase):
+
+    def setUp(self):
+
+        self.ag = AtomGroup('segments')
+        self.ag.setCoords(arange(36, dtype=float).reshape((12, 3)))
+        self.ag.setSegnames(['P1'] * 4 + ['P2'] * 4 + ['P1'] * 4)
+        self.ag.setChids(['A', 'A', 'B', 'B'] * 3)
+        self.ag.setResnums([1, 2, 1, 2] * 3)
+
+    def testNumbers(self):
+
+        hv = self.ag.getHierView()
+        self.assertEqual(hv.numSegments(), 2)
+        self.assertEqual(hv.numChains(), 4)
+        self.assertEqual(hv.numResidues(), 8)
+
+    def testNonContiguousSegment(self):
+
+        hv = self.ag.getHierView()
+        self.assertEqual(list(hv['P1'].getIndices()),
+                         [0, 1, 2, 3, 8, 9, 10, 11])
+        self.assertEqual(list(hv['P1', 'B'].getIndices()), [2, 3, 10, 11])
+        self.assertEqual(list(hv.getResidue('A', 2, segname='P1')
+                              .getIndices()), [1, 9])
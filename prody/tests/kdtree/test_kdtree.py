@@ -1,10 +1,12 @@
 """This module contains unit tests for :mod:`~prody.KDTree` module."""
 
-from numpy import tile, array, arange, ones
-from numpy.testing import assert_allclose
+from numpy import tile, array, arange, ones, triu_indices
+from numpy.random import RandomState
+from numpy.testing import assert_allclose, assert_equal
 
 from prody.tests import unittest
-from prody.kdtree import KDTree
+from prody.kdtree import KDTree, iterFrameNeighbors
+from prody.measure import buildDistMatrix
 ATOL = 1e-5
 RTOL = 0
 
@@ -27,6 +29,15 @@ class TestKDTree(unittest.TestCase):
         assert_allclose(radii, dist[indices], rtol=RTOL, atol=ATOL,
                         err_msg='KDTree search failed')
 
+    def testSetCoords(self):
+
+        kdtree = KDTree(self.coords)
+        kdtree.setCoords(self.coords * 2)
+        kdtree.search(1.75)
+        self.assertEqual(kdtree.getCount(), 0, 'KDTree setCoords failed')
+        kdtree.search(3.5)
+        self.assertEqual(kdtree.getCount(), 9, 'KDTree setCoords failed')
+
     def testAllSearch(self):
         kdtree = self.kdtree
         coords = self.coords
@@ -73,3 +84,44 @@ class TestKDTreePBC(unittest.TestCase):
         KDTREE_PBC.search(2)
         self.assertEqual(8, KDTREE_PBC.getCount())
 
+    def testPairTriclinic(self):
+
+        coords = RandomState(0).rand(200, 3) * 20
+        unitcell = array([15., 16., 17., 80., 85., 100.])
+        kdtree = KDTree(coords, unitcell=unitcell)
+        kdtree.search(4.)
+        dist = buildDistMatrix(coords, unitcell=unitcell)
+        pairs = kdtree.getIndices()
+        assert_equal(len(pairs), (dist[triu_indices(200, 1)] <= 4.).sum())
+        assert_allclose(kdtree.getDistances(), dist[pairs[:, 0], pairs[:, 1]],
+                        rtol=RTOL, atol=1e-4)
+
+    def testFrames(self):
+
+        coordsets = RandomState(1).rand(3, 100, 3) * 10
+        counts = [len(dist) for pairs, dist in
+                  iterFrameNeighbors(coordsets, 3., unitcell=UNITCELL + 10)]
+        for coords, count in zip(coordsets, counts):
+            kdtree = KDTree(coords, unitcell=UNITCELL + 10)
+            kdtree.search(3.)
+            self.assertEqual(kdtree.getCount(), count)
+
+    def testSetCoordsPBC(self):
+
+        coordsets = RandomState(2).rand(2, 100, 3) * 10
+        unitcell = UNITCELL + 10
+        kdtree = KDTree(coordsets[0], unitcell=unitcell)
+        kdtree.search(3.)
+        images = kdtree._kdtree2
+        kdtree.setCoords(coordsets[1])
+        kdtree.search(3.)
+        self.assertIs(kdtree._kdtree2, images)
+        expected = KDTree(coordsets[1], unitcell=unitcell)
+        expected.search(3.)
+        assert_equal(kdtree.getIndices(), expected.getIndices())
+        assert_allclose(kdtree.getDistances(), expected.getDistances())
+
+    def testLargeRadius(self):
+
+        self.assertRaises(ValueError, KDTREE_PBC.search, 2.5)
+        self.assertRaises(ValueError, KDTREE_PBC.search, 2.5, ones(3))
@@ -1,11 +1,14 @@
 from numpy import array, concatenate, unique
 from numpy.testing import assert_array_equal, assert_equal
+from numpy.testing import assert_array_almost_equal
 
 from prody.tests import unittest
 from prody.tests.datafiles import parseDatafile, pathDatafile
 
 from prody.measure import Contacts, findNeighbors, iterNeighbors
+from prody.measure import findNeighborArrays, buildContactMatrix
 from prody.measure import buildDistMatrix, calcDistance
+from prody.kdtree import KDTree
 
 
 UBI = parseDatafile('1ubi')
@@ -17,6 +20,8 @@ N0P = [-1, 0, 1]
 UBI_EDGES = UBI_MIN + UBI_UC * array([(i, j, k) for i in N0P
                                                 for j in N0P for k in N0P])
 UBI_RADIUS = 20
+# radius must not exceed half of the smallest width of the unitcell
+UBI_PBC_RADIUS = 15
 
 UBI_CONTACTS = Contacts(UBI_XYZ)
 UBI_CONTACTS_PBC = Contacts(UBI_XYZ, UBI_UC)
@@ -28,14 +33,19 @@ class TestContacts(unittest.TestCase):
 
     def testPBCvsNONE(self):
 
-        wout_pbc = unique(concatenate([UBI_CONTACTS(UBI_RADIUS, UBI_EDGES)]))
-        with_pbc = UBI_CONTACTS_PBC(UBI_RADIUS, UBI_MIN)
+        wout_pbc = unique(concatenate([UBI_CONTACTS(UBI_PBC_RADIUS,
+                                                    UBI_EDGES)]))
+        with_pbc = UBI_CONTACTS_PBC(UBI_PBC_RADIUS, UBI_MIN)
         assert_array_equal(wout_pbc, with_pbc)
 
     def testMINvsMAX(self):
 
-        assert_array_equal(UBI_CONTACTS_PBC(UBI_RADIUS, UBI_MIN),
-                           UBI_CONTACTS_PBC(UBI_RADIUS, UBI_MAX))
+        assert_array_equal(UBI_CONTACTS_PBC(UBI_PBC_RADIUS, UBI_MIN),
+                           UBI_CONTACTS_PBC(UBI_PBC_RADIUS, UBI_MAX))
+
+    def testLargeRadius(self):
+
+        self.assertRaises(ValueError, UBI_CONTACTS_PBC, UBI_RADIUS, UBI_MIN)
 
 
 UCA = UBI.ca.copy()[::2].copy()
@@ -47,6 +57,7 @@ N0P = [-1, 0, 1]
 UCA_EDGES = UCA_MIN + UCA_UC * array([(i, j, k) for i in N0P
                                                 for j in N0P for k in N0P])
 UCA_RADIUS = 20
+UCA_PBC_RADIUS = 10
 
 UCA_CONTACTS = Contacts(UCA_XYZ)
 UCA_CONTACTS_PBC = Contacts(UCA_XYZ, UCA_UC)
@@ -55,9 +66,9 @@ class TestNeighbors(unittest.TestCase):
 
     def testPBC(self):
 
-        neighbors = findNeighbors(UCA_XYZ, UCA_RADIUS, unitcell=UCA_UC)
+        neighbors = findNeighbors(UCA_XYZ, UCA_PBC_RADIUS, unitcell=UCA_UC)
         n_neighbors = (buildDistMatrix(UCA_XYZ, unitcell=UCA_UC,
-                                       format='arr') <= UCA_RADIUS).sum()
+                                       format='arr') <= UCA_PBC_RADIUS).sum()
         assert_equal(len(neighbors), n_neighbors)
 
     def testNoPBC(self):
@@ -94,7 +105,7 @@ class TestNeighbors(unittest.TestCase):
 
     def testPBCCoordArgumentSwitching(self):
 
-        dist = 12.
+        dist = UCA_PBC_RADIUS
         neighbors1 = findNeighbors(UCA_XYZ, dist, UCA_XYZ[1], unitcell=UCA_UC)
         neighbors2 = findNeighbors(UCA_XYZ[1], dist, UCA_XYZ, unitcell=UCA_UC)
         n_neighbors = (calcDistance(UCA_XYZ, UCA_XYZ[1], unitcell=UCA_UC) <=
@@ -107,7 +118,7 @@ class TestNeighbors(unittest.TestCase):
 
     def testPBCAtomicArgumentSwitching(self):
 
-        dist = 12.
+        dist = UCA_PBC_RADIUS
         neighbors1 = [(a.getIndex(), d) for a, b, d in
                             iterNeighbors(UCA, dist, UCA[1], unitcell=UCA_UC)]
         neighbors2 = [(b.getIndex(), d) for a, b, d in
@@ -118,3 +129,57 @@ class TestNeighbors(unittest.TestCase):
         neighbors1.sort()
         neighbors2.sort()
         self.assertEqual(neighbors1, neighbors2)
+
+
+class TestNeighborArrays(unittest.TestCase):
+
+    def testNoPBC(self):
+
+        indices1, indices2, distances = findNeighborArrays(UCA_XYZ,
+                                                           UCA_RADIUS)
+        neighbors = findNeighbors(UCA_XYZ, UCA_RADIUS)
+        self.assertTrue((indices1 < indices2).all())
+        assert_equal(len(distances), len(neighbors))
+        assert_array_equal(sorted(distances), sorted(n[-1] for n in neighbors))
+
+    def testPBC(self):
+
+        indices1, indices2, distances = findNeighborArrays(UCA_XYZ,
+                                            UCA_PBC_RADIUS, unitcell=UCA_UC)
+        n_neighbors = (buildDistMatrix(UCA_XYZ, unitcell=UCA_UC,
+                                       format='arr') <= UCA_PBC_RADIUS).sum()
+        assert_equal(len(distances), n_neighbors)
+        self.assertRaises(ValueError, findNeighborArrays, UCA_XYZ,
+                          UCA_RADIUS, unitcell=UCA_UC)
+
+    def testArgumentSwitching(self):
+
+        dist = 12.
+        indices1, indices2, distances1 = findNeighborArrays(UCA, dist, UBI)
+        indices3, indices4, distances2 = findNeighborArrays(UBI, dist, UCA)
+        n_neighbors = (buildDistMatrix(UCA, UBI) <= dist).sum()
+        assert_equal(len(distances1), n_neighbors)
+        assert_array_equal(sorted(zip(indices1, indices2)),
+                           sorted(zip(indices4, indices3)))
+
+    def testPrebuiltTree(self):
+
+        dist = 12.
+        kdtree = KDTree(UBI_XYZ)
+        expected = findNeighborArrays(UBI, dist, UCA)
+        result = findNeighborArrays(UBI, dist, UCA, kdtree=kdtree)
+        for a, b in zip(expected, result):
+            assert_array_equal(a, b)
+        assert_equal(result[2].dtype, float)
+        result = findNeighborArrays(UBI, dist, kdtree=kdtree)
+        assert_array_equal(result[2], findNeighborArrays(UBI, dist)[2])
+        assert_equal(result[2].dtype, float)
+        self.assertRaises(ValueError, findNeighborArrays, UCA, dist, UBI,
+                          kdtree=kdtree)
+
+    def testContactMatrix(self):
+
+        matrix = buildContactMatrix(UCA_XYZ, UCA_RADIUS).toarray()
+        dist = buildDistMatrix(UCA_XYZ)
+        dist[dist > UCA_RADIUS] = 0
+        assert_array_almost_equal(matrix, dist, decimal=4)
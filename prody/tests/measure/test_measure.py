@@ -76,6 +76,59 @@ class TestDistances(unittest.TestCase):
         assert_equal(PBC_DIST, calcDistance(PBC_ONE, PBC_TWO, unitcell=PBC_UC))
         assert_equal(PBC_DIST, calcDistance(PBC_TWO, PBC_ONE, unitcell=PBC_UC))
 
+    def testTriclinicPBC(self):
+
+        uc = array([5., 5., 5., 90., 90., 60.])
+        assert_array_almost_equal(calcDistance(array([0., 0., 0.]),
+                                               array([4., 0., 0.]),
+                                               unitcell=uc), 1.)
+        assert_array_almost_equal(calcDistance(array([0., 0., 0.]),
+                                               array([2.5, 4.33, 0.]),
+                                               unitcell=uc), 0., 3)
+
+
+UBI_XYZ = UBI._getCoords()
+
+class TestDistMatrix(unittest.TestCase):
+
+    def setUp(self):
+
+        self.matrix = array([[calcDistance(xyz1, xyz2) for xyz2 in UBI_XYZ]
+                             for xyz1 in UBI_XYZ[:50]])
+
+    def testMatrix(self):
+
+        assert_array_almost_equal(buildDistMatrix(UBI_XYZ[:50], UBI_XYZ),
+                                  self.matrix)
+        assert_array_almost_equal(buildDistMatrix(UBI_XYZ[:50]),
+                                  self.matrix[:, :50])
+
+    def testRCD(self):
+
+        row, col, dist = buildDistMatrix(UBI_XYZ[:50], format='rcd')
+        self.assertTrue((row < col).all())
+        assert_array_almost_equal(dist, self.matrix[row, col])
+        assert_array_almost_equal(buildDistMatrix(UBI_XYZ[:50], format='arr'),
+                                  dist)
+
+    def testFloat32(self):
+
+        matrix = buildDistMatrix(UBI_XYZ[:50], UBI_XYZ, dtype='float32')
+        assert_equal(matrix.dtype.char, 'f')
+        assert_array_almost_equal(matrix, self.matrix, 4)
+
+    def testCutoff(self):
+
+        cutoff = 6.
+        matrix = self.matrix[:, :50].copy()
+        matrix[matrix > cutoff] = 0
+        sparse = buildDistMatrix(UBI_XYZ[:50], cutoff=cutoff)
+        assert_array_almost_equal(sparse.toarray(), matrix, 4)
+        row, col, dist = buildDistMatrix(UBI_XYZ[:50], format='rcd',
+                                         cutoff=cutoff)
+        assert_equal(len(dist), (matrix > 0).sum() // 2)
+
+
 ATOMS = parseDatafile('multi_model_truncated')
 CENTERS = ATOMS.getCoordsets().mean(-2)
 
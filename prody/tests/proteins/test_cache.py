@@ -0,0 +1,59 @@
+"""This module contains unit tests for :mod:`~prody.proteins.cache`."""
+
+import os
+import shutil
+import tempfile
+
+from numpy.testing import *
+
+from prody import *
+from prody import LOGGER, SETTINGS
+from prody.tests import TEMPDIR, unittest
+from prody.tests.datafiles import *
+
+LOGGER.verbosity = 'none'
+
+
+class TestStructureCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.current = SETTINGS.get('structure_cache_folder')
+        self.folder = tempfile.mkdtemp(dir=TEMPDIR)
+        pathStructureCache(self.folder)
+        self.path = pathDatafile(DATA_FILES['multi_model_truncated']['file'])
+
+    def testCachedAtoms(self):
+
+        atoms = parsePDB(self.path, subset='ca')
+        self.assertEqual(len(os.listdir(self.folder)), 1)
+        cached = parsePDB(self.path, subset='ca')
+        self.assertEqual(len(os.listdir(self.folder)), 1)
+        self.assertEqual(cached.getTitle(), atoms.getTitle())
+        assert_equal(cached.getCoordsets(), atoms.getCoordsets())
+        assert_equal(cached.getNames(), atoms.getNames())
+        assert_equal(cached.getFlags('pdbter'), atoms.getFlags('pdbter'))
+        self.assertEqual(cached.select('resnum 1').numAtoms(), 1)
+
+    def testOptionsAreKeys(self):
+
+        parsePDB(self.path, subset='ca')
+        atoms = parsePDB(self.path, subset='bb', header=True)
+        self.assertEqual(len(os.listdir(self.folder)), 2)
+        cached, header = parsePDB(self.path, subset='bb', header=True)
+        self.assertIsInstance(header, dict)
+        self.assertEqual(cached.numAtoms(), atoms[0].numAtoms())
+
+    def testClear(self):
+
+        parsePDB(self.path)
+        clearStructureCache()
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def tearDown(self):
+
+        if self.current:
+            pathStructureCache(self.current)
+        else:
+            pathStructureCache('')
+        shutil.rmtree(self.folder, ignore_errors=True)
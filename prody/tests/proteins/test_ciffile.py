@@ -0,0 +1,84 @@
+"""This module contains unit tests for :mod:`~prody.proteins.ciffile`."""
+
+from io import StringIO
+
+from numpy.testing import *
+
+from prody import *
+from prody import LOGGER
+from prody.tests import unittest
+
+LOGGER.verbosity = 'none'
+
+CIF = u"""data_TEST
+#
+_entry.id TEST
+#
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_alt_id
+_atom_site.label_comp_id
+_atom_site.label_asym_id
+_atom_site.pdbx_PDB_ins_code
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.occupancy
+_atom_site.B_iso_or_equiv
+_atom_site.auth_seq_id
+_atom_site.auth_comp_id
+_atom_site.auth_asym_id
+_atom_site.auth_atom_id
+_atom_site.pdbx_PDB_model_num
+ATOM   1 N N     . ALA A ? 1.000 2.000 3.000 1.00 10.0 1 ALA A N     1
+ATOM   2 C CA    A ALA A ? 2.000 2.000 3.000 0.50 11.0 1 ALA A CA    1
+ATOM   3 C CA    B ALA A ? 2.100 2.000 3.000 0.50 11.0 1 ALA A CA    1
+ATOM   4 C C     . ALA A ? 3.000 2.000 3.000 1.00 12.0 1 ALA A C     1
+ATOM   5 O "O5'" . DA  B ? 4.000 2.000 3.000 1.00 13.0 2 DA  B "O5'" 1
+HETATM 6 O O     . HOH C ? 5.000 2.000 3.000 1.00 14.0 3 HOH C O     1
+ATOM   7 N N     . ALA A ? 1.500 2.000 3.000 1.00 10.0 1 ALA A N     2
+ATOM   8 C CA    A ALA A ? 2.500 2.000 3.000 0.50 11.0 1 ALA A CA    2
+ATOM   9 C CA    B ALA A ? 2.600 2.000 3.000 0.50 11.0 1 ALA A CA    2
+ATOM  10 C C     . ALA A ? 3.500 2.000 3.000 1.00 12.0 1 ALA A C     2
+ATOM  11 O "O5'" . DA  B ? 4.500 2.000 3.000 1.00 13.0 2 DA  B "O5'" 2
+HETATM 12 O O    . HOH C ? 5.500 2.000 3.000 1.00 14.0 3 HOH C O     2
+#
+"""
+
+
+class TestParseMMCIF(unittest.TestCase):
+
+    def testUsualCase(self):
+
+        ag = parseMMCIFStream(StringIO(CIF))
+        self.assertEqual(ag.numAtoms(), 5)
+        self.assertEqual(ag.numCoordsets(), 2)
+        assert_equal(ag.getNames(), ['N', 'CA', 'C', "O5'", 'O'])
+        assert_equal(ag.getSerials(), [1, 2, 4, 5, 6])
+        assert_equal(ag.getFlags('hetatm'), [0, 0, 0, 0, 1])
+        assert_equal(ag.getFlags('pdbter'), [0, 0, 1, 1, 1])
+        assert_equal(ag.getCoordsets()[:, 0, 0], [1.0, 1.5])
+
+    def testModelArgument(self):
+
+        ag = parseMMCIFStream(StringIO(CIF), model=2)
+        self.assertEqual(ag.numCoordsets(), 1)
+        assert_equal(ag.getCoords()[:, 0], [1.5, 2.5, 3.5, 4.5, 5.5])
+        self.assertRaises(proteins.ciffile.mmCIFParseError,
+                          parseMMCIFStream, StringIO(CIF), model=3)
+
+    def testChainSubsetArguments(self):
+
+        ag = parseMMCIFStream(StringIO(CIF), chain='A,B')
+        assert_equal(ag.getChids(), ['A', 'A', 'A', 'B'])
+        ag = parseMMCIFStream(StringIO(CIF), subset='ca')
+        assert_equal(ag.getNames(), ['CA'])
+
+    def testAltlocArgument(self):
+
+        ag = parseMMCIFStream(StringIO(CIF), altloc='B')
+        assert_equal(ag.getSerials(), [1, 3, 4, 5, 6])
+        assert_equal(ag.getCoords()[1], [2.1, 2.0, 3.0])
@@ -1,5 +1,6 @@
 """This module contains unit tests for :mod:`~prody.proteins`."""
 
+import numpy as np
 from numpy.testing import *
 
 from prody import *
@@ -40,7 +41,105 @@ class TestParsePDBHeaderOnly(unittest.TestCase):
         self.header = None
 
 
+class TestLazyHeader(unittest.TestCase):
 
+    def setUp(self):
+
+        self.header = parsePDB(pathDatafile('pdb1ubi.pdb'), header=True,
+                               model=0, lazy=True)
+
+    def testPlainDict(self):
+
+        header = parsePDB(pathDatafile('pdb1ubi.pdb'), header=True, model=0)
+        self.assertIs(type(header), dict)
+        # storage is read directly, as functions implemented in C do
+        self.assertEqual(set(dict.keys(header)), set(self.header))
+        header = parsePDBHeader(pathDatafile('pdb1ubi.pdb'))
+        self.assertIs(type(header), dict)
+        self.assertIn('A', dict.keys(header))
+
+    def testSelectiveParsing(self):
+
+        self.assertEqual(self.header['resolution'], 1.8)
+        self.assertNotIn('polymers', dict.keys(self.header))
+        self.assertEqual(self.header['A'].chid, 'A')
+        self.assertEqual(self.header['A'].pdbentry, '1UBI')
+        self.assertIn('polymers', dict.keys(self.header))
+        self.assertNotIn('helix', dict.keys(self.header))
+
+    def testMissingKeys(self):
+
+        self.assertNotIn('unknown', self.header)
+        self.assertIsNone(self.header.get('split'))
+        self.assertRaises(KeyError, lambda: self.header['split'])
+
+    def testDictionary(self):
+
+        import pickle
+        self.assertIn('polymers', list(self.header))
+        self.assertIn('A', list(self.header))
+        self.assertEqual(len(self.header), len(dict.keys(self.header)))
+        copy = pickle.loads(pickle.dumps(self.header))
+        self.assertIs(type(copy), dict)
+        self.assertEqual(sorted(copy), sorted(self.header))
+        self.header['title'] = 'changed'
+        self.assertEqual(self.header['title'], 'changed')
+
+
+
+
+class TestBuildBiomolecules(unittest.TestCase):
+
+    def setUp(self):
+
+        atoms = parsePDB(pathDatafile('pdb3mht.pdb'))
+        self.atoms = atoms.select('name CA P').copy()
+        i, j, k = self.atoms.select('chain A').getIndices()[:3]
+        self.atoms.setBonds([[i, j], [j, k]])
+        lines = ['0.000000 -1.000000  0.000000        1.00000',
+                 '1.000000  0.000000  0.000000        2.00000',
+                 '0.000000  0.000000  1.000000        3.00000']
+        identity = ['1.000000  0.000000  0.000000        0.00000',
+                    '0.000000  1.000000  0.000000        0.00000',
+                    '0.000000  0.000000  1.000000        0.00000']
+        self.header = {'biomoltrans': {'1': [['A']] + identity +
+                                            [['A']] + lines +
+                                            [['A', 'C']] + lines}}
+
+    def testAssembly(self):
+
+        chain = self.atoms.select('chain A')
+        n_a = chain.numAtoms()
+        n_c = self.atoms.select('chain C').numAtoms()
+        bm = buildBiomolecules(self.header, self.atoms)
+        self.assertEqual(bm.numAtoms(), 2 * n_a + n_a + n_c)
+        assert_equal(bm.getSegnames()[[0, n_a, 2 * n_a]], ['A', 'B', 'C'])
+        coords = chain.getCoords()
+        assert_allclose(bm.getCoords()[:n_a], coords)
+        assert_allclose(bm.getCoords()[n_a:2 * n_a],
+                        np.array([-coords[:, 1], coords[:, 0],
+                                  coords[:, 2]]).T + [1, 2, 3])
+        union = self.atoms.select('chain A C')
+        assert_equal(bm.getResnums()[2 * n_a:], union.getResnums())
+        i, j, k = np.searchsorted(union.getIndices(),
+                                  chain.getIndices()[:3]) + 2 * n_a
+        assert_equal(list(bm._iterBonds()), [(0, 1), (1, 2),
+                                             (n_a, n_a + 1),
+                                             (n_a + 1, n_a + 2),
+                                             (i, j), (j, k)])
+
+    def testVirtualAssembly(self):
+
+        bm = buildBiomolecules(self.header, self.atoms)
+        virtual = buildBiomolecules(self.header, self.atoms, virtual=True)
+        self.assertIsInstance(virtual, BiomolecularAssembly)
+        self.assertEqual(virtual.numAtoms(), bm.numAtoms())
+        self.assertEqual(virtual.numTransformations(), 3)
+        assert_allclose(virtual.getCoords(), bm.getCoords())
+        assert_equal(virtual.toAtomGroup().getSegnames(), bm.getSegnames())
+        anm = ANM()
+        anm.buildHessian(virtual)
+        self.assertEqual(anm.numAtoms(), bm.numAtoms())
 
 
 if __name__ == '__main__':
@@ -1,6 +1,7 @@
 """This module contains unit tests for :mod:`~prody.proteins`."""
 
 import os
+import shutil
 
 import numpy as np
 from numpy.testing import *
@@ -11,7 +12,7 @@ except ImportError:
 
 from prody import *
 from prody import LOGGER
-from prody.utilities import which
+from prody.utilities import which, makePath
 from prody.tests import TEMPDIR, unittest
 from prody.tests.datafiles import *
 
@@ -77,3 +78,57 @@ class TestFetchPDB(unittest.TestCase):
                 os.remove(fn)
             except:
                 pass
+
+
+class TestLookupPDBFiles(unittest.TestCase):
+
+    """Test :func:`~.lookupPDBFiles` function and local folder index."""
+
+    def setUp(self):
+
+        import tempfile
+        self.current = pathPDBFolder()
+        self.folder = tempfile.mkdtemp(dir=TEMPDIR)
+        self.local = tempfile.mkdtemp(dir=TEMPDIR)
+        for name in ['1p38.pdb', '1p38.pdb.gz', 'pdb1r39.ent.gz',
+                     '2abc.cif', 'notes.txt']:
+            open(os.path.join(self.folder, name), 'w').close()
+        os.mkdir(os.path.join(self.local, 'bc'))
+        open(os.path.join(self.local, 'bc', 'pdb1bcd.pdb.gz'), 'w').close()
+        pathPDBFolder(self.local, divided=True)
+
+    def testFolder(self):
+
+        fns = lookupPDBFiles('1p38', '1r39', '2abc', '1bcd', '9xyz',
+                             folder=self.folder)
+        self.assertEqual([os.path.split(fn)[1] if fn else fn for fn in fns],
+                         ['1p38.pdb.gz', 'pdb1r39.ent.gz', None,
+                          'pdb1bcd.pdb.gz', None])
+        fn = lookupPDBFiles('2abc', folder=self.folder, format='cif')
+        self.assertEqual(os.path.split(fn)[1], '2abc.cif')
+
+    def testFindPDBFiles(self):
+
+        pdbs = findPDBFiles(self.folder, compressed=False)
+        self.assertEqual(list(pdbs), ['1p38'])
+        pdbs = findPDBFiles(self.folder, case='upper')
+        self.assertEqual(sorted(pdbs), ['1P38', '1R39'])
+
+    def testIndexUpdate(self):
+
+        self.assertIsNone(lookupPDBFiles('1cde'))
+        folder = makePath(os.path.join(self.local, 'cd'))
+        open(os.path.join(folder, 'pdb1cde.pdb.gz'), 'w').close()
+        self.assertIsNotNone(lookupPDBFiles('1cde'))
+        self.assertIsNotNone(fetchPDB('1bcd', folder=self.folder))
+        os.remove(os.path.join(self.local, 'bc', 'pdb1bcd.pdb.gz'))
+        self.assertIsNone(lookupPDBFiles('1bcd'))
+
+    def tearDown(self):
+
+        if self.current:
+            pathPDBFolder(*self.current)
+        else:
+            pathPDBFolder('')
+        shutil.rmtree(self.folder, ignore_errors=True)
+        shutil.rmtree(self.local, ignore_errors=True)
@@ -11,7 +11,7 @@ except ImportError:
 
 from prody import *
 from prody import LOGGER
-from prody.utilities import which
+from prody.utilities import which, createStringIO
 from prody.tests import TEMPDIR, unittest
 from prody.tests.datafiles import *
 
@@ -151,6 +151,58 @@ class TestParsePDB(unittest.TestCase):
                           secondary=True)
 '''
 
+class TestParseStructures(unittest.TestCase):
+
+    def setUp(self):
+
+        self.paths = [pathDatafile(DATA_FILES[key]['file'])
+                      for key in ('multi_model_truncated', '1ubi_ca')]
+
+    def testSequential(self):
+
+        results, errors = parseStructures(self.paths + ['missing.pdb'], n_cpu=1,
+                                          subset='ca', return_errors=True)
+        self.assertEqual(len(results), 3)
+        self.assertIsNone(results[2])
+        self.assertEqual(errors[:2], [None, None])
+        self.assertIsNotNone(errors[2])
+        assert_equal(results[0].getCoordsets(),
+                     parsePDB(self.paths[0], subset='ca').getCoordsets())
+
+    def testPool(self):
+
+        results = parseStructures(self.paths, n_cpu=2, model=1,
+                                  per_structure={'chain': ['A', 'A']})
+        for path, result in zip(self.paths, results):
+            atoms = parsePDB(path, model=1, chain='A')
+            self.assertEqual(result.getTitle(), atoms.getTitle())
+            assert_equal(result.getCoordsets(), atoms.getCoordsets())
+            assert_equal(result.getNames(), atoms.getNames())
+            assert_equal(result.getResnums(), atoms.getResnums())
+        self.assertRaises(ValueError, parseStructures, self.paths,
+                          per_structure={'chain': ['A']})
+
+    def testInterrupted(self):
+
+        from prody.proteins import pdbfile
+
+        if not os.path.isdir('/dev/shm'):
+            self.skipTest('shared memory blocks are not listed')
+
+        def interrupt(result):
+            raise RuntimeError('interrupted')
+
+        before = set(os.listdir('/dev/shm'))
+        unpack = pdbfile._unpackStructure
+        pdbfile._unpackStructure = interrupt
+        try:
+            self.assertRaises(RuntimeError, parseStructures, self.paths * 3,
+                              n_cpu=2)
+        finally:
+            pdbfile._unpackStructure = unpack
+        self.assertEqual(set(os.listdir('/dev/shm')) - before, set())
+
+
 class TestWritePDB(unittest.TestCase):
 
     @dec.slow
@@ -201,6 +253,71 @@ class TestWritePDB(unittest.TestCase):
             os.remove(self.tmp)
 
 
+class TestWritePDBStream(unittest.TestCase):
+
+    def setUp(self):
+
+        coords = np.array([[0.0005, -0.0001, 2.675],
+                           [1.0005, 99.9995, -999.999],
+                           [9999.999, -12.3456, 0.125]])
+        self.ag = ag = AtomGroup('test')
+        ag.setCoords(coords)
+        ag.addCoordset(coords + 1)
+        ag.setNames(['N', 'CA', 'HD21'])
+        ag.setResnames(['ALA'] * 3)
+        ag.setResnums([1, 1, 2])
+        ag.setChids(['A', 'A', 'B'])
+        ag.setAltlocs(['', 'A', ''])
+        ag.setBetas([0.005, 10., 99.995])
+        ag.setFlags('pdbter', np.array([False, True, True]))
+
+    def getLines(self, atoms, **kwargs):
+
+        stream = createStringIO()
+        writePDBStream(stream, atoms, **kwargs)
+        return stream.getvalue().split('\n')
+
+    def testCoordinates(self):
+
+        lines = self.getLines(self.ag)
+        for i, line in enumerate([lines[2], lines[3], lines[5]]):
+            xyz = self.ag.getCoordsets(0)[i]
+            self.assertEqual(line[30:54], '%8.3f%8.3f%8.3f' % tuple(xyz))
+            self.assertEqual(line[60:66], '%6.2f' % self.ag.getBetas()[i])
+
+    def testRecords(self):
+
+        lines = self.getLines(self.ag)
+        self.assertEqual(lines[1], 'MODEL        1')
+        self.assertEqual(lines[4], 'TER')
+        self.assertEqual(lines[6:8], ['TER', 'ENDMDL'])
+        self.assertEqual(lines[3][:30], 'ATOM      2  CA AALA A   1    ')
+        self.assertEqual(lines[5][6:30], '    3 HD21 ALA B   2    ')
+        self.assertEqual(lines[10][:30], 'ATOM      2  CA  ALA A   1    ')
+        self.assertTrue(all(len(line) == 80 for line in lines
+                            if line.startswith('ATOM')))
+
+    def testWideColumns(self):
+
+        ag = self.ag.copy()
+        ag.setCoords(ag.getCoords() * 10)
+        line = self.getLines(ag)[5]
+        self.assertEqual(line[30:55], '%8.3f%8.3f%8.3f' %
+                         tuple(ag.getCoords()[2]))
+
+    def testPQR(self):
+
+        stream = createStringIO()
+        ag = self.ag.copy()
+        ag.setCharges([-1., 0.5, 0.])
+        ag.setRadii([1.5, 2., 1.2])
+        writePQRStream(stream, ag)
+        lines = stream.getvalue().split('\n')
+        self.assertEqual(lines[1], 'ATOM       2  CA  AALA  A    1     '
+                         '%8.3f %8.3f %8.3f  0.5000  2.0000' %
+                         tuple(ag.getCoords()[1]))
+
+
 class TestParsePDBHeaderAndAllModels(unittest.TestCase):
 
     def setUp(self):
@@ -251,3 +368,68 @@ class TestParsePDBAltloc(unittest.TestCase):
 
         self.assertEqual(len(parsePDB(self.pdbfile, altloc='C')), 496,
             'failed to parse alternate locations C correctly')
+
+    def testAltlocAnisou(self):
+
+        ag = parsePDB(self.pdbfile)
+        lines = open(self.pdbfile).readlines()
+        anisou = [float(nextline[28:35]) / 10000
+                  if nextline.startswith('ANISOU') else 0
+                  for line, nextline in zip(lines, lines[1:])
+                  if line[:6] in ('ATOM  ', 'HETATM') and line[16] in ' A']
+        self.assertEqual(len(anisou), len(ag))
+        assert_allclose(ag.getAnisous()[:, 0], anisou)
+
+
+class TestParsePDBColumns(unittest.TestCase):
+
+    """Test that columnar parsing reproduces the line-by-line parser."""
+
+    def setUp(self):
+
+        self.columns = proteins.pdbfile._parsePDBColumns
+
+    def tearDown(self):
+
+        proteins.pdbfile._parsePDBColumns = self.columns
+
+    def _parseBoth(self, filename, **kwargs):
+
+        path = pathDatafile(filename)
+        columns = parsePDB(path, **kwargs)
+        proteins.pdbfile._parsePDBColumns = lambda *args: None
+        lines = parsePDB(path, **kwargs)
+        proteins.pdbfile._parsePDBColumns = self.columns
+        return columns, lines
+
+    def _assertEqual(self, columns, lines):
+
+        assert_equal(columns.getCoordsets(), lines.getCoordsets())
+        self.assertEqual(columns.getDataLabels(), lines.getDataLabels())
+        for label in lines.getDataLabels():
+            assert_equal(columns.getData(label), lines.getData(label),
+                         'failed to parse ' + label)
+        for label in ('hetatm', 'pdbter'):
+            assert_equal(columns.getFlags(label), lines.getFlags(label))
+
+    def testMultiModel(self):
+
+        self._assertEqual(*self._parseBoth('pdb2k39_truncated.pdb'))
+
+    def testModel(self):
+
+        self._assertEqual(*self._parseBoth('pdb2k39_truncated.pdb', model=2))
+
+    def testSubsetChain(self):
+
+        self._assertEqual(*self._parseBoth('pdb3mht.pdb', subset='ca',
+                                           chain='A'))
+
+    def testTermini(self):
+
+        self._assertEqual(*self._parseBoth('pdbRTER.pdb'))
+
+    def testBonds(self):
+
+        columns, lines = self._parseBoth('pdb3mht.pdb', bonds=True)
+        assert_equal(columns.getBonds(), lines.getBonds())
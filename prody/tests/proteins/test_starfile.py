@@ -0,0 +1,86 @@
+"""This module contains unit tests for :mod:`~prody.proteins.starfile`."""
+
+from numpy.testing import *
+
+from prody import *
+from prody import LOGGER
+from prody.proteins.starfile import parseSTARLines
+from prody.tests import unittest
+
+LOGGER.verbosity = 'none'
+
+STAR = """data_images
+
+loop_
+_rlnImageName
+_rlnAnglePsi
+_rlnOriginX
+000001@stack.mrcs  10.0  1.0
+000002@stack.mrcs  20.0  2.0
+
+000003@stack.mrcs  30.0  3.0
+#
+data_model
+_rlnNr 3
+loop_
+_a
+_b
+_c
+1 'x y' 3
+4
+'u v' 6
+7 8
+;long
+value
+;
+#
+"""
+
+
+class TestParseSTARLines(unittest.TestCase):
+
+    def setUp(self):
+
+        parsingDict, prog = parseSTARLines(STAR.split('\n'), shlex=True)
+        self.star = StarDict(parsingDict, prog, 'test')
+
+    def testLoopRows(self):
+
+        loop = self.star['images'][0]
+        self.assertEqual(loop.numRows, 3)
+        self.assertEqual(loop[1], {'_rlnImageName': '000002@stack.mrcs',
+                                   '_rlnAnglePsi': '20.0',
+                                   '_rlnOriginX': '2.0'})
+        self.assertEqual(loop[-1]['_rlnAnglePsi'], '30.0')
+        self.assertEqual(loop.getData('_rlnOriginX'), ['1.0', '2.0', '3.0'])
+        self.assertEqual(len(loop.data), 3)
+
+    def testColumns(self):
+
+        data = self.star['images'][0]['data']
+        assert_equal(data.getColumn('_rlnAnglePsi').astype(float),
+                     [10., 20., 30.])
+
+    def testBrokenRows(self):
+
+        loop = self.star['model'][0]
+        self.assertEqual(loop.numRows, 3)
+        self.assertEqual(loop.getData('_b'), ['x y', 'u v', '8'])
+        self.assertEqual(loop[2]['_c'], ';long value ;')
+        self.assertEqual(self.star['model']['data']['_rlnNr'], '3')
+
+    def testMismatchedRows(self):
+
+        lines = ['data_test', 'loop_', '_x', '_y', '_z', '1 2', '3 4 5 6']
+        parsingDict, prog = parseSTARLines(lines)
+        data = parsingDict['test'][0]['data']
+        self.assertIsNone(data._lines)
+        self.assertRaises(KeyError, len, data)
+
+    def testSearch(self):
+
+        indices, loop = self.star['images'][0].search('2',
+                                                      return_indices=True)
+        self.assertEqual(indices, [1])
+        self.assertEqual(loop.numRows, 1)
+        self.assertEqual(loop[0]['_rlnAnglePsi'], '20.0')
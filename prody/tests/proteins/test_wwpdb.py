@@ -79,3 +79,261 @@ class TestHTTP(TestFTP):
         self.fetch = fetchPDBviaHTTP
         self.protocol = 'HTTP'
 
+
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn, StreamRequestHandler, TCPServer
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn, StreamRequestHandler, TCPServer
+
+FILES = {'1abc': b'1abc' * 5000, '2abc': b'2abc' * 10, '3abc': b''}
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+
+    """Serves :data:`FILES`, supporting keep-alive and range requests.
+    First request for **1abc** is interrupted."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+
+        server = self.server
+        server.requests.append((self.path, self.headers.get('Range'),
+                                self.client_address[1]))
+        pdb = self.path.strip('/')[:4]
+        if pdb not in FILES:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = FILES[pdb]
+        start = 0
+        if self.headers.get('Range'):
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+        if pdb == '1abc' and pdb not in server.interrupted:
+            server.interrupted.add(pdb)
+            self.wfile.write(data[:len(data) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(data[start:])
+
+    def log_message(self, *args):
+
+        pass
+
+
+class _FTPHandler(StreamRequestHandler):
+
+    """Serves :data:`FILES` in passive mode, supporting REST command."""
+
+    def reply(self, line):
+
+        self.wfile.write((line + '\r\n').encode('ascii'))
+
+    def handle(self):
+
+        self.server.connections += 1
+        self.reply('220 ready')
+        rest = 0
+        data_server = None
+        while True:
+            line = self.rfile.readline().decode('ascii').strip()
+            if not line:
+                break
+            cmd, _, arg = line.partition(' ')
+            cmd = cmd.upper()
+            if cmd == 'USER':
+                self.reply('230 logged in')
+            elif cmd == 'TYPE':
+                self.reply('200 ok')
+            elif cmd == 'REST':
+                rest = int(arg)
+                self.reply('350 restarting')
+            elif cmd == 'PASV':
+                data_server = TCPServer(('127.0.0.1', 0), None)
+                port = data_server.server_address[1]
+                self.reply('227 Entering Passive Mode (127,0,0,1,{0},{1}).'
+                           .format(port // 256, port % 256))
+            elif cmd == 'RETR':
+                self.server.paths.append(arg)
+                pdb = arg.split('/')[-1][3:7]
+                if pdb not in FILES:
+                    data_server.server_close()
+                    self.reply('550 not found')
+                    continue
+                self.reply('150 sending')
+                conn, _ = data_server.socket.accept()
+                conn.sendall(FILES[pdb][rest:])
+                conn.close()
+                data_server.server_close()
+                rest = 0
+                self.reply('226 done')
+            elif cmd == 'QUIT':
+                self.reply('221 bye')
+                break
+            else:
+                self.reply('502 not implemented')
+
+
+class _ThreadingServer(ThreadingMixIn, TCPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class TestConcurrentDownloads(unittest.TestCase):
+
+    def setUp(self):
+
+        from threading import Thread
+        from prody import SETTINGS
+        from prody.proteins import wwpdb
+
+        self.http = type('HTTPServer', (ThreadingMixIn, HTTPServer),
+                         {'daemon_threads': True})(('127.0.0.1', 0),
+                                                   _HTTPHandler)
+        self.http.requests = []
+        self.http.interrupted = set()
+        self.ftp = _ThreadingServer(('127.0.0.1', 0), _FTPHandler)
+        self.ftp.connections = 0
+        self.ftp.paths = []
+        for server in (self.http, self.ftp):
+            thread = Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+
+        url = 'http://127.0.0.1:{0}/'.format(self.http.server_address[1])
+        wwpdb.WWPDB_HTTP_URL['test'] = lambda pdb: url + pdb + '.pdb.gz'
+        host = '127.0.0.1:{0}'.format(self.ftp.server_address[1])
+        wwpdb.WWPDB_FTP_SERVERS['test'] = ('Test', host, '/pub/')
+        self.settings = dict((key, SETTINGS.pop(key))
+                             for key in ('wwpdb', 'pdb_local_folder')
+                             if key in SETTINGS)
+        SETTINGS['wwpdb'] = 'test'
+        self.folder = os.path.join(TEMPDIR, 'downloads')
+        if not os.path.isdir(self.folder):
+            os.mkdir(self.folder)
+
+    def testHTTP(self):
+
+        fns, status = fetchPDBviaHTTP('1abc', '2abc', '3abc', '4abc',
+                                      folder=self.folder, backoff=0,
+                                      n_threads=2, return_status=True)
+        self.assertEqual(status, ['downloaded', 'downloaded',
+                                  'failed (empty file)', 'not found'])
+        self.assertIsNone(fns[3])
+        with open(fns[0], 'rb') as inp:
+            self.assertEqual(inp.read(), FILES['1abc'])
+        ranges = [rng for path, rng, port in self.http.requests
+                  if path.startswith('/1abc')]
+        self.assertEqual(ranges, [None, 'bytes=10000-'])
+        self.assertLessEqual(len(set(port for path, rng, port
+                                     in self.http.requests)), 3)
+
+    def testResumeLater(self):
+
+        from glob import glob
+
+        for fn in glob(os.path.join(self.folder, '1abc*')):
+            os.remove(fn)
+        fns, status = fetchPDBviaHTTP('1abc', folder=self.folder, retries=0,
+                                      return_status=True)
+        self.assertIsNone(fns)
+        self.assertTrue(status.startswith('failed'))
+        partial = glob(os.path.join(self.folder, '1abc*.part'))
+        self.assertEqual(len(partial), 1)
+        self.assertEqual(os.path.getsize(partial[0]), 10000)
+        fn = fetchPDBviaHTTP('1abc', folder=self.folder, retries=0)
+        with open(fn, 'rb') as inp:
+            self.assertEqual(inp.read(), FILES['1abc'])
+        self.assertFalse(os.path.isfile(partial[0]))
+        ranges = [rng for path, rng, port in self.http.requests]
+        self.assertEqual(ranges, [None, 'bytes=10000-'])
+
+    def testRepeated(self):
+
+        fns = fetchPDBviaHTTP(*['2abc'] * 8, folder=self.folder,
+                              n_threads=4, backoff=0)
+        self.assertEqual(len(set(fns)), 1)
+        with open(fns[0], 'rb') as inp:
+            self.assertEqual(inp.read(), FILES['2abc'])
+        self.assertEqual(len([path for path, rng, port in self.http.requests
+                              if path.startswith('/2abc')]), 1)
+
+    def testUnreachable(self):
+
+        import socket
+        from time import time
+        from prody.proteins import wwpdb
+
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        url = 'http://127.0.0.1:{0}/'.format(sock.getsockname()[1])
+        sock.close()
+        wwpdb.WWPDB_HTTP_URL['test'] = lambda pdb: url + pdb + '.pdb.gz'
+        start = time()
+        fns, status = fetchPDBviaHTTP('1abc', '2abc', '4abc',
+                                      folder=self.folder, backoff=10,
+                                      n_threads=1, return_status=True)
+        self.assertLess(time() - start, 5)
+        self.assertEqual(fns, [None, None, None])
+        self.assertTrue(all(item.startswith('failed') for item in status))
+
+    def testProxy(self):
+
+        from prody.proteins.wwpdb import _connectHTTP
+
+        environ = dict(os.environ)
+        try:
+            for key in list(os.environ):
+                if key.lower().endswith('_proxy'):
+                    os.environ.pop(key)
+            os.environ['http_proxy'] = 'http://user:pw@proxy.test:3128'
+            os.environ['https_proxy'] = 'proxy.test:3128'
+            conn, headers, absolute = _connectHTTP('http', 'files.test', 5)
+            self.assertEqual((conn.host, conn.port), ('proxy.test', 3128))
+            self.assertTrue(absolute)
+            self.assertEqual(headers['Proxy-Authorization'],
+                             'Basic dXNlcjpwdw==')
+            conn, headers, absolute = _connectHTTP('https', 'files.test', 5)
+            self.assertEqual((conn.host, conn.port), ('proxy.test', 3128))
+            self.assertFalse(absolute)
+            self.assertEqual(conn._tunnel_host, 'files.test')
+            os.environ['no_proxy'] = 'files.test'
+            conn, headers, absolute = _connectHTTP('https', 'files.test', 5)
+            self.assertEqual(conn.host, 'files.test')
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+
+    def testFTP(self):
+
+        fns = fetchPDBviaFTP('1abc', '2abc', '5abc', folder=self.folder,
+                             n_threads=2, backoff=0)
+        self.assertIsNone(fns[2])
+        with open(fns[1], 'rb') as inp:
+            self.assertEqual(inp.read(), FILES['2abc'])
+        self.assertEqual(self.ftp.connections, 2)
+        self.assertIn('/pub/pdb/data/structures/divided/pdb/ab/pdb1abc.ent.gz',
+                      self.ftp.paths)
+
+    def tearDown(self):
+
+        from prody import SETTINGS
+        from prody.proteins import wwpdb
+
+        for server in (self.http, self.ftp):
+            server.shutdown()
+            server.server_close()
+        wwpdb.WWPDB_HTTP_URL.pop('test')
+        wwpdb.WWPDB_FTP_SERVERS.pop('test')
+        SETTINGS.pop('wwpdb')
+        SETTINGS.update(self.settings)
@@ -2,15 +2,19 @@ __author__ = 'Ahmet Bakan, Anindita Dutta, Wenzhi Mao'
 
 from prody.tests import TestCase
 
-from numpy import array, log, zeros, char, ones, fromfile
+from numpy import array, log, zeros, char, ones, fromfile, empty, concatenate
+from numpy import dtype
+from numpy.random import RandomState
 from numpy.testing import assert_array_equal, assert_array_almost_equal
 
 from prody.tests.datafiles import *
 
-from prody import LOGGER, calcShannonEntropy, buildMutinfoMatrix, parseMSA
+from prody import LOGGER, calcShannonEntropy, buildMutinfoMatrix, parseMSA, MSA
 from prody import calcMSAOccupancy, buildSeqidMatrix, uniqueSequences
 from prody import buildOMESMatrix, buildSCAMatrix, calcMeff
-from prody import buildDirectInfoMatrix
+from prody import buildDirectInfoMatrix, applyMutinfoCorr
+from prody import alignPairwise, calcResampledMatrices, calcRankorder
+from prody.sequence.msatools import msamutinfo, msaomes, msajoint
 
 LOGGER.verbosity = None
 
@@ -89,6 +93,28 @@ class TestCalcShannonEntropy(TestCase):
         result = calcShannonEntropy(msa, omitgaps=True)
         assert_array_almost_equal(expect, result)
 
+    def testWeights(self):
+
+        msa = array([list('ACDE'),
+                     list('ACDE'),
+                     list('ACCF'),
+                     list('-AAA')], dtype='|S1')
+
+        expect = calcShannonEntropy(msa[1:])
+        result = calcShannonEntropy(msa, weights=[.5, .5, 1, 1])
+        assert_array_almost_equal(expect, result)
+        result = calcShannonEntropy(MSA(msa), weights=[.5, .5, 1, 1])
+        assert_array_almost_equal(expect, result)
+
+    def testCachedCounts(self):
+
+        for ambiguity in (True, False):
+            for omitgaps in (True, False):
+                expect = calcShannonEntropy(FASTA._getArray(), ambiguity,
+                                            omitgaps)
+                result = calcShannonEntropy(FASTA, ambiguity, omitgaps)
+                assert_array_almost_equal(expect, result)
+
 """
     def testSixSequences3(self):
 
@@ -279,6 +305,39 @@ class TestCalcMutualInfo(TestCase):
         result = buildMutinfoMatrix(msa, norm=True)
         assert_array_almost_equal(expect, result, err_msg='norm failed')
 
+    def testTiles(self):
+
+        length = FASTA.numResidues()
+        for ambiguity in (True, False):
+            expect = msamutinfo(FASTA._getArray(), empty((length, length)),
+                                ambiguity=ambiguity)
+            result = buildMutinfoMatrix(FASTA, ambiguity, columns=16,
+                                        n_cpu=2)
+            assert_array_almost_equal(expect, result)
+
+    def testWeights(self):
+
+        msa = array([list('ACCA'),
+                     list('ACDA'),
+                     list('ACEC'),
+                     list('ACGC')], dtype='|S1')
+
+        expect = buildMutinfoMatrix(msa)
+        result = buildMutinfoMatrix(msa[[0, 0, 1, 2, 3]],
+                                    weights=[.5, .5, 1, 1, 1])
+        assert_array_almost_equal(expect, result)
+
+    def testCorrection(self):
+
+        mutinfo = buildMutinfoMatrix(FASTA)
+        length = len(mutinfo)
+        expect = mutinfo - (mutinfo.sum(0)[:, None] * mutinfo.sum(0) *
+                            length / mutinfo.sum() / (length - 1))
+        assert_array_almost_equal(expect, applyMutinfoCorr(mutinfo))
+        result = applyMutinfoCorr(mutinfo, inplace=True)
+        self.assertIs(result, mutinfo)
+        assert_array_almost_equal(expect, mutinfo)
+
 
 class TestCalcMSAOccupancy(TestCase):
 
@@ -302,6 +361,21 @@ class TestCalcMSAOccupancy(TestCase):
         assert_array_equal(calcMSAOccupancy(FASTA, 'sequence'),
                            FASTA_ALPHA.sum(1) / (FASTA.numResidues() * 1.0))
 
+    def testArray(self):
+
+        assert_array_equal(calcMSAOccupancy(FASTA._getArray(), 'residue'),
+                           calcMSAOccupancy(FASTA, 'residue'))
+
+    def testWeights(self):
+
+        weights = ones(FASTA_NUMBER)
+        weights[0] = 0
+        assert_array_almost_equal(calcMSAOccupancy(FASTA, weights=weights,
+                                                   count=True),
+                                  FASTA_ALPHA[1:].sum(0))
+        assert_array_almost_equal(calcMSAOccupancy(FASTA, weights=weights),
+                                  FASTA_ALPHA[1:].mean(0))
+
 
 class TestIdentity(TestCase):
 
@@ -314,6 +388,12 @@ class TestIdentity(TestCase):
         assert_array_almost_equal(FASTA_EYE,
                                   buildSeqidMatrix(FASTA, turbo=False))
 
+    def testSparseIdentityMatrix(self):
+
+        seqid = buildSeqidMatrix(FASTA, threshold=0.5, n_cpu=2)
+        expect = FASTA_EYE * (FASTA_EYE >= 0.5)
+        assert_array_almost_equal(expect, seqid.toarray())
+
 
 class TestUnique(TestCase):
 
@@ -343,6 +423,29 @@ class TestUnique(TestCase):
 
         assert_array_equal(unique, uniqueSequences(FASTA, seqid))
 
+    def testUniqueBlocks(self):
+
+        seqid = 0.5
+        unique = ones(FASTA_NUMBER, bool)
+        for i in range(FASTA_NUMBER):
+            if not unique[i]:
+                continue
+            for j in range(i+1, FASTA_NUMBER):
+                if FASTA_EYE[i, j] >= seqid:
+                    unique[j] = False
+
+        assert_array_equal(unique, uniqueSequences(FASTA, seqid, block=4,
+                                                   n_cpu=2))
+
+    def testRepeats(self):
+
+        msa = concatenate([FASTA._getArray()[:10], zeros((2, FASTA_LENGTH),
+                          '|S1'), FASTA._getArray()[:10]])
+        msa[10:12] = '-'
+        unique = uniqueSequences(msa, 0.5, block=4)
+        assert_array_equal(unique[:10], uniqueSequences(msa[:10], 0.5))
+        assert_array_equal(unique[10:], [True] * 2 + [False] * 10)
+
 
 class TestCalcOMES(TestCase):
 
@@ -504,6 +607,15 @@ class TestCalcOMES(TestCase):
         result = buildOMESMatrix(msa, turbo=False)
         assert_array_almost_equal(expect, result, err_msg='w/out turbo failed')
 
+    def testTiles(self):
+
+        length = FASTA.numResidues()
+        for ambiguity in (True, False):
+            expect = msaomes(FASTA._getArray(), empty((length, length)),
+                             ambiguity=ambiguity)
+            result = buildOMESMatrix(FASTA, ambiguity, columns=16, n_cpu=2)
+            assert_array_almost_equal(expect, result)
+
 
 class TestCalcSCA(TestCase):
 
@@ -537,6 +649,15 @@ class TestCalcSCA(TestCase):
         result = buildSCAMatrix(fasta, turbo=False)
         assert_array_almost_equal(expect, result, err_msg='w/out turbo failed')
 
+    def testWeights(self):
+
+        msa = FASTA._getArray()[:, :10]
+        weights = ones(FASTA_NUMBER)
+        weights[:5] = 2
+        expect = buildSCAMatrix(concatenate([msa[:5], msa]))
+        result = buildSCAMatrix(MSA(msa), weights=weights)
+        assert_array_almost_equal(expect, result)
+
 
 class TestCalcMeff(TestCase):
 
@@ -716,6 +837,24 @@ class TestCalcMeff(TestCase):
         assert_array_almost_equal(expect[1], result[1],
                                   err_msg='weight failed')
 
+    def testBlocks(self):
+
+        expect = calcMeff(FASTA, seqid=0.4, refine=True, weight=True)
+        result = calcMeff(FASTA, seqid=0.4, refine=True, weight=True,
+                          block=4, n_cpu=2)
+        assert_array_almost_equal(expect[0], result[0])
+        assert_array_almost_equal(expect[1], result[1])
+
+    def testPrefilter(self):
+
+        msa = concatenate([FASTA._getArray()] * 2)[::-1]
+        for seqid in (0.4, 0.62, 0.8, 1.):
+            expect = calcMeff(msa, seqid=seqid, weight=True, prefilter=False)
+            result = calcMeff(msa, seqid=seqid, weight=True, block=5,
+                              n_cpu=2)
+            self.assertEqual(expect[0], result[0])
+            assert_array_equal(expect[1], result[1])
+
 
 class TestDirectInfo(TestCase):
 
@@ -1196,3 +1335,132 @@ class TestDirectInfo(TestCase):
         fasta = FASTA[:, :10]
         result = buildDirectInfoMatrix(fasta, refine=True)
         assert_array_almost_equal(expect, result, err_msg='refine failed')
+
+    def testTiles(self):
+
+        expect = buildDirectInfoMatrix(FASTA[:, :40])
+        result = buildDirectInfoMatrix(FASTA[:, :40], columns=7, n_cpu=2)
+        assert_array_almost_equal(expect, result, decimal=12)
+        result = buildDirectInfoMatrix(FASTA[:, :40], dtype='float32')
+        assert_array_almost_equal(expect, result, decimal=4)
+        self.assertEqual(result.dtype, dtype('float32'))
+
+    def testShrinkage(self):
+
+        expect = buildDirectInfoMatrix(FASTA[:, :20])
+        result = buildDirectInfoMatrix(FASTA[:, :20], shrinkage=0.2)
+        self.assertEqual(result.shape, expect.shape)
+        self.assertTrue((result <= expect.max()).all())
+        self.assertRaises(ValueError, buildDirectInfoMatrix, FASTA[:, :20],
+                          shrinkage=1)
+
+    def testPseudoLikelihood(self):
+
+        result = buildDirectInfoMatrix(FASTA[:, :12], method='plm',
+                                       max_iter=20)
+        self.assertEqual(result.shape, (12, 12))
+        assert_array_equal(result, result.T)
+        assert_array_equal(result.diagonal(), 0)
+        self.assertTrue((result >= 0).all())
+        pooled = buildDirectInfoMatrix(FASTA[:, :12], method='plm',
+                                       max_iter=20, n_cpu=2)
+        assert_array_almost_equal(result, pooled)
+        self.assertRaises(ValueError, buildDirectInfoMatrix, FASTA,
+                          method='gaussian')
+
+    def testJointArguments(self):
+
+        cols = zeros((2, 5), 'uint8')
+        weights = ones(5)
+        self.assertRaises(TypeError, msajoint, cols, cols, weights,
+                          zeros((2, 2, 3, 3), 'float32'))
+        self.assertRaises(ValueError, msajoint, cols, cols, weights,
+                          zeros((2, 3, 3, 3)))
+        self.assertRaises(ValueError, msajoint, cols, cols, ones(4),
+                          zeros((2, 2, 3, 3)))
+        cols[0, 0] = 3
+        self.assertRaises(ValueError, msajoint, cols, cols, weights,
+                          zeros((2, 2, 3, 3)))
+
+
+class TestAlignPairwise(TestCase):
+
+    def testGlobal(self):
+
+        result = alignPairwise('ACGT', 'AGT', method='global')
+        self.assertEqual(result, ('ACGT', 'A-GT', 2.0, 0, 4))
+
+    def testLocal(self):
+
+        result = alignPairwise('XXACGZZZ', 'YACGW', method='local')
+        self.assertEqual(result, ('XXACGZZZ', '-YACGW--', 3.0, 2, 5))
+        self.assertIsNone(alignPairwise('AAAA', 'CCCC', method='local'))
+
+    def testScores(self):
+
+        seq1 = str(FASTA[0]).replace('-', '').replace('.', '')
+        for seq in FASTA[1:6]:
+            seq2 = str(seq).replace('-', '').replace('.', '')
+            for method in ('global', 'local'):
+                result = alignPairwise(seq1, seq2, method=method)
+                self.assertEqual(result[0].replace('-', ''), seq1)
+                self.assertEqual(result[1].replace('-', ''), seq2)
+                self.assertAlmostEqual(alignPairwise(seq1, seq2,
+                                       method=method, score_only=True),
+                                       result[2])
+
+    def testBatch(self):
+
+        results = alignPairwise('ACGT', ['ACGT', 'AGT', 'TTTT'],
+                                method='global')
+        self.assertEqual([result[2] for result in results], [4.0, 2.0, 1.0])
+        self.assertEqual(results[1],
+                         alignPairwise('ACGT', 'AGT', method='global'))
+        self.assertRaises(ValueError, alignPairwise, 'ACGT', 'AGT',
+                          method='semiglobal')
+
+
+class TestResampling(TestCase):
+
+    def testBootstrap(self):
+
+        msa = FASTA._getArray()[:, :20]
+        mean, variance, zscore = calcResampledMatrices(msa, replicates=5,
+                                                       seed=7, n_cpu=2)
+        random = RandomState(7)
+        replicates = array([buildMutinfoMatrix(msa[random.randint(0,
+                            FASTA_NUMBER, FASTA_NUMBER)]) for i in range(5)])
+        assert_array_almost_equal(mean, replicates.mean(0))
+        assert_array_almost_equal(variance, replicates.var(0, ddof=1))
+        std = replicates.std(0, ddof=1)
+        assert_array_almost_equal(zscore[std > 0], (mean / std)[std > 0])
+
+    def testShuffle(self):
+
+        msa = FASTA._getArray()[:, :20]
+        mean, variance, zscore = calcResampledMatrices(
+            msa, lambda arr, **kwargs: calcShannonEntropy(arr)[None],
+            'shuffle', replicates=3, seed=0)
+        assert_array_almost_equal(mean, calcShannonEntropy(msa)[None])
+        assert_array_almost_equal(variance, 0)
+        assert_array_equal(zscore, 0)
+
+    def testRankorder(self):
+
+        msa = FASTA._getArray()[:, :20]
+        mean, variance, zscore = calcResampledMatrices(msa, 'omes', 'shuffle',
+                                                       replicates=3, seed=0)
+        row, col, values = calcRankorder(buildOMESMatrix(msa), zscore=True,
+                                         resampled=(mean, variance))
+        assert_array_almost_equal(values, zscore[row, col])
+
+    def testArguments(self):
+
+        msa = FASTA._getArray()[:, :5]
+        self.assertRaises(ValueError, calcResampledMatrices, msa, 'entropy')
+        self.assertRaises(ValueError, calcResampledMatrices, msa,
+                          resample='jackknife')
+        self.assertRaises(ValueError, calcResampledMatrices, msa,
+                          replicates=1)
+        self.assertRaises(ValueError, calcResampledMatrices, msa,
+                          resample='subsample', fraction=0)
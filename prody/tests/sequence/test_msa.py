@@ -6,7 +6,7 @@ from numpy.testing import assert_equal, assert_array_equal, assert_array_almost_
 from prody.tests.datafiles import *
 
 from prody import LOGGER, refineMSA, parseMSA, calcMSAOccupancy, mergeMSA
-from prody import uniqueSequences
+from prody import uniqueSequences, MSA
 
 LOGGER.verbosity = None
 
@@ -41,6 +41,15 @@ class TestRefinement(TestCase):
 
         assert_array_equal(refined, expected)
 
+    def testLabelColocc(self):
+
+        label = 'FSHB_BOVIN'
+        index = FASTA.getIndex(label)
+        refined = refineMSA(FASTA, label=label, colocc=0.9)._getArray()
+        expected = FASTA._getArray().take(FASTA_ALPHA[index].nonzero()[0], 1)
+        cols = char.isalpha(expected).sum(0) / NUMSEQ >= 0.9
+        assert_array_equal(refined, expected[:, cols])
+
     def testRowCol(self):
 
         rowocc = 0.9
@@ -112,6 +121,63 @@ class TestRefinement(TestCase):
         msa.extend(FASTA)
         assert_equal(msa[numSeq:].getArray(), FASTA.getArray(), 'MSA extension failed')
 
+    def testFullLabelIndex(self):
+
+        label = FASTA.getLabels(full=True)[5]
+        self.assertEqual(FASTA.getIndex(label), 5)
+        self.assertEqual(FASTA.getIndex(label.split('/')[0]), 5)
+        self.assertEqual(FASTA.getIndex('GTHB2_ONCKE/26-130'), [0, 1])
+        self.assertIsNone(FASTA.getIndex('MISSING/1-10'))
+
+class TestEncoding(TestCase):
+
+    def testCodes(self):
+
+        msa = MSA(array([list('AcZx-.'), list('bJ-a1W')], dtype='|S1'))
+        assert_array_equal(msa.getCodes(), [[1, 3, 26, 24, 0, 0],
+                                            [2, 10, 0, 1, 0, 23]])
+
+    def testCounts(self):
+
+        msa = MSA(array([list('ABX'), list('A-D')], dtype='|S1'))
+        counts = msa.getCounts(ambiguity=False)
+        self.assertEqual(counts.shape, (3, 27))
+        assert_array_equal(counts[:, [0, 1, 2, 4, 24]],
+                           [[0, 2, 0, 0, 0], [1, 0, 1, 0, 0],
+                            [0, 0, 0, 1, 1]])
+        counts = msa.getCounts()
+        assert_array_almost_equal(counts[1, [0, 2, 4, 14]], [1, 0, .5, .5])
+        assert_array_almost_equal(counts[2, [1, 4, 24]], [.05, 1.05, 0])
+        assert_array_almost_equal(counts.sum(1), [2, 2, 2])
+
+    def testExtensionResetsCaches(self):
+
+        msa = FASTA[:]
+        msa._getCodes()
+        msa.getProfile()
+        msa.extend(FASTA)
+        self.assertEqual(msa._getCodes().shape[0], 2 * len(FASTA))
+        self.assertEqual(msa.getProfile().getOccupancy(count=True).max(),
+                         2 * len(FASTA))
+
+    def testProfile(self):
+
+        msa = MSA(array([list('AB-'), list('A-D'), list('C--')], dtype='|S1'))
+        profile = msa.getProfile()
+        self.assertIs(profile, msa.getProfile())
+        assert_array_almost_equal(profile.getGapFraction(), [0, 2/3., 2/3.])
+        assert_array_almost_equal(profile.getOccupancy(), [1, 1/3., 1/3.])
+        freqs = profile.getFrequencies(omitgaps=True)
+        assert_array_almost_equal(freqs[0, [1, 3]], [2/3., 1/3.])
+        assert_array_almost_equal(freqs[1, [4, 14]], [.5, .5])
+        assert_array_almost_equal(profile.getFrequencies().sum(1), [1, 1, 1])
+
+        weighted = msa.getProfile(weights=[.5, .5, 1])
+        assert_array_almost_equal(weighted.getOccupancy(), [1, .25, .25])
+        assert_array_almost_equal(weighted.getEntropy(), [log(2), log(2), 0])
+        self.assertRaises(ValueError, msa.getProfile, weights=[1, 1])
+
+
 class TestMerging(TestCase):
 
 
@@ -10,6 +10,7 @@ from numpy.testing import assert_array_equal, dec
 from prody.tests.datafiles import *
 from prody.tests import TEMPDIR
 from prody import MSA, MSAFile, parseMSA, LOGGER, writeMSA
+from prody import saveMSA, loadMSA, indexMSA
 from prody.utilities import createStringIO
 
 LOGGER.verbosity = None
@@ -75,6 +76,89 @@ class TestParseMSA(TestCase):
         self.assertDictEqual(FASTA._mapping, SELEX._mapping)
         self.assertDictEqual(FASTA._mapping, STOCK._mapping)
 
+    def testCompressed(self):
+
+        for msa, ext in ((FASTA, '.fasta'), (STOCK, '.sth')):
+            filename = writeMSA(join(TEMPDIR, 'test' + ext + '.gz'), msa)
+            result = parseMSA(filename)
+            self.assertEqual(result.getTitle(), 'test')
+            assert_array_equal(result._getArray(), msa._getArray())
+            self.assertDictEqual(result._mapping, msa._mapping)
+            os.remove(filename)
+
+    def testCompressedWithoutZlib(self):
+
+        from prody.sequence import msaio
+        has_zlib = msaio.HAS_ZLIB
+        msaio.HAS_ZLIB = 0
+        try:
+            for msa, ext in ((FASTA, '.fasta'), (SELEX, '.slx'),
+                             (STOCK, '.sth')):
+                filename = writeMSA(join(TEMPDIR, 'test' + ext + '.gz'), msa)
+                result = parseMSA(filename)
+                assert_array_equal(result._getArray(), msa._getArray())
+                os.remove(filename)
+        finally:
+            msaio.HAS_ZLIB = has_zlib
+
+    def testFilterSlice(self):
+
+        for ext in ('fasta', 'sth'):
+            filename = pathDatafile('msa_Cys_knot.' + ext)
+            msa = parseMSA(filename, filter=lambda label, seq: 'BOVIN' in label)
+            self.assertListEqual(msa.getLabels(), ['TSHB_BOVIN', 'FSHB_BOVIN'])
+            assert_array_equal(msa._getArray(),
+                               FASTA._getArray()[[FASTA.getIndex('TSHB_BOVIN'),
+                                                  FASTA.getIndex('FSHB_BOVIN')]])
+            msa = parseMSA(filename, slice=slice(10, 50, 3))
+            assert_array_equal(msa._getArray(),
+                               FASTA._getArray()[:, 10:50:3])
+            msa = parseMSA(filename, slice=[0, 5, 7],
+                           filter=lambda label, seq: seq.count('-') < 20)
+            self.assertEqual(msa.numResidues(), 3)
+            self.assertListEqual(msa.getLabels(full=True),
+                                 [seq.getLabel(True) for seq in FASTA
+                                  if str(seq).count('-') < 20])
+
+
+    def testLabels(self):
+
+        labels = ['FSHB_BOVIN', 'GTHB2_ONCKE', FASTA.getLabels(full=True)[5]]
+        rows = sorted([FASTA.getIndex('FSHB_BOVIN'), 5] +
+                      FASTA.getIndex('GTHB2_ONCKE'))
+        for ext in ('fasta', 'sth', 'fasta.gz'):
+            filename = join(TEMPDIR, 'test.' + ext)
+            writeMSA(filename, FASTA)
+            msa = parseMSA(filename, labels=labels + ['MISSING'])
+            self.assertEqual(msa.getTitle(), 'test')
+            assert_array_equal(msa._getArray(), FASTA._getArray()[rows])
+            self.assertListEqual(msa.getLabels(full=True),
+                                 [FASTA.getLabels(full=True)[i] for i in rows])
+            msa = parseMSA(filename, labels=labels, slice=slice(0, 10),
+                           filter=lambda label, seq: label != 'FSHB_BOVIN')
+            assert_array_equal(msa._getArray(),
+                               FASTA._getArray()[rows[:-1], :10])
+            os.remove(filename)
+            if not ext.endswith('.gz'):
+                self.assertTrue(os.path.isfile(filename + '.index'))
+                os.remove(filename + '.index')
+
+    def testIndex(self):
+
+        filename = writeMSA(join(TEMPDIR, 'test.sth'), FASTA)
+        index = indexMSA(filename)
+        stamp = os.path.getmtime(index)
+        self.assertEqual(indexMSA(filename), index)
+        self.assertEqual(os.path.getmtime(index), stamp)
+        writeMSA(filename, FASTA[:3])
+        os.utime(filename, (stamp + 10, stamp + 10))
+        msa = parseMSA(filename, labels=FASTA.getLabels()[:4])
+        self.assertEqual(msa.numSequences(), 3)
+        self.assertRaises(ValueError, indexMSA, filename + '.gz')
+        os.remove(filename)
+        os.remove(index)
+
+
 class TestWriteMSA(TestCase):
 
     def testSelex(self):
@@ -90,3 +174,25 @@ class TestWriteMSA(TestCase):
         self.assertListEqual(list(FASTA), list(fasta))
         if os.path.isfile(filename):
             os.remove(filename)
+
+
+class TestSaveMSA(TestCase):
+
+    def testMemoryMapped(self):
+
+        filename = saveMSA(FASTA, join(TEMPDIR, 'test'))
+        self.assertTrue(filename.endswith('.msa.npz'))
+        msa = loadMSA(filename)
+        self.assertEqual(msa.getTitle(), FASTA.getTitle())
+        self.assertListEqual(msa.getLabels(full=True),
+                             FASTA.getLabels(full=True))
+        self.assertEqual(msa.getIndex('FSHB_BOVIN'),
+                         FASTA.getIndex('FSHB_BOVIN'))
+        assert_array_equal(msa._getArray(), FASTA._getArray())
+        assert_array_equal(msa._getCodes(), FASTA._getCodes())
+        self.assertFalse(msa._getArray().flags.writeable)
+
+        msa = loadMSA(filename, mmap=False)
+        self.assertTrue(msa._getArray().flags.writeable)
+        assert_array_equal(msa._getCodes(), FASTA._getCodes())
+        os.remove(filename)
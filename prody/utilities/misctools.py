@@ -4,6 +4,7 @@ import re
 from numpy import unique, linalg, diag, sqrt, dot, chararray, divide, zeros_like, zeros, allclose, ceil, abs
 from numpy import diff, where, insert, nan, isnan, loadtxt, array, round, average, min, max, delete, vstack
 from numpy import sign, arange, asarray, ndarray, subtract, power, sum, isscalar, empty, triu, tril, median
+from numpy import minimum
 from collections import Counter
 import numbers
 
@@ -19,7 +20,7 @@ __all__ = ['Everything', 'Cursor', 'ImageCursor', 'rangeString', 'alnum', 'impor
            'saxsWater', 'count', 'addEnds', 'copy', 'dictElementLoop', 'index',
            'getDataPath', 'openData', 'chr2', 'toChararray', 'interpY', 'cmp', 'pystr',
            'getValue', 'indentElement', 'isPDB', 'isURL', 'isListLike', 'isSymmetric', 'makeSymmetric',
-           'getDistance', 'fastin', 'createStringIO', 'div0', 'wmean', 'bin2dec', 'wrapModes', 
+           'getDistance', 'getBoxVectors', 'fastin', 'createStringIO', 'div0', 'wmean', 'bin2dec', 'wrapModes', 
            'fixArraySize', 'decToHybrid36', 'hybrid36ToDec', 'DTYPE', 'checkIdentifiers', 'split', 'mad']
 
 DTYPE = array(['a']).dtype.char  # 'S' for PY2K and 'U' for PY3K
@@ -510,13 +511,59 @@ def indentElement(elem, level=0):
 def isListLike(a):
     return isinstance(a, (list, tuple, ndarray))
 
+PBC_SHIFTS = array([[x, y, z] for x in (-1., 0., 1.)
+                    for y in (-1., 0., 1.) for z in (-1., 0., 1.)])
+
 def getDistance(coords1, coords2, unitcell=None):
 
     diff = coords1 - coords2
     if unitcell is not None:
-        diff = subtract(diff, round(diff/unitcell)*unitcell, diff)
+        if unitcell.shape == (6,) and (unitcell[3:] == 90).all():
+            unitcell = unitcell[:3]
+        if unitcell.shape == (3,):
+            diff = subtract(diff, round(diff/unitcell)*unitcell, diff)
+        else:
+            # wrap into the unitcell using fractional coordinates, and then
+            # check neighboring images, as rounding fractional coordinates
+            # does not always give the minimum image for triclinic cells
+            box = getBoxVectors(unitcell)
+            frac = dot(diff, linalg.inv(box))
+            frac -= round(frac)
+            diff = dot(frac, box)
+            dist2 = None
+            for shift in dot(PBC_SHIFTS, box):
+                d2 = power(diff + shift, 2).sum(axis=-1)
+                dist2 = d2 if dist2 is None else minimum(dist2, d2)
+            return sqrt(dist2)
     return sqrt(power(diff, 2, diff).sum(axis=-1))
 
+def getBoxVectors(unitcell):
+    """Returns box vectors of a periodic *unitcell* as rows of a ``(3, 3)``
+    array.  *unitcell* may be orthorhombic box dimensions ``(a, b, c)``, box
+    dimensions and angles in degrees ``(a, b, c, alpha, beta, gamma)`` as
+    stored in DCD files, or box vectors with shape ``(3, 3)``."""
+
+    unitcell = asarray(unitcell, float)
+    if unitcell.shape == (3, 3):
+        return unitcell
+    if unitcell.shape == (3,):
+        return diag(unitcell)
+    if unitcell.shape != (6,):
+        raise ValueError('unitcell.shape must be (3,), (6,), or (3, 3)')
+
+    from numpy import cos, sin, radians
+    a, b, c = unitcell[:3]
+    alpha, beta, gamma = radians(unitcell[3:])
+    box = zeros((3, 3))
+    box[0, 0] = a
+    box[1, 0] = b * cos(gamma)
+    box[1, 1] = b * sin(gamma)
+    box[2, 0] = c * cos(beta)
+    box[2, 1] = c * (cos(alpha) - cos(beta) * cos(gamma)) / sin(gamma)
+    box[2, 2] = sqrt(c ** 2 - box[2, 0] ** 2 - box[2, 1] ** 2)
+    box[abs(box) < 1e-8] = 0
+    return box
+
 def fastin(a, B):
     for b in reversed(B):
         if a is b:
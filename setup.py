@@ -95,6 +95,12 @@ for pkg in PACKAGES:
 from glob import glob
 tntDir = join('prody', 'utilities', 'tnt')
 
+# compressed MSA files are parsed in C by streaming them through zlib
+if platform.system() == 'Windows':
+    MSAIO_ZLIB = {'define_macros': [('MSAIO_NO_ZLIB', None)]}
+else:
+    MSAIO_ZLIB = {'libraries': ['z']}
+
 EXTENSIONS = [
     Extension('prody.dynamics.rtbtools',
               glob(join('prody', 'dynamics', 'rtbtools.c')),
@@ -110,7 +116,8 @@ EXTENSIONS = [
               include_dirs=[numpy.get_include()]),
     Extension('prody.sequence.msaio',
               [join('prody', 'sequence', 'msaio.c'),],
-              include_dirs=[numpy.get_include()]),
+              include_dirs=[numpy.get_include()],
+              **MSAIO_ZLIB),
     Extension('prody.sequence.seqtools',
               [join('prody', 'sequence', 'seqtools.c'),],
               include_dirs=[numpy.get_include()]),